@@ -1354,6 +1354,8 @@ class Model:
 
         connections[child.pyqt_signals.child_added] = self.child_added
         connections[child.pyqt_signals.child_removed] = self.deleted
+        connections[child.pyqt_signals.children_added] = self.children_added
+        connections[child.pyqt_signals.children_removed] = self.children_deleted
 
         for signal, slot in connections.items():
             signal.connect(slot)
@@ -1396,6 +1398,19 @@ class Model:
         if child.uuid is None:
             check_uuids(self.root)
 
+    def children_added(self, parent, first, last):
+        children = parent.children[first : last + 1]
+
+        for child in children:
+            self.pyqtify_connect(parent, child)
+
+        if any(child.uuid is None for child in children):
+            check_uuids(self.root)
+
+    def children_deleted(self, parent, nodes, row):
+        for node in nodes:
+            self.deleted(parent, node, row)
+
     def deleted(self, parent, node, row):
         item = self.item_from_node(parent)
         taken_items = item.takeRow(row)
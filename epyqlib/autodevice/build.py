@@ -12,6 +12,7 @@ import attr
 import canmatrix.formats
 
 import epyqlib.device
+import epyqlib.pm.valuesettable
 
 
 class InvalidAutoParametersDeviceError(Exception):
@@ -105,7 +106,7 @@ class Builder:
         self._original_raw_dict = original_raw_dict
 
     def load_pmvs(self, path):
-        self._value_set = epyqlib.pm.valuesetmodel.loadp(path)
+        self._value_set = epyqlib.pm.valuesettable.loadp(path)
 
     def load_epp(self, parameters, can, can_suffix):
         (matrix,) = canmatrix.formats.load(
@@ -124,7 +125,7 @@ class Builder:
         )
         parameters = json.load(parameters)
         nvs.from_dict(parameters)
-        self._value_set = nvs.to_value_set(include_secrets=True)
+        self._value_set = nvs.to_value_set(include_secrets=True).to_table()
 
     def load_epp_paths(self, parameter_path, can_path):
         can_suffix = pathlib.Path(can_path).suffix
@@ -137,16 +138,13 @@ class Builder:
                 )
 
     def get_or_create_parameter(self, name):
-        try:
-            nodes = self._value_set.model.root.nodes_by_attribute(
-                attribute_value=name,
-                attribute_name="name",
-            )
-        except epyqlib.treenode.NotFoundError:
-            node = epyqlib.pm.valuesetmodel.Parameter(
+        nodes = self._value_set.records_by_name(name)
+
+        if len(nodes) == 0:
+            node = epyqlib.pm.valuesettable.Record(
                 name=name,
             )
-            self._value_set.model.root.append_child(node)
+            self._value_set.append(node)
         else:
             try:
                 (node,) = nodes
@@ -2,7 +2,11 @@
 
 # TODO: get some docstrings in here!
 
+import collections
 import contextlib
+import functools
+import heapq
+import itertools
 import logging
 import sys
 import time
@@ -12,6 +16,8 @@ import attr
 import can
 import can.interfaces.pcan
 from epyqlib.canneo import QtCanListener
+import epyqlib.canneo
+import epyqlib.metrics
 import epyqlib.utils.qt
 from PyQt5 import QtCore
 from PyQt5.QtWidgets import QApplication
@@ -21,6 +27,171 @@ __copyright__ = "Copyright 2016, EPC Power Corp."
 __license__ = "GPLv2+"
 
 
+standard_id_mask = 0x7FF
+extended_id_mask = 0x1FFFFFFF
+
+# Hardware acceptance filter banks are small and python-can falls back
+# to checking each filter in turn in software so keep the list short.
+default_maximum_filters = 16
+
+sent_rate = epyqlib.metrics.registry.rate("busproxy.sent")
+send_errors = epyqlib.metrics.registry.counter("busproxy.send_errors")
+receive_latency_seconds = epyqlib.metrics.registry.histogram(
+    "busproxy.receive_latency_seconds",
+)
+fan_out_seconds = epyqlib.metrics.registry.histogram("busproxy.fan_out_seconds")
+
+
+def _merge_exact(terms):
+    # Quine-McCluskey style merging of (value, mask) terms that differ
+    # in exactly one cared-about bit.  No additional IDs are accepted.
+    terms = set(terms)
+
+    while True:
+        merged = set()
+        used = set()
+
+        for value, mask in terms:
+            if (value, mask) in used:
+                continue
+
+            bits = mask
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+
+                partner = (value ^ bit, mask)
+                if partner in terms and partner not in used:
+                    used.add((value, mask))
+                    used.add(partner)
+                    merged.add((value & ~bit, mask & ~bit))
+                    break
+
+        if len(used) == 0:
+            return terms
+
+        terms = (terms - used) | merged
+
+
+def _merge_cost(a, b):
+    mask = a[1] & b[1] & ~(a[0] ^ b[0])
+    return bin(mask).count("1"), (a[0] & mask, mask)
+
+
+def _merge_lossy(terms, maximum):
+    # Combine neighboring terms, in value order, that give up the fewest
+    # cared-about bits until the list fits.  Neighbors share the most
+    # leading bits so only they are considered, keeping this n log n.
+    # This accepts some extra IDs which the listeners ignore anyways.
+    terms = sorted(terms)
+    if len(terms) <= maximum:
+        return set(terms)
+
+    following = list(range(1, len(terms) + 1))
+    previous = list(range(-1, len(terms) - 1))
+    alive = [True] * len(terms)
+    remaining = len(terms)
+
+    heap = []
+
+    def push(i, j):
+        cost, term = _merge_cost(terms[i], terms[j])
+        heapq.heappush(heap, (-cost, i, j, term))
+
+    for i in range(len(terms) - 1):
+        push(i, i + 1)
+
+    while remaining > maximum:
+        _, i, j, term = heapq.heappop(heap)
+        if not (alive[i] and alive[j] and following[i] == j):
+            # stale, one side has since been merged with another neighbor
+            continue
+
+        # the merged term takes over the left slot
+        terms[i] = term
+        alive[j] = False
+        following[i] = following[j]
+        if following[i] < len(terms):
+            previous[following[i]] = i
+        remaining -= 1
+
+        if previous[i] >= 0:
+            push(previous[i], i)
+        if following[i] < len(terms):
+            push(i, following[i])
+
+    return {term for term, is_alive in zip(terms, alive) if is_alive}
+
+
+def can_filters_from_ids(ids, maximum=default_maximum_filters):
+    """Build python-can ``can_filters`` covering the passed IDs.
+
+    Args:
+        ids: iterable of ``(arbitration_id, extended)`` pairs, or ``None``
+            to accept all traffic.
+        maximum: the largest number of filters to produce.  Filters are
+            merged, accepting some unrequested IDs, to fit.
+
+    Returns:
+        A list of python-can filter dicts or ``None`` to accept everything.
+    """
+
+    if ids is None:
+        return None
+
+    ids = frozenset(ids)
+    if len(ids) == 0:
+        return None
+
+    return [dict(f) for f in _can_filters(ids=ids, maximum=maximum)]
+
+
+@functools.lru_cache(maxsize=64)
+def _can_filters(ids, maximum):
+    # devices come and go with the same frames so the same id sets recur
+    full_masks = {False: standard_id_mask, True: extended_id_mask}
+
+    terms = {
+        extended: _merge_exact(
+            {
+                (id, full_masks[extended])
+                for id, id_extended in ids
+                if id_extended == extended
+            }
+        )
+        for extended in (False, True)
+    }
+
+    if sum(len(t) for t in terms.values()) > maximum:
+        populated = [extended for extended, t in terms.items() if len(t) > 0]
+        remaining = maximum
+        for extended in sorted(populated, key=lambda e: len(terms[e])):
+            share = max(1, remaining // len(populated))
+            terms[extended] = _merge_lossy(terms[extended], maximum=share)
+            remaining -= len(terms[extended])
+            populated.remove(extended)
+
+    return tuple(
+        {"can_id": value, "can_mask": mask, "extended": extended}
+        for extended in (False, True)
+        for value, mask in sorted(terms[extended])
+    )
+
+
+def listener_can_ids(listener):
+    """Get the ``(arbitration_id, extended)`` pairs a listener wants.
+
+    Listeners opt in to acceptance filtering by providing a
+    ``can_filter_ids()`` method.  ``None`` means all traffic is needed.
+    """
+
+    can_filter_ids = getattr(listener, "can_filter_ids", None)
+    if can_filter_ids is None:
+        return None
+
+    return can_filter_ids()
+
+
 @attr.s(auto_attribs=True)
 class BusSettings:
     type: str
@@ -60,11 +231,28 @@ class BusProxy:
     went_offline = epyqlib.utils.qt.Signal()
 
     def __init__(
-        self, bus=None, timeout=0.1, transmit=True, filters=None, auto_disconnect=True
+        self,
+        bus=None,
+        timeout=0.1,
+        transmit=True,
+        filters=None,
+        auto_disconnect=True,
+        automatic_filters=True,
+        maximum_filters=default_maximum_filters,
     ):
         self.filters = filters
+        self.automatic_filters = automatic_filters
+        self.maximum_filters = maximum_filters
+        self.applied_filters = None
         self.auto_disconnect = auto_disconnect
 
+        # listeners are attached in batches when a device loads so only
+        # rebuild the filters once the batch is done
+        self.filter_timer = QtCore.QTimer()
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(0)
+        self.filter_timer.timeout.connect(self.update_filters)
+
         self.timeout = timeout
         self.notifier = NotifierProxy(self)
         self.real_notifier = None
@@ -156,9 +344,15 @@ class BusProxy:
                     #       https://bitbucket.org/hardbyte/python-can/issues/52/inconsistent-send-signatures
                     self.bus.send(msg)
                 except can.CanError:
+                    if epyqlib.metrics.enabled:
+                        send_errors.increment()
+
                     # TODO: specifically implemented for a transmit queue
                     #       full situation to avoid infinite dialogs
                     self.set_bus()
+                else:
+                    if epyqlib.metrics.enabled:
+                        sent_rate.mark()
 
                 # TODO: get a real value for sent, but for now python-can
                 #       doesn't provide that info.  also, it would be async...
@@ -185,6 +379,41 @@ class BusProxy:
 
         return False
 
+    def direct_send_target(self, passive=False):
+        """Return the innermost proxy, whose ``bus`` is the python-can bus, if
+        a message sent through this proxy would reach it, otherwise ``None``.
+        Timing critical senders write to that bus from their own thread and
+        then call :meth:`direct_sent` from this proxy's thread."""
+
+        proxy = self
+        while True:
+            if proxy.bus is None or not (proxy._transmit or passive):
+                return None
+
+            if isinstance(proxy.bus, can.BusABC):
+                return proxy
+
+            proxy = proxy.bus
+
+    def direct_sent(self, msg, error=None):
+        """Do the bookkeeping of :meth:`send` for ``msg`` written directly to
+        the python-can bus from another thread.  ``error`` is the
+        :class:`can.CanError` raised by the bus, if any."""
+
+        if error is None:
+            if epyqlib.metrics.enabled:
+                sent_rate.mark()
+        else:
+            if epyqlib.metrics.enabled:
+                send_errors.increment()
+
+            self.set_bus()
+
+        self.tx_notifier.message_received(message=msg)
+
+        if self.auto_disconnect:
+            self.verify_bus_ok()
+
     def verify_bus_ok(self):
         if self.bus is None:
             # No bus, nothing to go wrong with it... ?
@@ -239,9 +468,10 @@ class BusProxy:
             self.bus_settings = None
 
         self.bus = bus
+        self.applied_filters = None
 
         if self.bus is not None:
-            self.set_filters(self.filters)
+            self.update_filters()
             if isinstance(self.bus, can.BusABC):
                 self.real_notifier = can.Notifier(
                     bus=self.bus, listeners=[self.notifier], timeout=self.timeout
@@ -296,15 +526,64 @@ class BusProxy:
 
     def set_filters(self, filters):
         self.filters = filters
+        self.update_filters()
+
+    def schedule_filter_update(self):
+        if QtCore.QCoreApplication.instance() is None:
+            # no event loop to run the timer
+            self.update_filters()
+            return
+
+        self.filter_timer.start()
+
+    def update_filters(self):
+        self.filter_timer.stop()
+
+        # a listener's wanted ids may have changed so reroute as well
+        self.notifier.invalidate_routes()
+
         real_bus = self.bus
-        if real_bus is not None:
-            if hasattr(real_bus, "setFilters"):
-                real_bus.setFilters(can_filters=filters)
+        if real_bus is None:
+            return
+
+        if not isinstance(real_bus, can.BusABC):
+            # filtering is applied by the innermost proxy which asks
+            # all of the nested notifiers what they need
+            real_bus.update_filters()
+            return
+
+        filters = self.filters
+        if filters is None and self.automatic_filters:
+            filters = can_filters_from_ids(
+                ids=self.notifier.can_filter_ids(),
+                maximum=self.maximum_filters,
+            )
+
+        if filters == self.applied_filters:
+            return
+
+        if hasattr(real_bus, "setFilters"):
+            real_bus.setFilters(can_filters=filters)
+        else:
+            real_bus.set_filters(filters=filters)
+
+        self.applied_filters = filters
 
 
 class NotifierProxy(QtCanListener):
+    """Fan received messages out to listeners.
+
+    Listeners providing ``can_filter_ids()`` are routed to by
+    ``(arbitration_id, extended)`` so one proxy per channel can serve many
+    devices, each only seeing the messages for its own node ID adjusted
+    frames.  Listeners without ids receive everything.
+    """
+
+    queued_message_signal = epyqlib.utils.qt.Signal(can.Message, bool)
+
     def __init__(self, bus, listeners=[], filtered_ids=None, parent=None):
         super().__init__(receiver=self.message_received, parent=parent)
+        self.queued_message_signal.connect(self._queued_message_received)
 
         # TODO: consider a WeakSet, though this may presently
         #       be keeping objects alive
@@ -314,19 +593,113 @@ class NotifierProxy(QtCanListener):
         else:
             self.filtered_ids = set(filtered_ids)
 
+        self.bus = bus
+
+        self._routes = None
+        self._unrouted = ()
+
+    def invalidate_routes(self):
+        self._routes = None
+
+    def _build_routes(self):
+        routes = collections.defaultdict(list)
+        unrouted = []
+
+        for listener in self.listeners:
+            ids = listener_can_ids(listener)
+            if ids is None:
+                unrouted.append(listener)
+            else:
+                for id_ in ids:
+                    routes[id_].append(listener)
+
+        self._routes = {id_: tuple(listeners) for id_, listeners in routes.items()}
+        self._unrouted = tuple(unrouted)
+
+    def routed_listeners(self, message):
+        if self._routes is None:
+            self._build_routes()
+
+        routed = self._routes.get(
+            (message.arbitration_id, bool(message.is_extended_id)),
+            (),
+        )
+
+        return itertools.chain(routed, self._unrouted)
+
+    def on_message_received(self, msg):
+        # called from the python-can notifier thread.  the queue depth is
+        # counted here and in the matching slot so it stays balanced even
+        # if metrics are toggled while messages are queued.
+        measured = epyqlib.metrics.enabled
+        if measured:
+            epyqlib.canneo.received_rate.mark()
+            epyqlib.canneo.queue_depth.increment()
+
+        self.queued_message_signal.emit(msg, measured)
+
+    def _queued_message_received(self, message, measured):
+        if measured:
+            epyqlib.canneo.queue_depth.decrement()
+
+        self.message_received(message)
+
     def message_received(self, message):
+        if epyqlib.metrics.enabled:
+            self._measured_message_received(message)
+            return
+
+        self._dispatch(message)
+
+    def _dispatch(self, message):
         if self.filtered_ids is None or message.arbitration_id in self.filtered_ids:
-            for listener in tuple(self.listeners):
+            for listener in self.routed_listeners(message):
                 listener.message_received_signal.emit(message)
 
+    def _measured_message_received(self, message):
+        # only messages received from the real bus carry a timestamp
+        if self.bus is not None and self.bus.real_notifier is not None:
+            if message.timestamp is not None:
+                receive_latency_seconds.record(time.time() - message.timestamp)
+
+        start = time.perf_counter()
+
+        self._dispatch(message)
+
+        fan_out_seconds.record(time.perf_counter() - start)
+
+    def can_filter_ids(self):
+        ids = set()
+
+        for listener in self.listeners:
+            listener_ids = listener_can_ids(listener)
+            if listener_ids is None:
+                return None
+
+            ids.update(listener_ids)
+
+        if self.filtered_ids is not None:
+            ids = {(id, extended) for id, extended in ids if id in self.filtered_ids}
+
+        return ids
+
+    def _listeners_changed(self):
+        self.invalidate_routes()
+
+        if self.bus is not None:
+            self.bus.schedule_filter_update()
+
     def add(self, listener):
         self.listeners.add(listener)
+        self._listeners_changed()
 
     def discard(self, listener):
         self.listeners.discard(listener)
+        self._listeners_changed()
 
     def remove(self, listener):
         self.listeners.remove(listener)
+        self._listeners_changed()
 
 
 if __name__ == "__main__":
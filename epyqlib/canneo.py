@@ -1,5 +1,6 @@
 import can
 from canmatrix import canmatrix
+import collections
 import copy
 import decimal
 import epyqlib.utils.general
@@ -8,13 +9,16 @@ import itertools
 import locale
 import logging
 import math
-from PyQt5.QtCore import QObject, QTimer, Qt
+from PyQt5.QtCore import QObject, Qt
 import re
 import struct
 import sys
+import time
 import uuid
 
 import attr
+import epyqlib.cyclicscheduler
+import epyqlib.metrics
 import epyqlib.utils.qt
 import epyqlib.utils.units
 
@@ -38,6 +42,12 @@ class NotFoundError(Exception):
 nothing = object()
 
 
+received_rate = epyqlib.metrics.registry.rate("canneo.received")
+queue_depth = epyqlib.metrics.registry.gauge("canneo.queue_depth")
+unpack_seconds = epyqlib.metrics.registry.histogram("canneo.frame.unpack_seconds")
+length_errors = epyqlib.metrics.registry.counter("canneo.frame.length_errors")
+
+
 # Use compiled regex pattern for speed up since
 # this regex pattern is used thousands of times.
 strip_uuid_from_comment_search_pattern = re.compile(r"<uuid:([a-z0-9-]+)>")
@@ -605,6 +615,9 @@ class QtCanListener(can.Listener):
         #       This optimization is being justified by the 25% drop
         #       in CPU usage.
 
+        if epyqlib.metrics.enabled:
+            received_rate.mark()
+
         self.message_received_signal.emit(msg)
 
     def move_to_thread(self, thread):
@@ -652,8 +665,7 @@ class Frame(QtCanListener):
         self._cyclic_period = None
         self.user_send_control = True
         self.block_cyclic = False
-        self.timer = QTimer()
-        self.timer.timeout.connect(self._update_and_send)
+        self.scheduler = None
 
         self.format_str = None
         self.data = None
@@ -701,11 +713,25 @@ class Frame(QtCanListener):
         if not self.block_cyclic:
             self._send(update=True)
 
+    def can_filter_ids(self):
+        return {(self.id, self.extended)}
+
+    @property
+    def signals(self):
+        return self._signals
+
+    @signals.setter
+    def signals(self, signals):
+        self._signals = signals
+        self._signals_by_name = None
+
     def signal_by_name(self, name):
-        try:
-            return next(s for s in self.signals if s.name == name)
-        except StopIteration:
-            return None
+        if self._signals_by_name is None:
+            self._signals_by_name = {}
+            for signal in self._signals:
+                self._signals_by_name.setdefault(signal.name, signal)
+
+        return self._signals_by_name.get(name)
 
     def update_from_signals(self, function=None, data=None, only_return=False):
         if data is None:
@@ -741,16 +767,24 @@ class Frame(QtCanListener):
     def unpack(self, data, report_error=True, only_return=False):
         rx_length = len(data)
         if rx_length != self.size and report_error:
+            if epyqlib.metrics.enabled:
+                length_errors.increment()
+
             print(
                 "Received message 0x{self.id:08X} with length {rx_length}, expected {self.size}".format(
                     **locals()
                 )
             )
         else:
+            start = time.perf_counter() if epyqlib.metrics.enabled else None
+
             little, big = bytes_to_bitstrings(bytes(data))
 
             unpacked = bitstring_to_signal_list(self.signals, big, little)
 
+            if start is not None:
+                unpack_seconds.record(time.perf_counter() - start)
+
             if only_return:
                 return dict(zip(self.signals, unpacked))
 
@@ -791,12 +825,26 @@ class Frame(QtCanListener):
         if new_period != self._cyclic_period:
             self._cyclic_period = new_period
 
+            if self.scheduler is None:
+                self.scheduler = epyqlib.cyclicscheduler.default()
+
             if self._cyclic_period is None:
-                self.timer.stop()
+                self.scheduler.remove(self)
             else:
-                self.timer.setInterval(int(round(float(self._cyclic_period) * 1000)))
-                if not self.timer.isActive():
-                    self.timer.start()
+                self.scheduler.add(
+                    key=self,
+                    callback=self._update_and_send,
+                    period=self._cyclic_period,
+                )
+
+    def cyclic_statistics(self):
+        """Return the :class:`epyqlib.cyclicscheduler.Statistics` of the
+        cyclic transmission or ``None`` if it is not being sent cyclically."""
+
+        if self.scheduler is None or self not in self.scheduler.entries:
+            return None
+
+        return self.scheduler.statistics(self)
 
     def to_message(self, data=None):
         if data is None:
@@ -856,6 +904,20 @@ def frame_by_id(id, frames):
     return frame
 
 
+def index_frames_by_id(frames):
+    """Map ids to frames with the same results as :func:`frame_by_id`."""
+    index = {}
+
+    for frame in frames:
+        if frame.mux_name is not None:
+            continue
+
+        # ambiguous ids are not found, just as with frame_by_id()
+        index[frame.id] = None if frame.id in index else frame
+
+    return index
+
+
 class Neo(QtCanListener):
     def __init__(
         self,
@@ -879,6 +941,8 @@ class Neo(QtCanListener):
 
         for frame in matrix.frames:
             if node_id_adjust is not None:
+                # the matrix may be shared between devices so adjust a copy
+                frame = copy.copy(frame)
                 frame.arbitration_id = canmatrix.canmatrix.ArbitrationId(
                     id=node_id_adjust(
                         message_id=frame.arbitration_id.id,
@@ -1005,16 +1069,74 @@ class Neo(QtCanListener):
         for frame in self.frames:
             frame.send.connect(self.bus.send)
 
+    @property
+    def frames(self):
+        return self._frames
+
+    @frames.setter
+    def frames(self, frames):
+        self._frames = tuple(frames)
+        self._frames_by_id = None
+        self._frames_by_name = None
+        self._signals_by_path = None
+
     def frame_by_id(self, id):
-        return frame_by_id(id, self.frames)
+        if self._frames_by_id is None:
+            self._frames_by_id = index_frames_by_id(self._frames)
+
+        return self._frames_by_id.get(id)
+
+    def can_filter_ids(self):
+        return {(frame.id, frame.extended) for frame in self.frames}
+
+    def _frame_name_index(self):
+        if self._frames_by_name is None:
+            self._frames_by_name = {}
+            for frame in self._frames:
+                self._frames_by_name.setdefault(frame.name, frame)
+
+        return self._frames_by_name
 
     def frame_by_name(self, name):
-        try:
-            return next(f for f in self.frames if f.name == name)
-        except StopIteration:
-            return None
+        return self._frame_name_index().get(name)
+
+    def _index_signal_paths(self):
+        """Map every ``(frame, signal)`` and ``(frame, mux, signal)`` path to
+        its signal, resolving duplicates the same way as the scan in
+        :meth:`_signal_by_path_scan`."""
+
+        signals_by_path = {}
+
+        for name, frame in self._frame_name_index().items():
+            if hasattr(frame, "multiplex_frames"):
+                multiplex_frames = collections.defaultdict(list)
+                for multiplex_frame in frame.multiplex_frames.values():
+                    multiplex_frames[multiplex_frame.mux_name].append(multiplex_frame)
+
+                for mux_name, (multiplex_frame, *others) in multiplex_frames.items():
+                    if len(others) > 0:
+                        continue
+
+                    for signal in multiplex_frame.signals:
+                        signals_by_path.setdefault(
+                            (name, mux_name, signal.name), signal
+                        )
+            else:
+                for signal in frame.signals:
+                    signals_by_path.setdefault((name, signal.name), signal)
+
+        return signals_by_path
 
     def signal_by_path(self, *elements):
+        if self._signals_by_path is None:
+            self._signals_by_path = self._index_signal_paths()
+
+        try:
+            return self._signals_by_path[elements]
+        except (KeyError, TypeError):
+            return self._signal_by_path_scan(*elements)
+
+    def _signal_by_path_scan(self, *elements):
         i = iter(elements)
 
         def get_next(i):
@@ -0,0 +1,383 @@
+"""Event driven waiting on :class:`epyqlib.canneo.Signal` values.
+
+Predicates are re-evaluated when one of the signals they depend on emits
+``value_set`` so a wait resolves in the same reactor turn as the frame that
+satisfies it rather than on the next tick of a polling loop.  Predicates
+compose with ``&``, ``|`` and ``~`` and :class:`Edge` and :class:`HoldFor`
+add transitions and durations.
+
+    speed = epyqlib.conditions.value(speed_signal)
+    state = epyqlib.conditions.value(state_signal)
+    await epyqlib.conditions.wait_for(
+        epyqlib.conditions.HoldFor(
+            predicate=(speed > 100) & (state == 3),
+            duration=0.5,
+        ),
+        timeout=10,
+    )
+"""
+
+import abc
+import operator
+
+import attr
+import twisted.internet.defer
+import twisted.python.failure
+
+import epyqlib.utils.twisted
+
+
+class Predicate(abc.ABC):
+    """Base for composable conditions.  ``arm()`` is called once when a wait
+    starts and ``evaluate()`` each time a signal updates.  ``wakeup()``
+    returns the time at which the result may change with no signal update,
+    or ``None``."""
+
+    def signals(self):
+        return ()
+
+    def arm(self, now):
+        pass
+
+    @abc.abstractmethod
+    def evaluate(self, now):
+        pass
+
+    def wakeup(self):
+        return None
+
+    def __and__(self, other):
+        return All(predicates=(self, other))
+
+    def __or__(self, other):
+        return Any(predicates=(self, other))
+
+    def __invert__(self):
+        return Not(predicate=self)
+
+
+def human_value(signal):
+    return signal.to_human(signal.value)
+
+
+@attr.s(eq=False)
+class Compare(Predicate):
+    signal = attr.ib()
+    op = attr.ib()
+    value = attr.ib()
+    read = attr.ib(default=human_value)
+
+    def signals(self):
+        return (self.signal,)
+
+    def evaluate(self, now):
+        if self.signal.value is None:
+            # nothing received yet
+            return False
+
+        return bool(self.op(self.read(self.signal), self.value))
+
+
+@attr.s(eq=False)
+class Value:
+    """Build :class:`Compare` predicates with comparison operators."""
+
+    signal = attr.ib()
+    read = attr.ib(default=human_value)
+
+    def _compare(self, op, value):
+        return Compare(signal=self.signal, op=op, value=value, read=self.read)
+
+    def __eq__(self, other):
+        return self._compare(operator.eq, other)
+
+    def __ne__(self, other):
+        return self._compare(operator.ne, other)
+
+    def __lt__(self, other):
+        return self._compare(operator.lt, other)
+
+    def __le__(self, other):
+        return self._compare(operator.le, other)
+
+    def __gt__(self, other):
+        return self._compare(operator.gt, other)
+
+    def __ge__(self, other):
+        return self._compare(operator.ge, other)
+
+    __hash__ = None
+
+
+def value(signal, read=human_value):
+    return Value(signal=signal, read=read)
+
+
+def _earliest(times):
+    times = [time for time in times if time is not None]
+
+    if len(times) == 0:
+        return None
+
+    return min(times)
+
+
+@attr.s(eq=False)
+class All(Predicate):
+    predicates = attr.ib(converter=tuple)
+
+    def signals(self):
+        return tuple(s for p in self.predicates for s in p.signals())
+
+    def arm(self, now):
+        for predicate in self.predicates:
+            predicate.arm(now)
+
+    def evaluate(self, now):
+        # evaluate every child so edges and holds see each update
+        return all([p.evaluate(now) for p in self.predicates])
+
+    def wakeup(self):
+        return _earliest(p.wakeup() for p in self.predicates)
+
+    def __and__(self, other):
+        return All(predicates=self.predicates + (other,))
+
+
+@attr.s(eq=False)
+class Any(Predicate):
+    predicates = attr.ib(converter=tuple)
+
+    def signals(self):
+        return tuple(s for p in self.predicates for s in p.signals())
+
+    def arm(self, now):
+        for predicate in self.predicates:
+            predicate.arm(now)
+
+    def evaluate(self, now):
+        return any([p.evaluate(now) for p in self.predicates])
+
+    def wakeup(self):
+        return _earliest(p.wakeup() for p in self.predicates)
+
+    def __or__(self, other):
+        return Any(predicates=self.predicates + (other,))
+
+
+@attr.s(eq=False)
+class Not(Predicate):
+    predicate = attr.ib()
+
+    def signals(self):
+        return self.predicate.signals()
+
+    def arm(self, now):
+        self.predicate.arm(now)
+
+    def evaluate(self, now):
+        return not self.predicate.evaluate(now)
+
+    def wakeup(self):
+        return self.predicate.wakeup()
+
+
+@attr.s(eq=False)
+class Edge(Predicate):
+    """True on the update where ``predicate`` changes to ``rising``, relative
+    to its state when the wait started.  While any of its signals has no
+    value the state is unknown and the first state once they all have one
+    counts as a change."""
+
+    predicate = attr.ib()
+    rising = attr.ib(default=True)
+    _last = attr.ib(default=None, init=False, repr=False)
+
+    def signals(self):
+        return self.predicate.signals()
+
+    def _unknown(self):
+        return any(signal.value is None for signal in self.predicate.signals())
+
+    def arm(self, now):
+        self.predicate.arm(now)
+
+        if self._unknown():
+            self._last = None
+        else:
+            self._last = self.predicate.evaluate(now)
+
+    def evaluate(self, now):
+        if self._unknown():
+            return False
+
+        state = self.predicate.evaluate(now)
+        changed = state != self._last
+        self._last = state
+
+        return changed and state == self.rising
+
+    def wakeup(self):
+        return self.predicate.wakeup()
+
+
+@attr.s(eq=False)
+class HoldFor(Predicate):
+    """True once ``predicate`` has been continuously true for ``duration``
+    seconds."""
+
+    predicate = attr.ib()
+    duration = attr.ib()
+    _since = attr.ib(default=None, init=False, repr=False)
+
+    def signals(self):
+        return self.predicate.signals()
+
+    def arm(self, now):
+        self.predicate.arm(now)
+        self._since = None
+
+    def evaluate(self, now):
+        if not self.predicate.evaluate(now):
+            self._since = None
+            return False
+
+        if self._since is None:
+            self._since = now
+
+        return now - self._since >= self.duration
+
+    def wakeup(self):
+        if self._since is None:
+            return self.predicate.wakeup()
+
+        return _earliest((self._since + self.duration, self.predicate.wakeup()))
+
+
+@attr.s(eq=False)
+class Waiter:
+    predicate = attr.ib()
+    timeout = attr.ib(default=None)
+    message = attr.ib(default=None)
+    initial = attr.ib(default=True)
+    reactor = attr.ib(default=None, repr=False)
+    deferred = attr.ib(default=None, init=False)
+    _signals = attr.ib(default=(), init=False, repr=False)
+    _timeout_call = attr.ib(default=None, init=False, repr=False)
+    _wakeup_call = attr.ib(default=None, init=False, repr=False)
+
+    def start(self):
+        if self.reactor is None:
+            from twisted.internet import reactor
+
+            self.reactor = reactor
+
+        if self.message is None and self.timeout is not None:
+            self.message = f"Condition not satisfied within {self.timeout:.1f} seconds"
+
+        self.deferred = twisted.internet.defer.Deferred(
+            canceller=lambda deferred: self._stop(),
+        )
+
+        self._signals = tuple(dict.fromkeys(self.predicate.signals()))
+        for signal in self._signals:
+            signal.value_set.connect(self._update)
+
+        now = self.reactor.seconds()
+        try:
+            self.predicate.arm(now)
+        except Exception:
+            self._fail()
+            return self.deferred
+
+        if self.timeout is not None:
+            self._timeout_call = self.reactor.callLater(
+                self.timeout,
+                self._timed_out,
+            )
+
+        if self.initial:
+            self._update()
+        else:
+            self._schedule_wakeup(now)
+
+        return self.deferred
+
+    def _update(self, *args):
+        if self.deferred.called:
+            return
+
+        now = self.reactor.seconds()
+
+        try:
+            satisfied = self.predicate.evaluate(now)
+        except Exception:
+            self._fail()
+            return
+
+        if satisfied:
+            self._stop()
+            self.deferred.callback(None)
+        else:
+            self._schedule_wakeup(now)
+
+    def _schedule_wakeup(self, now):
+        wakeup = self.predicate.wakeup()
+
+        if self._wakeup_call is not None and self._wakeup_call.active():
+            if wakeup is not None and self._wakeup_call.getTime() == wakeup:
+                return
+
+            self._wakeup_call.cancel()
+
+        self._wakeup_call = None
+
+        if wakeup is not None:
+            self._wakeup_call = self.reactor.callLater(
+                max(0, wakeup - now),
+                self._update,
+            )
+
+    def _timed_out(self):
+        self._timeout_call = None
+
+        if self.deferred.called:
+            return
+
+        self._stop()
+        self.deferred.errback(epyqlib.utils.twisted.WaitForTimedOut(self.message))
+
+    def _fail(self):
+        failure = twisted.python.failure.Failure()
+        self._stop()
+        self.deferred.errback(failure)
+
+    def _stop(self):
+        for signal in self._signals:
+            signal.value_set.disconnect(self._update)
+
+        self._signals = ()
+
+        for call in (self._timeout_call, self._wakeup_call):
+            if call is not None and call.active():
+                call.cancel()
+
+        self._timeout_call = None
+        self._wakeup_call = None
+
+
+def wait_for(predicate, timeout=None, message=None, initial=True, reactor=None):
+    """Return a deferred that fires once ``predicate`` is satisfied or fails
+    with :class:`epyqlib.utils.twisted.WaitForTimedOut` after ``timeout``
+    seconds.  With ``initial`` false the present values are not checked and
+    only updates after the call can satisfy the wait."""
+
+    waiter = Waiter(
+        predicate=predicate,
+        timeout=timeout,
+        message=message,
+        initial=initial,
+        reactor=reactor,
+    )
+
+    return waiter.start()
@@ -3,8 +3,9 @@
 # TODO: """DocString if there is one"""
 
 import argparse
-import csv
+import array
 import logging
+import pathlib
 
 # import math
 import signal
@@ -12,6 +13,8 @@ import sys
 
 from PyQt5 import QtChart, QtCore, QtGui, QtWidgets
 
+import epyqlib.utils.columnar
+
 # See file COPYING in this source tree
 __copyright__ = "Copyright 2017, EPC Power Corp."
 __license__ = "GPLv2+"
@@ -24,6 +27,12 @@ def parse_args(args):
     parser = argparse.ArgumentParser()
     parser.add_argument("--verbose", "-v", action="count", default=0)
     parser.add_argument("--file", "-f", type=argparse.FileType("r"), required=True)
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Do not read or write the binary column cache in the user cache directory",
+    )
 
     return parser.parse_args(args)
 
@@ -40,22 +49,20 @@ def main(args=None):
     if args.verbose >= 2:
         logging.getLogger().setLevel(logging.DEBUG)
 
-    data = read_csv(args.file.name)
+    data = read_csv(args.file.name, cache=args.cache)
 
     qtc(data=data)
 
 
-def read_csv(filename):
-    with open(filename, "r") as f:
-        reader = csv.DictReader(f)
+def read_csv(filename, cache=True):
+    if pathlib.Path(filename).suffix == epyqlib.utils.columnar.suffix:
+        return epyqlib.utils.columnar.load(filename)
 
-        data = {name: [] for name in reader.fieldnames}
+    return epyqlib.utils.columnar.load_csv(filename, cache=cache)
 
-        for row in reader:
-            for k, v in row.items():
-                data[k].append(float(v))
 
-    return data
+def is_monotonic(values):
+    return all(a <= b for a, b in zip(values, values[1:]))
 
 
 # class Chart(QtChart.QChart):
@@ -150,6 +157,7 @@ class CheckableChart:
         self.series = QtChart.QLineSeries()
         self.chart.addSeries(self.series)
         self.chart.createDefaultAxes()
+        self.chart.plotAreaChanged.connect(self._plot_area_resized)
 
         # self.chart.plotAreaChanged.connect(self._plot_area_changed)
         self.original_area = None
@@ -166,7 +174,12 @@ class CheckableChart:
         self._name = None
         self.name = "<unnamed>"
 
-        self.data = ()
+        self.x = ()
+        self.y = ()
+        self.monotonic = True
+        self.envelope = None
+        self.visible = None
+        self.buckets = 0
 
     @property
     def name(self):
@@ -192,43 +205,99 @@ class CheckableChart:
     def _check_changed(self, state):
         self.view.setVisible(state == QtCore.Qt.Checked)
 
-    def set_data(self, data):
-        self.data = tuple(data)
+    def set_data(self, x, y, monotonic=None):
+        self.x = x
+        self.y = y
+
+        if monotonic is None:
+            monotonic = is_monotonic(x)
+
+        self.monotonic = monotonic
+        self.envelope = None
+        if len(y) > 0:
+            self.envelope = epyqlib.utils.columnar.Envelope(values=y)
+
+        self.visible = None
         self.update()
 
     def scaling_changed(self, _):
         self.update()
 
-    def update(self):
+    def _plot_area_resized(self, area):
+        if int(area.width()) != self.buckets:
+            self.update_points()
+
+    def set_visible_range(self, minimum, maximum):
+        self.visible = (minimum, maximum)
+        self.update_points()
+
+    def update_points(self):
         scale = self.scaling_spin_box.value()
+        self.buckets = int(self.chart.plotArea().width())
+
+        if self.envelope is None:
+            self.series.clear()
+            return
+
+        if not self.monotonic:
+            points = zip(self.x, self.y)
+        else:
+            if self.visible is None:
+                start, stop = 0, len(self.y)
+            else:
+                start, stop = epyqlib.utils.columnar.visible_slice(
+                    self.x,
+                    *self.visible,
+                )
+
+            points = epyqlib.utils.columnar.downsample(
+                x=self.x,
+                y=self.y,
+                envelope=self.envelope,
+                start=start,
+                stop=stop,
+                buckets=max(self.buckets, 100),
+            )
 
         self.series.replace(
-            QtGui.QPolygonF((QtCore.QPointF(x, y * scale) for x, y in self.data))
+            QtGui.QPolygonF([QtCore.QPointF(x, y * scale) for x, y in points])
         )
 
-        if len(self.data) > 0:
-            y_minimum = min(y for _, y in self.data) * scale
-            y_maximum = max(y for _, y in self.data) * scale
+    def update(self):
+        self.update_points()
 
-            delta = y_maximum - y_minimum
+        if self.envelope is None:
+            return
 
-            if delta == 0:
-                extra = 1
-            else:
-                extra = 0.05 * delta
+        scale = self.scaling_spin_box.value()
 
-            self.chart.axisY().setRange(
-                y_minimum - extra,
-                y_maximum + extra,
-            )
+        y_minimum, y_maximum = sorted(
+            extreme * scale for extreme in self.envelope.extent()
+        )
 
-            x_minimum = min(x for x, _ in self.data)
-            x_maximum = max(x for x, _ in self.data)
+        delta = y_maximum - y_minimum
 
-            self.chart.axisX().setRange(
-                x_minimum,
-                x_maximum,
-            )
+        if delta == 0:
+            extra = 1
+        else:
+            extra = 0.05 * delta
+
+        self.chart.axisY().setRange(
+            y_minimum - extra,
+            y_maximum + extra,
+        )
+
+        if self.monotonic:
+            x_minimum = self.x[0]
+            x_maximum = self.x[-1]
+        else:
+            x_minimum = min(self.x)
+            x_maximum = max(self.x)
+
+        self.chart.axisX().setRange(
+            x_minimum,
+            x_maximum,
+        )
 
 
 class QtChartWindow(QtWidgets.QMainWindow):
@@ -275,6 +344,16 @@ class QtChartWindow(QtWidgets.QMainWindow):
         # self.series = []
         # self.polygons = []
         self.checkable_charts = []
+        self.x_range = None
+
+        if ".time" in data:
+            x = data[".time"]
+        else:
+            x = array.array("d", range(len(next(iter(data.values()), ()))))
+
+        monotonic = is_monotonic(x)
+        if not monotonic:
+            logger.warning("X values are not monotonic, plotting all points")
 
         for name, values in sorted(data.items()):
             if name == ".time":
@@ -302,11 +381,7 @@ class QtChartWindow(QtWidgets.QMainWindow):
             view.setRubberBand(QtChart.QChartView.HorizontalRubberBand)
             view.setRenderHint(QtGui.QPainter.Antialiasing)
 
-            if ".time" in data:
-                d = zip(data[".time"], values)
-            else:
-                d = enumerate(values)
-            checkable_chart.set_data(data=d)
+            checkable_chart.set_data(x=x, y=values, monotonic=monotonic)
             self.x_axes.append(chart.axisX())
             self.checkable_charts.append(checkable_chart)
 
@@ -315,9 +390,17 @@ class QtChartWindow(QtWidgets.QMainWindow):
 
     @QtCore.pyqtSlot("qreal", "qreal")
     def axis_range_changed(self, min, max):
+        if self.x_range == (min, max):
+            return
+
+        self.x_range = (min, max)
+
         for axis in self.x_axes:
             axis.setRange(min, max)
 
+        for checkable_chart in self.checkable_charts:
+            checkable_chart.set_visible_range(min, max)
+
     def closeEvent(self, event):
         self.closing.emit()
 
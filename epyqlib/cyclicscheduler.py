@@ -0,0 +1,367 @@
+"""A single scheduler for cyclic transmissions.
+
+Rather than each :class:`epyqlib.canneo.Frame` owning a timer, all cyclic
+callbacks are kept in one heap ordered by due time.  Each wakeup runs every
+callback due within one ``tick`` so frames sharing a period go out as a
+batch.  New entries are given a phase that falls in the largest gap between
+the phases already scheduled which spreads the bus load across the period.
+Every entry keeps the actual interval between its calls so the achieved
+period can be compared to the requested one.  Keys and bound method
+callbacks are only weakly referenced so a frame that is dropped without
+being terminated stops being sent and can be collected.
+
+:class:`Scheduler` is driven by explicit calls to :meth:`Scheduler.run_due`
+and does not depend on Qt.  :class:`QtScheduler` drives it with one precise
+single shot timer and :func:`default` returns the shared instance used by
+frames.
+"""
+
+import collections.abc
+import heapq
+import inspect
+import itertools
+import logging
+import math
+import time
+import weakref
+
+import attr
+from PyQt5 import QtCore
+
+import epyqlib.metrics
+
+
+logger = logging.getLogger(__name__)
+
+lateness_seconds = epyqlib.metrics.registry.histogram("cyclic.lateness")
+batch_size = epyqlib.metrics.registry.histogram(
+    "cyclic.batch",
+    bounds=epyqlib.metrics.count_bounds(),
+    unit="count",
+)
+missed_periods = epyqlib.metrics.registry.counter("cyclic.missed")
+
+
+class InvalidPeriodError(ValueError):
+    pass
+
+
+@attr.s(frozen=True)
+class Statistics:
+    requested = attr.ib()
+    count = attr.ib()
+    mean = attr.ib()
+    jitter = attr.ib()
+    missed = attr.ib()
+
+
+def _reference(value, callback=None):
+    """Weakly reference ``value`` if it allows it, otherwise return it."""
+
+    try:
+        return weakref.ref(value, callback)
+    except TypeError:
+        return value
+
+
+def _callback_reference(callback):
+    """Weakly reference bound methods so their object is not kept alive.
+    Other callables, such as lambdas, are often only held here."""
+
+    if inspect.ismethod(callback):
+        return weakref.WeakMethod(callback)
+
+    return callback
+
+
+def _dereference(reference):
+    if isinstance(reference, weakref.ref):
+        return reference()
+
+    return reference
+
+
+@attr.s(eq=False)
+class Entry:
+    _key = attr.ib(converter=_reference)
+    _callback = attr.ib(converter=_callback_reference)
+    period = attr.ib()
+    phase = attr.ib()
+    due = attr.ib()
+    active = attr.ib(default=True)
+    last = attr.ib(default=None)
+    count = attr.ib(default=0)
+    total_interval = attr.ib(default=0)
+    jitter = attr.ib(default=0)
+    missed = attr.ib(default=0)
+
+    @property
+    def key(self):
+        return _dereference(self._key)
+
+    @property
+    def callback(self):
+        """The callback or ``None`` if it has been collected."""
+
+        return _dereference(self._callback)
+
+    def statistics(self):
+        intervals = self.count - 1
+        mean = None if intervals < 1 else self.total_interval / intervals
+
+        return Statistics(
+            requested=self.period,
+            count=self.count,
+            mean=mean,
+            jitter=self.jitter,
+            missed=self.missed,
+        )
+
+
+class Entries(collections.abc.MutableMapping):
+    """Entries by key, weakly referencing the keys that allow it.  An entry
+    is deactivated and dropped when its key is collected."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def __getitem__(self, key):
+        return self._entries[_reference(key)]
+
+    def __setitem__(self, key, entry):
+        self._entries[_reference(key, self._collected)] = entry
+
+    def __delitem__(self, key):
+        del self._entries[_reference(key)]
+
+    def __iter__(self):
+        for reference in tuple(self._entries):
+            key = _dereference(reference)
+            if key is not None:
+                yield key
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _collected(self, reference):
+        entry = self._entries.pop(reference, None)
+        if entry is not None:
+            entry.active = False
+
+
+@attr.s
+class Scheduler:
+    """Heap of cyclic callbacks keyed by any hashable.  Adding a key that is
+    already scheduled replaces it."""
+
+    clock = attr.ib(default=time.monotonic, repr=False)
+    tick = attr.ib(default=0.001)
+    epoch = attr.ib(default=None)
+    entries = attr.ib(factory=Entries)
+    _heap = attr.ib(factory=list, repr=False)
+    _sequence = attr.ib(factory=itertools.count, repr=False)
+
+    def add(self, key, callback, period):
+        period = float(period)
+        if not period > 0 or not math.isfinite(period):
+            raise InvalidPeriodError(
+                "Period must be a positive number of seconds, got {!r}".format(period)
+            )
+
+        self._deactivate(key)
+
+        now = self.clock()
+        if self.epoch is None:
+            self.epoch = now
+
+        phase = self._phase(period)
+        entry = Entry(
+            key=key,
+            callback=callback,
+            period=period,
+            phase=phase,
+            due=self._next_slot(period=period, phase=phase, after=now),
+        )
+        self.entries[key] = entry
+        self._push(entry)
+
+        return entry
+
+    def remove(self, key):
+        self._deactivate(key)
+
+    def clear(self):
+        for key in tuple(self.entries):
+            self._deactivate(key)
+
+        self._heap = []
+
+    def statistics(self, key):
+        return self.entries[key].statistics()
+
+    def all_statistics(self):
+        return {key: entry.statistics() for key, entry in self.entries.items()}
+
+    def next_due(self):
+        """Return the due time of the earliest entry or ``None`` if nothing
+        is scheduled."""
+
+        while len(self._heap) > 0:
+            due, _, entry = self._heap[0]
+            if entry.active and due == entry.due:
+                return due
+
+            heapq.heappop(self._heap)
+
+        return None
+
+    def run_due(self, now=None):
+        """Call every callback due within one tick of ``now`` and reschedule
+        them.  Returns the number of callbacks called."""
+
+        if now is None:
+            now = self.clock()
+
+        limit = now + self.tick
+        batch = []
+        while True:
+            due = self.next_due()
+            if due is None or due > limit:
+                break
+
+            _, _, entry = heapq.heappop(self._heap)
+            batch.append(entry)
+
+        for entry in batch:
+            self._reschedule(entry=entry, now=now)
+
+        if epyqlib.metrics.enabled and len(batch) > 0:
+            batch_size.record(len(batch))
+
+        for entry in batch:
+            # a callback earlier in the batch may have removed this one
+            if not entry.active:
+                continue
+
+            callback = entry.callback
+            if callback is None:
+                entry.active = False
+                if self.entries.get(entry.key) is entry:
+                    del self.entries[entry.key]
+                continue
+
+            try:
+                callback()
+            except Exception:
+                logger.exception("Cyclic callback for %r failed", entry.key)
+
+        return len(batch)
+
+    def _reschedule(self, entry, now):
+        if entry.last is not None:
+            interval = now - entry.last
+            entry.total_interval += interval
+            entry.jitter = max(entry.jitter, abs(interval - entry.period))
+
+        if epyqlib.metrics.enabled:
+            lateness_seconds.record(max(0, now - entry.due))
+
+        entry.last = now
+        entry.count += 1
+
+        due = entry.due + entry.period
+        if due <= now:
+            due = self._next_slot(period=entry.period, phase=entry.phase, after=now)
+            missed = int(round((due - entry.due) / entry.period)) - 1
+            entry.missed += missed
+
+            if epyqlib.metrics.enabled:
+                missed_periods.increment(missed)
+
+        entry.due = due
+        self._push(entry)
+
+    def _push(self, entry):
+        heapq.heappush(self._heap, (entry.due, next(self._sequence), entry))
+
+    def _deactivate(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            entry.active = False
+
+    def _next_slot(self, period, phase, after):
+        slots = math.floor((after - self.epoch - phase) / period) + 1
+
+        return self.epoch + phase + slots * period
+
+    def _phase(self, period):
+        """Pick the middle of the largest gap between the phases, modulo
+        ``period``, of the entries already scheduled."""
+
+        phases = sorted(entry.phase % period for entry in self.entries.values())
+
+        if len(phases) == 0:
+            return 0
+
+        gaps = (
+            (later - earlier, earlier)
+            for earlier, later in zip(phases, phases[1:] + [phases[0] + period])
+        )
+        width, start = max(gaps)
+
+        return (start + width / 2) % period
+
+
+class QtScheduler(Scheduler):
+    """Drive a :class:`Scheduler` from one precise single shot Qt timer that
+    is always armed for the earliest due entry."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.timeout.connect(self._timeout)
+
+    def add(self, key, callback, period):
+        entry = super().add(key=key, callback=callback, period=period)
+        self._arm()
+
+        return entry
+
+    def remove(self, key):
+        super().remove(key=key)
+        self._arm()
+
+    def clear(self):
+        super().clear()
+        self._arm()
+
+    def _timeout(self):
+        self.run_due()
+        self._arm()
+
+    def _arm(self):
+        due = self.next_due()
+
+        if due is None:
+            self.timer.stop()
+            return
+
+        delay = max(0, due - self.clock())
+        self.timer.start(int(round(delay * 1000)))
+
+
+_default = None
+
+
+def default():
+    """Return the shared :class:`QtScheduler`, creating it on first use."""
+
+    global _default
+
+    if _default is None:
+        _default = QtScheduler()
+
+    return _default
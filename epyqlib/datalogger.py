@@ -1,7 +1,9 @@
+import array
 import collections
 import csv
 import functools
 import io
+import pathlib
 import textwrap
 
 import attr
@@ -10,9 +12,11 @@ import twisted.internet.task
 
 from PyQt5 import QtCore, QtWidgets
 
+import epyqlib.cmemoryparser
 import epyqlib.twisted.busproxy
 import epyqlib.twisted.cancalibrationprotocol as ccp
 import epyqlib.twisted.nvs
+import epyqlib.utils.columnar
 import epyqlib.utils.qt
 from epyqlib.tabs.files.log_manager import LogManager
 
@@ -265,6 +269,75 @@ def generate_records(
         yield row
 
 
+def column_type(variable):
+    """Return the :mod:`array` typecode to store ``variable`` with.  Plain
+    integers keep their size and signedness, everything else, including
+    scaled IQ values, is stored as a double."""
+
+    if variable.fields.type.startswith("_iq"):
+        return "d"
+
+    type_ = epyqlib.cmemoryparser.base_type(variable.variable)
+    format_ = getattr(type_, "format", None)
+
+    if not isinstance(format_, epyqlib.cmemoryparser.TypeFormats):
+        return "d"
+
+    if not format_.is_integer():
+        return "d"
+
+    size = type_.bytes * epyqlib.cmemoryparser.bits_per_byte // 8
+    signed = format_.is_signed_integer()
+
+    for typecode, item_size in epyqlib.utils.columnar.item_sizes.items():
+        if typecode in "fd" or item_size < size:
+            continue
+
+        if typecode.islower() == signed:
+            return typecode
+
+    return "d"
+
+
+def write_columns(path, records, types, metadata):
+    columns = None
+
+    def write():
+        data = [] if columns is None else columns
+
+        epyqlib.utils.columnar.write(
+            path=path,
+            columns=epyqlib.utils.columnar.Columns(
+                names=[name for name, _ in data],
+                data=data,
+                metadata=metadata,
+            ),
+        )
+
+    try:
+        for row in records:
+            if columns is None:
+                names = sorted(row.keys(), key=str.casefold)
+                columns = [(name, array.array(types.get(name, "d"))) for name in names]
+                appends = [
+                    (
+                        name,
+                        column.append,
+                        float if column.typecode in "fd" else int,
+                    )
+                    for name, column in columns
+                ]
+
+            for name, append, convert in appends:
+                append(convert(row[name]))
+    except EOFError:
+        # keep the complete records just as the CSV does
+        write()
+        raise
+
+    write()
+
+
 def parse_log(
     cache,
     chunks,
@@ -273,19 +346,42 @@ def parse_log(
     variables_and_chunks,
     sample_period_us,
     raw_chunks,
+    metadata=None,
 ):
-    with open(csv_path, "w", newline="") as f:
-        writer = None
+    """Write the records of a raw log to ``csv_path``.  If it has the
+    :data:`epyqlib.utils.columnar.suffix` the typed columns format is
+    written instead of CSV, with ``metadata`` stored alongside."""
+
+    records = generate_records(
+        cache=cache,
+        chunks=chunks,
+        data_stream=data_stream,
+        variables_and_chunks=variables_and_chunks,
+        sample_period_us=sample_period_us,
+        raw_chunks=raw_chunks,
+    )
 
-        records = generate_records(
-            cache=cache,
-            chunks=chunks,
-            data_stream=data_stream,
-            variables_and_chunks=variables_and_chunks,
-            sample_period_us=sample_period_us,
-            raw_chunks=raw_chunks,
+    if pathlib.Path(csv_path).suffix == epyqlib.utils.columnar.suffix:
+        types = {
+            ".".join(variable.path()): column_type(variable)
+            for variable in variables_and_chunks
+        }
+
+        if metadata is None:
+            metadata = {}
+
+        write_columns(
+            path=csv_path,
+            records=records,
+            types=types,
+            metadata={"sample_period_us": sample_period_us, **metadata},
         )
 
+        return
+
+    with open(csv_path, "w", newline="") as f:
+        writer = None
+
         for row in records:
             if writer is None:
                 writer = csv.DictWriter(
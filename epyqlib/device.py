@@ -47,6 +47,7 @@ import textwrap
 import twisted.internet.task
 import typing
 import uuid
+import weakref
 import zipfile
 from twisted.internet.defer import setDebugging
 
@@ -213,7 +214,11 @@ def ignore_timeout(failure):
     return epyqlib.utils.twisted.errbackhook(failure)
 
 
-def load_matrix(path):
+# (path, modified, size) -> matrix, shared while any device holds it
+_matrices = weakref.WeakValueDictionary()
+
+
+def _load_matrix(path):
     matrix = list(canmatrix.formats.loadp(path).values())[0]
 
     if hasattr(matrix, "load_errors"):
@@ -227,9 +232,25 @@ def load_matrix(path):
     return matrix
 
 
+def load_matrix(path):
+    # Devices of the same type share a single parse of the matrix so it
+    # must be treated as read only.
+    path = os.path.abspath(os.fspath(path))
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    matrix = _matrices.get(key)
+    if matrix is None:
+        matrix = _load_matrix(path)
+        _matrices[key] = matrix
+
+    return matrix
+
+
 class Device:
     def __init__(self, *args, **kwargs):
         self.bus = None
+        self.matrix = None
         self.from_zip = False
         self.device_sha = "N/A"
         self.device_file = "N/A"
@@ -254,6 +275,7 @@ class Device:
                 self.bus.notifier.discard(self.notifiees.pop())
 
         self.bus = None
+        self.matrix = None
 
         self.neo_frames.terminate()
         try:
@@ -666,6 +688,7 @@ class Device:
 
         # Load the matrix once and use as needed as a speed optimization.
         matrix = load_matrix(self.can_path)
+        self.matrix = matrix
 
         if Elements.dash in self.elements:
             self.uis = self.dash_uis
@@ -1,3 +1,4 @@
+import collections
 import contextlib
 import decimal
 import functools
@@ -11,10 +12,14 @@ import warnings
 import attr
 import canmatrix
 import sunspec.core.client
+import twisted.internet.defer
 import epyqlib.busproxy
 import epyqlib.canneo
+import epyqlib.conditions
 import epyqlib.device
+import epyqlib.metrics
 import epyqlib.nv
+import epyqlib.twisted.modbus
 import epyqlib.utils.qt
 import epyqlib.utils.sunspec_modbus
 import epyqlib.utils.twisted
@@ -149,13 +154,14 @@ class Signal:
     signal = attr.ib()
     device = attr.ib()
 
-    async def _get_raw(self, stale_after=0.1, timeout=1):
+    def _fresh(self, stale_after):
         # TODO: uh...  why not time.monotonic()?
-        start = time.time()
-
         last_received = self.signal.last_received()
 
-        if last_received is None or last_received <= start - stale_after:
+        return last_received is not None and last_received > time.time() - stale_after
+
+    async def _get_raw(self, stale_after=0.1, timeout=1):
+        if not self._fresh(stale_after=stale_after):
             await epyqlib.utils.qt.signal_as_deferred(
                 self.signal.value_set,
                 timeout=timeout,
@@ -195,21 +201,29 @@ class Signal:
     def cyclic_send(self, period):
         self.device.cyclic_send_signal(self, period=period)
 
-    async def wait_for(self, op, value, timeout):
+    def condition(self, op, value):
+        """Return an :mod:`epyqlib.conditions` predicate comparing the
+        present human value, as returned by :meth:`get`, to ``value``."""
+
+        return epyqlib.conditions.Compare(
+            signal=self.signal,
+            op=operator_map.get(op, op),
+            value=value,
+            read=lambda signal: self._to_human(enumeration_as_string=True),
+        )
+
+    async def wait_for(self, op, value, timeout, stale_after=0.1):
         op = operator_map.get(op, op)
         operator_string = reverse_operator_map.get(op, str(op))
 
-        async def check():
-            present_value = await self.get()
-            return op(present_value, value)
-
-        await epyqlib.utils.twisted.wait_for(
-            check=check,
+        await epyqlib.conditions.wait_for(
+            predicate=self.condition(op=op, value=value),
             timeout=timeout,
             message=(
                 f"{self.signal.name} not {operator_string} {value} "
                 f"within {timeout:.1f} seconds"
             ),
+            initial=self._fresh(stale_after=stale_after),
         )
 
     def scaling_factor(self):
@@ -252,7 +266,22 @@ class Signal:
                     self.set(value=original)
 
 
-@attr.s
+@attr.s(frozen=True)
+class WriteStatus:
+    """The outcome of writing one parameter with :meth:`Device.write_many`.
+    ``response`` is the value echoed in the status frame and ``error`` is
+    the exception that failed the parameter's frame, if any."""
+
+    requested = attr.ib()
+    response = attr.ib(default=None)
+    error = attr.ib(default=None)
+
+    @property
+    def accepted(self):
+        return self.error is None and self.response == self.requested
+
+
+@attr.s(eq=False)
 class Nv:
     nv = attr.ib()
     device = attr.ib()
@@ -278,15 +307,25 @@ class Nv:
         for meta, value in values.items():
             await self.set_meta(value=value, meta=meta)
 
-    async def set_meta(self, value, meta):
+    def _stage(self, value, meta):
+        """Set the local copy of ``meta`` to ``value`` and return the raw
+        value that will be sent."""
+
         units = self.units()
         if units != epyqlib.utils.units.registry.dimensionless:
             value = value.to(units).magnitude
 
         if meta == epyqlib.nv.MetaEnum.value:
-            self.nv.set_human_value(value)
+            signal = self.nv
         else:
-            getattr(self.nv.meta, meta.name).set_human_value(value)
+            signal = getattr(self.nv.meta, meta.name)
+
+        signal.set_human_value(value)
+
+        return signal.value
+
+    async def set_meta(self, value, meta):
+        self._stage(value=value, meta=meta)
 
         # TODO: verify value was accepted
         await self.device.nvs.protocol.write(
@@ -398,6 +437,9 @@ class Device:
     save_nv = attr.ib(default=None)
     save_nv_value = attr.ib(default=None)
     uuid = attr.ib(default=uuid.uuid4)
+    metrics_dumper = attr.ib(default=None)
+    _signals = attr.ib(factory=dict, init=False, eq=False, repr=False)
+    _nvs = attr.ib(factory=dict, init=False, eq=False, repr=False)
 
     def load(self):
         if self.definition is not None:
@@ -456,31 +498,33 @@ class Device:
         #       nv objects from getting updated?
         # self.bus.notifier.add(self.nvs)
 
-    # @functools.lru_cache(maxsize=512)
+    def _signal(self, signal):
+        wrapper = self._signals.get(signal)
+        if wrapper is None:
+            wrapper = Signal(signal=signal, device=self)
+            self._signals[signal] = wrapper
+
+        return wrapper
+
+    def _nv(self, nv):
+        wrapper = self._nvs.get(nv)
+        if wrapper is None:
+            wrapper = Nv(nv=nv, device=self)
+            self._nvs[nv] = wrapper
+
+        return wrapper
+
     def signal(self, *path):
-        return Signal(
-            signal=self.neo.signal_by_path(*path),
-            device=self,
-        )
+        return self._signal(self.neo.signal_by_path(*path))
 
     def signal_from_uuid(self, uuid_):
-        return Signal(
-            signal=self.neo.signal_from_uuid[uuid_],
-            device=self,
-        )
+        return self._signal(self.neo.signal_from_uuid[uuid_])
 
-    # @functools.lru_cache(maxsize=512)
     def nv(self, *path):
-        return Nv(
-            nv=self.nvs.signal_from_names(*path),
-            device=self,
-        )
+        return self._nv(self.nvs.signal_from_names(*path))
 
     def nv_from_uuid(self, uuid_):
-        return Nv(
-            nv=self.nvs.nv_from_uuid[uuid_],
-            device=self,
-        )
+        return self._nv(self.nvs.nv_from_uuid[uuid_])
 
     def parameter_from_uuid(self, uuid_):
         try:
@@ -488,6 +532,104 @@ class Device:
         except KeyError:
             return self.signal_from_uuid(uuid_=uuid_)
 
+    def _group_by_frame(self, nvs):
+        groups = collections.defaultdict(list)
+        for nv in nvs:
+            groups[nv.nv.frame].append(nv)
+
+        return groups
+
+    async def read_many(self, nvs, meta=epyqlib.nv.MetaEnum.value):
+        """Read the passed NVs with one request per set frame.
+        The requests for all frames are queued together.  Returns a dict of
+        values keyed by :class:`Nv`."""
+
+        groups = self._group_by_frame(nvs)
+        try:
+            results = await twisted.internet.defer.gatherResults(
+                [
+                    self.nvs.protocol.read_multiple(
+                        nv_signals=[nv.nv for nv in group],
+                        meta=meta,
+                        all_values=True,
+                    )
+                    for group in groups.values()
+                ],
+                consumeErrors=True,
+            )
+        except twisted.internet.defer.FirstError as e:
+            e.subFailure.raiseException()
+
+        values = {}
+        for group, (response, _meta) in zip(groups.values(), results):
+            for nv in group:
+                values[nv] = response[nv.nv.status_signal] * nv.units()
+
+        return values
+
+    async def write_many(self, values, meta=epyqlib.nv.MetaEnum.value):
+        """Write ``{nv: value}`` grouped by set frame so that each frame is
+        packed and sent once no matter how many of its parameters are
+        written.  The requests for all frames are queued together rather
+        than awaited one at a time.  A failed frame does not stop the
+        others.  Returns a :class:`WriteStatus` keyed by :class:`Nv`."""
+
+        groups = self._group_by_frame(values)
+        requested = {}
+        deferreds = []
+        for group in groups.values():
+            raw_values = {}
+            for nv in group:
+                raw = nv._stage(value=values[nv], meta=meta)
+                raw_values[nv.nv] = raw
+                requested[nv] = nv.nv.status_signal.to_human(raw)
+
+            try:
+                deferred = self.nvs.protocol.write_multiple(
+                    nv_signals=raw_values,
+                    meta=meta,
+                    all_values=True,
+                )
+            except Exception:
+                deferred = twisted.internet.defer.fail()
+
+            deferreds.append(deferred)
+
+        results = await twisted.internet.defer.DeferredList(
+            deferreds,
+            consumeErrors=True,
+        )
+
+        statuses = {}
+        for group, (success, result) in zip(groups.values(), results):
+            for nv in group:
+                if success:
+                    response, _meta = result
+                    statuses[nv] = WriteStatus(
+                        requested=requested[nv],
+                        response=response.get(nv.nv.status_signal),
+                    )
+                else:
+                    statuses[nv] = WriteStatus(
+                        requested=requested[nv],
+                        error=result.value,
+                    )
+
+        return statuses
+
+    @contextlib.asynccontextmanager
+    async def temporary_write_many(self, values, meta=epyqlib.nv.MetaEnum.value):
+        """Read the present values, :meth:`write_many` the passed ones and
+        yield their statuses.  Every parameter is written back on exit,
+        including those that failed to be set."""
+
+        original = await self.read_many(nvs=values, meta=meta)
+
+        try:
+            yield await self.write_many(values=values, meta=meta)
+        finally:
+            await self.write_many(values=original, meta=meta)
+
     async def active_to_nv(self, wait=False):
         # TODO: dedupe 8795477695t46542676781543768139
         await self.save_nv.set(value=self.save_nv_value)
@@ -519,6 +661,34 @@ class Device:
         for frame in self.cyclic_frames:
             frame.cyclic_request(self.uuid, None)
 
+    def cyclic_statistics(self):
+        """Return the requested and achieved period of each frame being
+        sent cyclically, keyed by frame name."""
+        statistics = {}
+        for frame in self.cyclic_frames:
+            frame_statistics = frame.cyclic_statistics()
+            if frame_statistics is not None:
+                statistics[frame.name] = frame_statistics
+
+        return statistics
+
+    def dump_metrics(self, path, interval=10):
+        """Enable metrics collection and periodically write them to ``path``
+        as JSON until :meth:`stop_dumping_metrics` is called."""
+        self.stop_dumping_metrics()
+
+        epyqlib.metrics.enable()
+        self.metrics_dumper = epyqlib.metrics.JsonDumper(
+            path=path,
+            interval=interval,
+        )
+        self.metrics_dumper.start()
+
+    def stop_dumping_metrics(self):
+        if self.metrics_dumper is not None:
+            self.metrics_dumper.stop()
+            self.metrics_dumper = None
+
     async def get_access_level(self):
         nv = Nv(nv=self.nvs.access_level_node, device=self)
         access_level = await nv.get()
@@ -836,11 +1006,18 @@ class AccessLevel:
     password = attr.ib()
 
 
-@attr.s
+sunspec_errors = (
+    sunspec.core.client.SunSpecClientError,
+    epyqlib.twisted.modbus.ModbusError,
+)
+
+
+@attr.s(frozen=True)
 class SunSpecNv:
     nv = attr.ib()
     model = attr.ib()
     # device = attr.ib()
+    client = attr.ib(default=None)
 
     async def set(self, value):
         units = self.units()
@@ -848,7 +1025,11 @@ class SunSpecNv:
             value = value.to(units).magnitude
 
         self.nv.value = value
-        self.nv.write()
+
+        if self.client is None:
+            self.nv.write()
+        else:
+            await self.client.write_point(self.nv)
 
     @contextlib.asynccontextmanager
     async def temporary_set(
@@ -886,8 +1067,14 @@ class SunSpecNv:
                     await self.set(value=original)
 
     async def get(self):
-        self.model.read_points()
+        if self.client is None:
+            self.model.read_points()
+        else:
+            await self.client.read_points([self.nv])
 
+        return self._value()
+
+    def _value(self):
         value = decimal.Decimal(self.nv.value)
         scale_factor = self.nv.value_sf
         if scale_factor is None:
@@ -912,6 +1099,7 @@ class SunSpecDevice:
     uuid_to_point = attr.ib(default=None)
     uuid_to_model = attr.ib(default=None)
     uuid = attr.ib(default=uuid.uuid4)
+    client = attr.ib(default=None)
 
     def load(
         self,
@@ -965,6 +1153,16 @@ class SunSpecDevice:
                 parity=parity,
             )
 
+        # pysunspec is only used to scan the models, release the port
+        self.device.close()
+        self.client = epyqlib.twisted.modbus.PointClient.rtu(
+            port=name,
+            baudrate=baudrate,
+            parity=parity,
+            slave_id=slave_id,
+            timeout=timeout,
+        )
+
     def load_tcp(
         self,
         address,
@@ -981,6 +1179,14 @@ class SunSpecDevice:
                 ipport=port,
             )
 
+        self.device.close()
+        self.client = epyqlib.twisted.modbus.PointClient.tcp(
+            host=address,
+            port=502 if port is None else port,
+            slave_id=slave_id,
+            timeout=timeout,
+        )
+
     # def signal_from_uuid(self, uuid_) -> SunSpecNv:
     #     return self.nv_from_uuid(uuid_=uuid_)
 
@@ -989,11 +1195,42 @@ class SunSpecDevice:
             nv=self.uuid_to_point[uuid_],
             model=self.uuid_to_model[uuid_],
             # device=self,
+            client=self.client,
         )
 
     # no 'signals' so just alias
     parameter_from_uuid = nv_from_uuid
 
+    async def read_many(self, nvs):
+        """Read the passed SunSpec NVs with the fewest Modbus requests,
+        spanning models where they are adjacent.  Returns a dict of values
+        keyed by :class:`SunSpecNv`."""
+
+        if self.client is None:
+            for model in {nv.model for nv in nvs}:
+                model.read_points()
+        else:
+            await self.client.read_points([nv.nv for nv in nvs])
+
+        return {nv: nv._value() for nv in nvs}
+
+    async def _read_control(self, *names):
+        points = [self.device.epc_control.model.points[name] for name in names]
+
+        if self.client is None:
+            self.device.epc_control.read()
+        else:
+            await self.client.read_points(points, max_age=0)
+
+        return [point.value for point in points]
+
+    async def _send(self, point, value):
+        if self.client is None:
+            epyqlib.utils.sunspec_modbus.send_val(point, value)
+        else:
+            point.value_setter(value)
+            await self.client.write_point(point)
+
     def map_uuids(self):
         def get_uuid(block, point):
             comment = point.point_type.notes
@@ -1029,23 +1266,19 @@ class SunSpecDevice:
         }
 
     async def get_access_level(self):
-        access_level_point = self.device.epc_control.model.points["AccLvl"]
+        (access_level,) = await self._read_control("AccLvl")
 
-        self.device.epc_control.read()
-
-        return access_level_point.value
+        return access_level
 
     async def get_check_limits(self):
-        point = self.device.epc_control.model.points["ChkLmts"]
-        self.device.epc_control.read()
+        (check_limits,) = await self._read_control("ChkLmts")
 
-        return point.value
+        return check_limits
 
     async def get_password(self):
-        point = self.device.epc_control.model.points["Passwd"]
-        self.device.epc_control.read()
+        (password,) = await self._read_control("Passwd")
 
-        return point.value
+        return password
 
     async def set_access_level(self, level=None, password=None, check_limits=True):
         if level is None:
@@ -1059,11 +1292,11 @@ class SunSpecDevice:
         check_limits_point = self.device.epc_control.model.points["ChkLmts"]
         submit_point = self.device.epc_control.model.points["SubAccLvl"]
 
-        epyqlib.utils.sunspec_modbus.send_val(access_level_point, level)
-        epyqlib.utils.sunspec_modbus.send_val(password_point, password)
-        epyqlib.utils.sunspec_modbus.send_val(check_limits_point, check_limits)
+        await self._send(access_level_point, level)
+        await self._send(password_point, password)
+        await self._send(check_limits_point, check_limits)
 
-        epyqlib.utils.sunspec_modbus.send_val(submit_point, True)
+        await self._send(submit_point, True)
 
     @contextlib.asynccontextmanager
     async def temporary_access_level(
@@ -1072,11 +1305,10 @@ class SunSpecDevice:
         password=None,
         check_limits=True,
     ):
-        check_limits_point = self.device.epc_control.model.points["ChkLmts"]
-
-        original_access_level = await self.get_access_level()
-        self.device.epc_control.read()
-        original_check_limits = check_limits_point.value
+        original_access_level, original_check_limits = await self._read_control(
+            "AccLvl",
+            "ChkLmts",
+        )
 
         try:
             await self.set_access_level(
@@ -1101,7 +1333,7 @@ class SunSpecDevice:
         # TODO: just accept the 1s or whatever default timeout?  A set without
         #       waiting for the response could be nice.  (or embedded sending
         #       a response)
-        with contextlib.suppress(sunspec.core.client.SunSpecClientError):
+        with contextlib.suppress(*sunspec_errors):
             await reset_parameter.set(value=1)
 
         if sleep > 0:
@@ -1121,7 +1353,7 @@ class SunSpecDevice:
                 for _ in range(5):
                     await epyqlib.utils.twisted.sleep(0.2)
                     await a_parameter_that_can_be_read.get()
-            except sunspec.core.client.SunSpecClientError as e:
+            except sunspec_errors as e:
                 if time.monotonic() > end:
                     raise RestartTimeoutError() from e
                 continue
@@ -1143,7 +1375,7 @@ class SunSpecDevice:
         while time.monotonic() < end:
             try:
                 saving = await save_in_progress_parameter.get()
-            except sunspec.core.client.SunSpecClientError:
+            except sunspec_errors:
                 continue
 
             if not saving:
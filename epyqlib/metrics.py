@@ -0,0 +1,313 @@
+"""Lightweight counters, gauges, histograms and rates for hot paths.
+
+Instrumented code checks the module level ``enabled`` flag before doing any
+work so the cost of the instrumentation while disabled is a single attribute
+lookup.  Metrics are created at import time from the default ``registry`` and
+can be viewed in :class:`epyqlib.metricsview.MetricsView` or written out
+periodically with :class:`JsonDumper`.
+"""
+
+import bisect
+import collections
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+import attr
+
+
+logger = logging.getLogger(__name__)
+
+enabled = False
+
+
+def enable(enable=True):
+    global enabled
+
+    enabled = enable
+
+
+def disable():
+    enable(False)
+
+
+class MetricTypeError(Exception):
+    pass
+
+
+@attr.s
+class Counter:
+    name = attr.ib()
+    value = attr.ib(default=0)
+    _lock = attr.ib(factory=threading.Lock, repr=False)
+
+    type = "counter"
+
+    def increment(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+    def snapshot(self):
+        return {"type": self.type, "value": self.value}
+
+
+@attr.s
+class Gauge:
+    name = attr.ib()
+    value = attr.ib(default=0)
+    maximum = attr.ib(default=0)
+    _lock = attr.ib(factory=threading.Lock, repr=False)
+
+    type = "gauge"
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+            self.maximum = max(self.maximum, value)
+
+    def increment(self, n=1):
+        with self._lock:
+            self.value += n
+            self.maximum = max(self.maximum, self.value)
+
+    def decrement(self, n=1):
+        with self._lock:
+            self.value = max(0, self.value - n)
+
+    def reset(self):
+        with self._lock:
+            self.maximum = self.value
+
+    def snapshot(self):
+        return {"type": self.type, "value": self.value, "maximum": self.maximum}
+
+
+def exponential_bounds(minimum=1e-6, maximum=10, per_decade=4):
+    decades = math.log10(maximum / minimum)
+    steps = int(round(decades * per_decade))
+
+    return tuple(minimum * 10 ** (step / per_decade) for step in range(steps + 1))
+
+
+def count_bounds(maximum=1024):
+    return tuple(2 ** power for power in range(int(math.log2(maximum)) + 1))
+
+
+@attr.s
+class Histogram:
+    """Bucketed distribution of recorded values, durations in seconds by
+    default.  Percentiles are reported as the upper bound of the bucket
+    they fall in.  Histograms of anything else pass suitable ``bounds``
+    along with the ``unit``, such as :func:`count_bounds` and ``"count"``."""
+
+    name = attr.ib()
+    bounds = attr.ib(factory=exponential_bounds, converter=tuple)
+    unit = attr.ib(default="seconds")
+    counts = attr.ib(default=None)
+    count = attr.ib(default=0)
+    total = attr.ib(default=0)
+    minimum = attr.ib(default=None)
+    maximum = attr.ib(default=None)
+    _lock = attr.ib(factory=threading.Lock, repr=False)
+
+    type = "histogram"
+
+    def __attrs_post_init__(self):
+        if self.counts is None:
+            self.counts = [0] * (len(self.bounds) + 1)
+
+    def record(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+
+    def percentile(self, percent):
+        if self.count == 0:
+            return None
+
+        target = self.count * percent / 100
+        accumulated = 0
+        for index, count in enumerate(self.counts):
+            accumulated += count
+            if accumulated >= target:
+                break
+
+        if index < len(self.bounds):
+            return min(self.bounds[index], self.maximum)
+
+        return self.maximum
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.total = 0
+            self.minimum = None
+            self.maximum = None
+
+    def snapshot(self):
+        mean = None if self.count == 0 else self.total / self.count
+
+        return {
+            "type": self.type,
+            "unit": self.unit,
+            "count": self.count,
+            "mean": mean,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+@attr.s
+class Rate:
+    """Events per second over a sliding window of whole seconds."""
+
+    name = attr.ib()
+    window = attr.ib(default=5)
+    total = attr.ib(default=0)
+    clock = attr.ib(default=time.monotonic, repr=False)
+    _seconds = attr.ib(factory=collections.deque, repr=False)
+    _lock = attr.ib(factory=threading.Lock, repr=False)
+
+    type = "rate"
+
+    def _expire(self, now):
+        oldest = int(now) - self.window
+        while len(self._seconds) > 0 and self._seconds[0][0] <= oldest:
+            self._seconds.popleft()
+
+    def mark(self, n=1):
+        second = int(self.clock())
+
+        with self._lock:
+            self.total += n
+
+            if len(self._seconds) > 0 and self._seconds[-1][0] == second:
+                self._seconds[-1][1] += n
+            else:
+                self._seconds.append([second, n])
+                self._expire(second)
+
+    def rate(self):
+        now = self.clock()
+
+        with self._lock:
+            self._expire(now)
+            events = sum(count for _, count in self._seconds)
+
+        return events / self.window
+
+    def reset(self):
+        with self._lock:
+            self.total = 0
+            self._seconds.clear()
+
+    def snapshot(self):
+        return {"type": self.type, "per_second": self.rate(), "total": self.total}
+
+
+@attr.s
+class Registry:
+    metrics = attr.ib(factory=dict)
+    _lock = attr.ib(factory=threading.Lock, repr=False)
+
+    def _get(self, name, cls, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+
+            if metric is None:
+                metric = cls(name=name, **kwargs)
+                self.metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise MetricTypeError(
+                    "{} is a {}, not a {}".format(name, metric.type, cls.type),
+                )
+
+        return metric
+
+    def counter(self, name):
+        return self._get(name=name, cls=Counter)
+
+    def gauge(self, name):
+        return self._get(name=name, cls=Gauge)
+
+    def histogram(self, name, **kwargs):
+        return self._get(name=name, cls=Histogram, **kwargs)
+
+    def rate(self, name):
+        return self._get(name=name, cls=Rate)
+
+    def reset(self):
+        for metric in tuple(self.metrics.values()):
+            metric.reset()
+
+    def snapshot(self):
+        return {
+            name: metric.snapshot() for name, metric in sorted(self.metrics.items())
+        }
+
+    def dumps(self):
+        return json.dumps(
+            {"time": time.time(), "enabled": enabled, "metrics": self.snapshot()},
+            indent=4,
+        )
+
+    def dump(self, path):
+        # write then rename so readers never see a partial file
+        temporary = "{}.tmp".format(path)
+        with open(temporary, "w") as f:
+            f.write(self.dumps())
+            f.write("\n")
+
+        os.replace(temporary, path)
+
+
+registry = Registry()
+
+
+@attr.s
+class JsonDumper:
+    """Periodically write a registry snapshot to a JSON file using the
+    twisted reactor, intended for headless runs such as
+    :mod:`epyqlib.hildevice` scripts."""
+
+    path = attr.ib()
+    interval = attr.ib(default=10)
+    registry = attr.ib(default=registry)
+    _looping_call = attr.ib(default=None, repr=False)
+
+    def start(self):
+        import twisted.internet.task
+
+        self._looping_call = twisted.internet.task.LoopingCall(self.dump)
+        d = self._looping_call.start(self.interval, now=False)
+        d.addErrback(lambda failure: logger.error(failure.getTraceback()))
+
+    def stop(self):
+        if self._looping_call is not None and self._looping_call.running:
+            self._looping_call.stop()
+
+        self._looping_call = None
+        self.dump()
+
+    def dump(self):
+        self.registry.dump(self.path)
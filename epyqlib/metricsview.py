@@ -0,0 +1,96 @@
+from PyQt5 import QtCore, QtWidgets
+
+import epyqlib.metrics
+import epyqlib.metricsview_ui
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "-"
+
+    return "{:.3f} ms".format(seconds * 1000)
+
+
+def format_count(count):
+    if count is None:
+        return "-"
+
+    return "{:.1f}".format(count)
+
+
+formatters = {
+    "seconds": format_seconds,
+    "count": format_count,
+}
+
+
+def format_snapshot(snapshot):
+    type_ = snapshot["type"]
+
+    if type_ == "counter":
+        return str(snapshot["value"])
+    elif type_ == "gauge":
+        return "{value} (max {maximum})".format(**snapshot)
+    elif type_ == "rate":
+        return "{per_second:.1f}/s ({total} total)".format(**snapshot)
+    elif type_ == "histogram":
+        if snapshot["count"] == 0:
+            return "-"
+
+        format_value = formatters[snapshot.get("unit", "seconds")]
+
+        return "mean {mean}, p50 {p50}, p90 {p90}, p99 {p99}, max {maximum} ({count})".format(
+            count=snapshot["count"],
+            **{
+                name: format_value(snapshot[name])
+                for name in ("mean", "p50", "p90", "p99", "maximum")
+            },
+        )
+
+    return str(snapshot)
+
+
+class MetricsView(QtWidgets.QWidget):
+    def __init__(self, parent=None, in_designer=False, registry=None, interval=1):
+        super().__init__(parent=parent)
+
+        self.in_designer = in_designer
+
+        if registry is None:
+            registry = epyqlib.metrics.registry
+
+        self.registry = registry
+        self.items = {}
+
+        self.ui = epyqlib.metricsview_ui.Ui_Form()
+        self.ui.setupUi(self)
+
+        self.ui.tree_widget.sortByColumn(0, QtCore.Qt.AscendingOrder)
+
+        self.ui.enabled_check_box.setChecked(epyqlib.metrics.enabled)
+        self.ui.enabled_check_box.toggled.connect(epyqlib.metrics.enable)
+        self.ui.reset_button.clicked.connect(self.reset)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(int(interval * 1000))
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+        self.refresh()
+
+    def reset(self):
+        self.registry.reset()
+        self.refresh()
+
+    def refresh(self):
+        self.ui.enabled_check_box.setChecked(epyqlib.metrics.enabled)
+
+        for name, snapshot in self.registry.snapshot().items():
+            item = self.items.get(name)
+            if item is None:
+                item = QtWidgets.QTreeWidgetItem(self.ui.tree_widget, [name, ""])
+                self.items[name] = item
+
+            item.setText(1, format_snapshot(snapshot))
+
+        self.ui.tree_widget.resizeColumnToContents(0)
@@ -171,9 +171,211 @@ column_index_by_meta = {meta: getattr(Columns.indexes, meta.name) for meta in Me
 
 
 @attr.s
-@epyqlib.utils.general.enumerated_attrs(MetaEnum, default=None)
-class Meta:
-    pass
+class MetaTable:
+    """The non-value metas and the scratch value of many parameters, stored
+    as one column per meta with a row per parameter.  The value itself is
+    still held by the :class:`Nv`.  Rows are only ever added so a parameter
+    keeps the row it was given.
+    """
+
+    columns = (*(meta.name for meta in MetaEnum.non_value), "scratch")
+
+    values = attr.ib(factory=lambda: {column: [] for column in MetaTable.columns})
+    reset_values = attr.ib(
+        factory=lambda: {column: [] for column in MetaTable.columns},
+    )
+    stale = attr.ib(
+        factory=lambda: {column: bytearray() for column in MetaTable.columns},
+    )
+    rows = attr.ib(default=0)
+
+    @classmethod
+    def for_frame(cls, frame):
+        """Get the table shared by the parameters of the frame's multiplexer."""
+        if frame is None:
+            return cls()
+
+        owner = frame if frame.mux_frame is None else frame.mux_frame
+        table = getattr(owner, "meta_table", None)
+        if table is None:
+            table = cls()
+            owner.meta_table = table
+
+        return table
+
+    def add_row(self):
+        for column in self.columns:
+            self.values[column].append(None)
+            self.reset_values[column].append(None)
+            # scratch is only ever local
+            self.stale[column].append(column != "scratch")
+
+        self.rows += 1
+
+        return self.rows - 1
+
+
+class MetaSignal:
+    """A flyweight standing in for one meta, or the scratch value, of an
+    :class:`Nv`.  The signal definition is the Nv's own and the values are
+    in its :class:`MetaTable` row so these are cheap to create on demand.
+    """
+
+    __slots__ = ("nv", "column", "meta_value", "for_remote_data")
+
+    def __init__(self, nv, column):
+        self.nv = nv
+        self.column = column
+
+        if column == "scratch":
+            # checked against the limits like the value is
+            self.meta_value = MetaEnum.value
+            self.for_remote_data = False
+        else:
+            self.meta_value = getattr(MetaEnum, column)
+            self.for_remote_data = True
+
+    def __getattr__(self, name):
+        # the status signal belongs to the value alone
+        if name == "status_signal":
+            raise AttributeError(name)
+
+        return getattr(self.nv, name)
+
+    @property
+    def value(self):
+        return self.nv._meta_table.values[self.column][self.nv._meta_row]
+
+    @value.setter
+    def value(self, value):
+        self.nv._meta_table.values[self.column][self.nv._meta_row] = value
+
+    @property
+    def reset_value(self):
+        return self.nv._meta_table.reset_values[self.column][self.nv._meta_row]
+
+    @reset_value.setter
+    def reset_value(self, value):
+        self.nv._meta_table.reset_values[self.column][self.nv._meta_row] = value
+
+    @property
+    def _stale(self):
+        return bool(self.nv._meta_table.stale[self.column][self.nv._meta_row])
+
+    @_stale.setter
+    def _stale(self, stale):
+        self.nv._meta_table.stale[self.column][self.nv._meta_row] = int(stale)
+
+    @property
+    def full_string(self):
+        full_string, _, _ = self.nv.format_strings(value=self.value)
+
+        return full_string
+
+    @property
+    def short_string(self):
+        _, short_string, _ = self.nv.format_strings(value=self.value)
+
+        return short_string
+
+    def get_human_value(self, for_file=False, column=None):
+        return epyqlib.canneo.Signal.get_human_value(
+            self.nv,
+            for_file=for_file,
+            value=self.value,
+        )
+
+    def pack_bitstring(self, value=None):
+        if value is None:
+            value = self.value
+
+        return self.nv.pack_bitstring(value=0 if value is None else value)
+
+    def check_value(self, value, force=False, check_range=False):
+        return epyqlib.canneo.Signal.check_value(
+            self.nv,
+            value=value,
+            check_range=check_range,
+            **self.nv.limits(meta=self.meta_value),
+        )
+
+    def set_value(self, value, force=False, check_range=False):
+        ok = self.check_value(value=value, check_range=check_range)
+        if not ok:
+            return False
+
+        self.reset_value = value
+        self.value = value
+
+    def check_human_value(self, raw_value, check_range=False):
+        return self.check_value(
+            value=self.nv.calc_human_value(raw_value),
+            check_range=check_range,
+        )
+
+    def set_human_value(self, raw_value, force=False, check_range=False):
+        self.set_value(
+            value=self.nv.calc_human_value(raw_value),
+            force=force,
+            check_range=check_range,
+        )
+
+    def check_data(self, data, check_range=True):
+        try:
+            if data is None:
+                return self.check_value(data)
+            else:
+                return self.check_human_value(data, check_range=check_range)
+        except ValueError:
+            return False
+
+    def set_data(self, data, mark_modified=False, check_range=True):
+        if not self.check_data(data=data, check_range=check_range):
+            return False
+
+        reset_value = self.reset_value
+        try:
+            if data is None:
+                self.set_value(data)
+            else:
+                self.set_human_value(data, check_range=check_range)
+        except ValueError:
+            return False
+        finally:
+            if mark_modified:
+                self.reset_value = reset_value
+
+        return True
+
+    def saturation_value(self):
+        return self.nv.saturated(self.value)
+
+    def can_be_saturated(self):
+        if self.value is None:
+            return False
+
+        return self.nv.to_human(self.value) != self.saturation_value()
+
+    def can_be_reset(self):
+        return self.reset_value != self.value
+
+    def can_be_cleared(self):
+        return self.value is not None
+
+
+class MetaSignals:
+    """Access to an Nv's metas as ``nv.meta.minimum`` and so on."""
+
+    __slots__ = ("nv",)
+
+    def __init__(self, nv):
+        self.nv = nv
+
+    def __getattr__(self, name):
+        if name not in MetaTable.columns or name == "scratch":
+            raise AttributeError(name)
+
+        return MetaSignal(nv=self.nv, column=name)
 
 
 class Nvs(TreeNode, epyqlib.canneo.QtCanListener):
@@ -220,6 +422,7 @@ class Nvs(TreeNode, epyqlib.canneo.QtCanListener):
 
         self.bus = bus
         self.neo = neo
+        self._signals_by_names = None
         self.message_received_signal.connect(self.message_received)
 
         self.access_level_node = None
@@ -245,6 +448,11 @@ class Nvs(TreeNode, epyqlib.canneo.QtCanListener):
             f for f in self.neo.frames if f.name == self.configuration.status_frame
         ][0].multiplex_frames
 
+        self.protocol.status_frame_ids = self.can_filter_ids()
+        if self.bus is not None:
+            # the transport was attached before the status frame was known
+            self.bus.update_filters()
+
         self.serial_number_node = None
         if serial_number_uuid is not None:
             self.serial_number_node = self.nv_from_uuid(serial_number_uuid)
@@ -507,6 +715,10 @@ class Nvs(TreeNode, epyqlib.canneo.QtCanListener):
     def terminate(self):
         self.cancel_cyclic_read_all()
 
+    def can_filter_ids(self):
+        status_frame = self.status_frames[0]
+        return {(status_frame.id, status_frame.extended)}
+
     def set_stale(self):
         for nv in self.all_nv():
             nv.set_stale()
@@ -944,6 +1156,35 @@ class Nvs(TreeNode, epyqlib.canneo.QtCanListener):
         return frames
 
     def signal_from_names(self, frame_name, value_name):
+        if self._signals_by_names is None:
+            self._signals_by_names = self._index_signal_names()
+
+        try:
+            return self._signals_by_names[(frame_name, value_name)]
+        except KeyError:
+            return self._signal_from_names_scan(frame_name, value_name)
+
+    def _index_signal_names(self):
+        """Map ``(mux name, signal name)`` to the signal for the names that
+        :meth:`_signal_from_names_scan` resolves unambiguously."""
+
+        frames = collections.defaultdict(list)
+        for frame in self.set_frames.values():
+            frames[frame.mux_name].append(frame)
+
+        signals_by_names = {}
+        for frame_name, (frame, *others) in frames.items():
+            if len(others) > 0:
+                continue
+
+            counts = collections.Counter(signal.name for signal in frame.signals)
+            for signal in frame.signals:
+                if counts[signal.name] == 1:
+                    signals_by_names[(frame_name, signal.name)] = signal
+
+        return signals_by_names
+
+    def _signal_from_names_scan(self, frame_name, value_name):
         frame = [f for f in self.set_frames.values() if f.mux_name == frame_name]
 
         try:
@@ -1051,18 +1292,12 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
         signal,
         frame,
         parent=None,
-        meta=None,
-        meta_value=None,
-        base=True,
         for_remote_data=True,
     ):
         epyqlib.canneo.Signal.__init__(self, signal=signal, frame=frame, parent=parent)
         TreeNode.__init__(self)
 
-        if meta_value is None:
-            self.meta_value = MetaEnum.value
-        else:
-            self.meta_value = meta_value
+        self.meta_value = MetaEnum.value
 
         default = self.default_value
         if default is None:
@@ -1073,6 +1308,10 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
 
         self.reset_value = None
 
+        # the other metas and the scratch value, see MetaSignal
+        self._meta_table = MetaTable.for_frame(self.frame)
+        self._meta_row = self._meta_table.add_row()
+
         self.clear(mark_modified=False)
 
         self.fields = Columns(
@@ -1082,53 +1321,26 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
         if self.frame is not None:
             self.fields.name = "{}:{}".format(self.frame.mux_name, self.name)
 
-        if meta is None:
-            self.meta = Meta()
-        else:
-            self.meta = meta
+        unset, _, _ = self.format_strings(value=None)
+        for column in MetaTable.columns:
+            setattr(self.fields, column, unset)
 
-        self.base = base
         self.for_remote_data = for_remote_data
 
-        if self.base:
-            metas = (
-                MetaEnum.user_default,
-                MetaEnum.factory_default,
-                MetaEnum.minimum,
-                MetaEnum.maximum,
-            )
-            for meta in metas:
-                setattr(
-                    self.meta,
-                    meta.name,
-                    Nv(signal, frame=None, meta=self.meta, meta_value=meta, base=False),
-                )
-
-            for meta in metas:
-                getattr(self.meta, meta.name).set_value(None)
-
-                setattr(
-                    self.fields,
-                    meta.name,
-                    getattr(self.meta, meta.name).full_string,
-                )
-
-            self.scratch = Nv(
-                signal,
-                frame=None,
-                meta=self.meta,
-                base=False,
-                for_remote_data=False,
-            )
-            self.scratch.set_value(None)
-            self.fields.scratch = self.scratch.full_string
-
         self.write_only = False
 
         self._stale = self.for_remote_data
 
         self.stale_role = Qt.ForegroundRole
 
+    @property
+    def meta(self):
+        return MetaSignals(nv=self)
+
+    @property
+    def scratch(self):
+        return MetaSignal(nv=self, column="scratch")
+
     def _changed(
         self, column_start=None, column_end=None, roles=(Columns.indexes.value,)
     ):
@@ -1176,24 +1388,33 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
                 self._set_stale(stale=True, column=column, subnode=subnode)
 
     def _get_signal_for_column(self, column):
-        if not self.base:
-            raise Exception("This should only be called on the base signal")
-
         if column == Columns.indexes.value:
             return self
 
-        if column == Columns.indexes.scratch:
-            return self.scratch
-
         column_name = Columns().index_from_attribute(column)
+        if column_name not in MetaTable.columns:
+            return None
 
-        return getattr(self.meta, column_name, None)
+        return MetaSignal(nv=self, column=column_name)
 
     def get_meta_signal(self, meta):
         if meta == MetaEnum.value:
             return self
 
-        return getattr(self.meta, meta.name)
+        return MetaSignal(nv=self, column=meta.name)
+
+    def limits(self, meta=MetaEnum.value):
+        """Get the human range that values of ``meta`` are checked against."""
+        minimum = self._meta_table.values["minimum"][self._meta_row]
+        maximum = self._meta_table.values["maximum"][self._meta_row]
+
+        if minimum is None or meta in meta_limits:
+            minimum = self.raw_minimum
+
+        if maximum is None or meta in meta_limits:
+            maximum = self.raw_maximum
+
+        return dict(minimum=self.to_human(minimum), maximum=self.to_human(maximum))
 
     def get_human_value(self, for_file=False, column=None):
         if column is None:
@@ -1234,16 +1455,21 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
         self.set_meta(signal.saturation_value(), meta=meta, mark_modified=True)
 
     def saturation_value(self):
-        if self.value is None:
+        return self.saturated(self.value)
+
+    def saturated(self, value):
+        if value is None:
             return None
 
-        s = self.to_human(self.value)
+        s = self.to_human(value)
 
-        if self.meta.minimum.value is not None:
-            s = max(self.to_human(self.meta.minimum.value), s)
+        minimum = self._meta_table.values["minimum"][self._meta_row]
+        if minimum is not None:
+            s = max(self.to_human(minimum), s)
 
-        if self.meta.maximum.value is not None:
-            s = min(self.to_human(self.meta.maximum.value), s)
+        maximum = self._meta_table.values["maximum"][self._meta_row]
+        if maximum is not None:
+            s = min(self.to_human(maximum), s)
 
         return s
 
@@ -1260,29 +1486,10 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
         self.set_meta(signal.reset_value, meta=meta)
 
     def check_value(self, value, force=False, check_range=False):
-        min_max = {MetaEnum.minimum, MetaEnum.maximum}
-
-        extras = {}
-
-        if self.meta is not None:
-            if self.meta.minimum.value is None or self.meta_value in min_max:
-                extras["minimum"] = self.to_human(self.raw_minimum)
-            else:
-                extras["minimum"] = self.meta.minimum.to_human(
-                    self.meta.minimum.value,
-                )
-
-            if self.meta.maximum.value is None or self.meta_value in min_max:
-                extras["maximum"] = self.to_human(self.raw_maximum)
-            else:
-                extras["maximum"] = self.meta.maximum.to_human(
-                    self.meta.maximum.value,
-                )
-
         return super().check_value(
             value=value,
             check_range=check_range,
-            **extras,
+            **self.limits(),
         )
 
     def set_value(self, value, force=False, check_range=False):
@@ -1295,29 +1502,11 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
 
         self.reset_value = value
 
-        min_max = {MetaEnum.minimum, MetaEnum.maximum}
-
-        if self.meta is not None:
-            extras = {}
-            if self.meta.minimum.value is None or self.meta_value in min_max:
-                extras["minimum"] = self.to_human(self.raw_minimum)
-            else:
-                extras["minimum"] = self.meta.minimum.to_human(
-                    self.meta.minimum.value,
-                )
-
-            if self.meta.maximum.value is None or self.meta_value in min_max:
-                extras["maximum"] = self.to_human(self.raw_maximum)
-            else:
-                extras["maximum"] = self.meta.maximum.to_human(
-                    self.meta.maximum.value,
-                )
-
         super().set_value(
             value=value,
             force=force,
             check_range=check_range,
-            **extras,
+            **self.limits(),
         )
         self.fields.value = self.full_string
         self._changed()
@@ -1360,7 +1549,7 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
                 extras["check_range"] = kwargs["check_range"]
             return self.check_data(data, *args, **extras)
 
-        meta_signal = getattr(self.meta, meta.name)
+        meta_signal = self.get_meta_signal(meta)
 
         return meta_signal.check_data(
             data=data,
@@ -1377,7 +1566,7 @@ class Nv(epyqlib.canneo.Signal, TreeNode):
         if meta == MetaEnum.value:
             return self.set_data(data=data, *args, **kwargs)
 
-        meta_signal = getattr(self.meta, meta.name)
+        meta_signal = self.get_meta_signal(meta)
 
         result = meta_signal.set_data(
             data=data,
@@ -1573,6 +1762,24 @@ class NvModel(epyqlib.pyqabstractitemmodel.PyQAbstractItemModel):
         self.stale_foreground = color
         self.edit_locally = False
 
+        # None reports every change immediately
+        self.change_coalescer = epyqlib.pyqabstractitemmodel.ChangeCoalescer(
+            model=self,
+        )
+
+    @pyqtSlot(TreeNode, int, TreeNode, int, list)
+    def changed(self, start_node, start_column, end_node, end_column, roles):
+        if self.change_coalescer is None or end_node is not start_node:
+            super().changed(start_node, start_column, end_node, end_column, roles)
+            return
+
+        self.change_coalescer.mark(
+            node=start_node,
+            first_column=start_column,
+            last_column=end_column,
+            roles=roles,
+        )
+
     def all_nv(self):
         return self.root.all_nv()
 
@@ -1843,8 +2050,6 @@ class NvModel(epyqlib.pyqabstractitemmodel.PyQAbstractItemModel):
                     )
 
         for signal in frame.set_frame.parameter_signals:
-            QtWidgets.QApplication.instance().processEvents()
-
             model.dynamic_columns_changed(
                 signal, columns=(getattr(epyqlib.nv.Columns.indexes, meta.name),)
             )
@@ -1,11 +1,15 @@
 import collections
+import concurrent.futures
+import hashlib
+import json
 import os
 import math
 import pathlib
 
+import appdirs
 import attr
 import click
-import epyqlib.pm.valuesetmodel
+import epyqlib.pm.valuesettable
 import epyqlib.attrsmodel
 import graham
 import marshmallow
@@ -24,6 +28,60 @@ def to_list_of_pathlib(l):
     return [pathlib.Path(path) for path in l]
 
 
+# bump when cooking changes in a way that should invalidate existing outputs
+cook_version = 1
+
+
+def default_manifest_directory():
+    return pathlib.Path(appdirs.user_cache_dir("Epyq", "EPC Power")) / "cook"
+
+
+def file_digest(path, digests=None):
+    """Return the SHA-256 hex digest of the file contents.  ``digests`` is an
+    optional dict used to hash each path only once."""
+
+    if digests is not None:
+        digest = digests.get(path)
+        if digest is not None:
+            return digest
+
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(2 ** 16), b""):
+            sha256.update(chunk)
+
+    digest = sha256.hexdigest()
+
+    if digests is not None:
+        digests[path] = digest
+
+    return digest
+
+
+# parsed value sets kept per process so that recipes handled by the same
+# worker share them
+_table_cache = {}
+
+
+def cook_recipe(base_pmvs_path, overlay_pmvs_paths, output_path):
+    result_table = epyqlib.pm.valuesettable.loadp_cached(
+        base_pmvs_path,
+        cache=_table_cache,
+    )
+
+    for path in overlay_pmvs_paths:
+        overlay_table = epyqlib.pm.valuesettable.loadp_cached(
+            path,
+            cache=_table_cache,
+        )
+        result_table.overlay(overlay_table)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    result_table.save(path=output_path)
+
+    return output_path
+
+
 @graham.schemify(tag="valueset_overlay_recipe")
 @attr.s
 class OverlayRecipe:
@@ -53,6 +111,10 @@ class OverlayConfiguration:
         converter=epyqlib.attrsmodel.to_pathlib_or_none,
     )
     path = attr.ib(default=None)
+    manifest_directory = attr.ib(
+        default=None,
+        converter=epyqlib.attrsmodel.to_pathlib_or_none,
+    )
 
     @classmethod
     def load(cls, path):
@@ -79,6 +141,124 @@ class OverlayConfiguration:
     def recipe_overlay_pmvs_paths(self, recipe):
         return [self.reference_path / path for path in recipe.overlay_pmvs_paths]
 
+    def manifest_path(self):
+        """The manifest is kept out of the output directory, which is often
+        committed, in a file named for the resolved output directory."""
+
+        directory = self.manifest_directory
+        if directory is None:
+            directory = default_manifest_directory()
+
+        output_path = os.fspath(self.reference_output_path().resolve())
+        name = hashlib.sha256(output_path.encode("utf-8")).hexdigest()
+
+        return directory / f"{name}.json"
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        path = self.manifest_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+            f.write("\n")
+
+    def recipe_digest(self, recipe, digests=None):
+        """Hash the contents of the recipe inputs, in order, so any change
+        to them produces a different digest."""
+
+        sha256 = hashlib.sha256()
+        sha256.update(str(cook_version).encode("ascii"))
+
+        paths = [
+            self.recipe_base_pmvs_path(recipe=recipe),
+            *self.recipe_overlay_pmvs_paths(recipe=recipe),
+        ]
+
+        for path in paths:
+            sha256.update(file_digest(path, digests=digests).encode("ascii"))
+
+        return sha256.hexdigest()
+
+    def stale_recipes(self, manifest, digests=None):
+        """Return ``(recipe, digest)`` pairs for the recipes whose output is
+        missing or whose inputs changed since ``manifest`` was recorded."""
+
+        stale = []
+
+        for recipe in self.recipes:
+            digest = self.recipe_digest(recipe=recipe, digests=digests)
+            output_path = self.recipe_output_path(recipe=recipe)
+
+            if manifest.get(os.fspath(recipe.output_path)) == digest:
+                if output_path.exists():
+                    continue
+
+            stale.append((recipe, digest))
+
+        return stale
+
+    def cook(self, jobs=None, force=False, echo=lambda *args, **kwargs: None):
+        """Cook the stale recipes, or all of them if ``force``, using up to
+        ``jobs`` processes.  ``None`` uses one per CPU."""
+
+        manifest = {} if force else self.load_manifest()
+        stale = self.stale_recipes(manifest=manifest, digests={})
+
+        stale_ids = {id(recipe) for recipe, _ in stale}
+        for recipe in self.recipes:
+            if id(recipe) not in stale_ids:
+                output_path = self.recipe_output_path(recipe=recipe)
+                echo(f"Up to date: {os.fspath(output_path)}")
+
+        if jobs is None:
+            jobs = os.cpu_count()
+
+        jobs = max(1, min(jobs, len(stale)))
+
+        arguments = [
+            (
+                self.recipe_base_pmvs_path(recipe=recipe),
+                self.recipe_overlay_pmvs_paths(recipe=recipe),
+                self.recipe_output_path(recipe=recipe),
+            )
+            for recipe, _ in stale
+        ]
+
+        if jobs == 1:
+            results = (cook_recipe(*args) for args in arguments)
+            executor = None
+        else:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+            results = executor.map(
+                cook_recipe,
+                *zip(*arguments),
+                chunksize=max(1, len(arguments) // (4 * jobs)),
+            )
+
+        try:
+            for (recipe, digest), (base, overlays, _), output_path in zip(
+                stale, arguments, results
+            ):
+                echo(f"Created: {os.fspath(output_path)}")
+                echo(
+                    "\n".join(f"    {os.fspath(path)}" for path in [base, *overlays]),
+                )
+                manifest[os.fspath(recipe.output_path)] = digest
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+            self.save_manifest(manifest)
+
+        return [recipe for recipe, _ in stale]
+
     def raw(self, echo=lambda *args, **kwargs: None):
         input_modification_times = []
         output_modification_times = []
@@ -137,51 +317,51 @@ def generate_recipes(value_set_path_strings, common_output_path_string):
     ]
     common_output_path = pathlib.Path(common_output_path_string)
 
-    common_value_set = epyqlib.pm.valuesetmodel.create_blank()
+    common_table = epyqlib.pm.valuesettable.Table()
 
-    value_sets = [
-        epyqlib.pm.valuesetmodel.loadp(value_set_path)
+    tables = [
+        epyqlib.pm.valuesettable.loadp(value_set_path)
         for value_set_path in value_set_paths
     ]
 
-    all_parameters_by_uuid = collections.defaultdict(list)
-    for value_set in value_sets:
-        for parameter in value_set.model.root.children:
-            all_parameters_by_uuid[parameter.parameter_uuid].append(parameter)
+    all_records_by_uuid = collections.defaultdict(list)
+    for table in tables:
+        for record in table.records:
+            all_records_by_uuid[record.parameter_uuid].append(record)
 
     common_uuids = [
         uuid_
-        for uuid_, parameters in all_parameters_by_uuid.items()
-        if len(parameters) == len(value_sets)
+        for uuid_, records in all_records_by_uuid.items()
+        if len(records) == len(tables)
     ]
 
     common_and_equal_uuids = [
         uuid_
         for uuid_ in common_uuids
-        if 1 == len({parameter.value for parameter in all_parameters_by_uuid[uuid_]})
+        if 1 == len({record.value for record in all_records_by_uuid[uuid_]})
     ]
 
     for uuid_ in common_and_equal_uuids:
-        reference_parameter = all_parameters_by_uuid[uuid_][0]
-
-        new_parameter = epyqlib.pm.valuesetmodel.Parameter(
-            name=reference_parameter.name,
-            value=reference_parameter.value,
-            parameter_uuid=reference_parameter.parameter_uuid,
-            readable=reference_parameter.readable,
-            writable=reference_parameter.writable,
+        reference_record = all_records_by_uuid[uuid_][0]
+
+        new_record = epyqlib.pm.valuesettable.Record(
+            name=reference_record.name,
+            value=reference_record.value,
+            parameter_uuid=reference_record.parameter_uuid,
+            readable=reference_record.readable,
+            writable=reference_record.writable,
         )
 
-        common_value_set.model.root.append_child(new_parameter)
+        common_table.append(new_record)
 
-    for value_set in value_sets:
-        value_set.strip_common(reference=common_value_set)
+    for table in tables:
+        table.strip_common(reference=common_table)
 
-    common_value_set.save(path=common_output_path)
-    for value_set in value_sets:
-        new_name = common_output_path.stem + "-" + value_set.path.name
+    common_table.save(path=common_output_path)
+    for table in tables:
+        new_name = common_output_path.stem + "-" + table.path.name
         path = common_output_path.parent / new_name
-        value_set.save(path=path)
+        table.save(path=path)
 
 
 @recipes.command(name="cook")
@@ -195,10 +375,30 @@ def generate_recipes(value_set_path_strings, common_output_path_string):
     "only_if_raw",
     default=False,
 )
-def cli(configuration_path_string, only_if_raw):
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of processes to cook with, defaults to one per CPU",
+)
+@click.option(
+    "--force/--incremental",
+    default=False,
+    help="Cook all recipes even if their inputs are unchanged",
+)
+@click.option(
+    "--manifest-directory",
+    "manifest_directory_string",
+    type=click.Path(file_okay=False, resolve_path=True),
+    default=None,
+    help="Where to record the cooked input digests, defaults to the user cache",
+)
+def cli(configuration_path_string, only_if_raw, jobs, force, manifest_directory_string):
     configuration_path = pathlib.Path(configuration_path_string)
 
     configuration = OverlayConfiguration.load(configuration_path)
+    if manifest_directory_string is not None:
+        configuration.manifest_directory = pathlib.Path(manifest_directory_string)
 
     if only_if_raw:
         if not configuration.raw(echo=click.echo):
@@ -210,27 +410,4 @@ def cli(configuration_path_string, only_if_raw):
 
         click.echo("Generated files appear to be out of date, starting cooking")
 
-    for recipe in configuration.recipes:
-        output_path = configuration.recipe_output_path(recipe=recipe)
-        click.echo(f"Creating: {os.fspath(output_path)}")
-
-        base_pmvs_path = configuration.recipe_base_pmvs_path(recipe=recipe)
-
-        overlay_pmvs_paths = configuration.recipe_overlay_pmvs_paths(
-            recipe=recipe,
-        )
-
-        all_pmvs_paths = [base_pmvs_path, *overlay_pmvs_paths]
-
-        click.echo(
-            "\n".join(f"    {os.fspath(path)}" for path in all_pmvs_paths),
-        )
-
-        result_value_set = epyqlib.pm.valuesetmodel.loadp(base_pmvs_path)
-
-        for path in overlay_pmvs_paths:
-            overlay_value_set = epyqlib.pm.valuesetmodel.loadp(path)
-            result_value_set.overlay(overlay_value_set)
-
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        result_value_set.save(path=output_path)
+    configuration.cook(jobs=jobs, force=force, echo=click.echo)
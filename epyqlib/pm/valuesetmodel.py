@@ -1,3 +1,4 @@
+import collections
 import pathlib
 
 import attr
@@ -7,6 +8,7 @@ import marshmallow
 import epyqlib.attrsmodel
 import epyqlib.nv
 import epyqlib.pm.parametermodel
+import epyqlib.pm.valuesettable
 import epyqlib.treenode
 
 
@@ -44,6 +46,26 @@ def loadp(path):
         return load(f)
 
 
+def from_table(table):
+    """Build a value set with a Qt model from a headless
+    :class:`epyqlib.pm.valuesettable.Table`."""
+
+    names = [field.name for field in attr.fields(epyqlib.pm.valuesettable.Record)]
+
+    root = Root(
+        name=table.name,
+        uuid=table.uuid,
+        children=[
+            Parameter(**{name: getattr(record, name) for name in names})
+            for record in table.records
+        ],
+    )
+    value_set = ValueSet(path=table.path)
+    _post_load(value_set, root=root)
+
+    return value_set
+
+
 def _post_load(value_set, root=None):
     if root is None:
         root = Root()
@@ -55,6 +77,28 @@ def _post_load(value_set, root=None):
         )
 
 
+def signals_by_parameter_uuid(can_root):
+    """Index the signals of the parameter query multiplexed message by the
+    UUID of the parameter they carry.  Each value is a list so ambiguity is
+    still detectable by the caller."""
+
+    (query_multiplexed_message,) = can_root.nodes_by_attribute(
+        attribute_value="Parameter Query",
+        attribute_name="name",
+    )
+
+    signals = collections.defaultdict(list)
+
+    def collect(node, _):
+        parameter_uuid = getattr(node, "parameter_uuid", None)
+        if parameter_uuid is not None:
+            signals[parameter_uuid].append(node)
+
+    query_multiplexed_message.traverse(call_this=collect, internal_nodes=True)
+
+    return signals
+
+
 def copy_parameter_data(
     value_set,
     human_names=True,
@@ -62,7 +106,12 @@ def copy_parameter_data(
     calculate_unspecified_min_max=False,
     can_root=None,
 ):
+    parameters = []
+    signals = None
+
     def traverse(node, _):
+        nonlocal signals
+
         if isinstance(node, epyqlib.pm.parametermodel.Parameter):
             if human_names:
                 name = node.name
@@ -78,14 +127,10 @@ def copy_parameter_data(
             maximum = node.maximum
 
             if calculate_unspecified_min_max and None in (minimum, maximum):
-                (query_multiplexed_message,) = can_root.nodes_by_attribute(
-                    attribute_value="Parameter Query",
-                    attribute_name="name",
-                )
-                (signal,) = query_multiplexed_message.nodes_by_attribute(
-                    attribute_value=node.uuid,
-                    attribute_name="parameter_uuid",
-                )
+                if signals is None:
+                    signals = signals_by_parameter_uuid(can_root=can_root)
+
+                (signal,) = signals.get(node.uuid, ())
 
                 calculated_minimum, calculated_maximum = signal.calculated_min_max()
 
@@ -95,7 +140,7 @@ def copy_parameter_data(
                 if maximum is None:
                     maximum = calculated_maximum
 
-            value_set.model.root.append_child(
+            parameters.append(
                 Parameter(
                     name=name,
                     parameter_uuid=node.uuid,
@@ -105,8 +150,6 @@ def copy_parameter_data(
                 ),
             )
 
-            value_set.model.root.children.sort()
-
     if base_node is None:
         base_node = value_set.parameter_model.root
 
@@ -115,6 +158,15 @@ def copy_parameter_data(
         internal_nodes=False,
     )
 
+    root = value_set.model.root
+    sort = len(root.children) > 0
+
+    # attach everything at once so the model wires up a single range
+    root.append_children(sorted(parameters))
+
+    if sort:
+        root.children.sort()
+
 
 def decimal_attrib(load_only=False, **kwargs):
     attrib = attr.ib(
@@ -244,6 +296,23 @@ class ValueSet:
             if not s.endswith("\n"):
                 f.write("\n")
 
+    def to_table(self):
+        """Create a headless :class:`epyqlib.pm.valuesettable.Table`."""
+
+        names = [field.name for field in attr.fields(epyqlib.pm.valuesettable.Record)]
+
+        return epyqlib.pm.valuesettable.Table(
+            records=[
+                epyqlib.pm.valuesettable.Record(
+                    **{name: getattr(parameter, name) for name in names}
+                )
+                for parameter in self.model.root.children
+            ],
+            name=self.model.root.name,
+            uuid=self.model.root.uuid,
+            path=self.path,
+        )
+
     def overlay(self, overlay):
         attribute_names = [
             "value",
@@ -0,0 +1,303 @@
+"""Headless reading and writing of ``.pmvs`` value set files.
+
+:func:`epyqlib.pm.valuesetmodel.loadp` builds an
+:class:`epyqlib.attrsmodel.Model` with Qt items and signal connections for
+every parameter.  Command line tools only need the data so this module
+handles the same files as plain records indexed by parameter UUID without
+importing Qt.  :meth:`Table.to_value_set` builds the model when a view needs
+it.
+"""
+
+import decimal
+import json
+import os
+import pathlib
+import uuid
+
+import attr
+
+
+root_type = "root"
+parameter_type = "parameter"
+
+
+def to_decimal_or_none(value):
+    if value is None:
+        return None
+
+    if isinstance(value, str) and len(value) == 0:
+        return None
+
+    try:
+        return decimal.Decimal(value)
+    except decimal.InvalidOperation as e:
+        raise ValueError("Invalid number: {}".format(repr(value))) from e
+
+
+def to_uuid_or_none(value):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+
+    return uuid.UUID(value)
+
+
+def decimal_to_string_or_none(value):
+    if value is None:
+        return None
+
+    return str(decimal.Decimal(str(value)))
+
+
+def uuid_to_string_or_none(value):
+    if value is None:
+        return None
+
+    return str(value)
+
+
+def identity(value):
+    return value
+
+
+def record_attrib(load_only=False, dump=identity, **kwargs):
+    return attr.ib(
+        metadata={"load_only": load_only, "dump": dump},
+        **kwargs,
+    )
+
+
+def decimal_attrib(load_only=False):
+    return record_attrib(
+        default=None,
+        converter=to_decimal_or_none,
+        load_only=load_only,
+        dump=decimal_to_string_or_none,
+    )
+
+
+@attr.s(slots=True)
+class Record:
+    """Plain counterpart of :class:`epyqlib.pm.valuesetmodel.Parameter`.
+    Fields are in the same order so sorting matches."""
+
+    name = record_attrib(default="New Parameter", converter=str)
+    value = decimal_attrib()
+    user_default = decimal_attrib(load_only=True)
+    factory_default = decimal_attrib(load_only=True)
+    minimum = decimal_attrib(load_only=True)
+    maximum = decimal_attrib(load_only=True)
+    parameter_uuid = record_attrib(
+        default=None,
+        converter=to_uuid_or_none,
+        dump=uuid_to_string_or_none,
+    )
+    readable = record_attrib(default=None)
+    writable = record_attrib(default=None)
+    uuid = record_attrib(
+        default=None,
+        converter=to_uuid_or_none,
+        load_only=True,
+        order=False,
+    )
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            **{
+                field.name: d[field.name]
+                for field in attr.fields(cls)
+                if field.name in d
+            }
+        )
+
+    def to_dict(self):
+        d = {"_type": parameter_type}
+
+        for field in attr.fields(type(self)):
+            if not field.metadata["load_only"]:
+                d[field.name] = field.metadata["dump"](getattr(self, field.name))
+
+        return d
+
+    def copy(self):
+        return attr.evolve(self)
+
+
+overlay_field_names = (
+    "value",
+    "user_default",
+    "factory_default",
+    "minimum",
+    "maximum",
+)
+
+meta_field_names = (
+    "user_default",
+    "factory_default",
+    "minimum",
+    "maximum",
+)
+
+
+@attr.s
+class Table:
+    records = attr.ib(factory=list)
+    name = attr.ib(default="Value Set")
+    uuid = attr.ib(factory=uuid.uuid4, converter=to_uuid_or_none)
+    path = attr.ib(default=None)
+    _by_parameter_uuid = attr.ib(default=None, init=False, repr=False, eq=False)
+
+    def by_parameter_uuid(self):
+        """Return a dict from parameter UUID to record, the last record wins
+        if several share a UUID."""
+
+        if self._by_parameter_uuid is None:
+            self._by_parameter_uuid = {
+                record.parameter_uuid: record for record in self.records
+            }
+
+        return self._by_parameter_uuid
+
+    def record_by_parameter_uuid(self, parameter_uuid):
+        return self.by_parameter_uuid().get(to_uuid_or_none(parameter_uuid))
+
+    def records_by_name(self, name):
+        return [record for record in self.records if record.name == name]
+
+    def append(self, record):
+        self.records.append(record)
+
+        if self._by_parameter_uuid is not None:
+            self._by_parameter_uuid[record.parameter_uuid] = record
+
+    def remove(self, records):
+        removed = {id(record) for record in records}
+        self.records = [record for record in self.records if id(record) not in removed]
+        self._by_parameter_uuid = None
+
+    def copy(self):
+        return attr.evolve(
+            self,
+            records=[record.copy() for record in self.records],
+        )
+
+    def overlay(self, overlay):
+        """Same semantics as :meth:`epyqlib.pm.valuesetmodel.ValueSet.overlay`."""
+
+        by_parameter_uuid = self.by_parameter_uuid()
+
+        for overlay_record in overlay.records:
+            base_record = by_parameter_uuid.get(overlay_record.parameter_uuid)
+            if base_record is None:
+                self.append(overlay_record.copy())
+                continue
+
+            for name in overlay_field_names:
+                value = getattr(overlay_record, name)
+                if value is not None:
+                    setattr(base_record, name, value)
+
+    def strip_common(self, reference):
+        """Same semantics as
+        :meth:`epyqlib.pm.valuesetmodel.ValueSet.strip_common`."""
+
+        reference_by_parameter_uuid = reference.by_parameter_uuid()
+
+        drop_list = []
+
+        for record in self.records:
+            reference_record = reference_by_parameter_uuid.get(
+                record.parameter_uuid,
+            )
+            if reference_record is None:
+                continue
+
+            if not record.writable or record.value is None:
+                drop_list.append(record)
+                continue
+
+            for name in meta_field_names:
+                setattr(record, name, None)
+
+            if reference_record.value == record.value:
+                drop_list.append(record)
+
+        self.remove(drop_list)
+
+    def to_dict(self):
+        return {
+            "_type": root_type,
+            "name": self.name,
+            "children": [record.to_dict() for record in sorted(self.records)],
+            "uuid": uuid_to_string_or_none(self.uuid),
+        }
+
+    def dumps(self):
+        return json.dumps(self.to_dict(), indent=4)
+
+    def save(self, path=None):
+        if path is None:
+            path = self.path
+
+        s = self.dumps()
+
+        with open(path, "w") as f:
+            f.write(s)
+
+            if not s.endswith("\n"):
+                f.write("\n")
+
+    def to_value_set(self):
+        """Build a Qt backed :class:`epyqlib.pm.valuesetmodel.ValueSet`."""
+
+        import epyqlib.pm.valuesetmodel
+
+        return epyqlib.pm.valuesetmodel.from_table(self)
+
+    @classmethod
+    def from_dict(cls, d, path=None):
+        if d.get("_type") != root_type:
+            raise ValueError(
+                "Expected {!r} but found {!r}".format(root_type, d.get("_type")),
+            )
+
+        records = [Record.from_dict(child) for child in d.get("children", ())]
+
+        kwargs = {"records": records, "path": path}
+        for name in ("name", "uuid"):
+            if name in d:
+                kwargs[name] = d[name]
+
+        return cls(**kwargs)
+
+
+def loads(s, path=None):
+    if path is not None:
+        path = pathlib.Path(path).absolute()
+
+    return Table.from_dict(json.loads(s), path=path)
+
+
+def load(f):
+    return loads(f.read(), path=f.name)
+
+
+def loadp(path):
+    with open(path) as f:
+        return load(f)
+
+
+def loadp_cached(path, cache):
+    """Load through ``cache``, a dict from resolved path to
+    ``(modification time, table)``.  A copy is returned so callers may
+    modify it."""
+
+    path = pathlib.Path(path).resolve()
+    modification_time = os.stat(path).st_mtime_ns
+
+    cached = cache.get(path)
+    if cached is None or cached[0] != modification_time:
+        cached = (modification_time, loadp(path))
+        cache[path] = cached
+
+    return cached[1].copy()
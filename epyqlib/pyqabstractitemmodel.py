@@ -2,6 +2,7 @@
 
 # TODO: """DocString if there is one"""
 
+import collections
 import weakref
 
 from epyqlib.treenode import TreeNode
@@ -11,6 +12,7 @@ from PyQt5.QtCore import (
     QAbstractItemModel,
     QVariant,
     QModelIndex,
+    QTimer,
     pyqtSignal,
     pyqtSlot,
 )
@@ -20,6 +22,98 @@ __copyright__ = "Copyright 2016, EPC Power Corp."
 __license__ = "GPLv2+"
 
 
+class ChangeCoalescer:
+    """Collects the cells changed within a tick and reports them with as few
+    dataChanged emissions as possible, one per block of contiguous rows
+    under a parent.  Every changed row is reported, shown or not, since
+    proxy models sort and filter on the data and not just the views.
+    """
+
+    def __init__(self, model, interval=16):
+        self.model = model
+
+        # keyed by identity since some nodes compare by value
+        # id(node) -> [node, first column, last column, roles or None for all]
+        self._dirty = {}
+
+        self._timer = QTimer(model)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def mark(self, node, first_column, last_column, roles):
+        roles = None if len(roles) == 0 else set(roles)
+
+        entry = self._dirty.get(id(node))
+        if entry is None:
+            self._dirty[id(node)] = [node, first_column, last_column, roles]
+        else:
+            entry[1] = min(entry[1], first_column)
+            entry[2] = max(entry[2], last_column)
+            if entry[3] is not None:
+                if roles is None:
+                    entry[3] = None
+                else:
+                    entry[3] |= roles
+
+        self._schedule()
+
+    def _schedule(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        self._timer.stop()
+
+        dirty = self._dirty
+        self._dirty = {}
+
+        parents = {}
+        by_parent = collections.defaultdict(list)
+        for node, *entry in dirty.values():
+            parent = node.tree_parent
+            if parent is None:
+                # removed from the tree since it changed
+                continue
+
+            row = self.model.index_from_node(node).row()
+            if row == -1:
+                continue
+
+            parents[id(parent)] = parent
+            by_parent[id(parent)].append((row, entry))
+
+        for parent_key, rows in by_parent.items():
+            parent_index = self.model.index_from_node(parents[parent_key])
+            rows.sort(key=lambda row_entry: row_entry[0])
+
+            block = None
+            for row, (first_column, last_column, roles) in rows:
+                if block is not None and row == block[1] + 1:
+                    block[1] = row
+                    block[2] = min(block[2], first_column)
+                    block[3] = max(block[3], last_column)
+                    if block[4] is not None:
+                        block[4] = None if roles is None else block[4] | roles
+                    continue
+
+                if block is not None:
+                    self._emit(parent_index, *block)
+
+                block = [row, row, first_column, last_column, roles]
+
+            self._emit(parent_index, *block)
+
+    def _emit(
+        self, parent_index, first_row, last_row, first_column, last_column, roles
+    ):
+        self.model.dataChanged.emit(
+            self.model.index(first_row, first_column, parent_index),
+            self.model.index(last_row, last_column, parent_index),
+            [] if roles is None else sorted(roles),
+        )
+
+
 class PyQAbstractItemModel(QAbstractItemModel):
     root_changed = pyqtSignal(TreeNode)
 
@@ -196,7 +290,7 @@ class PyQAbstractItemModel(QAbstractItemModel):
 
         parent = node.tree_parent
 
-        if parent in [None, self.root]:
+        if parent is None or parent is self.root:
             return QModelIndex()
 
         grandparent = parent.tree_parent
@@ -217,19 +311,20 @@ class PyQAbstractItemModel(QAbstractItemModel):
 
     def index_from_node(self, node):
         # TODO  make up another role for identification?
-        if node in self.index_from_node_cache:
-            index = self.index_from_node_cache[node]
-        else:
-            if node is self.root:
-                index = QModelIndex()
-            else:
-                index = self.index(
-                    row=node.tree_parent.row_of_child(node),
-                    column=0,
-                    parent=self.index_from_node(node.tree_parent),
-                )
+        if node is self.root:
+            return QModelIndex()
+
+        index = self.index_from_node_cache.get(node)
+
+        if index is None:
+            # row_of_child() is constant time so there is no need to
+            # resolve the parent index the way index() does
+            row = node.tree_parent.row_of_child(node)
+            if row == -1:
+                return QModelIndex()
 
-                self.index_from_node_cache[node] = index
+            index = self.createIndex(row, 0, node)
+            self.index_from_node_cache[node] = index
 
         return index
 
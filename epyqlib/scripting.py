@@ -1,19 +1,33 @@
+import collections
 import csv
 import decimal
 import io
 import itertools
+import logging
 import operator
 import pathlib
+import queue
+import threading
+import time
 
 import attr
+import can
 import twisted.internet
 import twisted.internet.defer
 import twisted.internet.task
+import twisted.python.failure
 
+import epyqlib.busproxy
+import epyqlib.metrics
 import epyqlib.utils.general
 import epyqlib.utils.twisted
 
 
+logger = logging.getLogger(__name__)
+
+latency_seconds = epyqlib.metrics.registry.histogram("scripting.latency")
+
+
 class TimeParseError(Exception):
     pass
 
@@ -28,6 +42,11 @@ class NoDevicesError(epyqlib.utils.general.ExpectedException):
         return "No devices found."
 
 
+class TimeOrderError(epyqlib.utils.general.ExpectedException):
+    def expected_message(self):
+        return "Script times must not decrease when streaming: {}".format(self.args[0])
+
+
 class MissingDevicesError(epyqlib.utils.general.ExpectedException):
     def expected_message(self):
         return "Unable to find devices named: {}".format(
@@ -41,13 +60,13 @@ class Event:
     action = attr.ib()
     device = attr.ib()
 
-    def resolve(self):
+    def resolve(self, cache=None):
         if self.action is pause_sentinel:
             return self
 
         return attr.evolve(
-            inst=self,
-            action=self.action.resolve(device=self.device),
+            self,
+            action=self.action.resolve(device=self.device, cache=cache),
         )
 
 
@@ -92,22 +111,35 @@ class Action:
         self.set_nv_value()
         nvs.write_all_to_device(only_these=(self.signal,))
 
-    def resolve(self, device):
-        signal = device.neo.signal_by_path(*self.signal)
-
-        # TODO: CAMPid 079320743340327834208
-        is_nv = signal.frame.id == device.nvs.set_frames[0].id
-        if is_nv:
-            print("switching", self.signal)
-            signal = device.nvs.neo.signal_by_path(*self.signal)
+    def resolve(self, device, cache=None):
+        if cache is None:
+            signal, is_nv = resolve_signal(device=device, path=self.signal)
+        else:
+            key = (device, tuple(self.signal))
+            try:
+                signal, is_nv = cache[key]
+            except KeyError:
+                signal, is_nv = resolve_signal(device=device, path=self.signal)
+                cache[key] = (signal, is_nv)
 
         return attr.evolve(
-            inst=self,
+            self,
             signal=signal,
             is_nv=is_nv,
         )
 
 
+def resolve_signal(device, path):
+    signal = device.neo.signal_by_path(*path)
+
+    # TODO: CAMPid 079320743340327834208
+    is_nv = signal.frame.id == device.nvs.set_frames[0].id
+    if is_nv:
+        signal = device.nvs.neo.signal_by_path(*path)
+
+    return signal, is_nv
+
+
 @attr.s(frozen=True)
 class CompoundAction:
     actions = attr.ib()
@@ -130,16 +162,21 @@ class CompoundAction:
                 only_these=tuple(action.signal for action in nv_actions),
             )
 
-    def resolve(self, device):
+    def resolve(self, device, cache=None):
         return attr.evolve(
-            inst=self,
-            actions=tuple(action.resolve(device=device) for action in self.actions),
+            self,
+            actions=tuple(
+                action
+                if action is pause_sentinel
+                else action.resolve(device=device, cache=cache)
+                for action in self.actions
+            ),
         )
 
 
 def compound_event_from_events(events):
     return attr.evolve(
-        inst=events[0],
+        events[0],
         action=CompoundAction(
             actions=tuple(event.action for event in events),
         ),
@@ -153,30 +190,40 @@ special_leading_characters = set("#")
 
 
 def csv_load(f, devices):
-    events = []
+    missing_device_names = set()
+
+    events = list(
+        compound_events(
+            csv_iter_events(
+                f=f,
+                devices=devices,
+                missing_device_names=missing_device_names,
+            )
+        )
+    )
 
-    lines = tuple(line.strip() for line in f.readlines())
+    if len(missing_device_names) > 0:
+        raise MissingDevicesError(missing_device_names)
 
-    device_names = None
+    return sorted(events, key=lambda event: event.time)
 
-    for line in lines:
-        if line[0] == "@":
-            s = line.split()
-            command = s[0][1:]
-            arguments = s[1:]
 
-        # add commands here if needed
+def csv_iter_events(f, devices, missing_device_names=None):
+    """Yield an event per action as the rows of ``f`` are read.  Rows for
+    unknown devices raise :class:`MissingDevicesError` unless a
+    ``missing_device_names`` set is passed to collect the names in."""
 
     device_map = {device.name: device for device in devices}
 
+    lines = (line.strip() for line in f)
     reader = csv.reader(
-        line for line in lines if line[0] not in special_leading_characters
+        line
+        for line in lines
+        if len(line) > 0 and line[0] not in special_leading_characters
     )
 
     last_event_time = 0
 
-    missing_device_names = set()
-
     for i, row in enumerate(reader):
         raw_event_time = row[0]
 
@@ -204,33 +251,32 @@ def csv_load(f, devices):
                 events_from_raw_actions(
                     device_map=device_map,
                     event_time=event_time,
-                    events=events,
                     raw_actions=raw_actions,
                 )
             )
         except MissingDevicesError as e:
+            if missing_device_names is None:
+                raise
+
             missing_device_names |= e.args[0]
             continue
 
-        events.extend(events_group)
+        yield from events_group
 
         last_event_time = event_time
 
-    events = [
-        compound_event_from_events(tuple(events))
-        for key, events in itertools.groupby(
-            iterable=events,
-            key=lambda e: (e.time, e.device),
-        )
-    ]
 
-    if len(missing_device_names) > 0:
-        raise MissingDevicesError(missing_device_names)
+def compound_events(events):
+    """Merge consecutive events sharing a time and device."""
 
-    return sorted(events, key=lambda event: event.time)
+    for key, group in itertools.groupby(
+        iterable=events,
+        key=lambda e: (e.time, e.device),
+    ):
+        yield compound_event_from_events(tuple(group))
 
 
-def events_from_raw_actions(device_map, event_time, events, raw_actions):
+def events_from_raw_actions(device_map, event_time, raw_actions):
     missing_device_names = set()
 
     for path, value in epyqlib.utils.general.grouper(raw_actions, n=2):
@@ -275,35 +321,448 @@ def csv_loadp(path, devices):
         return csv_load(f, devices)
 
 
-def run(events, pause, loop):
-    sequence = epyqlib.utils.twisted.Sequence()
+@attr.s
+class Script:
+    """Re-iterable stream of resolved events read from the text file
+    returned by ``open_file``.  Rows are read, resolved and compiled only as
+    they are consumed so long scripts start immediately and are never held
+    in memory as a whole.  Resolved signal paths are cached across
+    iterations.  Iterating requires the rows to be in time order, use
+    :meth:`check` first and :meth:`sorted_events` for scripts that are
+    not."""
+
+    open_file = attr.ib()
+    devices = attr.ib()
+    cache = attr.ib(factory=dict)
+
+    @classmethod
+    def from_string(cls, s, devices):
+        return cls(open_file=lambda: io.StringIO(s), devices=devices)
+
+    @classmethod
+    def from_path(cls, path, devices):
+        return cls(open_file=lambda: open(path), devices=devices)
+
+    def __iter__(self):
+        with self.open_file() as f:
+            last_time = None
+
+            for event in compound_events(csv_iter_events(f, self.devices)):
+                if last_time is not None and event.time < last_time:
+                    raise TimeOrderError(event.time)
+
+                last_time = event.time
+
+                yield event.resolve(cache=self.cache)
+
+    def check(self):
+        """Read and resolve the whole file, keeping only the resolved
+        signals, so errors are raised before anything is sent.  Returns
+        whether the times never decrease and the script can be streamed."""
+
+        missing_device_names = set()
+        ordered = True
+        last_time = None
+
+        with self.open_file() as f:
+            events = compound_events(
+                csv_iter_events(
+                    f,
+                    self.devices,
+                    missing_device_names=missing_device_names,
+                )
+            )
+
+            for event in events:
+                event.resolve(cache=self.cache)
+
+                if last_time is not None and event.time < last_time:
+                    ordered = False
+
+                last_time = event.time
+
+        if len(missing_device_names) > 0:
+            raise MissingDevicesError(missing_device_names)
+
+        if last_time is None:
+            raise NoEventsError()
+
+        return ordered
+
+    def sorted_events(self):
+        """Return all of the resolved events sorted by time, as
+        :func:`csv_load` does."""
+
+        with self.open_file() as f:
+            return [
+                event.resolve(cache=self.cache) for event in csv_load(f, self.devices)
+            ]
+
+
+def actions_from_event(event):
+    if isinstance(event.action, CompoundAction):
+        return event.action.actions
+
+    return (event.action,)
+
+
+@attr.s(frozen=True)
+class Slot:
+    """Everything that happens at one script time.  ``messages`` holds
+    ``(bus, proxy, message)`` with the message already packed, see
+    :func:`direct_send_target`, ``values`` the ``(signal, value)`` pairs to
+    show in the GUI and ``nv_writes`` one ``(nvs, signals)`` write per
+    device."""
+
+    time = attr.ib()
+    messages = attr.ib(default=())
+    values = attr.ib(default=())
+    nv_writes = attr.ib(default=())
+    pause = attr.ib(default=False)
+
+
+def compile_events(events, tolerance=0):
+    """Group resolved and sorted ``events`` into :class:`Slot` objects.
+    Events within ``tolerance`` seconds of the first event of a slot are
+    merged into it.  Each frame touched in a slot is packed once with the
+    values accumulated so far in the script.  Signals not set by the
+    script keep the values they had when the slot was compiled."""
+
+    return tuple(iter_slots(events=events, tolerance=tolerance))
+
+
+def iter_slots(events, tolerance=0):
+    """Lazily compile ``events`` as described in :func:`compile_events`."""
+
+    frame_values = collections.defaultdict(dict)
+    group = []
+
+    for event in events:
+        if len(group) > 0 and event.time - group[0].time > tolerance:
+            yield compile_slot(events=group, frame_values=frame_values)
+            group = []
+
+        group.append(event)
+
+    if len(group) > 0:
+        yield compile_slot(events=group, frame_values=frame_values)
+
+
+@attr.s
+class Slots:
+    """Re-iterable lazy compilation of ``events`` which must be re-iterable,
+    such as a list or :class:`Script`, for looping."""
+
+    events = attr.ib()
+    tolerance = attr.ib(default=0)
+
+    def __iter__(self):
+        return iter_slots(events=self.events, tolerance=self.tolerance)
+
+
+def direct_send_target(bus):
+    """Return ``(bus, proxy)`` with the python-can, or other, bus to write
+    to from the timing thread and the :class:`epyqlib.busproxy.BusProxy`
+    to report the send to, or ``None`` if nothing would be sent."""
+
+    if isinstance(bus, epyqlib.busproxy.BusProxy):
+        proxy = bus.direct_send_target()
+        if proxy is None:
+            return None
+
+        return proxy.bus, proxy
 
-    zero_padded = itertools.chain(
-        (Event(time=0, action=None, device=None),),
-        events,
+    return bus, None
+
+
+def compile_slot(events, frame_values):
+    sends = {}
+    values = []
+    nv_signals = collections.defaultdict(list)
+    pause = False
+
+    for event in events:
+        for action in actions_from_event(event):
+            if action is pause_sentinel:
+                pause = True
+                continue
+
+            signal = action.signal
+            values.append((signal, action.value))
+
+            if action.is_nv:
+                nv_signals[event.device.nvs].append(signal)
+                continue
+
+            frame = signal.frame
+            frame_values[frame][signal] = signal.calc_human_value(action.value)
+
+            bus = event.device.neo.bus
+            if bus is not None:
+                sends[frame] = bus
+
+    messages = []
+    for frame, bus in sends.items():
+        target = direct_send_target(bus)
+        if target is None:
+            continue
+
+        frame_value = frame_values[frame]
+        data = frame.pack(
+            frame,
+            function=lambda signal: frame_value.get(signal, signal.value),
+        )
+        message = frame.to_message(data=data)
+        # marks the message as transmitted, as BusProxy.send() does
+        message.timestamp = None
+        messages.append((*target, message))
+
+    return Slot(
+        time=float(events[0].time),
+        messages=tuple(messages),
+        values=tuple(values),
+        nv_writes=tuple((nvs, tuple(signals)) for nvs, signals in nv_signals.items()),
+        pause=pause,
+    )
+
+
+@attr.s
+class Engine:
+    """Send compiled :class:`Slot` objects from a dedicated timing thread.
+    ``slots`` may be compiled lazily, such as by :class:`Slots`, in which
+    case each slot is compiled in the time after the previous one is sent.
+    It must be re-iterable when looping.
+
+    Slot times are measured from a single start time so delays do not
+    accumulate.  The thread waits on a condition until ``spin`` seconds
+    before a slot is due and then polls the clock.  Slots are taken from
+    ``slots`` on the reactor thread, one ahead of the timing thread, since
+    compiling reads the signals the reactor thread updates.  The timing
+    thread only writes the prepacked messages to the buses and records the
+    lateness of each slot in ``latency``.  Send bookkeeping, updating the
+    signal values and NV writes happen on the reactor thread.  The
+    interface matches :class:`epyqlib.utils.twisted.Sequence` as used by
+    the scripting view.
+    """
+
+    slots = attr.ib()
+    pause_callback = attr.ib(default=None)
+    loop = attr.ib(default=False)
+    spin = attr.ib(default=0.002)
+    clock = attr.ib(default=time.perf_counter, repr=False)
+    reactor = attr.ib(default=None, repr=False)
+    latency = attr.ib(
+        default=attr.Factory(lambda: epyqlib.metrics.Histogram(name="latency")),
     )
 
-    for p, n in epyqlib.utils.general.pairwise(zero_padded):
-        if n.action is pause_sentinel:
+    paused = attr.ib(default=False, init=False)
+    run_deferred = attr.ib(default=None, init=False)
+    _start = attr.ib(default=None, init=False, repr=False)
+    _paused_at = attr.ib(default=None, init=False, repr=False)
+    _holding = attr.ib(default=False, init=False, repr=False)
+    _cancelled = attr.ib(default=False, init=False, repr=False)
+    _condition = attr.ib(factory=threading.Condition, init=False, repr=False)
+    _thread = attr.ib(default=None, init=False, repr=False)
+
+    def run(self):
+        if self.reactor is None:
+            from twisted.internet import reactor
+
+            self.reactor = reactor
+
+        self.run_deferred = twisted.internet.defer.Deferred(canceller=self._cancel)
+        self._thread = threading.Thread(
+            target=self._run,
+            name="{}-{}".format(type(self).__name__, id(self)),
+            daemon=True,
+        )
+        self._start = self.clock()
+        self._thread.start()
+
+        return self.run_deferred
+
+    def cancel(self):
+        self.run_deferred.cancel()
+
+    def pause(self):
+        with self._condition:
+            if self._paused_at is None:
+                self._paused_at = self.clock()
 
-            def action(n=n):
-                n.action()
-                pause()
+            self.paused = True
+            self._condition.notify_all()
 
-            kwargs = {}
+    def unpause(self):
+        with self._condition:
+            if self._paused_at is not None:
+                self._start += self.clock() - self._paused_at
+
+            self._paused_at = None
+            self.paused = False
+            self._holding = False
+            self._condition.notify_all()
+
+    def _cancel(self, deferred):
+        with self._condition:
+            self._cancelled = True
+            self._condition.notify_all()
+
+    def _run(self):
+        try:
+            run = True
+            while run:
+                run = self.loop
+                duration = 0
+
+                for slot in self._compiled(iter(self.slots)):
+                    if not self._wait_for(slot):
+                        return
+
+                    self._dispatch(slot)
+                    duration = slot.time
+
+                if self._cancelled:
+                    return
+
+                with self._condition:
+                    self._start += duration
+        except Exception:
+            self.reactor.callFromThread(self._finish, twisted.python.failure.Failure())
         else:
-            action = n.action
-            kwargs = dict(nvs=n.device.nvs)
+            self.reactor.callFromThread(self._finish, None)
 
-        sequence.add_delayed(
-            delay=float(n.time - p.time),
-            f=action,
-            **kwargs,
-        )
+    def _compiled(self, slots):
+        """Yield from the iterator ``slots`` while advancing it on the
+        reactor thread.  The next slot is requested as each one is yielded
+        so it compiles while the timing thread waits."""
+
+        results = queue.Queue()
+
+        def compile_next():
+            try:
+                results.put(next(slots, None))
+            except Exception:
+                results.put(twisted.python.failure.Failure())
+
+        self.reactor.callFromThread(compile_next)
 
-    sequence.run(loop=loop)
+        while True:
+            while True:
+                if self._cancelled:
+                    return
 
-    return sequence
+                try:
+                    result = results.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+
+                break
+
+            if result is None:
+                return
+
+            if isinstance(result, twisted.python.failure.Failure):
+                result.raiseException()
+
+            self.reactor.callFromThread(compile_next)
+
+            yield result
+
+    def _wait_for(self, slot):
+        with self._condition:
+            while True:
+                if self._cancelled:
+                    return False
+
+                if self.paused or self._holding:
+                    self._condition.wait()
+                    continue
+
+                remaining = self._start + slot.time - self.clock()
+                if remaining <= self.spin:
+                    break
+
+                self._condition.wait(remaining - self.spin)
+
+        while self.clock() < self._start + slot.time:
+            time.sleep(0)
+
+        return True
+
+    def _dispatch(self, slot):
+        lateness = self.clock() - (self._start + slot.time)
+
+        errors = []
+        for bus, _, message in slot.messages:
+            try:
+                bus.send(message)
+            except can.CanError as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+
+        self.latency.record(lateness)
+        if epyqlib.metrics.enabled:
+            latency_seconds.record(lateness)
+
+        if slot.pause:
+            with self._condition:
+                self._holding = True
+                self._paused_at = self.clock()
+
+        self.reactor.callFromThread(self._apply, slot, errors)
+
+    def _apply(self, slot, errors):
+        for (bus, proxy, message), error in zip(slot.messages, errors):
+            if proxy is None:
+                if error is not None:
+                    logger.warning("Unable to send %s: %s", message, error)
+            elif proxy.bus is bus:
+                proxy.direct_sent(message, error=error)
+
+        if self._cancelled:
+            return
+
+        for signal, value in slot.values:
+            signal.set_human_value(value)
+
+        for nvs, signals in slot.nv_writes:
+            nvs.write_all_to_device(only_these=signals)
+
+        if slot.pause:
+            if self.pause_callback is None:
+                self.pause()
+            else:
+                self.pause_callback()
+
+    def _finish(self, failure):
+        snapshot = self.latency.snapshot()
+        if snapshot["count"] > 0:
+            logger.info(
+                "Script slot latency p50 %s s, p99 %s s, maximum %s s",
+                snapshot["p50"],
+                snapshot["p99"],
+                snapshot["maximum"],
+            )
+
+        if self.run_deferred.called:
+            return
+
+        if failure is None:
+            self.run_deferred.callback(None)
+        else:
+            self.run_deferred.errback(failure)
+
+
+def run(events, pause, loop):
+    engine = Engine(
+        slots=Slots(events=events),
+        pause_callback=pause,
+        loop=loop,
+    )
+    engine.run()
+
+    return engine
 
 
 @attr.s
@@ -323,11 +782,14 @@ class Model:
         if len(devices) == 0:
             raise NoDevicesError()
 
-        events = csv_loads(event_string, devices)
-
-        if len(events) == 0:
-            raise NoEventsError()
+        script = Script.from_string(event_string, devices)
 
-        events = [event.resolve() for event in events]
+        # a cheap pass over the whole script so errors are reported before
+        # anything is sent, only the resolved signals are kept
+        if script.check():
+            events = script
+        else:
+            # relative times may step backwards, order them as always
+            events = script.sorted_events()
 
         return run(events=events, pause=pause, loop=loop)
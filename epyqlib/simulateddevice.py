@@ -0,0 +1,562 @@
+"""A simulated device that answers NV and CCP requests on a CAN bus.
+
+The simulator loads the same ``.epc`` or ``.sym`` definitions as the host
+tools and then listens on a python-can bus, normally the ``virtual``
+interface or a ``vcan`` socketcan channel.  It replies to multiplexed NV
+set/status requests, to the CCP commands used for flashing and memory
+upload and it transmits the cyclic process frames.  Response latency,
+jitter and loss are configurable so protocol paths can be exercised and
+benchmarked without hardware.
+
+Everything runs on a private receive thread and a private timing thread.
+No Qt event loop or twisted reactor is needed on the simulator side.
+"""
+
+import collections
+import functools
+import heapq
+import logging
+import math
+import pathlib
+import random
+import threading
+import time
+
+import attr
+import can
+import canmatrix.formats
+
+import epyqlib.canneo
+import epyqlib.device
+import epyqlib.hildevice
+import epyqlib.nv
+import epyqlib.twisted.cancalibrationprotocol as ccp
+import epyqlib.updateepc
+
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Run callables at monotonic times on a single worker thread."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._queue = []
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+
+            self._running = True
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name="{}-{}".format(type(self).__name__, id(self)),
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._queue.clear()
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def call_at(self, when, function, *args):
+        with self._condition:
+            # the counter keeps equal times in submission order and avoids
+            # ever comparing the callables
+            heapq.heappush(self._queue, (when, self._counter, function, args))
+            self._counter += 1
+            self._condition.notify()
+
+    def call_later(self, delay, function, *args):
+        self.call_at(self.clock() + delay, function, *args)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    if len(self._queue) == 0:
+                        self._condition.wait()
+                        continue
+
+                    remaining = self._queue[0][0] - self.clock()
+                    if remaining <= 0:
+                        break
+
+                    self._condition.wait(timeout=remaining)
+
+                if not self._running:
+                    return
+
+                _, _, function, args = heapq.heappop(self._queue)
+
+            try:
+                function(*args)
+            except Exception:
+                logger.exception("Simulated device scheduled call failed")
+
+
+@attr.s
+class Statistics:
+    nv_reads = attr.ib(default=0)
+    nv_writes = attr.ib(default=0)
+    ccp_commands = attr.ib(default=0)
+    cyclic_frames = attr.ib(default=0)
+    dropped = attr.ib(default=0)
+    sent = attr.ib(default=0)
+
+
+@attr.s
+class _Listener(can.Listener):
+    receiver = attr.ib()
+
+    def on_message_received(self, msg):
+        self.receiver(msg)
+
+
+def _default_raw(signal, meta):
+    if meta == epyqlib.nv.MetaEnum.minimum and signal.min is not None:
+        value = signal.from_human(signal.min)
+    elif meta == epyqlib.nv.MetaEnum.maximum and signal.max is not None:
+        value = signal.from_human(signal.max)
+    else:
+        value = signal.default_value
+
+    if value is None:
+        value = 0
+
+    return min(max(int(value), signal.raw_minimum), signal.raw_maximum)
+
+
+@attr.s
+class SimulatedDevice:
+    """Simulate a device on the passed python-can bus.
+
+    Build instances with :meth:`from_definition_path` or
+    :meth:`from_symbol_path` then :meth:`start` them, or use them as
+    a context manager.
+    """
+
+    neo = attr.ib()
+    nvs = attr.ib()
+    bus = attr.ib()
+    latency = attr.ib(default=0)
+    jitter = attr.ib(default=0)
+    loss = attr.ib(default=0)
+    cyclic = attr.ib(default=True)
+    ccp_tx_id = attr.ib(default=ccp.bootloader_can_id)
+    ccp_rx_id = attr.ib(default=ccp.bootloader_can_id)
+    ccp_endianness = attr.ib(default="little")
+    seed = attr.ib(default=None)
+    statistics = attr.ib(default=attr.Factory(Statistics))
+    memory = attr.ib(default=attr.Factory(lambda: collections.defaultdict(bytearray)))
+    scheduler = attr.ib(default=attr.Factory(Scheduler))
+
+    def __attrs_post_init__(self):
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._notifier = None
+
+        self._set_frame_id = None
+        self._set_mux_frame = None
+        self._read_value = None
+        self.nv_values = {}
+
+        if self.nvs is not None:
+            set_frame = self.nvs.set_frames[0]
+            self._set_frame_id = (set_frame.id, set_frame.extended)
+            self._set_mux_frame = set_frame.mux_frame
+            (self._read_value,) = (
+                key
+                for key, value in set_frame.read_write.enumeration.items()
+                if value == "Read"
+            )
+
+            for frame in self.nvs.set_frames.values():
+                for signal in getattr(frame, "parameter_signals", ()):
+                    for meta in epyqlib.nv.MetaEnum:
+                        self.nv_values[meta, signal] = _default_raw(
+                            signal=signal,
+                            meta=meta,
+                        )
+
+        self.signal_values = {}
+
+        self.cyclic_frames = tuple(
+            frame
+            for frame in self.neo.frames
+            if frame.receivable
+            and frame.cycle_time is not None
+            and frame.mux_name is None
+            and not hasattr(frame, "multiplex_frames")
+        )
+
+        self._ccp_connected = False
+        self._mta = (0, 0)
+
+    @classmethod
+    def from_definition_path(cls, path, bus, **kwargs):
+        """Load the simulated device from a ``.epc`` definition."""
+
+        with epyqlib.updateepc.updated(pathlib.Path(path)) as updated:
+            definition = epyqlib.hildevice.Definition.loadp(updated)
+            matrix = definition.load_can()
+
+        return cls.from_matrix(
+            matrix=matrix,
+            bus=bus,
+            nv_configuration=definition.nv_configuration,
+            node_id_type=definition.node_id_type,
+            node_id=definition.node_id,
+            controller_id=definition.controller_id,
+            **kwargs,
+        )
+
+    @classmethod
+    def from_symbol_path(cls, path, bus, **kwargs):
+        """Load the simulated device from a ``.sym`` file."""
+
+        (matrix,) = canmatrix.formats.loadp(
+            str(path),
+            symImportEncoding="utf-8",
+        ).values()
+
+        return cls.from_matrix(matrix=matrix, bus=bus, **kwargs)
+
+    @classmethod
+    def from_matrix(
+        cls,
+        matrix,
+        bus,
+        nv_configuration="j1939",
+        node_id_type="j1939",
+        node_id=247,
+        controller_id=65,
+        **kwargs,
+    ):
+        node_id_adjust = functools.partial(
+            epyqlib.device.node_id_types[node_id_type],
+            device_id=node_id,
+            controller_id=controller_id,
+        )
+
+        neo = epyqlib.canneo.Neo(
+            matrix=matrix,
+            node_id_adjust=node_id_adjust,
+        )
+
+        try:
+            nvs = epyqlib.nv.Nvs(
+                neo=epyqlib.canneo.Neo(
+                    matrix=matrix,
+                    frame_class=epyqlib.nv.Frame,
+                    signal_class=epyqlib.nv.Nv,
+                    strip_summary=False,
+                    node_id_adjust=node_id_adjust,
+                ),
+                configuration=nv_configuration,
+            )
+        except epyqlib.nv.NoNv:
+            nvs = None
+
+        ccp_tx_frame = neo.frame_by_name("CCP")
+        ccp_rx_frame = neo.frame_by_name("CCPResponse")
+        if ccp_tx_frame is not None and ccp_rx_frame is not None:
+            kwargs.setdefault("ccp_tx_id", ccp_tx_frame.id)
+            kwargs.setdefault("ccp_rx_id", ccp_rx_frame.id)
+            kwargs.setdefault(
+                "ccp_endianness",
+                "little" if ccp_tx_frame.signals[0].little_endian else "big",
+            )
+
+        return cls(neo=neo, nvs=nvs, bus=bus, **kwargs)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        self.scheduler.start()
+
+        if self.cyclic:
+            now = self.scheduler.clock()
+            for index, frame in enumerate(self.cyclic_frames):
+                period = frame.cycle_time / 1000
+                # spread the first transmissions out over the period
+                offset = period * index / max(1, len(self.cyclic_frames))
+                self.scheduler.call_at(now + offset, self._send_cyclic, frame, period)
+
+        self._notifier = can.Notifier(
+            bus=self.bus,
+            listeners=[_Listener(receiver=self.message_received)],
+            timeout=0.05,
+        )
+
+    def stop(self):
+        if self._notifier is not None:
+            self._notifier.stop()
+            self._notifier = None
+
+        self.scheduler.stop()
+
+    def set_signal(self, path, value):
+        """Set a cyclic signal by path to a human (scaled) value."""
+
+        signal = self.neo.signal_by_path(*path)
+        with self._lock:
+            self.signal_values[signal] = signal.from_human(value)
+
+    def nv_value(self, nv, meta=epyqlib.nv.MetaEnum.value):
+        """Get the present human value of an NV by either side's object."""
+
+        with self._lock:
+            return nv.to_human(self.nv_values[meta, self._local_nv(nv)])
+
+    def load_memory(self, address_extension, address, data):
+        """Place ``data`` in simulated memory at the word ``address``."""
+
+        with self._lock:
+            self._write_memory(address_extension, address * 2, data)
+
+    def _local_nv(self, nv):
+        if (epyqlib.nv.MetaEnum.value, nv) in self.nv_values:
+            return nv
+
+        return self.nvs.signal_from_names(nv.frame.mux_name, nv.name)
+
+    def _send_cyclic(self, frame, period):
+        with self._lock:
+            data = frame.pack(
+                frame,
+                function=lambda signal: self.signal_values.get(signal, signal.value),
+            )
+
+        self.statistics.cyclic_frames += 1
+        self._send(frame.to_message(data=data))
+        self.scheduler.call_later(period, self._send_cyclic, frame, period)
+
+    def _send(self, message):
+        try:
+            self.bus.send(message)
+        except can.CanError:
+            logger.exception("Simulated device failed to send")
+        else:
+            self.statistics.sent += 1
+
+    def _respond(self, messages):
+        if self.loss > 0 and self._random.random() < self.loss:
+            self.statistics.dropped += 1
+            return
+
+        delay = self.latency
+        if self.jitter > 0:
+            delay += self._random.uniform(0, self.jitter)
+
+        for message in messages:
+            if delay > 0:
+                self.scheduler.call_later(delay, self._send, message)
+            else:
+                self._send(message)
+
+    def message_received(self, msg):
+        identifier = (msg.arbitration_id, bool(msg.is_extended_id))
+
+        if identifier == self._set_frame_id:
+            responses = self._handle_nv(msg)
+        elif msg.arbitration_id == self.ccp_tx_id and msg.is_extended_id:
+            if msg.data[0] == 0xFF:
+                # a reply, presumably our own echoed back
+                return
+
+            responses = self._handle_ccp(msg)
+        else:
+            return
+
+        if len(responses) > 0:
+            self._respond(responses)
+
+    def _handle_nv(self, msg):
+        data = bytes(msg.data)
+        ((_, mux_value),) = self._set_mux_frame.unpack(
+            data,
+            only_return=True,
+        ).items()
+
+        set_frame = self.nvs.set_frames.get(mux_value)
+        status_frame = self.nvs.status_frames.get(mux_value)
+        if set_frame is None or status_frame is None:
+            return []
+
+        request = set_frame.unpack(data, only_return=True)
+
+        read_write = request[set_frame.read_write]
+        read = read_write == self._read_value
+
+        meta = epyqlib.nv.MetaEnum.value
+        if set_frame.meta_signal is not None:
+            meta = epyqlib.nv.MetaEnum(request[set_frame.meta_signal])
+
+        parameter_signals = getattr(set_frame, "parameter_signals", ())
+
+        with self._lock:
+            if read:
+                self.statistics.nv_reads += 1
+            else:
+                self.statistics.nv_writes += 1
+                for signal in parameter_signals:
+                    self.nv_values[meta, signal] = request[signal]
+
+            values = []
+            for signal in status_frame.signals:
+                set_signal = getattr(signal, "set_signal", None)
+
+                if signal.multiplex is True:
+                    value = mux_value
+                elif signal is status_frame.read_write:
+                    value = read_write
+                elif signal is status_frame.meta_signal:
+                    value = meta
+                elif set_signal is not None and set_signal.frame is set_frame:
+                    value = self.nv_values[meta, set_signal]
+                else:
+                    value = 0
+
+                values.append(int(value))
+
+        return [status_frame.to_message(data=status_frame.pack(tuple(values)))]
+
+    def _reply(self, command, status=ccp.CommandStatus.acknowledge, payload=()):
+        reply = ccp.BootloaderReply(
+            code=status,
+            arbitration_id=self.ccp_rx_id,
+        )
+        reply.message.data[0] = 0xFF
+        reply.command_counter = command.command_counter
+        payload = bytes(payload)
+        reply.payload[0 : len(payload)] = payload
+
+        return reply.message
+
+    def _write_memory(self, address_extension, offset, data):
+        memory = self.memory[address_extension]
+        end = offset + len(data)
+        if len(memory) < end:
+            memory.extend(b"\xFF" * (end - len(memory)))
+        memory[offset:end] = data
+
+    def _read_memory(self, address_extension, offset, length):
+        memory = self.memory[address_extension]
+        data = bytes(memory[offset : offset + length])
+
+        return data + b"\xFF" * (length - len(data))
+
+    def _handle_ccp(self, msg):
+        command = ccp.Packet.from_message(message=msg)
+        try:
+            code = command.command_code
+        except ValueError:
+            return [self._reply(command, status=ccp.CommandStatus.unknown_command)]
+
+        self.statistics.ccp_commands += 1
+        payload = command.payload
+
+        if code == ccp.CommandCode.connect:
+            self._ccp_connected = True
+            dsp = ccp.DspCode._28335
+            return [self._reply(command, payload=(1, 0, dsp >> 8, dsp & 0xFF))]
+
+        if not self._ccp_connected:
+            return [self._reply(command, status=ccp.CommandStatus.access_denied)]
+
+        with self._lock:
+            if code == ccp.CommandCode.disconnect:
+                self._ccp_connected = False
+            elif code == ccp.CommandCode.set_mta:
+                address = int.from_bytes(bytes(payload[2:6]), self.ccp_endianness)
+                self._mta = (payload[1], address * 2)
+            elif code in (ccp.CommandCode.download, ccp.CommandCode.download_6):
+                if code == ccp.CommandCode.download:
+                    length = payload[0]
+                    swapped = bytes(payload[1 : length + 1])
+                else:
+                    swapped = bytes(payload[0:6])
+
+                data = bytes(ccp.endianness_swap_2byte(swapped))
+                extension, offset = self._mta
+                self._write_memory(extension, offset, data)
+                self._mta = (extension, offset + len(data))
+            elif code == ccp.CommandCode.upload:
+                length = payload[0]
+                extension, offset = self._mta
+                data = self._read_memory(extension, offset, length)
+                self._mta = (extension, offset + length)
+
+                chunks = math.ceil(length / 5)
+                return [
+                    self._reply(command, payload=data[5 * i : 5 * (i + 1)])
+                    for i in range(chunks)
+                ]
+            elif code == ccp.CommandCode.clear_memory:
+                extension, _ = self._mta
+                self.memory[extension].clear()
+            elif code in (ccp.CommandCode.build_checksum, ccp.CommandCode.unlock):
+                pass
+            else:
+                return [self._reply(command, status=ccp.CommandStatus.unknown_command)]
+
+        return [self._reply(command)]
+
+
+@attr.s
+class ReactorTransport(can.Listener):
+    """Connect a twisted protocol directly to a python-can bus.
+
+    This provides the transport interface of
+    :class:`epyqlib.twisted.busproxy.BusProxy` without a Qt event loop so
+    protocols can be driven against a simulated device from plain twisted
+    code such as tests and benchmarks.
+    """
+
+    protocol = attr.ib()
+    bus = attr.ib()
+    reactor = attr.ib(default=None)
+
+    def __attrs_post_init__(self):
+        if self.reactor is None:
+            from twisted.internet import reactor
+
+            self.reactor = reactor
+
+        self.protocol.makeConnection(self)
+        self._notifier = can.Notifier(bus=self.bus, listeners=[self], timeout=0.05)
+
+    def on_message_received(self, msg):
+        self.reactor.callFromThread(self.protocol.dataReceived, msg)
+
+    def write(self, message):
+        try:
+            self.bus.send(message)
+        except can.CanError:
+            return False
+
+        return True
+
+    write_passive = write
+
+    def terminate(self):
+        self._notifier.stop()
@@ -1,13 +1,15 @@
 import inspect
+import json
+import os
 import pickle
-import time
 from collections import Callable
 from datetime import datetime
 from os import path
-from typing import Union
+from typing import List, Union
 
 import attr
 
+from epyqlib.tabs.files.files_utils import open_database
 from epyqlib.tabs.files.sync_config import SyncConfig
 
 
@@ -88,16 +90,47 @@ class Event:
 
 
 class ActivityLog:
+    """
+    Events waiting to be sent to the server. Each is committed to the
+    database as it is added or removed, the in memory list mirrors the
+    database for the current session.
+    """
+
     _instance = None
+    _tag = "[Activity Log]"
 
     def __init__(self, file_dir=None):
         file_dir = file_dir or SyncConfig.get_instance().config_dir
 
+        ## Pickled list of events written by older versions, imported once
         self._cache_file = path.join(file_dir, "activity-cache.json")
+        self._database_file = path.join(file_dir, "activity-cache.sqlite")
 
         self._activity_cache: [Event] = []
+        self._row_ids: List[int] = []
         self._listeners = []
-        self._last_write_time = 0
+
+        self._database = open_database(self._database_file)
+        with self._database:
+            self._database.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    inverter_id TEXT,
+                    user_id TEXT,
+                    type TEXT NOT NULL,
+                    details TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    serial_number TEXT,
+                    file_hash TEXT
+                );
+                CREATE INDEX IF NOT EXISTS events_serial_number
+                    ON events (serial_number);
+                CREATE INDEX IF NOT EXISTS events_file_hash ON events (file_hash);
+                """
+            )
+
+        self._import_pickle_file()
 
     @staticmethod
     def get_instance():
@@ -106,6 +139,9 @@ class ActivityLog:
             ActivityLog._instance._read_cache_file()
         return ActivityLog._instance
 
+    def close(self):
+        self._database.close()
+
     ## Managing listeners
     def register_listener(self, listener: Callable):
         self._listeners.append(listener)
@@ -122,16 +158,24 @@ class ActivityLog:
 
     ## Adding and removing events
     async def add(self, event: Event):
-        self._activity_cache.append(event)
+        with self._database:
+            row_id = self._insert(event)
 
-        cache_write = self._write_cache_file()
+        self._activity_cache.append(event)
+        self._row_ids.append(row_id)
 
         await self._notify_listeners(event)
 
-        await cache_write
-
     def remove(self, event: Event):
-        self._activity_cache.remove(event)
+        index = self._activity_cache.index(event)
+
+        with self._database:
+            self._database.execute(
+                "DELETE FROM events WHERE id = ?", (self._row_ids[index],)
+            )
+
+        del self._activity_cache[index]
+        del self._row_ids[index]
 
     ## Reading events
     def has_cached_events(self):
@@ -143,25 +187,76 @@ class ActivityLog:
 
         return self._activity_cache[0]
 
+    def events_for_serial_number(self, serial_number: str) -> List[Event]:
+        return self._select("serial_number", serial_number)
+
+    def events_for_file_hash(self, file_hash: str) -> List[Event]:
+        return self._select("file_hash", file_hash)
+
     ## Cache file management
-    def _read_cache_file(self):
-        if path.exists(self._cache_file):
-            with open(self._cache_file, "rb") as cache:
-                cached_events = pickle.load(cache)
-                if not isinstance(cached_events, list):
-                    raise Exception(
-                        f"Error reading from {self._cache_file}. Not a pickle file with a list as the root."
-                    )
-                self._activity_cache = cached_events + self._activity_cache
-
-    async def _write_cache_file(self):
-        now = time.time()
-
-        if self._last_write_time + 1 > now:
-            # Don't write more often than once/sec
+    def _insert(self, event: Event) -> int:
+        cursor = self._database.execute(
+            "INSERT INTO events"
+            " (inverter_id, user_id, type, details, timestamp, serial_number, file_hash)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                event.inverter_id,
+                event.user_id,
+                event.type,
+                json.dumps(event.details),
+                event.timestamp,
+                event.details.get("serialNumber"),
+                event.details.get("fileHash"),
+            ),
+        )
+
+        return cursor.lastrowid
+
+    @staticmethod
+    def _event_from_row(row) -> Event:
+        return Event(
+            inverter_id=row["inverter_id"],
+            user_id=row["user_id"],
+            type=row["type"],
+            details=json.loads(row["details"]),
+            timestamp=row["timestamp"],
+        )
+
+    def _select(self, column: str, value: str) -> List[Event]:
+        rows = self._database.execute(
+            f"SELECT * FROM events WHERE {column} = ? ORDER BY id", (value,)
+        )
+
+        return [self._event_from_row(row) for row in rows]
+
+    def _import_pickle_file(self):
+        if not path.exists(self._cache_file):
             return
 
-        self._last_write_time = now
+        print(f"{self._tag} Importing {self._cache_file}")
+        with open(self._cache_file, "rb") as cache:
+            cached_events = pickle.load(cache)
+            if not isinstance(cached_events, list):
+                raise Exception(
+                    f"Error reading from {self._cache_file}. Not a pickle file with a list as the root."
+                )
 
-        with open(self._cache_file, "wb") as file_ref:
-            pickle.dump(self._activity_cache, file_ref)
+        with self._database:
+            for event in cached_events:
+                self._insert(event)
+
+        os.replace(self._cache_file, self._cache_file + ".imported")
+
+    def _read_cache_file(self):
+        """Load the events left over from earlier sessions."""
+        known = set(self._row_ids)
+        rows = [
+            row
+            for row in self._database.execute("SELECT * FROM events ORDER BY id")
+            if row["id"] not in known
+        ]
+
+        self._activity_cache = [
+            self._event_from_row(row) for row in rows
+        ] + self._activity_cache
+        self._row_ids = [row["id"] for row in rows] + self._row_ids
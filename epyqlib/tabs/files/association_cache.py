@@ -3,7 +3,7 @@ import os
 
 from typing import List, Dict, Set
 
-from epyqlib.tabs.files.files_utils import ensure_dir
+from epyqlib.tabs.files.files_utils import ensure_dir, open_database
 
 
 class AssociationCache:
@@ -13,10 +13,12 @@ class AssociationCache:
 
     def __init__(self, files_dir: str):
         self._cache_dir = os.path.join(files_dir, "")
+        ## Only read to import caches written by older versions
         self._cache_file = os.path.join(self._cache_dir, "associations-cache.json")
+        self._database_file = os.path.join(self._cache_dir, "associations-cache.sqlite")
         ensure_dir(self._cache_dir)
 
-        self._associations: Dict[str, List] = {}
+        self._database = None
 
     @staticmethod
     def get_instance():
@@ -31,40 +33,115 @@ class AssociationCache:
         return AssociationCache._instance
 
     def _init(self):
-        self._read_file()
-
-    def _read_file(self):
-        if os.path.exists(self._cache_file):
-            with open(self._cache_file, "r") as cache_file:
-                self._associations = json.load(cache_file)
-
-    def _write_file(self):
-        with open(self._cache_file, "w") as cache_file:
-            json.dump(self._associations, cache_file, indent=2)
+        self._database = open_database(self._database_file)
+        with self._database:
+            self._database.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS serial_numbers (
+                    serial_number TEXT PRIMARY KEY
+                );
+                CREATE TABLE IF NOT EXISTS associations (
+                    serial_number TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    file_hash TEXT,
+                    file_type TEXT,
+                    association TEXT NOT NULL,
+                    PRIMARY KEY (serial_number, position)
+                );
+                CREATE INDEX IF NOT EXISTS associations_file_hash
+                    ON associations (file_hash);
+                """
+            )
+
+        self._import_json_file()
+
+    def _import_json_file(self):
+        if not os.path.exists(self._cache_file):
+            return
+
+        print(f"{self._tag} Importing {self._cache_file}")
+        with open(self._cache_file, "r") as cache_file:
+            associations: Dict[str, List] = json.load(cache_file)
+
+        with self._database:
+            for serial_number, association_list in associations.items():
+                self._put_associations(serial_number, association_list)
+
+        os.replace(self._cache_file, self._cache_file + ".imported")
+
+    def close(self):
+        self._database.close()
 
     def clear(self):
-        self._associations = {}
-        if os.path.exists(self._cache_file):
-            os.unlink(self._cache_file)
+        with self._database:
+            self._database.execute("DELETE FROM associations")
+            self._database.execute("DELETE FROM serial_numbers")
 
     def get_associations(self, serial_number: str) -> List:
-        return self._associations.get(serial_number)
+        known = self._database.execute(
+            "SELECT 1 FROM serial_numbers WHERE serial_number = ?",
+            (serial_number,),
+        ).fetchone()
+        if known is None:
+            return None
+
+        rows = self._database.execute(
+            "SELECT association FROM associations"
+            " WHERE serial_number = ? ORDER BY position",
+            (serial_number,),
+        )
+        return [json.loads(row["association"]) for row in rows]
+
+    def get_associations_for_hash(self, hash: str) -> Dict[str, List]:
+        """Map each serial number with the file to its associations with it."""
+        rows = self._database.execute(
+            "SELECT serial_number, association FROM associations"
+            " WHERE file_hash = ? ORDER BY serial_number, position",
+            (hash,),
+        )
+
+        associations = {}
+        for row in rows:
+            associations.setdefault(row["serial_number"], []).append(
+                json.loads(row["association"])
+            )
+
+        return associations
 
     def put_associations(self, serial_number: str, associations: List):
-        self._associations[serial_number] = associations
-        self._write_file()
+        # Only this serial number's rows are rewritten, in a single transaction
+        with self._database:
+            self._put_associations(serial_number, associations)
+
+    def _put_associations(self, serial_number: str, associations: List):
+        self._database.execute(
+            "DELETE FROM associations WHERE serial_number = ?", (serial_number,)
+        )
+        self._database.execute(
+            "INSERT OR IGNORE INTO serial_numbers VALUES (?)", (serial_number,)
+        )
+
+        rows = []
+        for position, association in enumerate(associations):
+            file = association.get("file") or {}
+            rows.append(
+                (
+                    serial_number,
+                    position,
+                    file.get("hash"),
+                    file.get("type"),
+                    json.dumps(association),
+                )
+            )
+
+        self._database.executemany(
+            "INSERT INTO associations VALUES (?, ?, ?, ?, ?)", rows
+        )
 
     def get_all_known_file_hashes(self) -> Set[str]:
-        hashes = set()
-
-        for serial, association_list in self._associations.items():
-            for association in association_list:
-                if association["file"] is None:
-                    continue
-
-                if association["file"]["type"] == "Log":
-                    continue
-
-                hashes.add(association["file"]["hash"])
+        rows = self._database.execute(
+            "SELECT DISTINCT file_hash FROM associations"
+            " WHERE file_hash IS NOT NULL AND file_type IS NOT 'Log'"
+        )
 
-        return hashes
+        return {row["file_hash"] for row in rows}
@@ -1,8 +1,23 @@
+import itertools
+import os
+
+import twisted.internet.defer
+
+import epyqlib.utils.twisted
 from epyqlib.tabs.files.aws_login_manager import AwsLoginManager
+from epyqlib.tabs.files.files_utils import partial_suffix
 from epyqlib.tabs.files.sync_config import SyncConfig
+from epyqlib.utils.twisted import raise_if_cancelled
 
 
 class BucketManager:
+    """
+    All S3 calls block so they are run on a dedicated worker pool and every
+    public method returns once the pool is done. Transfers are streamed in
+    `_part_size` pieces so memory use doesn't grow with the file size, and
+    can be cancelled by cancelling the awaiting Deferred.
+    """
+
     _bucket_names = {
         "internal": "epc-files-internal-203222013089",
         "client": "epc-files-client-203222013089",
@@ -10,23 +25,61 @@ class BucketManager:
     _bucket_name = _bucket_names[SyncConfig.get_env()]
     _logs_path = "logs/"
     _tag = "[Bucket Manager]"
+    _chunk_size = 1024 * 1024
+    ## S3 requires all but the last part of a multipart upload to be >= 5 MiB
+    _part_size = 8 * 1024 * 1024
+    _multipart_threshold = 8 * 1024 * 1024
 
-    def __init__(self):
+    def __init__(self, s3_client=None, pool: epyqlib.utils.twisted.WorkerPool = None):
         self._aws = AwsLoginManager.get_instance()
+        self._s3_client = s3_client
+        if pool is None:
+            pool = epyqlib.utils.twisted.WorkerPool(name="bucket-manager")
+        self._pool = pool
         self._uploaded_logs: set[str] = None
 
-    async def download_file(self, hash: str, filename: str):
-        return await self._download(filename, "files/" + hash)
+    def _client(self):
+        if self._s3_client is not None:
+            return self._s3_client
+
+        # Clients, unlike resources, are safe to share between threads
+        return self._aws.get_s3_resource().meta.client
+
+    def _reporter(self, progress):
+        from twisted.internet import reactor
 
-    async def download_log(self, hash: str, filename: str):
+        def report(count: int):
+            if progress is not None:
+                reactor.callFromThread(progress, count)
+
+        return report
+
+    async def download_file(self, hash: str, filename: str, progress=None):
+        return await self._download(filename, "files/" + hash, progress)
+
+    async def download_log(self, hash: str, filename: str, progress=None):
         # Is it really worth it to have logs in a separate folder...?
-        return await self._download(filename, "logs/" + hash)
+        return await self._download(filename, "logs/" + hash, progress)
 
-    async def _download(self, filename: str, key: str):
+    async def _download(self, filename: str, key: str, progress=None):
+        """
+        Download to `filename` + `partial_suffix` and rename once complete.
+        A partial file left by an earlier failed or cancelled attempt is
+        resumed. `progress` is called in the reactor thread with the number
+        of bytes received.
+        """
         try:
-            bucket = self._aws.get_s3_resource().Bucket(self._bucket_name)
-            bucket.download_file(Filename=filename, Key=key)
+            await self._pool.run(
+                self._download_blocking,
+                self._client(),
+                key,
+                filename,
+                self._reporter(progress),
+            )
             print(f"{self._tag} Finished downloading {key}")
+        except twisted.internet.defer.CancelledError:
+            print(f"{self._tag} Cancelled downloading {key}")
+            raise
         except Exception as ex:
             import sys
 
@@ -37,14 +90,51 @@ class BucketManager:
             sys.stderr.write(error_message)
             raise Exception(error_message)
 
-    async def upload_log(self, source_path: str, dest_filename: str):
+    def _download_blocking(self, cancelled, client, key: str, filename: str, report):
+        part = filename + partial_suffix
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+
+        size = client.head_object(Bucket=self._bucket_name, Key=key)["ContentLength"]
+        if offset > size:
+            offset = 0
+        elif offset > 0:
+            print(f"{self._tag} Resuming {key} at byte {offset}")
+
+        with open(part, "ab" if offset > 0 else "wb") as file:
+            while offset < size:
+                raise_if_cancelled(cancelled)
+
+                end = min(offset + self._part_size, size) - 1
+                response = client.get_object(
+                    Bucket=self._bucket_name,
+                    Key=key,
+                    Range=f"bytes={offset}-{end}",
+                )
+
+                for chunk in response["Body"].iter_chunks(self._chunk_size):
+                    raise_if_cancelled(cancelled)
+                    file.write(chunk)
+                    offset += len(chunk)
+                    report(len(chunk))
+
+        os.replace(part, filename)
+
+    async def upload_log(self, source_path: str, dest_filename: str, progress=None):
         print(f"{self._tag} Starting to upload log {dest_filename}")
 
         # TODO: Figure out if logs should really be uploaded to their own folder
-        with open(source_path, "rb") as source_file:
-            s3_resource = self._aws.get_s3_resource()
-            bucket = s3_resource.Bucket(self._bucket_name)
-            bucket.put_object(Key=self._logs_path + dest_filename, Body=source_file)
+        key = self._logs_path + dest_filename
+        try:
+            await self._pool.run(
+                self._upload_blocking,
+                self._client(),
+                source_path,
+                key,
+                self._reporter(progress),
+            )
+        except twisted.internet.defer.CancelledError:
+            print(f"{self._tag} Cancelled upload of log {dest_filename}")
+            raise
 
         print(f"{self._tag} Finished upload of log {dest_filename}")
         if self._uploaded_logs is not None:
@@ -52,20 +142,86 @@ class BucketManager:
                 dest_filename
             )  # Assuming dest_filename is the file's hash
 
-    def fetch_uploaded_log_names(self):
-        if self._uploaded_logs is None:
-            s3_resource = self._aws.get_s3_resource()
-            bucket = s3_resource.Bucket(self._bucket_name)
+    def _upload_blocking(self, cancelled, client, source_path: str, key: str, report):
+        size = os.path.getsize(source_path)
+
+        with open(source_path, "rb") as source_file:
+            if size <= self._multipart_threshold:
+                raise_if_cancelled(cancelled)
+                client.put_object(Bucket=self._bucket_name, Key=key, Body=source_file)
+                report(size)
+                return
+
+            upload_id = client.create_multipart_upload(
+                Bucket=self._bucket_name, Key=key
+            )["UploadId"]
+
+            try:
+                parts = []
+                for number in itertools.count(1):
+                    raise_if_cancelled(cancelled)
 
-            # Get list of all paths and trim the leading "logs/" from each
-            self._uploaded_logs = set(
-                [o.key[5:] for o in bucket.objects.filter(Prefix="logs/")]
+                    data = source_file.read(self._part_size)
+                    if len(data) == 0:
+                        break
+
+                    response = client.upload_part(
+                        Bucket=self._bucket_name,
+                        Key=key,
+                        UploadId=upload_id,
+                        PartNumber=number,
+                        Body=data,
+                    )
+                    parts.append({"ETag": response["ETag"], "PartNumber": number})
+                    report(len(data))
+
+                client.complete_multipart_upload(
+                    Bucket=self._bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+            except BaseException:
+                # Parts of an incomplete upload are stored (and billed) until aborted
+                client.abort_multipart_upload(
+                    Bucket=self._bucket_name, Key=key, UploadId=upload_id
+                )
+                raise
+
+    async def fetch_uploaded_log_names(self):
+        if self._uploaded_logs is None:
+            self._uploaded_logs = await self._pool.run(
+                self._fetch_uploaded_log_names_blocking, self._client()
             )
 
         return self._uploaded_logs
 
+    def _fetch_uploaded_log_names_blocking(self, cancelled, client):
+        names = set()
+        arguments = {"Bucket": self._bucket_name, "Prefix": self._logs_path}
+
+        while True:
+            raise_if_cancelled(cancelled)
+            response = client.list_objects_v2(**arguments)
+
+            # Trim the leading "logs/" from each path
+            names.update(
+                o["Key"][len(self._logs_path) :] for o in response.get("Contents", [])
+            )
+
+            if not response["IsTruncated"]:
+                return names
+
+            arguments["ContinuationToken"] = response["NextContinuationToken"]
+
 
 if __name__ == "__main__":
-    bucket_manager = BucketManager()
-    bucket_manager.fetch_uploaded_log_names()
-    print(bucket_manager._uploaded_logs)
+    import twisted.internet.task
+
+    async def main(reactor):
+        bucket_manager = BucketManager()
+        print(await bucket_manager.fetch_uploaded_log_names())
+
+    twisted.internet.task.react(
+        lambda reactor: twisted.internet.defer.ensureDeferred(main(reactor))
+    )
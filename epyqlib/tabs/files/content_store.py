@@ -0,0 +1,150 @@
+import hashlib
+import os
+import shutil
+import uuid
+from os import path
+from typing import List, Set
+
+from epyqlib.tabs.files.files_utils import ensure_dir, partial_suffix
+
+## Large reads keep the per-call overhead of hashing and copying negligible
+buffer_size = 1024 * 1024
+
+
+def hash_file(file_path: str) -> str:
+    md5 = hashlib.md5()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    with open(file_path, "rb", buffering=0) as file:
+        for count in iter(lambda: file.readinto(buffer), 0):
+            md5.update(view[:count])
+
+    return md5.hexdigest()
+
+
+def copy_and_hash(source_path: str, destination_path: str) -> str:
+    """Copy the file and return its md5, reading the source only once."""
+    md5 = hashlib.md5()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    with open(source_path, "rb", buffering=0) as source, open(
+        destination_path, "wb", buffering=0
+    ) as destination:
+        for count in iter(lambda: source.readinto(buffer), 0):
+            chunk = view[:count]
+            md5.update(chunk)
+            destination.write(chunk)
+
+    shutil.copystat(source_path, destination_path)
+
+    return md5.hexdigest()
+
+
+class ContentStore:
+    """
+    Files stored by the md5 of their content, as `<directory>/ab/abcdef...`.
+    Adding content that is already present keeps the existing copy. A file's
+    name is its expected digest so it can be checked whenever it's needed
+    rather than up front.
+    """
+
+    _tag = "[Content Store]"
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        ensure_dir(directory)
+
+        self._verified: Set[str] = set()
+
+    def _shard(self, hash: str):
+        return path.join(self._directory, hash[:2])
+
+    def get_path(self, hash: str) -> str:
+        return path.join(self._shard(hash), hash)
+
+    def contains(self, hash: str) -> bool:
+        return path.exists(self.get_path(hash))
+
+    def hashes(self) -> List[str]:
+        return [
+            filename
+            for shard in os.listdir(self._directory)
+            if path.isdir(path.join(self._directory, shard))
+            for filename in os.listdir(path.join(self._directory, shard))
+            if not filename.endswith(partial_suffix)
+        ]
+
+    def add(self, source_path: str) -> str:
+        temporary = path.join(self._directory, uuid.uuid4().hex + partial_suffix)
+
+        try:
+            hash = copy_and_hash(source_path, temporary)
+
+            if self.contains(hash):
+                print(f"{self._tag} Already have {hash}, discarding the copy")
+                os.unlink(temporary)
+            else:
+                ensure_dir(self._shard(hash))
+                os.replace(temporary, self.get_path(hash))
+                # It was hashed while being written
+                self._verified.add(hash)
+        except BaseException:
+            if path.exists(temporary):
+                os.unlink(temporary)
+            raise
+
+        return hash
+
+    def verify(self, hash: str) -> bool:
+        """Check the content still matches its name, once per session."""
+        if hash in self._verified:
+            return True
+
+        if not self.contains(hash):
+            return False
+
+        if hash_file(self.get_path(hash)) != hash:
+            print(f"{self._tag} {hash} failed hash verification")
+            return False
+
+        self._verified.add(hash)
+        return True
+
+    def remove(self, hash: str):
+        self._verified.discard(hash)
+        os.unlink(self.get_path(hash))
+
+        shard = self._shard(hash)
+        if len(os.listdir(shard)) == 0:
+            os.rmdir(shard)
+
+    def forget(self, hash: str):
+        """Call after the file has been moved elsewhere."""
+        self._verified.discard(hash)
+
+        shard = self._shard(hash)
+        if path.isdir(shard) and len(os.listdir(shard)) == 0:
+            os.rmdir(shard)
+
+    def migrate(self):
+        """
+        Move files from the original flat layout, where each was named by
+        its hash directly in the directory, into their shards. Temporary
+        files left by an interrupted add are removed. Nothing is rehashed
+        here, contents are verified when they're used.
+        """
+        for filename in os.listdir(self._directory):
+            file_path = path.join(self._directory, filename)
+            if not path.isfile(file_path):
+                continue
+
+            if filename.endswith(partial_suffix):
+                os.unlink(file_path)
+            elif self.contains(filename):
+                os.unlink(file_path)
+            else:
+                print(f"{self._tag} Migrating {filename}")
+                ensure_dir(self._shard(filename))
+                os.replace(file_path, self.get_path(filename))
@@ -15,11 +15,12 @@ from epyqlib.tabs.files.files_manager import FilesManager
 from epyqlib.tabs.files.filesview import Cols, get_values
 from epyqlib.tabs.files.log_manager import LogManager, PendingLog
 from epyqlib.tabs.files.sync_config import SyncConfig, Vars
+from epyqlib.tabs.files.transfers import Progress, TransferPipeline
 from epyqlib.utils.twisted import errbackhook
 import twisted.internet
 from twisted.internet.error import DNSLookupError
 from twisted.internet.task import deferLater
-from typing import Dict
+from typing import Dict, Set
 
 from .graphql import API, InverterNotFoundException
 
@@ -49,6 +50,8 @@ class FilesController:
         self.bucket_manager = BucketManager()
         self.cache_manager = FilesManager(self.sync_config.cache_dir)
         self.log_manager = LogManager.init(self.sync_config.cache_dir)
+        self.transfers = TransferPipeline()
+        self.transfers.add_listener(self._transfer_progress)
 
         self._is_offline = self.sync_config.get(Vars.offline_mode) or False
         self._is_connected = False
@@ -62,6 +65,8 @@ class FilesController:
 
         self.associations: [str, AssociationMapping] = {}
         self._log_rows: Dict[str, QTreeWidgetItem] = {}
+        self._syncing_logs: Set[str] = set()
+        self._finished_transfers = 0
 
     def setup(self):
         self.aws_login_manager.register_listener(self.login_status_changed)
@@ -85,6 +90,7 @@ class FilesController:
         self.activity_log.register_listener(self.activity_syncer.listener)
 
         self.log_manager.add_listener(self._on_new_pending_log)
+        self.log_manager.is_synced = self._is_log_synced
 
         self._show_pending_logs()
 
@@ -232,17 +238,33 @@ class FilesController:
             )
             return
 
-        # TODO: Figure out how to download multiple files at a time. Just trying to wrap in asyncio task fails.
-        for hash in missing_hashes:
-            await self.sync_file(hash)
+        result = await self.transfers.run(missing_hashes, self.sync_file)
+
+        for hash in result.failed:
+            for mapping in self._get_mapping_for_hash(hash):
+                self.view.show_cross_status_icon(mapping.row, Cols.local)
 
-    async def sync_file(self, hash):
-        await self.download_file(hash)
+    async def sync_file(self, hash, progress=None):
+        await self.download_file(hash, progress)
 
         mapping: AssociationMapping
         for mapping in self._get_mapping_for_hash(hash):
             self.view.show_check_icon(mapping.row, Cols.local)
 
+    def _transfer_progress(self, progress: Progress):
+        if progress.finished == self._finished_transfers:
+            return
+
+        self._finished_transfers = progress.finished
+        if progress.finished == progress.total:
+            self._finished_transfers = 0
+
+        print(
+            f"{self._tag} Transferred {progress.finished} of {progress.total} "
+            f"({progress.failed} failed, {progress.retries} retries, "
+            f"{progress.bytes} bytes)"
+        )
+
     def _get_key_for_file_id(self, file_id: str):
         value: AssociationMapping
         return next(
@@ -277,16 +299,16 @@ class FilesController:
             self._get_mapping_for_row(row).association["file"]["hash"]
         )
 
-    async def download_file(self, hash: str):
+    async def download_file(self, hash: str, progress=None):
         print(f"[Files Controller] Downloading missing file hash {hash}")
         filename = self.cache_manager.get_file_path(hash)
-        await self.bucket_manager.download_file(hash, filename)
+        await self.bucket_manager.download_file(hash, filename, progress)
         return hash
 
-    async def download_log(self, hash: str):
+    async def download_log(self, hash: str, progress=None):
         print(f"[Files Controller] Downloading missing log hash {hash}")
         filename = self.cache_manager.get_file_path(hash)
-        await self.bucket_manager.download_log(hash, filename)
+        await self.bucket_manager.download_log(hash, filename, progress)
         return hash
 
     ## Lifecycle events
@@ -433,14 +455,17 @@ class FilesController:
             self.association_cache.put_associations(serial, association_list)
 
         # Fetch missing files
-        for hash in self.association_cache.get_all_known_file_hashes():
-            if not self.cache_manager.has_hash(hash):
-                try:
-                    await self.download_file(hash)
-                except Exception:
-                    self.view.add_log_error_line(
-                        f"Error caching file {hash}. See epyq.log for details."
-                    )
+        missing_hashes = [
+            hash
+            for hash in self.association_cache.get_all_known_file_hashes()
+            if not self.cache_manager.has_hash(hash)
+        ]
+        result = await self.transfers.run(missing_hashes, self.download_file)
+
+        for hash in result.failed:
+            self.view.add_log_error_line(
+                f"Error caching file {hash}. See epyq.log for details."
+            )
 
         self.view.add_log_line("Completed syncing all associations for organization.")
 
@@ -579,39 +604,75 @@ class FilesController:
         if self._is_offline:
             return
 
-        log = self.log_manager.get_next_pending_log()
-        while log is not None:
-            file_path = self.log_manager.get_path_to_log(log.hash)
-            await self.bucket_manager.upload_log(file_path, log.hash)
+        # Logs may be added while syncing, keep going until none are left
+        # that aren't either already being synced or failed in this call
+        failed = {}
+        while True:
+            logs = {
+                log.hash: log
+                for log in self.log_manager.get_pending_logs()
+                if log.hash not in self._syncing_logs and log.hash not in failed
+            }
+            if len(logs) == 0:
+                break
+
+            self._syncing_logs.update(logs)
+            try:
+                result = await self.transfers.run(
+                    logs,
+                    lambda hash, progress: self._sync_pending_log(logs[hash], progress),
+                )
+            finally:
+                self._syncing_logs.difference_update(logs)
 
-            # ?: Where do we want to store the timestamp and build_id that the log was generated?
-            notes = f"BuildId: {log.build_id}\nLog Captured At: {log.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
-            create_file_response = await self.api.create_file(
-                API.FileType.Log, log.filename, log.hash, notes
-            )
-            new_file_id = create_file_response["id"]
+            failed.update(result.failed)
 
-            inverter_id = await self._get_id_for_serial_number(log.serial_number)
+        for error in failed.values():
+            raise error
 
-            new_association = await self.api.create_association(
-                inverter_id, new_file_id
+    async def _sync_pending_log(self, log: PendingLog, progress=None):
+        if not self.log_manager.verify_log(log.hash):
+            # Retrying won't help, the content no longer matches its hash
+            self.view.add_log_error_line(
+                f"Pending log {log.filename} is corrupt and will not be uploaded."
             )
-
-            ## Move UI row from pending to current
             row = self.view.pending_log_rows.pop(log.hash)
-            self.view.show_check_icon(row, Cols.web)
-            map = AssociationMapping(new_association, row)
-            key = new_association["id"] + new_association["file"]["id"]
+            row.parent().removeChild(row)
+            self.log_manager.remove_pending(log)
+            return
 
-            self.associations[key] = map
+        file_path = self.log_manager.get_path_to_log(log.hash)
+        await self.bucket_manager.upload_log(file_path, log.hash, progress)
 
-            self.cache_manager.move_into_cache(
-                self.log_manager.get_path_to_log(log.hash)
-            )
+        # ?: Where do we want to store the timestamp and build_id that the log was generated?
+        notes = f"BuildId: {log.build_id}\nLog Captured At: {log.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
+        create_file_response = await self.api.create_file(
+            API.FileType.Log, log.filename, log.hash, notes
+        )
+        new_file_id = create_file_response["id"]
 
-            # Done processing. Remove pending and get next (if present)
-            self.log_manager.remove_pending(log)
-            log = self.log_manager.get_next_pending_log()
+        inverter_id = await self._get_id_for_serial_number(log.serial_number)
+
+        new_association = await self.api.create_association(inverter_id, new_file_id)
+
+        ## Move UI row from pending to current
+        row = self.view.pending_log_rows.pop(log.hash)
+        self.view.show_check_icon(row, Cols.web)
+        map = AssociationMapping(new_association, row)
+        key = new_association["id"] + new_association["file"]["id"]
+
+        self.associations[key] = map
+
+        self.cache_manager.move_into_cache(self.log_manager.get_path_to_log(log.hash))
+
+        # Done processing
+        self.log_manager.remove_pending(log)
+
+    def _is_log_synced(self, hash: str) -> bool:
+        ## Uploaded logs are moved into the files cache and associated
+        return self.cache_manager.has_hash(hash) or (
+            len(self.association_cache.get_associations_for_hash(hash)) > 0
+        )
 
     async def _on_new_pending_log(self, log: PendingLog):
         inverter_id = await self._get_id_for_serial_number(log.serial_number)
@@ -1,8 +1,8 @@
-import hashlib
 import os
 from os import path
 
-from epyqlib.tabs.files.files_utils import ensure_dir
+from epyqlib.tabs.files.content_store import hash_file
+from epyqlib.tabs.files.files_utils import ensure_dir, partial_suffix
 
 
 class FilesManager:
@@ -19,14 +19,15 @@ class FilesManager:
                 os.unlink(path.join(self._cache_dir, filename))
 
     def _md5(self, filename: str) -> str:
-        md5 = hashlib.md5()
-        with open(path.join(self._cache_dir, filename), "rb") as file:
-            for chunk in iter(lambda: file.read(4096), b""):
-                md5.update(chunk)
-        return md5.hexdigest()
+        return hash_file(path.join(self._cache_dir, filename))
 
     def hashes(self):
-        return os.listdir(self._cache_dir)
+        # Partial downloads are kept to be resumed but aren't files yet
+        return [
+            filename
+            for filename in os.listdir(self._cache_dir)
+            if not filename.endswith(partial_suffix)
+        ]
 
     def has_hash(self, hash: str) -> bool:
         return path.exists(path.join(self._cache_dir, hash))
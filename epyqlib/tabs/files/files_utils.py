@@ -1,7 +1,11 @@
 import json
 import os
+import sqlite3
 from base64 import b64decode
 
+## Downloads are written here first and renamed once complete
+partial_suffix = ".part"
+
 
 def ensure_dir(dir_name: str):
     if os.path.exists(dir_name):
@@ -15,6 +19,20 @@ def ensure_dir(dir_name: str):
     os.makedirs(dir_name, exist_ok=True)
 
 
+def open_database(file_path: str) -> sqlite3.Connection:
+    """
+    Each commit is appended to a write-ahead log that SQLite folds back into
+    the database periodically, so a crash leaves either the old or the new
+    state and writes don't rewrite the whole file.
+    """
+    connection = sqlite3.connect(file_path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+
+    return connection
+
+
 def decode(s: str) -> str:
     # Add missing padding just in case
     return json.loads(b64decode(s + "==="))
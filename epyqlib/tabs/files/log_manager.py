@@ -1,16 +1,15 @@
-import hashlib
 import inspect
 import json
 import os
-import shutil
 from datetime import datetime
 from enum import Enum
 from os import path
 from typing import Union, List, Callable, Coroutine
 
 import attr
+import twisted.internet.threads
 
-from epyqlib.tabs.files.files_utils import ensure_dir
+from epyqlib.tabs.files.content_store import ContentStore
 
 NewLogListener = Callable[[str], Coroutine]
 
@@ -38,14 +37,16 @@ class LogManager:
         # if LogManager._instance is not None:
         #     raise Exception("LogManager being created instead of using singleton")
 
-        self._cache_dir = path.join(files_dir, "pending_logs")
-        ensure_dir(self._cache_dir)
+        self._store = ContentStore(path.join(files_dir, "pending_logs"))
 
         self._pending_logs_file = path.join(files_dir, "pending-logs.json")
         self._pending_logs: List[PendingLog] = []
 
         self._listeners: List[NewLogListener] = []
 
+        ## Whether a log with this hash was already uploaded, set by the files tab
+        self.is_synced: Callable[[str], bool] = lambda hash: False
+
     @staticmethod
     def get_instance():
         if LogManager._instance is None:
@@ -55,13 +56,25 @@ class LogManager:
     @staticmethod
     def init(files_dir: str):
         LogManager._instance = LogManager(files_dir)
+        LogManager._instance._store.migrate()
         LogManager._instance._read_pending_log_file()
         return LogManager._instance
 
     async def add_pending_log(self, file_path: str, build_id: str, serial_number: str):
         basename = os.path.basename(file_path)
-        hash = self._md5(file_path)
-        shutil.copy2(file_path, path.join(self._cache_dir, hash))
+
+        ## Logs can be several GB so copy and hash them off the reactor thread
+        hash = await twisted.internet.threads.deferToThread(self._store.add, file_path)
+
+        if any(log.hash == hash for log in self._pending_logs):
+            print(f"{self._tag} Log {basename} is already pending as {hash}")
+            return
+
+        if self.is_synced(hash):
+            print(f"{self._tag} Log {basename} was already uploaded as {hash}")
+            if self._store.contains(hash):
+                self._store.remove(hash)
+            return
 
         new_log = PendingLog(hash, basename, build_id, serial_number)
         self._pending_logs.append(new_log)
@@ -86,11 +99,22 @@ class LogManager:
 
         with open(self._pending_logs_file, "r") as file:
             data: List[dict] = json.load(file)
-            for log in data:
+
+        # Older versions could queue the same log more than once
+        hashes = set()
+        for log in data:
+            if log["hash"] not in hashes:
+                hashes.add(log["hash"])
                 self._pending_logs.append(PendingLog(**log))
 
+        if len(self._pending_logs) < len(data):
+            self._save_pending_log_file()
+
     def get_path_to_log(self, hash: str):
-        return path.join(self._cache_dir, hash)
+        return self._store.get_path(hash)
+
+    def verify_log(self, hash: str) -> bool:
+        return self._store.verify(hash)
 
     def get_pending_logs(self) -> List[PendingLog]:
         return self._pending_logs
@@ -105,18 +129,17 @@ class LogManager:
         self._pending_logs.remove(log)
         self._save_pending_log_file()
 
-    def _md5(self, filename: str) -> str:
-        md5 = hashlib.md5()
-        with open(filename, "rb") as file:
-            for chunk in iter(lambda: file.read(4096), b""):
-                md5.update(chunk)
-        return md5.hexdigest()
+        if self._store.contains(log.hash):
+            self._store.remove(log.hash)
+        else:
+            # Already moved out, e.g. into the files cache
+            self._store.forget(log.hash)
 
     def get_file_ref(self, filename: str, mode: str):
-        return open(path.join(self._cache_dir, filename), mode)
+        return open(self._store.get_path(filename), mode)
 
     def stat(self, filename) -> os.stat_result:
-        return os.stat(path.join(self._cache_dir, filename))
+        return os.stat(self._store.get_path(filename))
 
     ## Listener Management
     ## Listener fires when new log is added
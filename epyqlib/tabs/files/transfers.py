@@ -0,0 +1,156 @@
+import itertools
+from typing import Awaitable, Callable, Dict, Iterable, List
+
+import attr
+import twisted.internet.defer
+
+import epyqlib.utils.twisted
+
+## Receives the number of bytes moved since the last report
+ByteReporter = Callable[[int], None]
+Transfer = Callable[[object, ByteReporter], Awaitable]
+ProgressListener = Callable[["Progress"], None]
+
+
+@attr.s(frozen=True)
+class Progress:
+    total: int = attr.ib()
+    completed: int = attr.ib()
+    failed: int = attr.ib()
+    active: int = attr.ib()
+    retries: int = attr.ib()
+    bytes: int = attr.ib()
+
+    @property
+    def finished(self) -> int:
+        return self.completed + self.failed
+
+
+@attr.s(frozen=True)
+class Result:
+    succeeded: List = attr.ib()
+    failed: Dict[object, Exception] = attr.ib()
+
+    def raise_first_failure(self):
+        for error in self.failed.values():
+            raise error
+
+
+@attr.s
+class TransferPipeline:
+    """
+    Runs transfers with at most `parallelism` of them in flight at once.
+    A failed transfer is retried after a delay that starts at `backoff` and
+    grows by `backoff_factor` up to `maximum_backoff`, up to `attempts`
+    times in total. Each transfer is given a callable to report the bytes
+    it has moved and listeners receive the aggregate `Progress` of the run
+    on every change.
+    """
+
+    _tag = "[Transfer Pipeline]"
+
+    parallelism: int = attr.ib(default=4)
+    attempts: int = attr.ib(default=3)
+    backoff: float = attr.ib(default=0.5)
+    backoff_factor: float = attr.ib(default=2)
+    maximum_backoff: float = attr.ib(default=10)
+    sleep: Callable[[float], Awaitable] = attr.ib(default=epyqlib.utils.twisted.sleep)
+    _listeners: List[ProgressListener] = attr.ib(factory=list)
+
+    def add_listener(self, listener: ProgressListener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: ProgressListener):
+        self._listeners.remove(listener)
+
+    async def run(self, items: Iterable, transfer: Transfer) -> Result:
+        items = list(items)
+        run = _Run(pipeline=self, total=len(items))
+        semaphore = twisted.internet.defer.DeferredSemaphore(self.parallelism)
+
+        deferreds = [
+            semaphore.run(
+                lambda item: twisted.internet.defer.ensureDeferred(
+                    run.transfer(item=item, transfer=transfer)
+                ),
+                item,
+            )
+            for item in items
+        ]
+
+        results = await twisted.internet.defer.DeferredList(
+            deferreds,
+            consumeErrors=True,
+        )
+
+        succeeded = []
+        failed = {}
+        for item, (success, result) in zip(items, results):
+            if success:
+                succeeded.append(item)
+            else:
+                print(f"{self._tag} Transfer of {item} failed: {result.value}")
+                failed[item] = result.value
+
+        return Result(succeeded=succeeded, failed=failed)
+
+    def _notify_listeners(self, progress: Progress):
+        for listener in self._listeners:
+            listener(progress)
+
+
+@attr.s
+class _Run:
+    pipeline: TransferPipeline = attr.ib()
+    total: int = attr.ib()
+    completed: int = attr.ib(default=0)
+    failed: int = attr.ib(default=0)
+    active: int = attr.ib(default=0)
+    retries: int = attr.ib(default=0)
+    bytes: int = attr.ib(default=0)
+
+    def _notify(self):
+        self.pipeline._notify_listeners(
+            Progress(
+                total=self.total,
+                completed=self.completed,
+                failed=self.failed,
+                active=self.active,
+                retries=self.retries,
+                bytes=self.bytes,
+            )
+        )
+
+    def _report(self, count: int):
+        self.bytes += count
+        self._notify()
+
+    async def transfer(self, item, transfer: Transfer):
+        pipeline = self.pipeline
+        delay = pipeline.backoff
+
+        self.active += 1
+        self._notify()
+
+        try:
+            for attempt in itertools.count(1):
+                try:
+                    await transfer(item, self._report)
+                except Exception:
+                    if attempt >= pipeline.attempts:
+                        self.failed += 1
+                        raise
+
+                    self.retries += 1
+                    self._notify()
+
+                    await pipeline.sleep(delay)
+                    delay = min(
+                        delay * pipeline.backoff_factor, pipeline.maximum_backoff
+                    )
+                else:
+                    self.completed += 1
+                    return
+        finally:
+            self.active -= 1
+            self._notify()
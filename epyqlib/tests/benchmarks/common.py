@@ -0,0 +1,478 @@
+import random
+import struct
+
+import can
+import canmatrix
+import elftools.dwarf.dwarf_expr
+import elftools.dwarf.enums
+import twisted.internet.threads
+
+import epyqlib.canneo
+import epyqlib.chunkedmemorycache
+import epyqlib.cmemoryparser
+import epyqlib.nv
+import epyqlib.tests.common
+import epyqlib.variableselectionmodel
+
+
+def synthetic_matrix(frames, signals_per_frame=8, seed=0):
+    """Build a matrix of 8 byte frames filled with assorted signals."""
+    random_ = random.Random(seed)
+    matrix = canmatrix.CanMatrix()
+    bits = 64 // signals_per_frame
+
+    for index in range(frames):
+        frame = canmatrix.Frame(
+            name="Frame{}".format(index),
+            arbitration_id=canmatrix.ArbitrationId(
+                id=0x18FF0000 | (index << 8) | 0x47,
+                extended=True,
+            ),
+            size=8,
+            cycle_time=100,
+        )
+
+        for signal_index in range(signals_per_frame):
+            signed = random_.choice((False, True))
+            frame.add_signal(
+                canmatrix.Signal(
+                    name="Signal{}".format(signal_index),
+                    start_bit=signal_index * bits,
+                    size=bits,
+                    is_little_endian=random_.choice((False, True)),
+                    is_signed=signed,
+                    factor=random_.choice(("1", "0.1", "0.01")),
+                    offset="0",
+                    min=-(2 ** (bits - 1)) if signed else 0,
+                    max=2 ** (bits - 1) - 1 if signed else 2 ** bits - 1,
+                )
+            )
+
+        matrix.add_frame(frame)
+
+    return matrix
+
+
+def synthetic_trace(neo, messages, seed=0):
+    """Generate a deterministic receive trace of random payloads."""
+    random_ = random.Random(seed)
+    frames = list(neo.frames)
+
+    trace = []
+    for index in range(messages):
+        frame = random_.choice(frames)
+        trace.append(
+            can.Message(
+                timestamp=index * 0.0001,
+                arbitration_id=frame.id,
+                is_extended_id=frame.extended,
+                dlc=frame.size,
+                data=bytes(random_.getrandbits(8) for _ in range(frame.size)),
+            )
+        )
+
+    return trace
+
+
+def blocking(f, *args, **kwargs):
+    """Call deferred returning ``f`` in the reactor and wait for its result.
+
+    Benchmarked callables are run in a thread via
+    :func:`twisted.internet.threads.deferToThread` so the reactor remains
+    free to service the protocols under test.
+    """
+    from twisted.internet import reactor
+
+    return twisted.internet.threads.blockingCallFromThread(reactor, f, *args, **kwargs)
+
+
+def synthetic_log(variables=40, records=500, seed=0):
+    """Build the parse_log() inputs for a log of 16 and 32 bit words."""
+    random_ = random.Random(seed)
+    bits_per_byte = epyqlib.cmemoryparser.bits_per_byte
+    types = (
+        epyqlib.cmemoryparser.Type(
+            name="int16_t",
+            bytes=1,
+            format=epyqlib.cmemoryparser.TypeFormats.signed,
+        ),
+        epyqlib.cmemoryparser.Type(
+            name="_iq",
+            bytes=2,
+            format=epyqlib.cmemoryparser.TypeFormats.signed,
+        ),
+    )
+
+    cache = epyqlib.chunkedmemorycache.Cache(bits_per_byte=bits_per_byte)
+    address = 0x8000
+    for index in range(variables):
+        variable = epyqlib.cmemoryparser.Variable(
+            name="variable{}".format(index),
+            type=random_.choice(types),
+            address=address,
+        )
+        address += variable.type.bytes
+
+        node = epyqlib.variableselectionmodel.VariableNode(variable=variable)
+        cache.add(cache.chunk_from_variable(variable=variable, reference=node))
+
+    raw_chunks = cache.contiguous_chunks()
+    record_length = sum(len(chunk) for chunk in raw_chunks)
+    data = bytes(random_.getrandbits(8) for _ in range(record_length * records))
+
+    return dict(
+        cache=cache,
+        chunks=raw_chunks,
+        data=data,
+        variables_and_chunks={chunk.reference: chunk for chunk in cache._chunks},
+        sample_period_us=1000,
+        raw_chunks=raw_chunks,
+    )
+
+
+def synthetic_parameter_sym(path, parameters=5000, first_mux=1200):
+    """Write a copy of the customer symbol file padded with extra
+    parameter multiplexers until it holds about ``parameters`` parameters.
+    """
+    source = epyqlib.tests.common.symbol_files["customer"]
+    lines = source.read_text(encoding="utf-8").splitlines()
+    existing = (
+        sum(
+            1
+            for line in lines
+            if line.startswith("Var=")
+            and not line.startswith(("Var=Meta ", "Var=ReadParam_"))
+        )
+        // 2
+    )
+
+    per_mux = 6
+    blocks = {"ParameterQuery": [], "ParameterResponse": []}
+    for index in range(max(0, parameters - existing) // per_mux):
+        for frame, read_param in (
+            ("ParameterQuery", "ReadParam_command"),
+            ("ParameterResponse", "ReadParam_status"),
+        ):
+            block = blocks[frame]
+            block.extend(
+                [
+                    "",
+                    "[{}]".format(frame),
+                    "DLC=8",
+                    "Mux=Synthetic{0} 0,11 {1:03X}h".format(index, first_mux + index),
+                    'Var=Meta unsigned 11,3 /e:Meta /ln:"Meta"',
+                    "Var={0} unsigned 14,2 /max:1 /e:ReadNV"
+                    ' /ln:"{0}"'.format(read_param),
+                ]
+            )
+            block.extend(
+                'Var=Value{0} unsigned {1},8 /ln:"Value{0}"'.format(
+                    signal, 16 + 8 * signal
+                )
+                for signal in range(per_mux)
+            )
+
+    # after the first, identified, block of each frame
+    for frame, block in blocks.items():
+        start = lines.index("[{}]".format(frame))
+        end = lines.index("", start)
+        lines[end:end] = block
+
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    return path
+
+
+def synthetic_nvs(path, parameters=5000):
+    """Load an :class:`epyqlib.nv.Nvs` from :func:`synthetic_parameter_sym`."""
+    synthetic_parameter_sym(path=path, parameters=parameters)
+    (matrix,) = canmatrix.formats.loadp(
+        str(path),
+        symImportEncoding="utf-8",
+    ).values()
+
+    neo = epyqlib.canneo.Neo(
+        matrix=matrix,
+        frame_class=epyqlib.nv.Frame,
+        signal_class=epyqlib.nv.Nv,
+        strip_summary=False,
+    )
+
+    return epyqlib.nv.Nvs(neo=neo, configuration="j1939")
+
+
+def _uleb128(value):
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value == 0:
+            encoded.append(byte)
+            return bytes(encoded)
+
+        encoded.append(byte | 0x80)
+
+
+# abbreviation code -> (tag, has children, ((attribute, form), ...))
+_abbreviations = {
+    1: ("compile_unit", True, (("name", "string"), ("producer", "string"))),
+    2: (
+        "base_type",
+        False,
+        (("name", "string"), ("byte_size", "data1"), ("encoding", "data1")),
+    ),
+    3: ("typedef", False, (("name", "string"), ("type", "ref_addr"))),
+    4: ("enumeration_type", True, (("name", "string"), ("byte_size", "data1"))),
+    5: ("enumerator", False, (("name", "string"), ("const_value", "data2"))),
+    6: ("structure_type", True, (("name", "string"), ("byte_size", "data2"))),
+    7: (
+        "member",
+        False,
+        (
+            ("name", "string"),
+            ("type", "ref_addr"),
+            ("data_member_location", "block1"),
+        ),
+    ),
+    8: ("array_type", True, (("type", "ref_addr"), ("byte_size", "data2"))),
+    9: ("subrange_type", False, (("upper_bound", "data2"),)),
+    10: ("pointer_type", False, (("type", "ref_addr"),)),
+    11: ("volatile_type", False, (("type", "ref_addr"),)),
+    12: (
+        "variable",
+        False,
+        (("name", "string"), ("type", "ref_addr"), ("location", "block1")),
+    ),
+}
+
+
+def _debug_abbrev():
+    tags = elftools.dwarf.enums.ENUM_DW_TAG
+    attributes = elftools.dwarf.enums.ENUM_DW_AT
+    forms = elftools.dwarf.enums.ENUM_DW_FORM
+
+    abbrev = bytearray()
+    for code, (tag, children, specifications) in _abbreviations.items():
+        abbrev += _uleb128(code)
+        abbrev += _uleb128(tags["DW_TAG_" + tag])
+        abbrev.append(int(children))
+        for attribute, form in specifications:
+            abbrev += _uleb128(attributes["DW_AT_" + attribute])
+            abbrev += _uleb128(forms["DW_FORM_" + form])
+        abbrev += bytes(2)
+
+    abbrev.append(0)
+
+    return bytes(abbrev)
+
+
+def _encode_die(code, values, offsets):
+    """Encode a DIE, or the end of a list of children for a ``code`` of 0.
+    ``ref_addr`` values are keys looked up in ``offsets``."""
+
+    encoded = bytearray(_uleb128(code))
+    if code == 0:
+        return bytes(encoded)
+
+    _, _, specifications = _abbreviations[code]
+    for (_, form), value in zip(specifications, values):
+        if form == "string":
+            encoded += value.encode("ascii") + b"\0"
+        elif form == "data1":
+            encoded += struct.pack("<B", value)
+        elif form == "data2":
+            encoded += struct.pack("<H", value)
+        elif form == "ref_addr":
+            encoded += struct.pack("<L", offsets.get(value, 0))
+        elif form == "block1":
+            encoded += struct.pack("<B", len(value)) + value
+
+    return bytes(encoded)
+
+
+def _compile_unit_dies(unit, variables, address):
+    """List the (key, code, values) DIEs of one synthetic compile unit."""
+
+    operations = elftools.dwarf.dwarf_expr.DW_OP_name2opcode
+    prefix = "unit{}.".format(unit)
+
+    def key(name):
+        return prefix + name
+
+    dies = [
+        (None, 1, ["unit{}.c".format(unit), "synthetic"]),
+        (key("int16_t"), 2, ["int16_t", 1, 0x05]),
+        (key("uint16_t"), 2, ["uint16_t", 1, 0x07]),
+        (key("float32"), 2, ["float32", 2, 0x04]),
+        (key("int16"), 3, ["int16", key("int16_t")]),
+        (key("State"), 4, ["State{}".format(unit), 1]),
+        *(
+            (None, 5, ["State{}_{}".format(unit, name), value])
+            for value, name in enumerate(("off", "on", "fault"))
+        ),
+        (None, 0, []),
+        (key("Struct"), 6, ["Struct{}".format(unit), 8]),
+    ]
+
+    member_types = ("int16", "uint16_t", "float32", "State")
+    location = 0
+    for index in range(6):
+        member_type = member_types[index % len(member_types)]
+        dies.append(
+            (
+                None,
+                7,
+                [
+                    "member{}".format(index),
+                    key(member_type),
+                    bytes([operations["DW_OP_plus_uconst"]]) + _uleb128(location),
+                ],
+            )
+        )
+        location += 2 if member_type == "float32" else 1
+
+    dies.extend(
+        [
+            (None, 0, []),
+            (key("array"), 8, [key("int16_t"), 10]),
+            (None, 9, [9]),
+            (None, 0, []),
+            (key("pointer"), 10, [key("Struct")]),
+            (key("volatile"), 11, [key("int16")]),
+        ]
+    )
+
+    variable_types = ("int16", "float32", "Struct", "array", "State", "volatile")
+    for index in range(variables):
+        dies.append(
+            (
+                None,
+                12,
+                [
+                    "variable{}_{}".format(unit, index),
+                    key(variable_types[index % len(variable_types)]),
+                    bytes([operations["DW_OP_addr"]]) + struct.pack("<L", address),
+                ],
+            )
+        )
+        address += 10
+
+    dies.append((None, 0, []))
+
+    return dies, address
+
+
+def _debug_info(compile_units, variables_per_unit):
+    header_size = 11
+    units = []
+    address = 0x8000
+    for unit in range(compile_units):
+        dies, address = _compile_unit_dies(
+            unit=unit,
+            variables=variables_per_unit,
+            address=address,
+        )
+        units.append(dies)
+
+    # lay out the DIEs with placeholder references to learn their offsets
+    offsets = {}
+    position = 0
+    for dies in units:
+        while True:
+            end = position + header_size
+            for key, code, values in dies:
+                if key is not None:
+                    offsets[key] = end
+                end += len(_encode_die(code=code, values=values, offsets={}))
+
+            # section sizes are counted in 16 bit words so pad the producer
+            # to keep every unit an even length
+            if (end - position) % 2 == 0:
+                break
+
+            dies[0][2][1] += " "
+
+        position = end
+
+    info = bytearray()
+    for dies in units:
+        body = b"".join(
+            _encode_die(code=code, values=values, offsets=offsets)
+            for _, code, values in dies
+        )
+        # version 3, abbreviations at 0 and four byte addresses
+        info += struct.pack("<LHLB", len(body) + header_size - 4, 3, 0, 4)
+        info += body
+
+    return bytes(info)
+
+
+def synthetic_coff(path, compile_units=50, variables_per_unit=100):
+    """Write a TI COFF image whose DWARF sections describe
+    ``compile_units`` units of assorted types and variables, for
+    :func:`epyqlib.cmemoryparser.process_file`."""
+
+    sections = {
+        ".stack": b"",
+        ".debug_abbrev": _debug_abbrev(),
+        ".debug_info": _debug_info(
+            compile_units=compile_units,
+            variables_per_unit=variables_per_unit,
+        ),
+    }
+
+    header_format = "<2H3L3H"
+    optional_header_format = "<2H6L"
+    section_format = "<8s9L2H"
+
+    data_offset = (
+        struct.calcsize(header_format)
+        + struct.calcsize(optional_header_format)
+        + len(sections) * struct.calcsize(section_format)
+    )
+
+    section_headers = bytearray()
+    data = bytearray()
+    strings = bytearray()
+    for name, contents in sections.items():
+        # sizes are counted in 16 bit words
+        if len(contents) % 2 == 1:
+            contents += b"\0"
+
+        if len(name) > 8:
+            encoded_name = struct.pack("<2L", 0, 4 + len(strings))
+            strings += name.encode("ascii") + b"\0"
+        else:
+            encoded_name = name.encode("ascii")
+
+        pointer = data_offset + len(data) if len(contents) > 0 else 0
+        section_headers += struct.pack(
+            section_format,
+            encoded_name,
+            *(0, 0, len(contents) // 2, pointer, 0, 0, 0, 0, 0),
+            *(0, 0),
+        )
+        data += contents
+
+    symbol_table_pointer = data_offset + len(data)
+
+    coff = bytearray()
+    coff += struct.pack(
+        header_format,
+        0xC2,
+        len(sections),
+        0,
+        symbol_table_pointer,
+        0,
+        struct.calcsize(optional_header_format),
+        0,
+        0x9D,
+    )
+    coff += struct.pack(optional_header_format, 0x108, 0, 0, 0, 0, 0, 0, 0)
+    coff += section_headers
+    coff += data
+    coff += struct.pack("<L", 4 + len(strings)) + strings
+
+    path.write_bytes(bytes(coff))
+
+    return path
@@ -0,0 +1,68 @@
+"""Fixtures for the hot path benchmarks.
+
+The benchmarks are skipped unless ``--run-benchmarks`` is passed and
+pytest-benchmark is installed.  Results can be saved and compared across
+commits using the pytest-benchmark storage options.
+
+    pytest epyqlib/tests/benchmarks --run-benchmarks --benchmark-autosave
+    pytest epyqlib/tests/benchmarks --run-benchmarks --benchmark-compare
+"""
+import uuid
+
+import can
+import pytest
+
+import epyqlib.canneo
+import epyqlib.hildevice
+import epyqlib.simulateddevice
+import epyqlib.tests.benchmarks.common
+import epyqlib.tests.common
+
+
+@pytest.fixture(params=[20, 200], ids=lambda frames: "{}_frames".format(frames))
+def neo(request, qapp):
+    neo = epyqlib.canneo.Neo(
+        matrix=epyqlib.tests.benchmarks.common.synthetic_matrix(frames=request.param),
+    )
+
+    yield neo
+
+    neo.terminate()
+
+
+@pytest.fixture
+def trace(neo):
+    return epyqlib.tests.benchmarks.common.synthetic_trace(neo=neo, messages=2000)
+
+
+@pytest.fixture
+def channel():
+    return "benchmark_{}".format(uuid.uuid4())
+
+
+@pytest.fixture
+def simulated(channel):
+    bus = can.interface.Bus(bustype="virtual", channel=channel)
+    device = epyqlib.simulateddevice.SimulatedDevice.from_definition_path(
+        path=epyqlib.tests.common.devices["customer"],
+        bus=bus,
+        cyclic=False,
+    )
+
+    with device:
+        yield device
+
+    bus.shutdown()
+
+
+@pytest.fixture
+def host(channel):
+    bus = can.interface.Bus(bustype="virtual", channel=channel)
+    device = epyqlib.hildevice.Device(
+        definition_path=epyqlib.tests.common.devices["customer"],
+    )
+    device.load()
+
+    yield device, bus
+
+    bus.shutdown()
@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import epyqlib.canneo
+
+
+pytestmark = pytest.mark.benchmarks
+
+
+def test_frame_pack(benchmark, neo):
+    frames = neo.frames
+
+    def pack():
+        for frame in frames:
+            frame.pack(frame)
+
+    benchmark(pack)
+
+
+def test_frame_unpack(benchmark, neo, trace):
+    frames = {(frame.id, frame.extended): frame for frame in neo.frames}
+    pairs = [(frames[(m.arbitration_id, m.is_extended_id)], m.data) for m in trace]
+
+    def unpack():
+        for frame, data in pairs:
+            frame.unpack(data)
+
+    benchmark(unpack)
+
+
+def test_neo_message_received(benchmark, neo, trace):
+    def receive():
+        for message in trace:
+            neo.message_received(message)
+
+    benchmark(receive)
+
+
+def test_neo_signal_by_path(benchmark, neo):
+    paths = [
+        (frame.name, signal.name)
+        for frame in neo.frames
+        if not hasattr(frame, "multiplex_frames")
+        for signal in frame.signals
+    ]
+
+    def resolve():
+        for path in paths:
+            neo.signal_by_path(*path)
+
+    benchmark(resolve)
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import pytest_twisted
+import twisted.internet.threads
+
+import epyqlib.simulateddevice
+import epyqlib.twisted.cancalibrationprotocol as ccp
+import epyqlib.tests.benchmarks.common
+
+
+pytestmark = pytest.mark.benchmarks
+
+
+@pytest.mark.parametrize("octets", [1024, 8192])
+@pytest_twisted.inlineCallbacks
+def test_upload_block(benchmark, simulated, host, octets):
+    device, bus = host
+    address = 0x310000
+    data = bytes(index % 256 for index in range(octets))
+    simulated.load_memory(
+        address_extension=ccp.AddressExtension.flash_memory,
+        address=address,
+        data=data,
+    )
+
+    handler = ccp.Handler(
+        endianness=simulated.ccp_endianness,
+        tx_id=simulated.ccp_tx_id,
+        rx_id=simulated.ccp_rx_id,
+    )
+    transport = epyqlib.simulateddevice.ReactorTransport(protocol=handler, bus=bus)
+
+    def upload():
+        return epyqlib.tests.benchmarks.common.blocking(
+            handler.upload_block,
+            address_extension=ccp.AddressExtension.flash_memory,
+            address=address,
+            octets=octets,
+        )
+
+    try:
+        yield handler.connect()
+        uploaded = yield twisted.internet.threads.deferToThread(
+            benchmark.pedantic,
+            upload,
+            rounds=3,
+        )
+        yield handler.disconnect()
+    finally:
+        transport.terminate()
+
+    assert bytes(uploaded) == data
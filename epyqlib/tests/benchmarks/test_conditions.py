@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import can
+import pytest_twisted
+import twisted.internet.defer
+import twisted.internet.protocol
+import twisted.internet.threads
+
+import epyqlib.conditions
+import epyqlib.simulateddevice
+import epyqlib.tests.benchmarks.common
+import epyqlib.utils.twisted
+
+
+pytestmark = pytest.mark.benchmarks
+
+
+class NeoProtocol(twisted.internet.protocol.Protocol):
+    def __init__(self, neo):
+        self.neo = neo
+
+    def dataReceived(self, message):
+        self.neo.message_received(message)
+
+
+def poll(signal, value, timeout):
+    async def check():
+        return signal.to_human(signal.value) == value
+
+    return twisted.internet.defer.ensureDeferred(
+        epyqlib.utils.twisted.wait_for(check=check, timeout=timeout),
+    )
+
+
+def event(signal, value, timeout):
+    return epyqlib.conditions.wait_for(
+        epyqlib.conditions.value(signal) == value,
+        timeout=timeout,
+    )
+
+
+@pytest.mark.parametrize("wait", [poll, event], ids=["poll", "event"])
+@pytest_twisted.inlineCallbacks
+def test_wait_for_signal(benchmark, channel, host, wait):
+    """Time from sending a frame on a virtual bus until a wait for the new
+    value resolves."""
+
+    device, bus = host
+    sender = can.interface.Bus(bustype="virtual", channel=channel)
+    transport = epyqlib.simulateddevice.ReactorTransport(
+        protocol=NeoProtocol(neo=device.neo),
+        bus=bus,
+    )
+
+    frame = next(
+        frame
+        for frame in device.neo.frames
+        if frame.receivable and not hasattr(frame, "multiplex_frames")
+    )
+    signal = frame.signals[0]
+    values = iter(range(1000))
+
+    def send_and_wait(value):
+        deferred = wait(signal=signal, value=value, timeout=5)
+
+        data = frame.pack(
+            frame,
+            function=lambda s: signal.from_human(value) if s is signal else s.value,
+        )
+        sender.send(frame.to_message(data=data))
+
+        return deferred
+
+    def toggle():
+        epyqlib.tests.benchmarks.common.blocking(send_and_wait, next(values) % 2)
+
+    try:
+        yield twisted.internet.threads.deferToThread(
+            benchmark.pedantic,
+            toggle,
+            rounds=20,
+        )
+    finally:
+        transport.terminate()
+        sender.shutdown()
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import epyqlib.tabs.files.content_store
+
+
+pytestmark = pytest.mark.benchmarks
+
+mebibyte = 1024 * 1024
+
+
+def write_synthetic_log(path, size):
+    # Repeating a random block keeps generation cheap while still
+    # giving the hash and the disk real data to chew on
+    block = os.urandom(16 * mebibyte)
+    with open(path, "wb") as file:
+        for start in range(0, size, len(block)):
+            file.write(block[: size - start])
+
+
+def hash_then_copy(source, destination):
+    """The original two pass approach: 4 KiB md5 reads then a copy."""
+    md5 = hashlib.md5()
+    with open(source, "rb") as file:
+        for chunk in iter(lambda: file.read(4096), b""):
+            md5.update(chunk)
+    shutil.copy2(source, destination)
+
+    return md5.hexdigest()
+
+
+@pytest.fixture(
+    params=[64 * mebibyte, 2048 * mebibyte],
+    ids=lambda size: "{}MiB".format(size // mebibyte),
+)
+def synthetic_log(request, tmp_path):
+    path = tmp_path / "synthetic.log"
+    write_synthetic_log(path, request.param)
+
+    yield path
+
+
+@pytest.mark.parametrize(
+    "copy",
+    [hash_then_copy, epyqlib.tabs.files.content_store.copy_and_hash],
+    ids=["hash_then_copy", "copy_and_hash"],
+)
+def test_copy_log(benchmark, tmp_path, synthetic_log, copy):
+    destination = tmp_path / "copy"
+
+    hash = benchmark.pedantic(
+        copy,
+        args=(synthetic_log, destination),
+        rounds=3,
+    )
+
+    assert hash == epyqlib.tabs.files.content_store.hash_file(synthetic_log)
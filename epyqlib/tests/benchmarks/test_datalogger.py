@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import epyqlib.cmemoryparser
+import epyqlib.datalogger
+import epyqlib.tests.benchmarks.common
+import epyqlib.utils.columnar
+
+
+pytestmark = pytest.mark.benchmarks
+
+
+@pytest.mark.parametrize("suffix", [".csv", epyqlib.utils.columnar.suffix])
+def test_parse_log(benchmark, tmp_path, suffix):
+    log = epyqlib.tests.benchmarks.common.synthetic_log()
+    data = log.pop("data")
+    path = tmp_path / ("log" + suffix)
+
+    def parse():
+        epyqlib.datalogger.parse_log(
+            csv_path=path,
+            data_stream=io.BytesIO(data),
+            **log,
+        )
+
+    benchmark(parse)
+
+    if suffix == ".csv":
+        with open(path) as f:
+            assert sum(1 for _ in f) == 501
+    else:
+        with epyqlib.utils.columnar.load(path) as columns:
+            assert columns.rows == 500
+
+
+def test_process_file(benchmark, tmp_path):
+    path = epyqlib.tests.benchmarks.common.synthetic_coff(
+        path=tmp_path / "synthetic.out",
+    )
+
+    names, variables, _ = benchmark.pedantic(
+        epyqlib.cmemoryparser.process_file,
+        kwargs=dict(filename=path),
+        rounds=1,
+    )
+
+    assert len(variables) == 5000
+    assert len(names["Struct0"][0].members) == 6
@@ -0,0 +1,114 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import canmatrix
+import pytest_twisted
+import twisted.internet.threads
+
+import epyqlib.canneo
+import epyqlib.nv
+import epyqlib.nvview
+import epyqlib.simulateddevice
+import epyqlib.tests.benchmarks.common
+
+
+pytestmark = pytest.mark.benchmarks
+
+
+@pytest_twisted.inlineCallbacks
+def test_read_all_from_device(benchmark, simulated, host):
+    device, bus = host
+    nvs = device.nvs
+    # measure throughput, not the timeout, when the machine is busy
+    nvs.protocol._timeout = 5
+    transport = epyqlib.simulateddevice.ReactorTransport(
+        protocol=nvs.protocol,
+        bus=bus,
+    )
+
+    def read_all():
+        return epyqlib.tests.benchmarks.common.blocking(
+            nvs.read_all_from_device,
+            meta=[epyqlib.nv.MetaEnum.value],
+            background=True,
+        )
+
+    try:
+        yield twisted.internet.threads.deferToThread(
+            benchmark.pedantic,
+            read_all,
+            rounds=3,
+        )
+    finally:
+        transport.terminate()
+
+    assert simulated.statistics.nv_reads > 0
+
+
+@pytest.fixture(scope="module")
+def synthetic_nvs(qapp, tmp_path_factory):
+    path = tmp_path_factory.mktemp("synthetic") / "synthetic.sym"
+
+    return epyqlib.tests.benchmarks.common.synthetic_nvs(path=path, parameters=5000)
+
+
+@pytest.mark.parametrize("coalesce", [False, True], ids=["immediate", "coalesced"])
+def test_refresh_after_read(benchmark, qapp, qtbot, synthetic_nvs, coalesce):
+    model = epyqlib.nv.NvModel(synthetic_nvs)
+    if not coalesce:
+        model.change_coalescer = None
+
+    view = epyqlib.nvview.NvView()
+    qtbot.addWidget(view)
+    view.setModel(model)
+    view.ui.tree_view.expandAll()
+    view.show()
+
+    value = epyqlib.nv.Columns.indexes.value
+    nvs = list(model.all_nv())
+    emitted = []
+    model.dataChanged.connect(lambda *args: emitted.append(None))
+
+    def refresh():
+        # what update_signals() reports for each frame of a full read
+        for nv in nvs:
+            if not coalesce:
+                # the per signal event loop pass this replaces
+                qapp.processEvents()
+            model.dynamic_columns_changed(nv, columns=(value,))
+
+        if coalesce:
+            model.change_coalescer.flush()
+        qapp.processEvents()
+
+    benchmark.pedantic(refresh, rounds=3)
+
+    assert len(nvs) > 4500
+    if coalesce:
+        assert len(emitted) < len(nvs)
+
+
+def test_build_parameters(benchmark, qapp, tmp_path):
+    path = epyqlib.tests.benchmarks.common.synthetic_parameter_sym(
+        path=tmp_path / "synthetic.sym",
+        parameters=5000,
+    )
+    (matrix,) = canmatrix.formats.loadp(
+        str(path),
+        symImportEncoding="utf-8",
+    ).values()
+
+    def build():
+        neo = epyqlib.canneo.Neo(
+            matrix=matrix,
+            frame_class=epyqlib.nv.Frame,
+            signal_class=epyqlib.nv.Nv,
+            strip_summary=False,
+        )
+
+        return epyqlib.nv.Nvs(neo=neo, configuration="j1939")
+
+    nvs = benchmark.pedantic(build, rounds=3)
+
+    assert len(list(nvs.all_nv())) > 4500
@@ -0,0 +1,81 @@
+import uuid
+
+import pytest
+
+import epyqlib.pm.valueset
+import epyqlib.pm.valuesettable
+
+
+def write_table(path, values):
+    epyqlib.pm.valuesettable.Table(
+        records=[
+            epyqlib.pm.valuesettable.Record(
+                name=name,
+                value=value,
+                parameter_uuid=uuid.uuid5(uuid.NAMESPACE_URL, name),
+            )
+            for name, value in values.items()
+        ],
+    ).save(path=path)
+
+
+@pytest.fixture
+def configuration(tmp_path):
+    write_table(tmp_path / "base.pmvs", {"a": 1, "b": 2})
+
+    recipes = []
+    for i in range(6):
+        overlay_name = "overlay_{}.pmvs".format(i)
+        write_table(tmp_path / overlay_name, {"b": 10 + i})
+        recipes.append(
+            epyqlib.pm.valueset.OverlayRecipe(
+                output_path="recipe_{}.pmvs".format(i),
+                base_pmvs_path="base.pmvs",
+                overlay_pmvs_paths=[overlay_name],
+            )
+        )
+
+    return epyqlib.pm.valueset.OverlayConfiguration(
+        output_path="out",
+        recipes=recipes,
+        reference_path=tmp_path,
+        manifest_directory=tmp_path / "manifests",
+    )
+
+
+def output_values(configuration):
+    values = []
+    for recipe in configuration.recipes:
+        table = epyqlib.pm.valuesettable.loadp(
+            configuration.recipe_output_path(recipe=recipe)
+        )
+        values.append([record.value for record in table.records])
+
+    return values
+
+
+def test_cook_incremental(configuration, tmp_path):
+    cooked = configuration.cook(jobs=1)
+    assert cooked == configuration.recipes
+
+    assert configuration.cook(jobs=1) == []
+    assert sorted(path.name for path in (tmp_path / "out").iterdir()) == [
+        "recipe_{}.pmvs".format(i) for i in range(6)
+    ]
+    assert configuration.manifest_path().parent == tmp_path / "manifests"
+
+    write_table(tmp_path / "overlay_3.pmvs", {"b": 99})
+    configuration.recipe_output_path(configuration.recipes[5]).unlink()
+
+    cooked = configuration.cook(jobs=1)
+    assert cooked == [configuration.recipes[3], configuration.recipes[5]]
+
+    assert output_values(configuration)[3] == [1, 99]
+    assert configuration.cook(jobs=1, force=True) == configuration.recipes
+
+
+def test_cook_parallel(configuration):
+    configuration.cook(jobs=3)
+
+    assert output_values(configuration) == [[1, 10 + i] for i in range(6)]
+    assert configuration.cook(jobs=3) == []
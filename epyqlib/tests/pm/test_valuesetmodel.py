@@ -1,5 +1,10 @@
+import uuid
+
+import epyqlib.attrsmodel
+import epyqlib.pm.parametermodel
 import epyqlib.pm.valuesetmodel
 import epyqlib.tests.test_attrsmodel
+import epyqlib.treenode
 
 # See file COPYING in this source tree
 __copyright__ = "Copyright 2017, EPC Power Corp."
@@ -11,3 +16,76 @@ TestAttrsModel = epyqlib.attrsmodel.build_tests(
     root_type=epyqlib.pm.valuesetmodel.Root,
     columns=epyqlib.pm.valuesetmodel.columns,
 )
+
+
+class QuerySignal(epyqlib.treenode.TreeNode):
+    def __init__(self, parameter_uuid, parent=None):
+        self.parameter_uuid = parameter_uuid
+        super().__init__(parent=parent)
+
+    def calculated_min_max(self):
+        return -1, 1
+
+
+class QueryMessage(epyqlib.treenode.TreeNode):
+    name = "Parameter Query"
+
+
+def test_copy_parameter_data():
+    parameter_root = epyqlib.pm.parametermodel.Root()
+    parameter_model = epyqlib.attrsmodel.Model(
+        root=parameter_root,
+        columns=epyqlib.pm.parametermodel.columns,
+    )
+    group = epyqlib.pm.parametermodel.Group(name="Group")
+    parameter_root.append_child(group)
+
+    parameters = [
+        epyqlib.pm.parametermodel.Parameter(
+            name="Parameter {}".format(i),
+            minimum=0 if i % 2 == 0 else None,
+            maximum=5,
+            uuid=uuid.uuid4(),
+        )
+        for i in reversed(range(20))
+    ]
+    for parameter in parameters:
+        group.append_child(parameter)
+
+    can_root = epyqlib.treenode.TreeNode()
+    query_message = QueryMessage(parent=can_root)
+    for parameter in parameters:
+        QuerySignal(parameter_uuid=parameter.uuid, parent=query_message)
+
+    value_set = epyqlib.pm.valuesetmodel.create_blank(
+        parameter_model=parameter_model,
+    )
+
+    added = []
+    value_set.model.root.pyqt_signals.children_added.connect(
+        lambda parent, first, last: added.append((first, last)),
+    )
+
+    epyqlib.pm.valuesetmodel.copy_parameter_data(
+        value_set=value_set,
+        calculate_unspecified_min_max=True,
+        can_root=can_root,
+    )
+
+    children = value_set.model.root.children
+    assert added == [(0, 19)]
+    assert children == sorted(children)
+    assert [child.parameter_uuid for child in children] == [
+        parameter.uuid for parameter in sorted(parameters, key=lambda p: p.name)
+    ]
+
+    by_name = {child.name: child for child in children}
+    assert by_name["Parameter 0"].minimum == 0
+    assert by_name["Parameter 1"].minimum == -1
+    assert by_name["Parameter 1"].maximum == 5
+
+    root_item = value_set.model.model.invisibleRootItem()
+    assert [root_item.child(row).text() for row in range(2)] == [
+        "Parameter 0",
+        "Parameter 1",
+    ]
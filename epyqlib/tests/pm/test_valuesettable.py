@@ -0,0 +1,139 @@
+import decimal
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import uuid
+
+import click.testing
+
+import epyqlib.pm.valueset
+import epyqlib.pm.valuesetmodel
+import epyqlib.pm.valuesettable
+
+# See file COPYING in this source tree
+__copyright__ = "Copyright 2017, EPC Power Corp."
+__license__ = "GPLv2+"
+
+
+root = pathlib.Path(epyqlib.__file__).parents[1]
+examples = root / "examples" / "develop"
+
+
+def make_table(values, writable=True):
+    return epyqlib.pm.valuesettable.Table(
+        records=[
+            epyqlib.pm.valuesettable.Record(
+                name=name,
+                value=value,
+                minimum=0,
+                parameter_uuid=uuid.uuid5(uuid.NAMESPACE_URL, name),
+                writable=writable,
+            )
+            for name, value in values
+        ],
+    )
+
+
+def test_import_does_not_load_qt():
+    modules = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            "import sys, epyqlib.pm.valuesettable; print(*sys.modules)",
+        ],
+        cwd=root,
+        universal_newlines=True,
+    ).split()
+
+    assert not any(module.startswith("PyQt5") for module in modules)
+
+
+def test_save_matches_model(tmp_path):
+    path = examples / "small.pmvs"
+
+    model_path = tmp_path / "model.pmvs"
+    epyqlib.pm.valuesetmodel.loadp(path).save(path=model_path)
+
+    table_path = tmp_path / "table.pmvs"
+    table = epyqlib.pm.valuesettable.loadp(path)
+    table.save(path=table_path)
+
+    assert table.records[0].maximum == decimal.Decimal("63")
+    assert table_path.read_text() == model_path.read_text()
+
+
+def test_overlay_and_strip_common_match_model():
+    base = make_table([("a", 1), ("b", 2), ("c", 3)])
+    overlay = make_table([("a", None), ("b", 20), ("d", 4)])
+
+    base_value_set = base.to_value_set()
+    base_value_set.overlay(overlay.to_value_set())
+    base.overlay(overlay)
+
+    assert base.dumps() == base_value_set.to_table().dumps()
+
+    reference = make_table([("a", 1), ("b", 3)])
+
+    base_value_set.strip_common(reference.to_value_set())
+    base.strip_common(reference)
+
+    assert [record.name for record in base.records] == ["b", "c", "d"]
+    assert base.records[0].minimum is None
+    assert base.dumps() == base_value_set.to_table().dumps()
+
+
+def test_loadp_cached(tmp_path):
+    path = tmp_path / "a.pmvs"
+    make_table([("a", 1)]).save(path=path)
+    cache = {}
+
+    first = epyqlib.pm.valuesettable.loadp_cached(path, cache=cache)
+    first.records[0].value = 2
+    second = epyqlib.pm.valuesettable.loadp_cached(path, cache=cache)
+
+    assert len(cache) == 1
+    assert second.records[0].value == 1
+
+
+def test_cook(tmp_path):
+    make_table([("a", 1), ("b", 2)]).save(path=tmp_path / "base.pmvs")
+    make_table([("b", 3)]).save(path=tmp_path / "overlay.pmvs")
+
+    recipes = [
+        {
+            "_type": "valueset_overlay_recipe",
+            "output_path": "{}.pmvs".format(name),
+            "base_pmvs_path": "base.pmvs",
+            "overlay_pmvs_paths": overlays,
+        }
+        for name, overlays in (("plain", []), ("overlaid", ["overlay.pmvs"]))
+    ]
+    configuration_path = tmp_path / "recipes.json"
+    configuration_path.write_text(
+        json.dumps(
+            {
+                "_type": "valueset_overlay_configuration",
+                "output_path": "out",
+                "recipes": recipes,
+            }
+        )
+    )
+
+    result = click.testing.CliRunner().invoke(
+        epyqlib.pm.valueset.cli,
+        [
+            "--configuration",
+            os.fspath(configuration_path),
+            "--manifest-directory",
+            os.fspath(tmp_path / "manifests"),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+
+    plain = epyqlib.pm.valuesettable.loadp(tmp_path / "out" / "plain.pmvs")
+    overlaid = epyqlib.pm.valuesettable.loadp(tmp_path / "out" / "overlaid.pmvs")
+
+    assert [record.value for record in plain.records] == [1, 2]
+    assert [record.value for record in overlaid.records] == [1, 3]
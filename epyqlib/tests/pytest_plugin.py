@@ -14,6 +14,12 @@ def pytest_addoption(parser):
         default=False,
         help="Run tests that require a factory device file",
     )
+    parser.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        default=False,
+        help="Run the hot path benchmarks",
+    )
 
 
 def pytest_collection_modifyitems(config, items):
@@ -32,3 +38,11 @@ def pytest_collection_modifyitems(config, items):
         for item in items:
             if "factory" in item.keywords:
                 item.add_marker(factory)
+
+    if not config.getoption("--run-benchmarks"):
+        benchmarks = pytest.mark.skip(
+            reason="need --run-benchmarks option to run",
+        )
+        for item in items:
+            if "benchmarks" in item.keywords:
+                item.add_marker(benchmarks)
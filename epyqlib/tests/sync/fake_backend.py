@@ -0,0 +1,183 @@
+import hashlib
+import itertools
+import os
+from typing import Dict, List
+
+import attr
+
+import epyqlib.utils.twisted
+from epyqlib.tabs.files.files_utils import partial_suffix
+
+
+class FakeTransferError(Exception):
+    pass
+
+
+@attr.s
+class FakeBackend:
+    """
+    In-process stand-in for the S3 bucket and the GraphQL API. Every request
+    waits `latency` seconds and every chunk of a transfer waits
+    `chunk_latency` seconds. `failures` maps an object key to the number of
+    transfers of it that will fail half way through.
+    """
+
+    latency: float = attr.ib(default=0)
+    chunk_latency: float = attr.ib(default=0)
+    chunk_size: int = attr.ib(default=1024)
+    objects: Dict[str, bytes] = attr.ib(factory=dict)
+    failures: Dict[str, int] = attr.ib(factory=dict)
+    inverters: Dict[str, str] = attr.ib(factory=dict)
+    associations: Dict[str, List[dict]] = attr.ib(factory=dict)
+    downloads: List[tuple] = attr.ib(factory=list)
+    active: int = attr.ib(default=0)
+    maximum_active: int = attr.ib(default=0)
+    _ids = attr.ib(factory=itertools.count)
+
+    def add_file(self, serial_number: str, content: bytes, type: str = "Parameter"):
+        hash = hashlib.md5(content).hexdigest()
+        self.objects["files/" + hash] = content
+        self.inverters.setdefault(serial_number, f"inverter-{serial_number}")
+
+        file = {
+            "id": f"file-{next(self._ids)}",
+            "hash": hash,
+            "type": type,
+            "filename": f"{hash}.bin",
+        }
+        association = {"id": f"association-{next(self._ids)}", "file": file}
+        self.associations.setdefault(serial_number, []).append(association)
+
+        return hash
+
+    async def request(self):
+        self.active += 1
+        self.maximum_active = max(self.maximum_active, self.active)
+        try:
+            await epyqlib.utils.twisted.sleep(self.latency)
+        finally:
+            self.active -= 1
+
+    async def _chunk(self):
+        if self.chunk_latency > 0:
+            await epyqlib.utils.twisted.sleep(self.chunk_latency)
+
+    async def download(self, key: str, filename: str, progress=None):
+        await self.request()
+
+        if key not in self.objects:
+            raise FakeTransferError(f"No such key {key}")
+
+        content = self.objects[key]
+        part = filename + partial_suffix
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        self.downloads.append((key, offset))
+
+        fail_at = None
+        if self.failures.get(key, 0) > 0:
+            self.failures[key] -= 1
+            fail_at = offset + (len(content) - offset) // 2
+
+        self.active += 1
+        self.maximum_active = max(self.maximum_active, self.active)
+        try:
+            with open(part, "ab") as file:
+                for start in range(offset, len(content), self.chunk_size):
+                    await self._chunk()
+                    chunk = content[start : start + self.chunk_size]
+                    file.write(chunk)
+                    if progress is not None:
+                        progress(len(chunk))
+
+                    if fail_at is not None and start + len(chunk) >= fail_at:
+                        raise FakeTransferError(f"Transfer of {key} interrupted")
+        finally:
+            self.active -= 1
+
+        os.replace(part, filename)
+
+    async def upload(self, key: str, source_path: str):
+        await self.request()
+
+        if self.failures.get(key, 0) > 0:
+            self.failures[key] -= 1
+            raise FakeTransferError(f"Upload of {key} failed")
+
+        with open(source_path, "rb") as file:
+            self.objects[key] = file.read()
+
+
+@attr.s
+class FakeBucketManager:
+    backend: FakeBackend = attr.ib()
+
+    async def download_file(self, hash: str, filename: str, progress=None):
+        await self.backend.download("files/" + hash, filename, progress=progress)
+
+    async def download_log(self, hash: str, filename: str, progress=None):
+        await self.backend.download("logs/" + hash, filename, progress=progress)
+
+    async def upload_log(self, source_path: str, dest_filename: str, progress=None):
+        await self.backend.upload("logs/" + dest_filename, source_path)
+        if progress is not None:
+            progress(os.path.getsize(source_path))
+
+    async def fetch_uploaded_log_names(self):
+        return {key[5:] for key in self.backend.objects if key.startswith("logs/")}
+
+
+@attr.s
+class FakeApi:
+    backend: FakeBackend = attr.ib()
+    files: Dict[str, dict] = attr.ib(factory=dict)
+
+    def set_id_token(self, id_token: str):
+        pass
+
+    async def test_connection(self):
+        await self.backend.request()
+
+    async def get_inverter_by_serial(self, serial_number: str):
+        await self.backend.request()
+        return {"id": self.backend.inverters[serial_number]}
+
+    async def get_associations(self, serial_number: str):
+        await self.backend.request()
+        return list(self.backend.associations.get(serial_number, []))
+
+    async def get_associations_for_customer(self):
+        await self.backend.request()
+        return {
+            serial: list(associations)
+            for serial, associations in self.backend.associations.items()
+        }
+
+    async def create_file(self, type, filename: str, hash: str, notes: str = None):
+        await self.backend.request()
+        file = {
+            "id": f"file-{next(self.backend._ids)}",
+            "hash": hash,
+            "type": getattr(type, "value", type),
+            "filename": filename,
+            "notes": notes,
+        }
+        self.files[file["id"]] = file
+        return file
+
+    async def create_association(self, inverterId: str, fileId: str):
+        await self.backend.request()
+        serial = next(
+            serial for serial, id in self.backend.inverters.items() if id == inverterId
+        )
+        association = {
+            "id": f"association-{next(self.backend._ids)}",
+            "file": self.files[fileId],
+        }
+        self.backend.associations.setdefault(serial, []).append(association)
+        return association
+
+    async def subscribe(self, user_customer, callback):
+        pass
+
+    async def unsubscribe(self):
+        pass
@@ -0,0 +1,191 @@
+import hashlib
+import itertools
+import os
+import shutil
+import threading
+import time
+from typing import List
+
+import attr
+import botocore.exceptions
+import botocore.response
+
+
+def _error(code: str, operation: str):
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code, "Message": code}},
+        operation,
+    )
+
+
+class _RangeReader:
+    def __init__(self, file, length: int):
+        self._file = file
+        self._remaining = length
+
+    def read(self, amt=None):
+        if amt is None or amt > self._remaining:
+            amt = self._remaining
+        data = self._file.read(amt)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+@attr.s
+class FilesystemS3Client:
+    """
+    Stand-in for the subset of the boto3 S3 client used by the bucket manager,
+    keeping objects as files under `root`. Every call is recorded in
+    `requests` and sleeps `delay` seconds first to mimic the network.
+    """
+
+    root: str = attr.ib()
+    delay: float = attr.ib(default=0)
+    page_size: int = attr.ib(default=1000)
+    requests: List[tuple] = attr.ib(factory=list)
+    _lock = attr.ib(factory=threading.Lock)
+    _ids = attr.ib(factory=itertools.count)
+
+    def _record(self, *request):
+        with self._lock:
+            self.requests.append(request)
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def requested(self, operation: str):
+        return [request for request in self.requests if request[0] == operation]
+
+    def _path(self, bucket: str, key: str):
+        return os.path.join(self.root, bucket, key)
+
+    def _uploads_path(self, upload_id: str = ""):
+        return os.path.join(self.root, ".uploads", upload_id)
+
+    def pending_uploads(self):
+        path = self._uploads_path()
+        return os.listdir(path) if os.path.exists(path) else []
+
+    def put(self, bucket: str, key: str, content: bytes):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(content)
+
+    def content(self, bucket: str, key: str):
+        with open(self._path(bucket, key), "rb") as file:
+            return file.read()
+
+    def head_object(self, Bucket: str, Key: str):
+        self._record("head_object", Key)
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _error("404", "HeadObject")
+
+        return {"ContentLength": os.path.getsize(path)}
+
+    def get_object(self, Bucket: str, Key: str, Range: str = None):
+        self._record("get_object", Key, Range)
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _error("NoSuchKey", "GetObject")
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        if Range is not None:
+            first, _, last = Range[len("bytes=") :].partition("-")
+            start = int(first)
+            if last != "":
+                end = min(int(last), end)
+
+        file = open(path, "rb")
+        file.seek(start)
+        length = end - start + 1
+
+        return {
+            "ContentLength": length,
+            "Body": botocore.response.StreamingBody(_RangeReader(file, length), length),
+        }
+
+    def put_object(self, Bucket: str, Key: str, Body):
+        self._record("put_object", Key)
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            if isinstance(Body, bytes):
+                file.write(Body)
+            else:
+                shutil.copyfileobj(Body, file)
+
+        return {}
+
+    def create_multipart_upload(self, Bucket: str, Key: str):
+        self._record("create_multipart_upload", Key)
+        upload_id = f"upload-{next(self._ids)}"
+        os.makedirs(self._uploads_path(upload_id))
+
+        return {"UploadId": upload_id}
+
+    def upload_part(
+        self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes
+    ):
+        self._record("upload_part", Key, PartNumber, len(Body))
+        path = os.path.join(self._uploads_path(UploadId), str(PartNumber))
+        with open(path, "wb") as file:
+            file.write(Body)
+
+        return {"ETag": hashlib.md5(Body).hexdigest()}
+
+    def complete_multipart_upload(
+        self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict
+    ):
+        self._record("complete_multipart_upload", Key)
+        upload_path = self._uploads_path(UploadId)
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "wb") as file:
+            for part in MultipartUpload["Parts"]:
+                part_path = os.path.join(upload_path, str(part["PartNumber"]))
+                with open(part_path, "rb") as part_file:
+                    data = part_file.read()
+                if hashlib.md5(data).hexdigest() != part["ETag"]:
+                    raise _error("InvalidPart", "CompleteMultipartUpload")
+                file.write(data)
+
+        shutil.rmtree(upload_path)
+
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str):
+        self._record("abort_multipart_upload", Key)
+        shutil.rmtree(self._uploads_path(UploadId))
+
+        return {}
+
+    def list_objects_v2(
+        self, Bucket: str, Prefix: str = "", ContinuationToken: str = None
+    ):
+        self._record("list_objects_v2", Prefix, ContinuationToken)
+        bucket_path = os.path.join(self.root, Bucket)
+        keys = sorted(
+            os.path.relpath(os.path.join(directory, name), bucket_path).replace(
+                os.sep, "/"
+            )
+            for directory, _, names in os.walk(bucket_path)
+            for name in names
+        )
+        keys = [key for key in keys if key.startswith(Prefix)]
+
+        start = 0 if ContinuationToken is None else int(ContinuationToken)
+        page = keys[start : start + self.page_size]
+        response = {
+            "Contents": [{"Key": key} for key in page],
+            "IsTruncated": start + self.page_size < len(keys),
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = str(start + self.page_size)
+
+        return response
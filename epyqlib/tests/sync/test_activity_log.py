@@ -1,4 +1,5 @@
 import os
+import pickle
 import time
 
 import pytest
@@ -53,12 +54,10 @@ def test_removing(temp_dir):
 def test_writing_to_file(temp_dir):
     activity_log = ActivityLog(temp_dir)
     print(f"Using: {temp_dir}")
-    cache_file = os.path.join(temp_dir, "activity-cache.json")
-    assert not os.path.exists(cache_file)
-
     yield ensureDeferred(activity_log.add(Event.new_push_to_inverter("", "")))
 
-    assert os.path.exists(cache_file)
+    assert os.path.exists(os.path.join(temp_dir, "activity-cache.sqlite"))
+    assert ActivityLog(temp_dir).events_for_serial_number("") == []
 
 
 @pytest.inlineCallbacks
@@ -77,6 +76,54 @@ def test_writing_and_reading_from_file(temp_dir):
     assert event1.inverter_id == event2.inverter_id
 
 
+@pytest.inlineCallbacks
+def test_removal_persists(temp_dir):
+    activity_log = ActivityLog(temp_dir)
+    first = Event.new_push_to_inverter("first", "")
+    second = Event.new_push_to_inverter("second", "")
+    yield ensureDeferred(activity_log.add(first))
+    yield ensureDeferred(activity_log.add(second))
+
+    activity_log.remove(first)
+
+    activity_log = ActivityLog(temp_dir)
+    activity_log._read_cache_file()
+    assert activity_log._activity_cache == [second]
+
+
+@pytest.inlineCallbacks
+def test_lookups(temp_dir):
+    activity_log = ActivityLog(temp_dir)
+    log = Event.new_raw_log("inverter", "user", "build", "serial", "log", "hash")
+    yield ensureDeferred(activity_log.add(log))
+    yield ensureDeferred(activity_log.add(Event.new_push_to_inverter("inverter", "")))
+
+    assert activity_log.events_for_serial_number("serial") == [log]
+    assert activity_log.events_for_file_hash("hash") == [log]
+    assert activity_log.events_for_file_hash("other") == []
+
+
+def test_import_pickle_file(temp_dir):
+    events = [
+        Event.new_push_to_inverter("first", ""),
+        Event.new_fault_cleared("second", "", 7),
+    ]
+    cache_file = os.path.join(temp_dir, "activity-cache.json")
+    with open(cache_file, "wb") as file:
+        pickle.dump(events, file)
+
+    activity_log = ActivityLog(temp_dir)
+    activity_log._read_cache_file()
+
+    assert activity_log._activity_cache == events
+    assert not os.path.exists(cache_file)
+
+    # Imported only once
+    activity_log = ActivityLog(temp_dir)
+    activity_log._read_cache_file()
+    assert activity_log._activity_cache == events
+
+
 @pytest.inlineCallbacks
 @pytest.mark.skip("Just here for benchmarking to make sure it's not too slow")
 def test_benchmark_mass_writes(temp_dir):
@@ -0,0 +1,64 @@
+import json
+import os
+
+from epyqlib.tabs.files.association_cache import AssociationCache
+
+# noinspection PyUnresolvedReferences
+from epyqlib.tests.utils.test_fixtures import temp_dir
+
+
+def association(id: str, hash: str, type: str = "Parameter"):
+    return {"id": id, "file": {"id": "file-" + id, "hash": hash, "type": type}}
+
+
+def test_put_and_get(temp_dir):
+    cache = AssociationCache.init(temp_dir)
+    associations = [association("a", "1"), association("b", "2")]
+
+    assert cache.get_associations("0") is None
+    cache.put_associations("0", associations)
+    cache.put_associations("1", [])
+
+    assert cache.get_associations("0") == associations
+    assert cache.get_associations("1") == []
+
+    cache.put_associations("0", associations[1:])
+    assert AssociationCache.init(temp_dir).get_associations("0") == associations[1:]
+
+    cache.clear()
+    assert cache.get_associations("0") is None
+
+
+def test_lookups_by_hash(temp_dir):
+    cache = AssociationCache.init(temp_dir)
+    cache.put_associations(
+        "0",
+        [
+            association("a", "1"),
+            association("b", "2"),
+            association("c", "3", type="Log"),
+            {"id": "d", "file": None},
+        ],
+    )
+    cache.put_associations("1", [association("e", "1")])
+
+    assert cache.get_all_known_file_hashes() == {"1", "2"}
+    assert cache.get_associations_for_hash("1") == {
+        "0": [association("a", "1")],
+        "1": [association("e", "1")],
+    }
+    assert cache.get_associations_for_hash("4") == {}
+
+
+def test_import_json_file(temp_dir):
+    associations = {"0": [association("a", "1")], "1": []}
+    cache_file = os.path.join(temp_dir, "associations-cache.json")
+    with open(cache_file, "w") as file:
+        json.dump(associations, file)
+
+    cache = AssociationCache.init(temp_dir)
+
+    assert not os.path.exists(cache_file)
+    assert cache.get_associations("0") == associations["0"]
+    assert cache.get_associations("1") == []
+    assert cache.get_all_known_file_hashes() == {"1"}
@@ -0,0 +1,174 @@
+import os
+
+import pytest
+import pytest_twisted
+import twisted.internet.defer
+import twisted.internet.task
+from twisted.internet.defer import ensureDeferred
+
+import epyqlib.utils.twisted
+from epyqlib.tabs.files.bucket_manager import BucketManager
+from epyqlib.tabs.files.files_utils import partial_suffix
+from epyqlib.tests.sync.fake_s3 import FilesystemS3Client
+
+# noinspection PyUnresolvedReferences
+from epyqlib.tests.utils.test_fixtures import temp_dir
+
+bucket = BucketManager._bucket_name
+
+
+@pytest.fixture
+def client(temp_dir):
+    return FilesystemS3Client(root=os.path.join(temp_dir, "s3"))
+
+
+@pytest.fixture
+def manager(client):
+    pool = epyqlib.utils.twisted.WorkerPool(name="test-bucket", maximum=2)
+    manager = BucketManager(s3_client=client, pool=pool)
+    manager._chunk_size = 64
+    manager._part_size = 1000
+    manager._multipart_threshold = 1000
+
+    yield manager
+
+    pool.stop()
+
+
+def content(size):
+    return bytes(i % 251 for i in range(size))
+
+
+@pytest_twisted.inlineCallbacks
+def test_download_in_ranges(manager, client, temp_dir):
+    client.put(bucket, "files/abc", content(4500))
+    filename = os.path.join(temp_dir, "abc")
+    progress = []
+
+    yield ensureDeferred(manager.download_file("abc", filename, progress.append))
+
+    with open(filename, "rb") as file:
+        assert file.read() == content(4500)
+    assert not os.path.exists(filename + partial_suffix)
+
+    ranges = [request[2] for request in client.requested("get_object")]
+    assert ranges == [
+        "bytes=0-999",
+        "bytes=1000-1999",
+        "bytes=2000-2999",
+        "bytes=3000-3999",
+        "bytes=4000-4499",
+    ]
+    assert max(progress) <= manager._chunk_size
+    assert sum(progress) == 4500
+
+
+@pytest_twisted.inlineCallbacks
+def test_download_resumes_partial_file(manager, client, temp_dir):
+    client.put(bucket, "files/abc", content(2500))
+    filename = os.path.join(temp_dir, "abc")
+    with open(filename + partial_suffix, "wb") as file:
+        file.write(content(1200))
+
+    yield ensureDeferred(manager.download_file("abc", filename))
+
+    with open(filename, "rb") as file:
+        assert file.read() == content(2500)
+
+    ranges = [request[2] for request in client.requested("get_object")]
+    assert ranges == ["bytes=1200-2199", "bytes=2200-2499"]
+
+
+@pytest_twisted.inlineCallbacks
+def test_small_upload_puts_object(manager, client, temp_dir):
+    source = os.path.join(temp_dir, "log")
+    with open(source, "wb") as file:
+        file.write(content(100))
+
+    yield ensureDeferred(manager.upload_log(source, "abc"))
+
+    assert client.content(bucket, "logs/abc") == content(100)
+    assert len(client.requested("put_object")) == 1
+    assert client.requested("create_multipart_upload") == []
+
+
+@pytest_twisted.inlineCallbacks
+def test_large_upload_streams_parts(manager, client, temp_dir):
+    source = os.path.join(temp_dir, "log")
+    with open(source, "wb") as file:
+        file.write(content(3500))
+    progress = []
+
+    yield ensureDeferred(manager.upload_log(source, "abc", progress.append))
+
+    assert client.content(bucket, "logs/abc") == content(3500)
+    parts = client.requested("upload_part")
+    assert [(number, size) for _, _, number, size in parts] == [
+        (1, 1000),
+        (2, 1000),
+        (3, 1000),
+        (4, 500),
+    ]
+    assert progress == [1000, 1000, 1000, 500]
+    assert client.pending_uploads() == []
+
+
+@pytest_twisted.inlineCallbacks
+def test_cancel_upload_aborts(manager, client, temp_dir):
+    client.delay = 0.02
+    source = os.path.join(temp_dir, "log")
+    with open(source, "wb") as file:
+        file.write(content(10000))
+
+    deferred = ensureDeferred(
+        manager.upload_log(source, "abc", lambda count: deferred.cancel())
+    )
+
+    with pytest.raises(twisted.internet.defer.CancelledError):
+        yield deferred
+
+    # the worker notices the cancellation between parts
+    async def aborted():
+        return client.pending_uploads() == []
+
+    yield ensureDeferred(
+        epyqlib.utils.twisted.wait_for(aborted, period=0.01, timeout=5)
+    )
+    assert len(client.requested("abort_multipart_upload")) == 1
+    assert len(client.requested("upload_part")) < 10
+    assert not os.path.exists(os.path.join(client.root, bucket, "logs", "abc"))
+
+
+@pytest_twisted.inlineCallbacks
+def test_transfers_do_not_block_reactor(manager, client, temp_dir):
+    client.delay = 0.05
+    client.put(bucket, "files/abc", content(3000))
+    ticks = []
+
+    def tick():
+        ticks.append(len(client.requests))
+
+    repeater = twisted.internet.task.LoopingCall(tick)
+    repeater.start(0.01)
+    try:
+        yield ensureDeferred(
+            manager.download_file("abc", os.path.join(temp_dir, "abc"))
+        )
+    finally:
+        repeater.stop()
+
+    # the reactor kept running between the blocking requests
+    assert len(set(ticks)) > 2
+
+
+@pytest_twisted.inlineCallbacks
+def test_fetch_uploaded_log_names_pages(manager, client):
+    client.page_size = 2
+    for name in ["a", "b", "c", "d", "e"]:
+        client.put(bucket, "logs/" + name, b"")
+    client.put(bucket, "files/f", b"")
+
+    names = yield ensureDeferred(manager.fetch_uploaded_log_names())
+
+    assert names == {"a", "b", "c", "d", "e"}
+    assert len(client.requested("list_objects_v2")) == 3
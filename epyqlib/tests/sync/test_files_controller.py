@@ -1,11 +1,17 @@
+import hashlib
+import os
 from unittest.mock import MagicMock
 
 import pytest
+import pytest_twisted
 from twisted.internet.defer import ensureDeferred
 
 from epyqlib.tabs.files.files_manager import FilesManager
-from epyqlib.tabs.files.files_controller import FilesController
+from epyqlib.tabs.files.files_controller import AssociationMapping, FilesController
 from epyqlib.tabs.files.filesview import FilesView
+from epyqlib.tabs.files.log_manager import LogManager
+from epyqlib.tabs.files.sync_config import SyncConfig
+from epyqlib.tests.sync.fake_backend import FakeApi, FakeBackend, FakeBucketManager
 
 # noinspection PyUnresolvedReferences
 from epyqlib.tests.utils.test_fixtures import temp_dir
@@ -39,3 +45,132 @@ def test_get_file(temp_dir):
     # assert output is None
 
     assert controller.cache_manager.has_hash(hash) is True
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend(chunk_latency=0.001, chunk_size=16)
+
+
+@pytest.fixture
+def controller(temp_dir, backend):
+    SyncConfig._instance = SyncConfig(directory=temp_dir)
+
+    controller = FilesController(MagicMock(spec=FilesView))
+    controller.api = FakeApi(backend)
+    controller.bucket_manager = FakeBucketManager(backend)
+    controller.transfers.parallelism = 3
+    controller.transfers.sleep = no_sleep
+
+    yield controller
+
+    SyncConfig._instance = None
+
+
+async def no_sleep(seconds):
+    pass
+
+
+def add_files(controller, backend, count):
+    hashes = []
+    for i in range(count):
+        hash = backend.add_file("0", b"%d" % i * 100)
+        hashes.append(hash)
+
+    for association in backend.associations["0"]:
+        key = association["id"] + association["file"]["id"]
+        controller.associations[key] = AssociationMapping(association, MagicMock())
+
+    return hashes
+
+
+@pytest_twisted.inlineCallbacks
+def test_sync_files_in_parallel(controller, backend):
+    hashes = add_files(controller, backend, 8)
+
+    yield ensureDeferred(controller._sync_files())
+
+    assert all(controller.cache_manager.has_hash(hash) for hash in hashes)
+    assert backend.maximum_active == controller.transfers.parallelism
+    assert controller.view.show_check_icon.call_count == len(hashes)
+
+
+@pytest_twisted.inlineCallbacks
+def test_sync_file_resumes_interrupted_download(controller, backend):
+    (hash,) = add_files(controller, backend, 1)
+    backend.failures["files/" + hash] = 1
+
+    yield ensureDeferred(controller._sync_files())
+
+    (first, second) = backend.downloads
+    assert first == ("files/" + hash, 0)
+    assert second[1] > 0
+
+    with open(controller.cache_manager.get_file_path(hash), "rb") as file:
+        assert hashlib.md5(file.read()).hexdigest() == hash
+    assert controller.cache_manager.hashes() == [hash]
+
+
+@pytest_twisted.inlineCallbacks
+def test_sync_all_reports_failed_files(controller, backend):
+    hashes = add_files(controller, backend, 4)
+    backend.failures["files/" + hashes[0]] = controller.transfers.attempts
+
+    yield ensureDeferred(controller.sync_all())
+
+    assert not controller.cache_manager.has_hash(hashes[0])
+    assert all(controller.cache_manager.has_hash(hash) for hash in hashes[1:])
+    controller.view.add_log_error_line.assert_called_once()
+    assert hashes[0] in controller.view.add_log_error_line.call_args[0][0]
+
+
+@pytest_twisted.inlineCallbacks
+def test_sync_pending_logs_concurrently(controller, backend, temp_dir):
+    backend.latency = 0.01
+    backend.inverters["0"] = "inverter-0"
+    controller.view.pending_log_rows = {}
+
+    for i in range(5):
+        source = os.path.join(temp_dir, f"log{i}.raw")
+        with open(source, "wb") as file:
+            file.write(b"log %d" % i)
+
+        yield ensureDeferred(
+            controller.log_manager.add_pending_log(source, "build", "0")
+        )
+
+    for log in controller.log_manager.get_pending_logs():
+        controller.view.pending_log_rows[log.hash] = MagicMock()
+
+    yield ensureDeferred(controller._sync_pending_logs())
+
+    assert controller.log_manager.get_pending_logs() == []
+    assert len(backend.associations["0"]) == 5
+    assert len(controller.associations) == 5
+    assert backend.maximum_active == controller.transfers.parallelism
+
+
+@pytest_twisted.inlineCallbacks
+def test_sync_pending_logs_drops_corrupt_log(controller, backend, temp_dir):
+    backend.inverters["0"] = "inverter-0"
+    source = os.path.join(temp_dir, "log.raw")
+    with open(source, "wb") as file:
+        file.write(b"log")
+
+    yield ensureDeferred(controller.log_manager.add_pending_log(source, "build", "0"))
+    (log,) = controller.log_manager.get_pending_logs()
+    row = MagicMock()
+    controller.view.pending_log_rows = {log.hash: row}
+
+    # The disk went bad while the application wasn't running
+    with open(controller.log_manager.get_path_to_log(log.hash), "wb") as file:
+        file.write(b"lag")
+    controller.log_manager = LogManager.init(controller.sync_config.cache_dir)
+    (log,) = controller.log_manager.get_pending_logs()
+
+    yield ensureDeferred(controller._sync_pending_logs())
+
+    assert controller.log_manager.get_pending_logs() == []
+    assert "logs/" + log.hash not in backend.objects
+    row.parent().removeChild.assert_called_once_with(row)
+    controller.view.add_log_error_line.assert_called_once()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+from os import path
+
+import pytest_twisted
+from twisted.internet.defer import ensureDeferred
+
+from epyqlib.tabs.files import content_store
+from epyqlib.tabs.files.content_store import ContentStore
+from epyqlib.tabs.files.files_utils import partial_suffix
+from epyqlib.tabs.files.log_manager import LogManager
+
+# noinspection PyUnresolvedReferences
+from epyqlib.tests.utils.test_fixtures import temp_dir
+
+
+def write(file_path: str, content: bytes):
+    with open(file_path, "wb") as file:
+        file.write(content)
+
+    return hashlib.md5(content).hexdigest()
+
+
+def test_copy_and_hash(temp_dir, monkeypatch):
+    # Spans several buffers with a partial one at the end
+    monkeypatch.setattr(content_store, "buffer_size", 1000)
+    content = os.urandom(3500)
+    source = path.join(temp_dir, "source")
+    expected = write(source, content)
+
+    hash = content_store.copy_and_hash(source, path.join(temp_dir, "copy"))
+
+    assert hash == expected
+    with open(path.join(temp_dir, "copy"), "rb") as file:
+        assert file.read() == content
+    assert content_store.hash_file(source) == expected
+
+
+def test_store_deduplicates(temp_dir):
+    store = ContentStore(path.join(temp_dir, "store"))
+    first = path.join(temp_dir, "first")
+    second = path.join(temp_dir, "second")
+    hash = write(first, b"same")
+    write(second, b"same")
+
+    assert store.add(first) == hash
+    assert store.add(second) == hash
+
+    assert store.hashes() == [hash]
+    assert store.get_path(hash) == path.join(temp_dir, "store", hash[:2], hash)
+    assert os.listdir(path.join(temp_dir, "store")) == [hash[:2]]
+
+
+def test_store_verifies_lazily(temp_dir):
+    source = path.join(temp_dir, "source")
+    hash = write(source, b"content")
+
+    store = ContentStore(path.join(temp_dir, "store"))
+    store.add(source)
+    write(store.get_path(hash), b"corrupted")
+
+    # Written and hashed by this store so not checked again
+    assert store.verify(hash)
+
+    reopened = ContentStore(path.join(temp_dir, "store"))
+    assert not reopened.verify(hash)
+    assert not reopened.verify("0" * 32)
+
+
+def test_migrate_flat_layout(temp_dir):
+    logs_dir = path.join(temp_dir, "pending_logs")
+    os.makedirs(logs_dir)
+    hash = write(path.join(logs_dir, "placeholder"), b"log")
+    os.rename(path.join(logs_dir, "placeholder"), path.join(logs_dir, hash))
+    write(path.join(logs_dir, "interrupted" + partial_suffix), b"lo")
+
+    log = {"hash": hash, "filename": "a.log", "build_id": "1", "serial_number": "2"}
+    with open(path.join(temp_dir, "pending-logs.json"), "w") as file:
+        json.dump([log, log], file)
+
+    manager = LogManager.init(temp_dir)
+
+    assert [log.hash for log in manager.get_pending_logs()] == [hash]
+    assert os.listdir(logs_dir) == [hash[:2]]
+    assert manager.verify_log(hash)
+
+    with open(path.join(temp_dir, "pending-logs.json")) as file:
+        assert len(json.load(file)) == 1
+
+
+@pytest_twisted.inlineCallbacks
+def test_add_pending_log_once(temp_dir):
+    manager = LogManager.init(path.join(temp_dir, "files"))
+    added = []
+    manager.add_listener(added.append)
+
+    source = path.join(temp_dir, "a.log")
+    hash = write(source, b"log")
+
+    yield ensureDeferred(manager.add_pending_log(source, "1", "2"))
+    yield ensureDeferred(manager.add_pending_log(source, "1", "2"))
+
+    assert [log.hash for log in added] == [hash]
+    assert [log.hash for log in manager.get_pending_logs()] == [hash]
+
+    with open(manager.get_path_to_log(hash), "rb") as file:
+        assert file.read() == b"log"
+
+    manager.remove_pending(added[0])
+    assert not path.exists(manager.get_path_to_log(hash))
+
+
+@pytest_twisted.inlineCallbacks
+def test_add_synced_log_skipped(temp_dir):
+    manager = LogManager.init(path.join(temp_dir, "files"))
+    added = []
+    manager.add_listener(added.append)
+
+    source = path.join(temp_dir, "a.log")
+    hash = write(source, b"log")
+    manager.is_synced = {hash}.__contains__
+
+    yield ensureDeferred(manager.add_pending_log(source, "1", "2"))
+
+    assert added == []
+    assert manager.get_pending_logs() == []
+    assert not path.exists(manager.get_path_to_log(hash))
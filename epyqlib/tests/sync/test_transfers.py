@@ -0,0 +1,75 @@
+import pytest
+import pytest_twisted
+from twisted.internet.defer import ensureDeferred
+
+import epyqlib.utils.twisted
+from epyqlib.tabs.files.transfers import TransferPipeline
+
+
+@pytest_twisted.inlineCallbacks
+def test_parallelism_is_bounded():
+    active = []
+    peak = []
+
+    async def transfer(item, report):
+        active.append(item)
+        peak.append(len(active))
+        await epyqlib.utils.twisted.sleep(0.01)
+        report(item)
+        active.remove(item)
+
+    pipeline = TransferPipeline(parallelism=3)
+    progress = []
+    pipeline.add_listener(progress.append)
+
+    result = yield ensureDeferred(pipeline.run(range(10), transfer))
+
+    assert result.succeeded == list(range(10))
+    assert result.failed == {}
+    assert max(peak) == 3
+
+    assert progress[-1].completed == 10
+    assert progress[-1].active == 0
+    assert progress[-1].bytes == sum(range(10))
+
+
+@pytest_twisted.inlineCallbacks
+def test_retries_with_backoff():
+    attempts = {}
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    async def transfer(item, report):
+        attempts[item] = attempts.get(item, 0) + 1
+        if item == "flaky" and attempts[item] < 3:
+            raise Exception("flaky")
+        if item == "broken":
+            raise ValueError("broken")
+
+    pipeline = TransferPipeline(
+        attempts=3,
+        backoff=1,
+        backoff_factor=3,
+        maximum_backoff=2,
+        sleep=sleep,
+    )
+    progress = []
+    pipeline.add_listener(progress.append)
+
+    result = yield ensureDeferred(
+        pipeline.run(["flaky", "broken", "fine"], transfer),
+    )
+
+    assert result.succeeded == ["flaky", "fine"]
+    assert list(result.failed) == ["broken"]
+    assert attempts == {"flaky": 3, "broken": 3, "fine": 1}
+    assert sorted(delays) == [1, 1, 2, 2]
+
+    final = progress[-1]
+    assert (final.completed, final.failed, final.retries) == (2, 1, 4)
+    assert final.finished == final.total == 3
+
+    with pytest.raises(ValueError):
+        result.raise_first_failure()
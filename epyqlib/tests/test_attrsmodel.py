@@ -638,6 +638,39 @@ def test_children_changed_signals():
     assert removed_items == [(group, parameter, 0)]
 
 
+def test_bulk_children_changed_signals():
+    model = make_a_model()
+
+    group = node_from_name(model, "Group C")
+
+    ranges = []
+    group.pyqt_signals.children_added.connect(
+        lambda parent, first, last: ranges.append((parent, first, last)),
+    )
+
+    parameters = [Parameter(name=str(i)) for i in range(5)]
+    group.append_children(parameters)
+
+    assert ranges == [(group, 0, 4)]
+    assert all(parameter.uuid is not None for parameter in parameters)
+
+    group_item = model.item_from_node(group)
+    assert [group_item.child(row).text() for row in range(5)] == [
+        "0",
+        "1",
+        "2",
+        "3",
+        "4",
+    ]
+
+    removed = group.remove_children(row=1, count=3)
+
+    assert removed == parameters[1:4]
+    assert group.children == [parameters[0], parameters[4]]
+    assert [group_item.child(row).text() for row in range(2)] == ["0", "4"]
+    assert model.uuid_to_node.get(parameters[2].uuid) is None
+
+
 @graham.schemify(tag="pass_through")
 @epyqlib.attrsmodel.ify()
 @epyqlib.utils.qt.pyqtify()
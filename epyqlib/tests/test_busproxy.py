@@ -0,0 +1,204 @@
+import itertools
+import random
+import time
+
+import can
+import pytest
+
+import epyqlib.busproxy
+import epyqlib.canneo
+
+
+def accepted(filters, id, extended):
+    if filters is None:
+        return True
+
+    return any(
+        f["extended"] == extended and (id & f["can_mask"]) == f["can_id"]
+        for f in filters
+    )
+
+
+class Listener:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def can_filter_ids(self):
+        return self.ids
+
+
+def test_no_ids_accepts_all():
+    assert epyqlib.busproxy.can_filters_from_ids(ids=None) is None
+    assert epyqlib.busproxy.can_filters_from_ids(ids=()) is None
+
+
+def test_exact_merge():
+    node_id = 0x47
+    ids = {((0x1FF00 | message) << 8 | node_id, True) for message in range(8)}
+
+    filters = epyqlib.busproxy.can_filters_from_ids(ids=ids)
+
+    assert filters == [
+        {"can_id": 0x1FF0000 | node_id, "can_mask": 0x1FFFF8FF, "extended": True},
+    ]
+
+
+def test_exact_merge_accepts_nothing_extra():
+    ids = {(0x100, False), (0x101, False), (0x103, False), (0x18FF0047, True)}
+
+    filters = epyqlib.busproxy.can_filters_from_ids(ids=ids)
+
+    for id in range(0x800):
+        assert accepted(filters, id, extended=False) == ((id, False) in ids)
+
+    assert accepted(filters, 0x18FF0047, extended=True)
+    assert not accepted(filters, 0x100, extended=True)
+    assert not accepted(filters, 0x18FF0048, extended=True)
+
+
+@pytest.mark.parametrize("maximum", [1, 2, 5])
+def test_maximum_filters(maximum):
+    ids = {
+        (id, extended)
+        for id, extended in itertools.product(range(0, 400, 7), (False, True))
+    }
+
+    filters = epyqlib.busproxy.can_filters_from_ids(ids=ids, maximum=maximum)
+
+    assert len(filters) <= max(maximum, 2)
+    for id, extended in ids:
+        assert accepted(filters, id, extended=extended)
+
+
+def test_many_ids_merge_quickly():
+    ids = {(id, True) for id in random.Random(0).sample(range(1 << 29), 2000)}
+
+    start = time.perf_counter()
+    filters = epyqlib.busproxy.can_filters_from_ids(ids=ids)
+    assert time.perf_counter() - start < 5
+
+    assert len(filters) <= epyqlib.busproxy.default_maximum_filters
+    for id, extended in ids:
+        assert accepted(filters, id, extended=extended)
+
+
+def test_filters_updated_once_per_batch(qtbot, monkeypatch):
+    real_bus = can.interface.Bus(bustype="virtual", channel="test_busproxy")
+    proxy = epyqlib.busproxy.BusProxy(bus=real_bus)
+
+    applied = []
+    monkeypatch.setattr(
+        real_bus, "set_filters", lambda filters: applied.append(filters)
+    )
+
+    try:
+        for id in range(100):
+            proxy.notifier.add(Listener(ids={(id, False)}))
+
+        assert applied == []
+        qtbot.waitUntil(lambda: len(applied) == 1)
+        assert applied == [proxy.applied_filters]
+        for id in range(100):
+            assert accepted(proxy.applied_filters, id, extended=False)
+    finally:
+        proxy.terminate()
+        real_bus.shutdown()
+
+
+def test_listener_without_ids_disables_filtering(qtbot):
+    real_bus = can.interface.Bus(bustype="virtual", channel="test_busproxy")
+    proxy = epyqlib.busproxy.BusProxy(bus=real_bus)
+
+    try:
+        a = Listener(ids={(0x123, False)})
+        proxy.notifier.add(a)
+        qtbot.waitUntil(
+            lambda: proxy.applied_filters
+            == [{"can_id": 0x123, "can_mask": 0x7FF, "extended": False}]
+        )
+
+        b = object()
+        proxy.notifier.add(b)
+        qtbot.waitUntil(lambda: proxy.applied_filters is None)
+
+        proxy.notifier.discard(b)
+        qtbot.waitUntil(lambda: proxy.applied_filters is not None)
+    finally:
+        proxy.terminate()
+        real_bus.shutdown()
+
+
+def test_nested_proxies_share_filters(qtbot):
+    real_bus = can.interface.Bus(bustype="virtual", channel="test_busproxy")
+    outer = epyqlib.busproxy.BusProxy(bus=real_bus)
+    inner = epyqlib.busproxy.BusProxy(bus=outer)
+
+    try:
+        inner.notifier.add(Listener(ids={(0x10, False)}))
+        outer.notifier.add(Listener(ids={(0x11, False)}))
+
+        qtbot.waitUntil(
+            lambda: outer.applied_filters
+            == [{"can_id": 0x10, "can_mask": 0x7FE, "extended": False}]
+        )
+
+        inner.set_bus()
+
+        qtbot.waitUntil(
+            lambda: outer.applied_filters
+            == [{"can_id": 0x11, "can_mask": 0x7FF, "extended": False}]
+        )
+    finally:
+        outer.terminate()
+        real_bus.shutdown()
+
+
+class RoutedListener(epyqlib.canneo.QtCanListener):
+    def __init__(self, ids):
+        super().__init__(receiver=self.message_received)
+        self.ids = ids
+        self.received = []
+
+    def can_filter_ids(self):
+        return self.ids
+
+    def message_received(self, message):
+        self.received.append(message.arbitration_id)
+
+
+def test_notifier_routes_by_id(qtbot):
+    channel = epyqlib.busproxy.BusProxy()
+    devices = {
+        node_id: epyqlib.busproxy.BusProxy(bus=channel) for node_id in (0x41, 0x42)
+    }
+
+    listeners = {}
+    for node_id, device in devices.items():
+        listener = RoutedListener(ids={(0x18FF0000 | node_id, True)})
+        device.notifier.add(listener)
+        listeners[node_id] = listener
+
+    everything = RoutedListener(ids=None)
+    channel.notifier.add(everything)
+
+    try:
+        for id in (0x18FF0041, 0x18FF0042, 0x18FF0043):
+            channel.notifier.message_received(
+                can.Message(arbitration_id=id, is_extended_id=True),
+            )
+
+        assert listeners[0x41].received == [0x18FF0041]
+        assert listeners[0x42].received == [0x18FF0042]
+        assert everything.received == [0x18FF0041, 0x18FF0042, 0x18FF0043]
+
+        listeners[0x41].ids = {(0x18FF0043, True)}
+        devices[0x41].update_filters()
+        channel.notifier.message_received(
+            can.Message(arbitration_id=0x18FF0043, is_extended_id=True),
+        )
+
+        assert listeners[0x41].received == [0x18FF0041, 0x18FF0043]
+    finally:
+        for device in devices.values():
+            device.terminate()
+        channel.terminate()
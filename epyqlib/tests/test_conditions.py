@@ -0,0 +1,263 @@
+import canmatrix
+import pytest
+import twisted.internet.task
+
+import epyqlib.canneo
+import epyqlib.conditions
+import epyqlib.utils.twisted
+
+
+def matrix_frame():
+    matrix_frame = canmatrix.Frame(
+        name="Test",
+        arbitration_id=canmatrix.ArbitrationId(id=0x123, extended=False),
+        size=8,
+    )
+    matrix_frame.add_signal(canmatrix.Signal(name="A", start_bit=0, size=16))
+    matrix_frame.add_signal(canmatrix.Signal(name="B", start_bit=16, size=16))
+
+    return matrix_frame
+
+
+@pytest.fixture
+def frame(qapp):
+    return epyqlib.canneo.Frame(frame=matrix_frame())
+
+
+@pytest.fixture
+def signals(frame):
+    return frame.signal_by_name("A"), frame.signal_by_name("B")
+
+
+@pytest.fixture
+def unset_signals(qapp):
+    # as for a frame that has not been received yet
+    frame = epyqlib.canneo.Frame(frame=matrix_frame(), set_value_to_default=False)
+
+    return frame.signal_by_name("A"), frame.signal_by_name("B")
+
+
+@pytest.fixture
+def clock():
+    return twisted.internet.task.Clock()
+
+
+def result(deferred):
+    results = []
+    deferred.addBoth(results.append)
+
+    return results
+
+
+def test_resolves_on_value_set(signals, clock):
+    a, _ = signals
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            epyqlib.conditions.value(a) == 7,
+            timeout=1,
+            reactor=clock,
+        )
+    )
+
+    a.set_value(3)
+    assert results == []
+
+    a.set_value(7)
+    assert results == [None]
+    assert clock.getDelayedCalls() == []
+
+
+def test_already_satisfied(signals, clock):
+    a, _ = signals
+    a.set_value(7)
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            epyqlib.conditions.value(a) == 7,
+            reactor=clock,
+        )
+    )
+
+    assert results == [None]
+
+
+def test_not_initial_waits_for_update(signals, clock):
+    a, _ = signals
+    a.set_value(7)
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            epyqlib.conditions.value(a) == 7,
+            initial=False,
+            reactor=clock,
+        )
+    )
+
+    assert results == []
+
+    a.set_value(7)
+    assert results == [None]
+
+
+def test_timeout(signals, clock):
+    a, _ = signals
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            epyqlib.conditions.value(a) == 7,
+            timeout=1,
+            message="a is not 7",
+            reactor=clock,
+        )
+    )
+
+    clock.advance(1)
+
+    (failure,) = results
+    assert failure.check(epyqlib.utils.twisted.WaitForTimedOut)
+    assert str(failure.value) == "a is not 7"
+
+    a.set_value(7)
+    assert len(results) == 1
+
+
+def test_and_or_not(signals, clock):
+    a, b = signals
+    a_value = epyqlib.conditions.value(a)
+    b_value = epyqlib.conditions.value(b)
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            ((a_value > 5) & ~(b_value == 0)) | (b_value == 100),
+            reactor=clock,
+        )
+    )
+
+    a.set_value(10)
+    assert results == []
+
+    b.set_value(1)
+    assert results == [None]
+
+    a.set_value(0)
+    b.set_value(0)
+    results = result(
+        epyqlib.conditions.wait_for(
+            ((a_value > 5) & ~(b_value == 0)) | (b_value == 100),
+            reactor=clock,
+        )
+    )
+
+    b.set_value(100)
+    assert results == [None]
+
+
+def test_edge(signals, clock):
+    a, _ = signals
+    a.set_value(10)
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            epyqlib.conditions.Edge(predicate=epyqlib.conditions.value(a) > 5),
+            reactor=clock,
+        )
+    )
+
+    a.set_value(11)
+    assert results == []
+
+    a.set_value(0)
+    assert results == []
+
+    a.set_value(6)
+    assert results == [None]
+
+
+def test_waits_for_first_value(unset_signals, clock):
+    a, _ = unset_signals
+    assert a.value is None
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            epyqlib.conditions.value(a) == 7,
+            reactor=clock,
+        )
+    )
+    assert results == []
+
+    a.set_value(7)
+    assert results == [None]
+
+
+def test_edge_first_value_is_transition(unset_signals, clock):
+    a, b = unset_signals
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            epyqlib.conditions.Edge(
+                predicate=(
+                    (epyqlib.conditions.value(a) > 5)
+                    & (epyqlib.conditions.value(b) > 5)
+                ),
+            ),
+            reactor=clock,
+        )
+    )
+
+    a.set_value(6)
+    assert results == []
+
+    b.set_value(6)
+    assert results == [None]
+
+
+def test_hold_for(signals, clock):
+    a, _ = signals
+
+    results = result(
+        epyqlib.conditions.wait_for(
+            epyqlib.conditions.HoldFor(
+                predicate=epyqlib.conditions.value(a) == 1,
+                duration=0.5,
+            ),
+            reactor=clock,
+        )
+    )
+
+    a.set_value(1)
+    clock.advance(0.3)
+    a.set_value(0)
+    clock.advance(0.3)
+    assert results == []
+
+    a.set_value(1)
+    clock.advance(0.4)
+    a.set_value(1)
+    assert results == []
+
+    clock.advance(0.1)
+    assert results == [None]
+
+
+def test_cancel_disconnects(signals, clock):
+    a, _ = signals
+
+    deferred = epyqlib.conditions.wait_for(
+        epyqlib.conditions.value(a) == 7,
+        timeout=1,
+        reactor=clock,
+    )
+    deferred.addErrback(lambda failure: None)
+    deferred.cancel()
+
+    assert clock.getDelayedCalls() == []
+    a.set_value(7)
+
+
+def test_predicate_requires_evaluate():
+    class Incomplete(epyqlib.conditions.Predicate):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
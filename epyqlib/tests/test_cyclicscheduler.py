@@ -0,0 +1,196 @@
+import gc
+import weakref
+
+import canmatrix
+import pytest
+
+import epyqlib.canneo
+import epyqlib.cyclicscheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return epyqlib.cyclicscheduler.Scheduler(clock=clock)
+
+
+def run_for(scheduler, clock, duration, step=0.001):
+    end = clock.now + duration
+    while clock.now < end:
+        clock.now += step
+        scheduler.run_due()
+
+
+def test_phases_are_staggered(scheduler):
+    for key in range(4):
+        scheduler.add(key=key, callback=lambda: None, period=0.1)
+
+    phases = sorted(entry.phase for entry in scheduler.entries.values())
+
+    assert phases == pytest.approx([0, 0.025, 0.05, 0.075])
+
+
+def test_due_entries_run_as_a_batch(scheduler, clock):
+    calls = []
+    scheduler.tick = 0.01
+
+    scheduler.add(key="a", callback=lambda: calls.append("a"), period=0.1)
+    scheduler.add(key="b", callback=lambda: calls.append("b"), period=0.1)
+    scheduler.entries["b"].due = scheduler.entries["a"].due + 0.005
+    scheduler._push(scheduler.entries["b"])
+
+    clock.now = scheduler.entries["a"].due
+
+    assert scheduler.run_due() == 2
+    assert calls == ["a", "b"]
+
+
+def test_statistics_report_actual_period(scheduler, clock):
+    calls = []
+    scheduler.add(key="a", callback=lambda: calls.append(clock.now), period=0.01)
+
+    run_for(scheduler, clock, duration=1)
+
+    statistics = scheduler.statistics("a")
+    assert statistics.requested == 0.01
+    assert statistics.count == len(calls) == pytest.approx(100, abs=1)
+    assert statistics.mean == pytest.approx(0.01)
+    assert statistics.jitter < 0.0011
+    assert statistics.missed == 0
+
+
+def test_missed_periods_keep_phase(scheduler, clock):
+    scheduler.add(key="a", callback=lambda: None, period=0.01)
+    entry = scheduler.entries["a"]
+    due = entry.due
+
+    clock.now = due + 0.035
+    scheduler.run_due()
+
+    assert entry.missed == 3
+    assert entry.due == pytest.approx(due + 0.04)
+
+
+def test_remove_and_replace(scheduler, clock):
+    calls = []
+    scheduler.add(key="a", callback=lambda: calls.append(1), period=0.01)
+    scheduler.add(key="a", callback=lambda: calls.append(2), period=0.02)
+
+    run_for(scheduler, clock, duration=0.1)
+
+    assert set(calls) == {2}
+    assert len(calls) == pytest.approx(5, abs=1)
+
+    scheduler.remove("a")
+    calls.clear()
+    run_for(scheduler, clock, duration=0.1)
+
+    assert calls == []
+    assert scheduler.next_due() is None
+
+
+def test_callback_may_remove_batch_member(scheduler, clock):
+    calls = []
+
+    def a():
+        calls.append("a")
+        scheduler.remove("b")
+
+    scheduler.tick = 1
+    scheduler.add(key="b", callback=lambda: calls.append("b"), period=0.1)
+    scheduler.add(key="a", callback=a, period=0.1)
+    assert scheduler.entries["a"].due < scheduler.entries["b"].due
+
+    clock.now += 0.1
+    scheduler.run_due()
+
+    assert calls == ["a"]
+
+
+def test_invalid_period(scheduler):
+    with pytest.raises(epyqlib.cyclicscheduler.InvalidPeriodError):
+        scheduler.add(key="a", callback=lambda: None, period=0)
+
+
+def test_frame_cyclic_request(qtbot):
+    matrix_frame = canmatrix.Frame(
+        name="Test",
+        arbitration_id=canmatrix.ArbitrationId(id=0x123, extended=False),
+        size=8,
+    )
+    frame = epyqlib.canneo.Frame(frame=matrix_frame)
+    scheduler = epyqlib.cyclicscheduler.QtScheduler()
+    frame.scheduler = scheduler
+
+    messages = []
+    frame.send.connect(lambda message, _: messages.append(message))
+
+    frame.cyclic_request("a", 0.01)
+    frame.cyclic_request("b", 0.05)
+    assert scheduler.entries[frame].period == 0.01
+
+    qtbot.waitUntil(lambda: len(messages) >= 5)
+
+    frame.terminate()
+    assert frame not in scheduler.entries
+    assert not scheduler.timer.isActive()
+
+
+class Sender:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def send(self):
+        self.calls.append(self)
+
+
+def test_dropped_keys_are_not_kept(scheduler, clock):
+    calls = []
+    sender = Sender(calls)
+    scheduler.add(key=sender, callback=sender.send, period=0.01)
+
+    run_for(scheduler, clock, duration=0.05)
+    assert len(calls) > 0
+
+    reference = weakref.ref(sender)
+    del sender
+    calls.clear()
+    gc.collect()
+
+    assert reference() is None
+    assert len(scheduler.entries) == 0
+
+    run_for(scheduler, clock, duration=0.05)
+    assert calls == []
+    assert scheduler.next_due() is None
+
+
+def test_dropped_frame_stops_sending(qtbot):
+    matrix_frame = canmatrix.Frame(
+        name="Test",
+        arbitration_id=canmatrix.ArbitrationId(id=0x123, extended=False),
+        size=8,
+    )
+    frame = epyqlib.canneo.Frame(frame=matrix_frame)
+    scheduler = epyqlib.cyclicscheduler.QtScheduler()
+    frame.scheduler = scheduler
+    frame.cyclic_request("a", 0.01)
+
+    reference = weakref.ref(frame)
+    del frame
+    gc.collect()
+
+    assert reference() is None
+    assert len(scheduler.entries) == 0
@@ -0,0 +1,69 @@
+import csv
+import io
+
+import pytest
+
+import epyqlib.datalogger
+import epyqlib.tests.benchmarks.common
+import epyqlib.utils.columnar
+
+
+def test_parse_log_columns_match_csv(tmp_path):
+    paths = {}
+
+    for suffix in (".csv", epyqlib.utils.columnar.suffix):
+        log = epyqlib.tests.benchmarks.common.synthetic_log(records=50)
+        data = log.pop("data")
+        paths[suffix] = tmp_path / ("log" + suffix)
+
+        epyqlib.datalogger.parse_log(
+            csv_path=paths[suffix],
+            data_stream=io.BytesIO(data),
+            metadata={"block_header": {"softwareHash": 0x1234567}},
+            **log,
+        )
+
+    with open(paths[".csv"], newline="") as f:
+        reader = csv.DictReader(f)
+        names = reader.fieldnames
+        rows = list(reader)
+
+    with epyqlib.utils.columnar.load(paths[epyqlib.utils.columnar.suffix]) as columns:
+        assert columns.keys() == names
+        assert columns.rows == len(rows) == 50
+        assert columns.metadata == {
+            "sample_period_us": 1000,
+            "block_header": {"softwareHash": 0x1234567},
+        }
+
+        typecodes = {columns.typecode(name) for name in names}
+        assert typecodes == {"d", "h"}
+        assert columns.typecode(".time") == "d"
+
+        for name in names:
+            assert list(columns[name]) == [float(row[name]) for row in rows]
+
+
+def test_truncated_log_keeps_complete_records(tmp_path):
+    rows = {}
+
+    for suffix in (".csv", epyqlib.utils.columnar.suffix):
+        log = epyqlib.tests.benchmarks.common.synthetic_log(records=50)
+        data = log.pop("data")
+        path = tmp_path / ("log" + suffix)
+
+        with pytest.raises(EOFError):
+            epyqlib.datalogger.parse_log(
+                csv_path=path,
+                data_stream=io.BytesIO(data[:-3]),
+                **log,
+            )
+
+        if suffix == ".csv":
+            with open(path, newline="") as f:
+                rows[suffix] = sum(1 for _ in csv.DictReader(f))
+        else:
+            with epyqlib.utils.columnar.load(path) as columns:
+                rows[suffix] = columns.rows
+
+    assert rows == {".csv": 49, epyqlib.utils.columnar.suffix: 49}
@@ -1,8 +1,11 @@
+import functools
+import gc
 import logging
 import os
 import shutil
 
 import epyqlib.busproxy
+import epyqlib.canneo
 import epyqlib.device
 import epyqlib.twisted.busproxy
 import epyqlib.tests.common
@@ -76,3 +79,63 @@ def test_zip(qtbot, zipped_customer_device_path, tmpdir):
 
     assert_device_ok(device)
     device.terminate()
+
+
+def test_load_matrix_shared_between_devices():
+    path = epyqlib.tests.common.symbol_files["customer"]
+
+    first = epyqlib.device.load_matrix(path)
+    second = epyqlib.device.load_matrix(str(path))
+
+    assert first is second
+
+    del first, second
+    gc.collect()
+
+    assert len(epyqlib.device._matrices) == 0
+
+
+def test_neo_leaves_shared_matrix_unchanged(qtbot):
+    matrix = epyqlib.device.load_matrix(
+        epyqlib.tests.common.symbol_files["customer"],
+    )
+    ids = [frame.arbitration_id.id for frame in matrix.frames]
+
+    neos = [
+        epyqlib.canneo.Neo(
+            matrix=matrix,
+            node_id_adjust=functools.partial(
+                epyqlib.device.j1939_node_id_adjust,
+                device_id=device_id,
+                controller_id=65,
+            ),
+        )
+        for device_id in (246, 247)
+    ]
+
+    assert [frame.arbitration_id.id for frame in matrix.frames] == ids
+    assert [frame.id for frame in neos[0].frames] != [
+        frame.id for frame in neos[1].frames
+    ]
+
+
+def test_neo_frame_by_id_index(qtbot):
+    neo = epyqlib.canneo.Neo(
+        matrix=epyqlib.device.load_matrix(
+            epyqlib.tests.common.symbol_files["customer"],
+        ),
+        node_id_adjust=functools.partial(
+            epyqlib.device.j1939_node_id_adjust,
+            device_id=247,
+            controller_id=65,
+        ),
+    )
+
+    for frame in neo.frames:
+        expected = epyqlib.canneo.frame_by_id(frame.id, neo.frames)
+        assert neo.frame_by_id(frame.id) is expected
+
+    (removed,) = (frame for frame in neo.frames if frame.name == "StatusTemps")
+    neo.frames = tuple(frame for frame in neo.frames if frame is not removed)
+
+    assert neo.frame_by_id(removed.id) is None
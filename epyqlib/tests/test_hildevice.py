@@ -3,8 +3,10 @@ import pathlib
 import attr
 import pytest
 
-import epyqlib.tests.common
+import epyqlib.canneo
 import epyqlib.hildevice
+import epyqlib.nv
+import epyqlib.tests.common
 
 
 @pytest.fixture
@@ -53,3 +55,63 @@ def test_device_reload():
 
     with pytest.raises(epyqlib.hildevice.AlreadyLoadedError):
         device.load()
+
+
+@pytest.fixture(scope="module")
+def loaded_device():
+    device = epyqlib.hildevice.Device(
+        definition_path=epyqlib.tests.common.devices["customer"],
+    )
+    device.load()
+
+    return device
+
+
+def test_signal_path_index_matches_scan(loaded_device):
+    neo = loaded_device.neo
+
+    paths = []
+    for frame in neo.frames:
+        if getattr(frame, "mux_frame", None) not in (None, frame):
+            path = (frame.name, frame.mux_name)
+        elif hasattr(frame, "multiplex_frames"):
+            continue
+        else:
+            path = (frame.name,)
+
+        paths.extend(path + (signal.name,) for signal in frame.signals)
+
+    assert len(paths) > 0
+
+    for path in paths:
+        assert neo.signal_by_path(*path) is neo._signal_by_path_scan(*path)
+
+    with pytest.raises(epyqlib.canneo.NotFoundError):
+        neo.signal_by_path("ProcessToInverter", "CommandPower", "Missing")
+
+
+def test_nv_name_index_matches_scan(loaded_device):
+    nvs = loaded_device.nvs
+
+    for frame in nvs.set_frames.values():
+        for signal in frame.signals:
+            names = (frame.mux_name, signal.name)
+            assert nvs.signal_from_names(*names) is nvs._signal_from_names_scan(*names)
+
+    with pytest.raises(epyqlib.nv.NotFoundError):
+        nvs.signal_from_names("Missing", "Missing")
+
+
+def test_wrappers_are_cached(loaded_device):
+    path = ("ProcessToInverter", "CommandPower", "RealPower")
+    signal = loaded_device.signal(*path)
+
+    assert loaded_device.signal(*path) is signal
+    assert loaded_device.signal_from_uuid(signal.signal.parameter_uuid) is signal
+
+    nv = next(iter(loaded_device.nvs.all_nv()))
+    wrapper = loaded_device.nv(nv.frame.mux_name, nv.name)
+
+    assert wrapper.nv is nv
+    assert loaded_device.nv(nv.frame.mux_name, nv.name) is wrapper
+    assert loaded_device.nv_from_uuid(nv.parameter_uuid) is wrapper
@@ -0,0 +1,174 @@
+import json
+
+import can
+import canmatrix
+import pytest
+
+import epyqlib.busproxy
+import epyqlib.canneo
+import epyqlib.metrics
+import epyqlib.metricsview
+
+
+@pytest.fixture
+def enabled():
+    epyqlib.metrics.enable()
+    yield
+    epyqlib.metrics.disable()
+
+
+def test_counter_and_gauge():
+    registry = epyqlib.metrics.Registry()
+
+    counter = registry.counter("a")
+    counter.increment()
+    counter.increment(3)
+    assert registry.counter("a") is counter
+    assert counter.value == 4
+
+    gauge = registry.gauge("b")
+    gauge.increment(5)
+    gauge.decrement(2)
+    gauge.decrement(10)
+    assert gauge.snapshot() == {"type": "gauge", "value": 0, "maximum": 5}
+
+
+def test_type_mismatch():
+    registry = epyqlib.metrics.Registry()
+    registry.counter("a")
+
+    with pytest.raises(epyqlib.metrics.MetricTypeError):
+        registry.histogram("a")
+
+
+def test_histogram_percentiles():
+    histogram = epyqlib.metrics.Histogram(name="h", bounds=[1, 2, 5, 10])
+
+    for value in [0.5] * 50 + [3] * 40 + [20] * 10:
+        histogram.record(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["minimum"] == 0.5
+    assert snapshot["maximum"] == 20
+    assert snapshot["p50"] == 1
+    assert snapshot["p90"] == 5
+    assert snapshot["p99"] == 20
+
+
+def test_rate_window():
+    now = [100.0]
+    rate = epyqlib.metrics.Rate(name="r", window=2, clock=lambda: now[0])
+
+    rate.mark(4)
+    now[0] += 1
+    rate.mark(2)
+    assert rate.rate() == 3
+
+    now[0] += 1
+    assert rate.rate() == 1
+
+    now[0] += 5
+    assert rate.rate() == 0
+    assert rate.total == 6
+
+
+def test_dump(tmp_path):
+    registry = epyqlib.metrics.Registry()
+    registry.counter("a").increment()
+    path = tmp_path / "metrics.json"
+
+    registry.dump(path)
+
+    with open(path) as f:
+        dumped = json.load(f)
+
+    assert dumped["metrics"] == {"a": {"type": "counter", "value": 1}}
+
+
+def unpack_frame():
+    matrix_frame = canmatrix.Frame(
+        name="Test",
+        arbitration_id=canmatrix.ArbitrationId(id=0x123, extended=False),
+        size=8,
+    )
+    matrix_frame.add_signal(canmatrix.Signal(name="Value", start_bit=0, size=16))
+    frame = epyqlib.canneo.Frame(frame=matrix_frame)
+
+    frame.unpack(bytes(8))
+
+
+def test_unpack_not_recorded_when_disabled(qapp):
+    histogram = epyqlib.canneo.unpack_seconds
+    histogram.reset()
+
+    unpack_frame()
+
+    assert histogram.count == 0
+
+
+def test_unpack_recorded_when_enabled(qapp, enabled):
+    histogram = epyqlib.canneo.unpack_seconds
+    histogram.reset()
+
+    unpack_frame()
+
+    assert histogram.count == 1
+
+
+def test_view_lists_metrics(qtbot):
+    registry = epyqlib.metrics.Registry()
+    registry.rate("r").mark()
+    registry.histogram("h").record(0.002)
+
+    view = epyqlib.metricsview.MetricsView(registry=registry)
+    qtbot.addWidget(view)
+
+    assert set(view.items) == {"h", "r"}
+    assert view.items["h"].text(1).startswith("mean 2.000 ms")
+
+
+def test_view_formats_counts(qtbot):
+    registry = epyqlib.metrics.Registry()
+    histogram = registry.histogram(
+        "h",
+        bounds=epyqlib.metrics.count_bounds(),
+        unit="count",
+    )
+    histogram.record(5)
+    histogram.record(40)
+
+    assert histogram.counts[:7] == [0, 0, 0, 1, 0, 0, 1]
+    assert registry.snapshot()["h"]["unit"] == "count"
+
+    view = epyqlib.metricsview.MetricsView(registry=registry)
+    qtbot.addWidget(view)
+
+    assert view.items["h"].text(1).startswith("mean 22.5, p50 8.0")
+
+
+def test_queue_depth_balanced(qtbot, enabled):
+    real_bus = can.interface.Bus(bustype="virtual", channel="test_metrics")
+    other_bus = can.interface.Bus(bustype="virtual", channel="test_metrics")
+    proxy = epyqlib.busproxy.BusProxy(bus=real_bus)
+    gauge = epyqlib.canneo.queue_depth
+    gauge.set(0)
+
+    received = []
+    proxy.notifier.add(epyqlib.canneo.QtCanListener(receiver=received.append))
+
+    try:
+        for id in range(5):
+            other_bus.send(can.Message(arbitration_id=id))
+
+        qtbot.waitUntil(lambda: len(received) == 5)
+        assert gauge.value == 0
+        assert gauge.maximum > 0
+
+        # delivered without crossing threads so not counted either way
+        proxy.notifier.message_received(can.Message(arbitration_id=7))
+        assert gauge.value == 0
+    finally:
+        proxy.terminate()
+        real_bus.shutdown()
+        other_bus.shutdown()
@@ -0,0 +1,91 @@
+import pytest
+
+import epyqlib.canneo
+import epyqlib.hildevice
+import epyqlib.nv
+import epyqlib.tests.common
+
+
+@pytest.fixture
+def nvs(qtbot):
+    device = epyqlib.hildevice.Device(
+        definition_path=epyqlib.tests.common.devices["customer"],
+    )
+    device.load()
+
+    return device.nvs
+
+
+def numeric_nv(nvs):
+    return next(
+        nv
+        for nv in nvs.all_nv()
+        if len(nv.enumeration) == 0 and not nv.secret and nv.raw_maximum > 10
+    )
+
+
+def test_metas_share_a_table(nvs):
+    nvs = list(nvs.all_nv())
+    tables = {id(nv._meta_table) for nv in nvs}
+
+    assert len(tables) < len(nvs)
+    for nv in nvs:
+        assert nv._meta_row < nv._meta_table.rows
+
+
+def test_set_meta(nvs):
+    nv = numeric_nv(nvs)
+    other = next(
+        other
+        for other in nvs.all_nv()
+        if other._meta_table is nv._meta_table and other is not nv
+    )
+    maximum = nv.to_human(nv.from_human(5))
+
+    nv.set_meta(maximum, meta=epyqlib.nv.MetaEnum.maximum)
+
+    signal = nv.get_meta_signal(epyqlib.nv.MetaEnum.maximum)
+    assert signal.value == nv.from_human(5)
+    assert nv.meta.maximum.value == signal.value
+    assert nv.fields.maximum == signal.full_string
+    assert signal.get_human_value() == nv.format_float(maximum)
+    assert other.meta.maximum.value is None
+
+    # the value is now limited by the maximum
+    nv.set_value(nv.from_human(7))
+    assert nv.can_be_saturated()
+    with pytest.raises(epyqlib.canneo.OutOfRangeError):
+        nv.set_value(nv.from_human(7), check_range=True)
+
+    nv.clear(meta=epyqlib.nv.MetaEnum.maximum)
+    assert nv.meta.maximum.value is None
+    assert nv.fields.maximum == "-"
+
+
+def test_meta_stale(nvs):
+    nv = numeric_nv(nvs)
+    column = epyqlib.nv.Columns.indexes.minimum
+    scratch = epyqlib.nv.Columns.indexes.scratch
+
+    assert nv.stale(column)
+    assert not nv.stale(scratch)
+
+    nv.set_from_device(column=column)
+    assert not nv.stale(column)
+
+    nv.set_stale()
+    assert nv.stale(column)
+    assert not nv.stale(scratch)
+
+
+def test_scratch(nvs):
+    nv = numeric_nv(nvs)
+
+    nv.scratch.set_human_value(3)
+
+    assert nv.scratch.value == nv.from_human(3)
+    assert nv.get_human_value(column=epyqlib.nv.Columns.indexes.scratch) == (
+        nv.format_float(nv.to_human(nv.from_human(3)))
+    )
+    assert nv.value is None
+    assert not hasattr(nv.scratch, "status_signal")
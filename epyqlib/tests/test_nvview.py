@@ -4,6 +4,9 @@ import pytest
 
 import epyqlib.busproxy
 import epyqlib.device
+import epyqlib.hildevice
+import epyqlib.nv
+import epyqlib.nvview
 import epyqlib.twisted.busproxy
 import epyqlib.tests.common
 
@@ -62,3 +65,73 @@ def test_secret_masked(qtbot):
 
 def logit(it):
     logging.debug("logit(): ({}) {}".format(type(it), it))
+
+
+@pytest.fixture
+def nv_model(qtbot):
+    device = epyqlib.hildevice.Device(
+        definition_path=epyqlib.tests.common.devices["customer"],
+    )
+    device.load()
+
+    model = epyqlib.nv.NvModel(device.nvs)
+    device.nvs.changed.connect(model.changed)
+
+    return model
+
+
+def record_data_changed(model):
+    emitted = []
+    model.dataChanged.connect(
+        lambda top_left, bottom_right, roles: emitted.append(
+            (
+                model.node_from_index(top_left.parent()),
+                top_left.row(),
+                bottom_right.row(),
+                top_left.column(),
+                bottom_right.column(),
+            )
+        )
+    )
+
+    return emitted
+
+
+def test_changes_coalesced_into_row_blocks(qtbot, nv_model):
+    emitted = record_data_changed(nv_model)
+
+    group = next(
+        nv.tree_parent for nv in nv_model.all_nv() if len(nv.tree_parent.children) >= 5
+    )
+    value = epyqlib.nv.Columns.indexes.value
+    minimum = epyqlib.nv.Columns.indexes.minimum
+    for row in (0, 1, 2, 4):
+        nv_model.dynamic_columns_changed(group.children[row], columns=(value,))
+    nv_model.changed(group.children[1], minimum, group.children[1], minimum, [])
+
+    assert emitted == []
+
+    qtbot.waitUntil(lambda: len(emitted) > 0)
+
+    assert emitted == [
+        (group, 0, 2, value, minimum),
+        (group, 4, 4, value, value),
+    ]
+
+
+def test_hidden_rows_reported(qtbot, nv_model):
+    view = epyqlib.nvview.NvView()
+    qtbot.addWidget(view)
+    view.setModel(nv_model)
+    emitted = record_data_changed(nv_model)
+
+    access_level = nv_model.root.access_level_node
+    # the view is never shown so no row is visible
+    hidden = next(nv for nv in nv_model.all_nv() if nv is not access_level)
+    value = epyqlib.nv.Columns.indexes.value
+
+    nv_model.dynamic_columns_changed(hidden, columns=(value,))
+    nv_model.change_coalescer.flush()
+
+    row = nv_model.index_from_node(hidden).row()
+    assert emitted == [(hidden.tree_parent, row, row, value, value)]
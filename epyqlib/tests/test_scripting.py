@@ -0,0 +1,334 @@
+import decimal
+import threading
+import time
+import uuid
+
+import can
+import pytest
+import pytest_twisted
+import twisted.internet.defer
+
+import epyqlib.busproxy
+import epyqlib.canneo
+import epyqlib.hildevice
+import epyqlib.scripting
+import epyqlib.tests.common
+import epyqlib.utils.twisted
+
+
+script = """\
+0.05, ;ProcessToInverter;CommandPower;RealPower, 10, ;ProcessToInverter;CommandPower;ReactivePower, 20
+0.05, ;ParameterQuery;ModAc1_Status1;syncActive, 1, ;ParameterQuery;ModAc1_Status1;pulseNrActual, 2
++0.05, ;ProcessToInverter;CommandPower;RealPower, 30
+"""
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append((time.perf_counter(), message))
+
+
+@pytest.fixture
+def scripting_device():
+    device = epyqlib.hildevice.Device(
+        definition_path=epyqlib.tests.common.devices["customer"],
+    )
+    device.load()
+
+    device.neo.bus = Recorder()
+
+    nv_writes = []
+    device.nvs.write_all_to_device = lambda only_these: nv_writes.append(only_these)
+
+    scripting_device = epyqlib.scripting.Device(
+        name=None,
+        neo=device.neo,
+        nvs=device.nvs,
+    )
+
+    return scripting_device, nv_writes
+
+
+def load(script, device):
+    events = epyqlib.scripting.csv_loads(script, devices=[device])
+
+    return [event.resolve() for event in events]
+
+
+def test_compile_packs_each_frame_once(scripting_device):
+    device, _ = scripting_device
+
+    slots = epyqlib.scripting.compile_events(load(script, device))
+
+    assert [slot.time for slot in slots] == [0.05, 0.1]
+
+    first, second = slots
+    assert len(first.messages) == 1
+    assert len(first.values) == 4
+    assert len(first.nv_writes) == 1
+
+    nvs, signals = first.nv_writes[0]
+    assert nvs is device.nvs
+    assert [signal.name for signal in signals] == ["syncActive", "pulseNrActual"]
+
+    (bus, proxy, message) = second.messages[0]
+    assert bus is device.neo.bus
+    assert proxy is None
+
+    frame = device.neo.signal_by_path(
+        "ProcessToInverter", "CommandPower", "RealPower"
+    ).frame
+    unpacked = frame.unpack(message.data, only_return=True)
+    values = {signal.name: signal.to_human(value) for signal, value in unpacked.items()}
+    assert values["RealPower"] == 30
+    assert values["ReactivePower"] == 20
+
+
+def test_compile_tolerance_merges_slots(scripting_device):
+    device, _ = scripting_device
+
+    slots = epyqlib.scripting.compile_events(
+        load(script, device),
+        tolerance=decimal.Decimal("0.05"),
+    )
+
+    assert len(slots) == 1
+    assert len(slots[0].messages) == 1
+
+
+@pytest_twisted.inlineCallbacks
+def test_engine_timing(scripting_device):
+    device, nv_writes = scripting_device
+
+    engine = epyqlib.scripting.run(
+        events=load(script, device),
+        pause=None,
+        loop=False,
+    )
+    start = engine._start
+
+    yield engine.run_deferred
+
+    sent = device.neo.bus.sent
+    assert [round(sent_time - start, 2) for sent_time, _ in sent] == [0.05, 0.1]
+    assert engine.latency.count == 2
+    assert engine.latency.maximum < 0.01
+
+    assert len(nv_writes) == 1
+
+    signal = device.neo.signal_by_path("ProcessToInverter", "CommandPower", "RealPower")
+    assert signal.to_human(signal.value) == 30
+
+
+@pytest_twisted.inlineCallbacks
+def test_engine_sends_to_the_real_bus(scripting_device, monkeypatch):
+    device, _ = scripting_device
+    channel = "test_scripting_{}".format(uuid.uuid4())
+    real_bus = can.interface.Bus(bustype="virtual", channel=channel)
+    other_bus = can.interface.Bus(bustype="virtual", channel=channel)
+    proxy = epyqlib.busproxy.BusProxy(bus=real_bus, auto_disconnect=False)
+    device.neo.bus = proxy
+
+    threads = set()
+    compile_slot = epyqlib.scripting.compile_slot
+
+    def recording_compile_slot(*args, **kwargs):
+        threads.add(("compile", threading.current_thread()))
+        return compile_slot(*args, **kwargs)
+
+    monkeypatch.setattr(epyqlib.scripting, "compile_slot", recording_compile_slot)
+
+    transmitted = []
+
+    def record_transmitted(message):
+        threads.add(("transmitted", threading.current_thread()))
+        transmitted.append(message)
+
+    tx_listener = epyqlib.canneo.QtCanListener(receiver=record_transmitted)
+    proxy.tx_notifier.add(tx_listener)
+
+    try:
+        engine = epyqlib.scripting.run(
+            events=epyqlib.scripting.Script.from_string(script, devices=[device]),
+            pause=None,
+            loop=False,
+        )
+        yield engine.run_deferred
+
+        received = [other_bus.recv(timeout=1) for _ in range(2)]
+    finally:
+        proxy.terminate()
+        real_bus.shutdown()
+        other_bus.shutdown()
+
+    assert [message.arbitration_id for message in received] == [
+        message.arbitration_id for message in transmitted
+    ]
+    assert threads == {
+        ("compile", threading.main_thread()),
+        ("transmitted", threading.main_thread()),
+    }
+
+
+@pytest_twisted.inlineCallbacks
+def test_engine_pause(scripting_device):
+    device, _ = scripting_device
+    events = load(
+        script + "+0, pause\n+0.05, ;ProcessToInverter;CommandPower;RealPower, 40\n",
+        device,
+    )
+
+    paused = []
+
+    def pause():
+        paused.append(True)
+        engine.pause()
+
+    engine = epyqlib.scripting.run(events=events, pause=pause, loop=False)
+
+    while len(paused) == 0:
+        yield epyqlib.utils.twisted.sleep(0.01)
+
+    yield epyqlib.utils.twisted.sleep(0.1)
+    assert len(device.neo.bus.sent) == 2
+
+    engine.unpause()
+    yield engine.run_deferred
+
+    assert len(device.neo.bus.sent) == 3
+
+
+@pytest_twisted.inlineCallbacks
+def test_engine_cancel(scripting_device):
+    device, _ = scripting_device
+
+    engine = epyqlib.scripting.run(
+        events=load(script, device),
+        pause=None,
+        loop=True,
+    )
+
+    yield epyqlib.utils.twisted.sleep(0.02)
+    engine.cancel()
+
+    with pytest.raises(twisted.internet.defer.CancelledError):
+        yield engine.run_deferred
+
+
+class CountingLines:
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.lines)
+        self.read += 1
+
+        return line
+
+
+def test_script_streams_and_caches(scripting_device, monkeypatch):
+    device, _ = scripting_device
+
+    rows = 100000
+    lines = CountingLines(
+        "+0.01, ;ProcessToInverter;CommandPower;RealPower, {}\n".format(i % 100)
+        for i in range(rows)
+    )
+    script = epyqlib.scripting.Script(open_file=lambda: lines, devices=[device])
+
+    resolved = []
+    signal_by_path = device.neo.signal_by_path
+    monkeypatch.setattr(
+        device.neo,
+        "signal_by_path",
+        lambda *path: resolved.append(path) or signal_by_path(*path),
+    )
+
+    slots = iter(epyqlib.scripting.Slots(events=script))
+    first = [next(slots) for _ in range(10)]
+
+    assert [slot.time for slot in first] == pytest.approx(
+        [0.01 * (i + 1) for i in range(10)]
+    )
+    assert lines.read < 20
+    assert len(resolved) == 1
+
+
+def test_script_rejects_decreasing_times(scripting_device):
+    device, _ = scripting_device
+
+    script = epyqlib.scripting.Script.from_string(
+        "2, ;ProcessToInverter;CommandPower;RealPower, 1\n"
+        "1, ;ProcessToInverter;CommandPower;RealPower, 2\n",
+        devices=[device],
+    )
+
+    with pytest.raises(epyqlib.scripting.TimeOrderError):
+        list(script)
+
+
+def test_script_check_reports_errors_up_front(scripting_device):
+    device, _ = scripting_device
+
+    script = epyqlib.scripting.Script.from_string(
+        "0.1, ;ProcessToInverter;CommandPower;RealPower, 1\n"
+        "0.2, missing;ProcessToInverter;CommandPower;RealPower, 2\n"
+        "0.3, other;ProcessToInverter;CommandPower;RealPower, 3\n",
+        devices=[device],
+    )
+
+    with pytest.raises(epyqlib.scripting.MissingDevicesError) as info:
+        script.check()
+
+    assert info.value.args[0] == {"missing", "other"}
+
+    with pytest.raises(epyqlib.scripting.NoEventsError):
+        epyqlib.scripting.Script.from_string("# nothing\n", devices=[device]).check()
+
+
+@pytest_twisted.inlineCallbacks
+def test_model_sorts_decreasing_times(scripting_device):
+    device, _ = scripting_device
+
+    class ModelDevice:
+        neo_frames = device.neo
+        widget_nvs = device.nvs
+
+    model = epyqlib.scripting.Model(get_devices=lambda: {None: ModelDevice()})
+    script = epyqlib.scripting.Script.from_string(
+        "0.1, ;ProcessToInverter;CommandPower;RealPower, 1\n"
+        "-0.05, ;ProcessToInverter;CommandPower;RealPower, 2\n",
+        devices=[device],
+    )
+
+    assert not script.check()
+    assert [event.time for event in script.sorted_events()] == [
+        decimal.Decimal("0.05"),
+        decimal.Decimal("0.1"),
+    ]
+
+    engine = model.run_s(
+        event_string=(
+            "0.1, ;ProcessToInverter;CommandPower;RealPower, 1\n"
+            "-0.05, ;ProcessToInverter;CommandPower;RealPower, 2\n"
+        ),
+        pause=None,
+    )
+    yield engine.run_deferred
+
+    signal = device.neo.signal_by_path("ProcessToInverter", "CommandPower", "RealPower")
+    assert signal.to_human(signal.value) == 1
+    assert len(device.neo.bus.sent) == 2
@@ -0,0 +1,250 @@
+import uuid
+
+import can
+import pytest
+import pytest_twisted
+import twisted.internet.defer
+
+import epyqlib.hildevice
+import epyqlib.nv
+import epyqlib.simulateddevice
+import epyqlib.tests.common
+import epyqlib.twisted.cancalibrationprotocol as ccp
+import epyqlib.twisted.nvs
+
+
+@pytest.fixture
+def channel():
+    return "test_simulateddevice_{}".format(uuid.uuid4())
+
+
+@pytest.fixture
+def simulated(channel):
+    bus = can.interface.Bus(bustype="virtual", channel=channel)
+    device = epyqlib.simulateddevice.SimulatedDevice.from_definition_path(
+        path=epyqlib.tests.common.devices["customer"],
+        bus=bus,
+        cyclic=False,
+    )
+
+    with device:
+        yield device
+
+    bus.shutdown()
+
+
+@pytest.fixture
+def host(channel):
+    bus = can.interface.Bus(bustype="virtual", channel=channel)
+    device = epyqlib.hildevice.Device(
+        definition_path=epyqlib.tests.common.devices["customer"],
+    )
+    device.load()
+
+    yield device, bus
+
+    bus.shutdown()
+
+
+@pytest.fixture
+def nv_protocol(host):
+    device, bus = host
+    protocol = epyqlib.twisted.nvs.Protocol()
+    transport = epyqlib.simulateddevice.ReactorTransport(protocol=protocol, bus=bus)
+
+    yield device, protocol
+
+    transport.terminate()
+
+
+def writable_nv(device):
+    return min(
+        (nv for nv in device.nvs.all_nv() if nv.frame.read_write.min <= 0),
+        key=lambda nv: nv.signal_path(),
+    )
+
+
+@pytest_twisted.inlineCallbacks
+def test_nv_write_then_read(simulated, nv_protocol):
+    device, protocol = nv_protocol
+    nv = writable_nv(device)
+
+    value = nv.to_human(nv.raw_maximum)
+    nv.set_human_value(value)
+    yield protocol.write(nv_signal=nv, meta=epyqlib.nv.MetaEnum.value)
+
+    assert simulated.nv_value(nv) == value
+
+    read, meta = yield protocol.read(nv_signal=nv, meta=epyqlib.nv.MetaEnum.value)
+
+    assert read == value
+    assert meta == epyqlib.nv.MetaEnum.value
+    assert simulated.statistics.nv_writes >= 1
+    assert simulated.statistics.nv_reads >= 1
+
+
+@pytest_twisted.inlineCallbacks
+def test_nv_loss_times_out(simulated, nv_protocol):
+    device, protocol = nv_protocol
+    protocol._timeout = 0.2
+    simulated.loss = 1
+
+    nv = writable_nv(device)
+
+    with pytest.raises(epyqlib.twisted.nvs.RequestTimeoutError):
+        yield protocol.read(nv_signal=nv, meta=epyqlib.nv.MetaEnum.value)
+
+    assert simulated.statistics.dropped == 1
+
+
+@pytest_twisted.inlineCallbacks
+def test_ccp_download_upload(simulated, host):
+    device, bus = host
+
+    handler = ccp.Handler(
+        endianness=simulated.ccp_endianness,
+        tx_id=simulated.ccp_tx_id,
+        rx_id=simulated.ccp_rx_id,
+    )
+    transport = epyqlib.simulateddevice.ReactorTransport(protocol=handler, bus=bus)
+
+    data = bytes(range(40))
+
+    try:
+        yield handler.connect()
+        yield handler.download_block(
+            address_extension=ccp.AddressExtension.flash_memory,
+            address=0x310000,
+            data=data,
+        )
+        uploaded = yield handler.upload_block(
+            address_extension=ccp.AddressExtension.flash_memory,
+            address=0x310000,
+            octets=len(data),
+        )
+        yield handler.disconnect()
+    finally:
+        transport.terminate()
+
+    assert bytes(uploaded) == data
+
+
+def test_cyclic_frames(channel):
+    bus = can.interface.Bus(bustype="virtual", channel=channel)
+    listener = can.interface.Bus(bustype="virtual", channel=channel)
+
+    device = epyqlib.simulateddevice.SimulatedDevice.from_definition_path(
+        path=epyqlib.tests.common.devices["customer"],
+        bus=bus,
+    )
+
+    try:
+        with device:
+            ids = set()
+            for _ in range(200):
+                message = listener.recv(timeout=1)
+                assert message is not None
+                ids.add(message.arbitration_id)
+
+                if len(ids) == len(device.cyclic_frames):
+                    break
+    finally:
+        listener.shutdown()
+        bus.shutdown()
+
+    assert ids == {frame.id for frame in device.cyclic_frames}
+
+
+def writable_frames(device):
+    return sorted(
+        (
+            frame
+            for frame in device.nvs.set_frames.values()
+            if len(getattr(frame, "parameter_signals", ())) >= 2
+            and frame.read_write.min <= 0
+        ),
+        key=lambda frame: frame.mux_name,
+    )
+
+
+def other_value(nv):
+    raw = nv.from_human(nv.default_value or 0)
+    if raw == nv.raw_maximum:
+        raw -= 1
+    else:
+        raw += 1
+
+    return nv.to_human(raw)
+
+
+@pytest.fixture
+def nv_device(nv_protocol):
+    device, protocol = nv_protocol
+    device.nvs.protocol = protocol
+
+    return device
+
+
+@pytest_twisted.inlineCallbacks
+def test_write_many_sends_each_frame_once(simulated, nv_device):
+    full, partial = writable_frames(nv_device)[:2]
+
+    nvs = [nv_device._nv(nv) for nv in full.parameter_signals]
+    nvs.append(nv_device._nv(partial.parameter_signals[0]))
+    values = {nv: other_value(nv.nv) * nv.units() for nv in nvs}
+
+    statuses = yield twisted.internet.defer.ensureDeferred(
+        nv_device.write_many(values),
+    )
+
+    assert all(status.accepted for status in statuses.values())
+    for nv, value in values.items():
+        assert simulated.nv_value(nv.nv) * nv.units() == value
+
+    # one write for each frame plus a read to fill in the partial frame
+    assert simulated.statistics.nv_writes == 2
+    assert simulated.statistics.nv_reads == 1
+
+
+@pytest_twisted.inlineCallbacks
+def test_write_many_reports_failed_frames(simulated, nv_device):
+    (frame,) = writable_frames(nv_device)[:1]
+    read_only = next(
+        frame
+        for frame in nv_device.nvs.set_frames.values()
+        if len(getattr(frame, "parameter_signals", ())) > 0 and frame.read_write.min > 0
+    )
+
+    good = nv_device._nv(frame.parameter_signals[0])
+    bad = nv_device._nv(read_only.parameter_signals[0])
+
+    statuses = yield twisted.internet.defer.ensureDeferred(
+        nv_device.write_many(
+            {
+                good: other_value(good.nv) * good.units(),
+                bad: other_value(bad.nv) * bad.units(),
+            }
+        ),
+    )
+
+    assert statuses[good].accepted
+    assert not statuses[bad].accepted
+    assert isinstance(statuses[bad].error, epyqlib.twisted.nvs.ReadOnlyError)
+
+
+@pytest_twisted.inlineCallbacks
+def test_temporary_write_many_restores(simulated, nv_device):
+    (frame,) = writable_frames(nv_device)[:1]
+    nvs = [nv_device._nv(nv) for nv in frame.parameter_signals]
+    original = {nv: simulated.nv_value(nv.nv) for nv in nvs}
+    values = {nv: other_value(nv.nv) * nv.units() for nv in nvs}
+
+    async def temporarily():
+        async with nv_device.temporary_write_many(values) as statuses:
+            assert all(status.accepted for status in statuses.values())
+            for nv, value in values.items():
+                assert simulated.nv_value(nv.nv) * nv.units() == value
+
+    yield twisted.internet.defer.ensureDeferred(temporarily())
+
+    assert {nv: simulated.nv_value(nv.nv) for nv in nvs} == original
@@ -0,0 +1,83 @@
+import epyqlib.treenode
+
+
+class Node(epyqlib.treenode.TreeNode):
+    def __init__(self, name, parent=None):
+        self.name = name
+        super().__init__(parent=parent)
+
+    def __eq__(self, other):
+        # rows must be tracked by identity, not equality
+        return True
+
+    __hash__ = object.__hash__
+
+
+def names(node):
+    return [child.name for child in node.children]
+
+
+def assert_rows_consistent(node):
+    for row, child in enumerate(node.children):
+        assert node.row_of_child(child) == row
+
+
+def test_row_of_child():
+    root = Node("root")
+    children = [Node(str(i), parent=root) for i in range(5)]
+
+    assert_rows_consistent(root)
+    assert root.row_of_child(Node("other")) == -1
+
+    root.insert_child(2, Node("inserted"))
+    assert names(root) == ["0", "1", "inserted", "2", "3", "4"]
+    assert_rows_consistent(root)
+
+    root.remove_child(child=children[3])
+    assert names(root) == ["0", "1", "inserted", "2", "4"]
+    assert children[3].tree_parent is None
+    assert_rows_consistent(root)
+
+
+def test_row_of_child_after_direct_mutation():
+    root = Node("root")
+    for name in "cab":
+        Node(name, parent=root)
+
+    root.children.sort(key=lambda child: child.name)
+
+    assert names(root) == ["a", "b", "c"]
+    assert_rows_consistent(root)
+
+
+def test_bulk_insert_and_remove():
+    root = Node("root")
+    Node("first", parent=root)
+    Node("last", parent=root)
+
+    added = []
+    root.pyqt_signals.children_added.connect(
+        lambda parent, first, last: added.append((parent, first, last)),
+    )
+    removed = []
+    root.pyqt_signals.children_removed.connect(
+        lambda parent, children, row: removed.append((parent, children, row)),
+    )
+
+    children = [Node(str(i)) for i in range(3)]
+    root.insert_children(1, children)
+
+    assert names(root) == ["first", "0", "1", "2", "last"]
+    assert added == [(root, 1, 3)]
+    assert all(child.tree_parent is root for child in children)
+    assert_rows_consistent(root)
+
+    root.remove_children(row=2, count=2)
+
+    assert names(root) == ["first", "0", "last"]
+    assert len(removed) == 1
+    parent, removed_children, row = removed[0]
+    assert parent is root
+    assert [child.name for child in removed_children] == ["1", "2"]
+    assert row == 2
+    assert_rows_consistent(root)
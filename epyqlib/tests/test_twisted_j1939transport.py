@@ -0,0 +1,179 @@
+import uuid
+
+import can
+import pytest
+import pytest_twisted
+import twisted.internet.defer
+import twisted.internet.threads
+
+import epyqlib.simulateddevice
+import epyqlib.twisted.j1939transport as tp
+import epyqlib.utils.twisted
+
+proprietary_a = 0xEF00
+fast = tp.Timeouts(t1=0.2, t2=0.2, t3=0.2, t4=0.2, broadcast_interval=0.001)
+
+
+@pytest.fixture
+def channel():
+    return "test_j1939transport_{}".format(uuid.uuid4())
+
+
+@pytest.fixture
+def node(channel):
+    buses = []
+    transports = []
+
+    def node(address, **kwargs):
+        bus = can.interface.Bus(bustype="virtual", channel=channel)
+        buses.append(bus)
+
+        protocol = tp.Protocol(address=address, timeouts=fast, **kwargs)
+        transports.append(
+            epyqlib.simulateddevice.ReactorTransport(protocol=protocol, bus=bus)
+        )
+
+        received = []
+        protocol.add_listener(received.append)
+
+        return protocol, received
+
+    yield node
+
+    for transport in transports:
+        transport.terminate()
+
+    for bus in buses:
+        bus.shutdown()
+
+
+def payload(size, seed=0):
+    return bytes((seed + i) % 256 for i in range(size))
+
+
+def received_count(received, count):
+    async def check():
+        return len(received) >= count
+
+    return twisted.internet.defer.ensureDeferred(
+        epyqlib.utils.twisted.wait_for(check, period=0.01, timeout=5)
+    )
+
+
+@pytest_twisted.inlineCallbacks
+def test_connection_mode_both_directions(node):
+    controller, controller_received = node(address=0x41)
+    device, device_received = node(address=0xF7, packets_per_clear_to_send=5)
+
+    yield controller.send(
+        pgn=proprietary_a, data=payload(tp.maximum_size), destination=0xF7
+    )
+    yield device.send(pgn=proprietary_a, data=payload(100, seed=7), destination=0x41)
+
+    assert device_received == [
+        tp.ReceivedMessage(
+            pgn=proprietary_a,
+            source=0x41,
+            destination=0xF7,
+            data=payload(tp.maximum_size),
+        )
+    ]
+    assert controller_received == [
+        tp.ReceivedMessage(
+            pgn=proprietary_a,
+            source=0xF7,
+            destination=0x41,
+            data=payload(100, seed=7),
+        )
+    ]
+
+
+@pytest_twisted.inlineCallbacks
+def test_broadcast_both_directions(node):
+    controller, controller_received = node(address=0x41)
+    device, device_received = node(address=0xF7)
+
+    yield controller.send(pgn=0xFECA, data=payload(20))
+    yield device.send(pgn=0xFECA, data=payload(tp.maximum_size, seed=3))
+    yield received_count(controller_received, 1)
+    yield received_count(device_received, 1)
+
+    assert device_received == [
+        tp.ReceivedMessage(
+            pgn=0xFECA, source=0x41, destination=tp.global_address, data=payload(20)
+        )
+    ]
+    assert controller_received[0].data == payload(tp.maximum_size, seed=3)
+
+
+@pytest_twisted.inlineCallbacks
+def test_concurrent_sessions(node):
+    device, device_received = node(address=0xF7, packets_per_clear_to_send=2)
+    first, _ = node(address=0x41)
+    second, _ = node(address=0x42)
+
+    yield twisted.internet.defer.gatherResults(
+        [
+            first.send(pgn=proprietary_a, data=payload(300, seed=1), destination=0xF7),
+            first.send(pgn=0xFECA, data=payload(30, seed=2)),
+            second.send(pgn=proprietary_a, data=payload(200, seed=3), destination=0xF7),
+            # queued behind the first transfer to the same destination
+            first.send(pgn=proprietary_a, data=payload(50, seed=4), destination=0xF7),
+        ],
+        consumeErrors=True,
+    )
+    yield received_count(device_received, 4)
+
+    assert sorted(device_received, key=lambda message: message.data[0]) == [
+        tp.ReceivedMessage(proprietary_a, 0x41, 0xF7, payload(300, seed=1)),
+        tp.ReceivedMessage(0xFECA, 0x41, tp.global_address, payload(30, seed=2)),
+        tp.ReceivedMessage(proprietary_a, 0x42, 0xF7, payload(200, seed=3)),
+        tp.ReceivedMessage(proprietary_a, 0x41, 0xF7, payload(50, seed=4)),
+    ]
+
+
+@pytest_twisted.inlineCallbacks
+def test_send_times_out_without_receiver(node):
+    controller, _ = node(address=0x41)
+
+    with pytest.raises(tp.TransportTimeoutError):
+        yield controller.send(pgn=proprietary_a, data=payload(20), destination=0x12)
+
+    assert controller._sending == {}
+
+
+@pytest_twisted.inlineCallbacks
+def test_receiver_aborts_stalled_transfer(node, channel):
+    device, device_received = node(address=0xF7)
+    bus = can.interface.Bus(bustype="virtual", channel=channel)
+
+    def recv():
+        return bus.recv(timeout=2)
+
+    try:
+        bus.send(
+            can.Message(
+                arbitration_id=tp.identifier(pgn=0xEC00, source=0x41, destination=0xF7),
+                data=[tp.ControlByte.request_to_send, 20, 0, 3, 0xFF, 0, 0xEF, 0],
+            )
+        )
+
+        clear_to_send = yield twisted.internet.threads.deferToThread(recv)
+        abort = yield twisted.internet.threads.deferToThread(recv)
+    finally:
+        bus.shutdown()
+
+    assert list(clear_to_send.data[:3]) == [tp.ControlByte.clear_to_send, 3, 1]
+    assert list(abort.data[:2]) == [tp.ControlByte.abort, tp.AbortReason.timeout]
+    assert abort.arbitration_id == tp.identifier(
+        pgn=0xEC00, source=0xF7, destination=0x41
+    )
+    assert device_received == []
+    assert device._receiving == {}
+
+
+def test_too_long():
+    protocol = tp.Protocol(address=0x41)
+
+    with pytest.raises(tp.MessageTooLongError):
+        protocol.send(pgn=proprietary_a, data=payload(tp.maximum_size + 1))
@@ -0,0 +1,316 @@
+import decimal
+import pathlib
+import select
+import socketserver
+import struct
+import threading
+
+import pytest
+import pytest_twisted
+import sunspec.core.client
+import sunspec.core.modbus.client
+import twisted.internet.defer
+import twisted.internet.task
+import twisted.internet.testing
+
+import epyqlib.hildevice
+import epyqlib.twisted.modbus
+
+
+models_path = pathlib.Path(sunspec.__file__).parent / "models" / "smdx"
+
+base_address = 40000
+
+
+def register_image():
+    """SunSpec common (1), inverter (103) and nameplate (120) models."""
+
+    registers = [0x5375, 0x6E53]
+
+    common = [0] * 66
+    common[0:2] = struct.unpack(">2H", b"EPC\0")
+    registers += [1, len(common), *common]
+
+    inverter = [0] * 50
+    inverter[0] = 123
+    inverter[4] = (-1) & 0xFFFF
+    inverter[12] = 4500
+    inverter[13] = 0
+    registers += [103, len(inverter), *inverter]
+
+    nameplate = [0] * 26
+    nameplate[1] = 60
+    nameplate[2] = 3
+    registers += [120, len(nameplate), *nameplate]
+
+    registers += [0xFFFF, 0]
+
+    return {base_address + offset: value for offset, value in enumerate(registers)}
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        buffer = b""
+        while True:
+            data = self.request.recv(4096)
+            if len(data) == 0:
+                return
+
+            buffer += data
+
+            if self.server.reverse:
+                # hold responses until the client stops sending
+                while select.select([self.request], [], [], 0.05)[0]:
+                    data = self.request.recv(4096)
+                    if len(data) == 0:
+                        return
+                    buffer += data
+
+            frames = []
+            while len(buffer) >= 7:
+                length = struct.unpack(">H", buffer[4:6])[0]
+                if len(buffer) < 6 + length:
+                    break
+                frames.append(buffer[: 6 + length])
+                buffer = buffer[6 + length :]
+
+            if self.server.reverse:
+                frames.reverse()
+
+            for frame in frames:
+                self.request.sendall(self.server.respond(frame))
+
+
+class Server(socketserver.ThreadingTCPServer):
+    """A minimal Modbus TCP server standing in for a SunSpec device."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+
+        self.registers = register_image()
+        self.reads = []
+        self.reverse = False
+        self.lock = threading.Lock()
+
+    def respond(self, frame):
+        header, pdu = frame[:7], frame[7:]
+        transaction_id, _, _, unit = struct.unpack(">HHHB", header)
+        function = pdu[0]
+
+        with self.lock:
+            if function == epyqlib.twisted.modbus.read_holding_registers:
+                _, address, count = struct.unpack(">BHH", pdu[:5])
+                self.reads.append((address, count))
+                values = [self.registers.get(address + i, 0) for i in range(count)]
+                response = struct.pack(
+                    ">BB{}H".format(count),
+                    function,
+                    2 * count,
+                    *values,
+                )
+            elif function == epyqlib.twisted.modbus.write_multiple_registers:
+                _, address, count = struct.unpack(">BHH", pdu[:5])
+                values = struct.unpack(">{}H".format(count), pdu[6 : 6 + 2 * count])
+                for i, value in enumerate(values):
+                    self.registers[address + i] = value
+                response = pdu[:5]
+            else:
+                response = bytes([function | 0x80, 1])
+
+        return struct.pack(">HHHB", transaction_id, 0, len(response) + 1, unit) + (
+            response
+        )
+
+
+@pytest.fixture
+def server():
+    server = Server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def device(server):
+    device = epyqlib.hildevice.SunSpecDevice(model_path=models_path)
+    device.load_tcp(address="127.0.0.1", port=server.server_address[1])
+    server.reads.clear()
+
+    yield device
+
+    device.client.disconnect()
+
+
+def model(device, model_id):
+    (model,) = (
+        model for model in device.device.device.models_list if model.id == model_id
+    )
+
+    return model
+
+
+def nv(device, model_id, name):
+    point_model = model(device=device, model_id=model_id)
+
+    return epyqlib.hildevice.SunSpecNv(
+        nv=point_model.points[name],
+        model=point_model,
+        client=device.client,
+    )
+
+
+def test_coalesce_splits_at_limit(device):
+    points = [
+        point
+        for model in device.device.device.models_list
+        for block in model.blocks
+        for point in [*block.points_list, *block.points_sf.values()]
+    ]
+
+    blocks = epyqlib.twisted.modbus.coalesce(points, gap=125)
+    assert len(blocks) == 2
+    assert all(block.count <= 125 for block in blocks)
+    assert sum(len(block.points) for block in blocks) == len(points)
+
+    # the model headers break up contiguous reads
+    assert len(epyqlib.twisted.modbus.coalesce(points)) == 3
+
+
+@pytest_twisted.inlineCallbacks
+def test_read_many_coalesces_models(server, device):
+    nvs = [
+        nv(device=device, model_id=103, name="A"),
+        nv(device=device, model_id=103, name="W"),
+        nv(device=device, model_id=120, name="WRtg"),
+    ]
+
+    values = yield twisted.internet.defer.ensureDeferred(device.read_many(nvs))
+
+    assert [values[nv].magnitude for nv in nvs] == [
+        decimal.Decimal("12.3"),
+        4500,
+        60000,
+    ]
+    # the points, their scale factors and the header between the models
+    assert len(server.reads) == 1
+
+
+@pytest_twisted.inlineCallbacks
+def test_ttl_skips_fresh_points(server, device):
+    current = nv(device=device, model_id=103, name="A")
+    device.client.ttl = 10
+
+    yield twisted.internet.defer.ensureDeferred(current.get())
+    yield twisted.internet.defer.ensureDeferred(current.get())
+    assert len(server.reads) == 1
+
+    yield twisted.internet.defer.ensureDeferred(
+        device.client.read_points([current.nv], max_age=0),
+    )
+    assert len(server.reads) == 2
+
+
+@pytest_twisted.inlineCallbacks
+def test_set_writes_point(server, device):
+    power = nv(device=device, model_id=103, name="W")
+
+    yield twisted.internet.defer.ensureDeferred(
+        power.set(3000 * power.units()),
+    )
+
+    assert server.registers[int(power.nv.addr)] == 3000
+
+    value = yield twisted.internet.defer.ensureDeferred(power.get())
+    assert value.magnitude == 3000
+
+
+@pytest_twisted.inlineCallbacks
+def test_concurrent_reads_share_connect(server, device):
+    current = nv(device=device, model_id=103, name="A")
+    power = nv(device=device, model_id=103, name="W")
+    connects = []
+    connect = device.client.connect
+
+    def counted_connect():
+        connects.append(None)
+        return connect()
+
+    device.client.disconnect()
+    device.client.connect = counted_connect
+
+    yield twisted.internet.defer.gatherResults(
+        [
+            twisted.internet.defer.ensureDeferred(
+                device.client.read_points([nv.nv], max_age=0),
+            )
+            for nv in (current, power)
+        ],
+    )
+
+    assert len(connects) == 1
+    assert device.client.protocol is not None
+    assert len(server.reads) == 2
+
+
+@pytest_twisted.inlineCallbacks
+def test_pipelined_responses_matched_by_transaction(server, device):
+    server.reverse = True
+    protocol = yield twisted.internet.defer.ensureDeferred(device.client._protocol())
+
+    addresses = [base_address + 4, base_address + 72, base_address + 124]
+    results = yield twisted.internet.defer.gatherResults(
+        [protocol.read(address=address, count=1) for address in addresses],
+    )
+
+    assert [struct.unpack(">H", result)[0] for result in results] == [
+        server.registers[address] for address in addresses
+    ]
+    assert [address for address, _ in server.reads] == addresses[::-1]
+
+
+@pytest_twisted.inlineCallbacks
+def test_exception_response(device):
+    protocol = yield twisted.internet.defer.ensureDeferred(device.client._protocol())
+
+    with pytest.raises(epyqlib.twisted.modbus.ExceptionResponseError):
+        yield protocol.request(bytes([0x2B, 0, 0]))
+
+
+def test_rtu_one_request_at_a_time():
+    clock = twisted.internet.task.Clock()
+    protocol = epyqlib.twisted.modbus.RtuProtocol(slave_id=3, reactor=clock)
+    transport = twisted.internet.testing.StringTransport()
+    protocol.makeConnection(transport)
+
+    first = protocol.read(address=40004, count=2)
+    second = protocol.read(address=40072, count=1)
+
+    frame = transport.value()
+    assert frame[:-2] == bytes([3]) + epyqlib.twisted.modbus.read_pdu(40004, 2)
+    assert sunspec.core.modbus.client.checkCRC(
+        frame[:-2],
+        struct.unpack(">H", frame[-2:])[0],
+    )
+    transport.clear()
+
+    response = bytes([3, 3, 4, 0, 1, 0, 2])
+    response += struct.pack(">H", sunspec.core.modbus.client.computeCRC(response))
+    # split to check that partial frames are buffered
+    protocol.dataReceived(response[:4])
+    assert transport.value() == b""
+    protocol.dataReceived(response[4:])
+
+    assert first.result == b"\x00\x01\x00\x02"
+    assert transport.value()[1:6] == epyqlib.twisted.modbus.read_pdu(40072, 1)
+
+    clock.advance(protocol.timeout)
+    with pytest.raises(epyqlib.twisted.modbus.RequestTimeoutError):
+        second.result.raiseException()
+    second.addErrback(lambda failure: None)
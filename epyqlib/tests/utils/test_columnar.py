@@ -0,0 +1,168 @@
+import array
+import math
+import os
+import random
+
+import pytest
+
+import epyqlib.utils.columnar
+
+
+def write_csv(path, rows):
+    with open(path, "w") as f:
+        f.write(".time,a,b\n")
+        for row in rows:
+            f.write(",".join(str(value) for value in row))
+            f.write("\n")
+
+
+def test_load_csv_caches(tmp_path):
+    path = tmp_path / "log.csv"
+    cache_directory = tmp_path / "cache"
+    write_csv(path, [(i / 10, i, -i) for i in range(100)])
+
+    parsed = epyqlib.utils.columnar.load_csv(path, cache_directory=cache_directory)
+    assert isinstance(parsed["a"], array.array)
+
+    cache_path = epyqlib.utils.columnar.cache_path(path, directory=cache_directory)
+    assert cache_path.exists()
+    assert sorted(os.listdir(tmp_path)) == ["cache", "log.csv"]
+
+    with epyqlib.utils.columnar.load_csv(
+        path, cache_directory=cache_directory
+    ) as mapped:
+        assert isinstance(mapped["a"], memoryview)
+        assert mapped.keys() == [".time", "a", "b"]
+        assert mapped.rows == 100
+        for name in mapped:
+            assert list(mapped[name]) == list(parsed[name])
+
+    # same modification time but a different size is still stale
+    stat = os.stat(path)
+    write_csv(path, [(0, 1, 2)])
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    loaded = epyqlib.utils.columnar.load_csv(path, cache_directory=cache_directory)
+    assert list(loaded["b"]) == [2]
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "log.csv"
+    write_csv(path, [(0, 1, 2)])
+
+    with pytest.raises(epyqlib.utils.columnar.FormatError):
+        epyqlib.utils.columnar.load(path)
+
+
+@pytest.mark.parametrize("length", [1, 63, 64, 1000, 5000])
+def test_envelope_extent(length):
+    random_ = random.Random(length)
+    values = array.array("d", (random_.uniform(-1, 1) for _ in range(length)))
+    envelope = epyqlib.utils.columnar.Envelope(values=values, block_size=16)
+
+    assert envelope.extent() == (min(values), max(values))
+    assert envelope.extent(5, 5) is None
+
+    for _ in range(50):
+        start = random_.randrange(length)
+        stop = random_.randrange(start, length) + 1
+        window = values[start:stop]
+        assert envelope.extent(start, stop) == (min(window), max(window))
+
+
+def test_downsample_keeps_envelope():
+    length = 100_000
+    x = array.array("d", (i / 1000 for i in range(length)))
+    y = array.array("d", (math.sin(i / 500) for i in range(length)))
+    y[54_321] = 10
+    envelope = epyqlib.utils.columnar.Envelope(values=y)
+
+    start, stop = epyqlib.utils.columnar.visible_slice(x, 10.0005, 89.9995)
+    assert x[start] < 10.0005 < x[start + 1]
+    assert x[stop - 2] < 89.9995 < x[stop - 1]
+
+    points = epyqlib.utils.columnar.downsample(
+        x=x,
+        y=y,
+        envelope=envelope,
+        start=start,
+        stop=stop,
+        buckets=500,
+    )
+
+    assert len(points) <= 4 * 500
+    assert points[0] == (x[start], y[start])
+    assert points[-1] == (x[stop - 1], y[stop - 1])
+    assert [px for px, _ in points] == sorted(px for px, _ in points)
+
+    ys = [py for _, py in points]
+    assert max(ys) == 10
+    assert min(ys) == min(y[start:stop])
+
+
+def test_downsample_keeps_extremes_in_order():
+    x = array.array("d", range(1000))
+    y = array.array("d", [0] * 1000)
+    # the maximum comes before the minimum within the first bucket
+    y[10] = 5
+    y[20] = -5
+    envelope = epyqlib.utils.columnar.Envelope(values=y, block_size=4)
+
+    points = epyqlib.utils.columnar.downsample(
+        x=x,
+        y=y,
+        envelope=envelope,
+        start=0,
+        stop=1000,
+        buckets=10,
+    )
+
+    assert points[:4] == [(0, 0), (10, 5), (20, -5), (99, 0)]
+
+
+def test_downsample_short_range_is_exact():
+    x = array.array("d", range(10))
+    y = array.array("d", range(10, 20))
+    envelope = epyqlib.utils.columnar.Envelope(values=y)
+
+    points = epyqlib.utils.columnar.downsample(
+        x=x,
+        y=y,
+        envelope=envelope,
+        start=2,
+        stop=6,
+        buckets=100,
+    )
+
+    assert points == [(2, 12), (3, 13), (4, 14), (5, 15)]
+
+
+def test_typed_round_trip(tmp_path):
+    path = tmp_path / "typed.columns"
+    columns = epyqlib.utils.columnar.Columns(
+        names=["b", "h", "d"],
+        data=[
+            ("b", array.array("b", [-1, 2, 3])),
+            ("h", array.array("H", [1, 65535, 3])),
+            ("d", array.array("d", [0.5, 1.5, 2.5])),
+        ],
+        metadata={"sample_period_us": 100},
+    )
+
+    epyqlib.utils.columnar.write(path, columns)
+
+    with epyqlib.utils.columnar.load(path) as loaded:
+        assert loaded.metadata == {"sample_period_us": 100}
+        assert [loaded.typecode(name) for name in loaded] == ["b", "H", "d"]
+        for name in columns:
+            assert list(loaded[name]) == list(columns[name])
+
+
+def test_write_rejects_platform_sized_types(tmp_path):
+    columns = epyqlib.utils.columnar.Columns(
+        names=["l"],
+        data=[("l", array.array("l", [1]))],
+    )
+
+    with pytest.raises(epyqlib.utils.columnar.FormatError):
+        epyqlib.utils.columnar.write(tmp_path / "l.columns", columns)
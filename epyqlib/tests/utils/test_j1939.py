@@ -0,0 +1,49 @@
+import random
+
+import attr
+import pytest
+
+import epyqlib.utils.j1939
+
+
+def reference_pack(id):
+    lengths = type(id).lengths()
+    strings = ("{:0{}b}".format(n, l) for n, l in zip(attr.astuple(id), lengths))
+    return int("".join(strings), 2)
+
+
+def reference_pgn(id):
+    cls = type(id)
+    strings = (
+        "{:0{}b}".format(n, l)
+        for n, l, b in zip(attr.astuple(id), cls.lengths(), cls.pgns())
+        if b
+    )
+    return int("".join(strings), 2)
+
+
+example_ids = [0x0CFFC2F6, 0x1DEFF741, 0x18EC41F7, 0x18EBFF41, 0, 0x1FFFFFFF]
+
+
+@pytest.mark.parametrize(
+    "n", example_ids + random.Random(0).sample(range(1 << 29), 200)
+)
+def test_id_round_trip(n):
+    id = epyqlib.utils.j1939.Id.unpack(n)
+
+    assert id.pack() == n == reference_pack(id)
+    assert id.pgn() == reference_pgn(id)
+
+
+def test_id_fields():
+    id = epyqlib.utils.j1939.Id.unpack(0x1DEFF741)
+
+    assert id == epyqlib.utils.j1939.Id(
+        priority=7,
+        extended_data_page=0,
+        data_page=1,
+        pdu_format=0xEF,
+        pdu_specific=0xF7,
+        source_address=0x41,
+    )
+    assert id.pgn() == 0x1EFF7
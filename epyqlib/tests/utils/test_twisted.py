@@ -1,4 +1,5 @@
 import gc
+import threading
 import time
 
 import attr
@@ -251,3 +252,63 @@ def test_sequence_stop_while_paused(action_logger, assert_no_unhandled_errbacks)
 
     with pytest.raises(twisted.internet.defer.CancelledError):
         yield deferred
+
+
+@pytest.fixture
+def worker_pool():
+    pool = epyqlib.utils.twisted.WorkerPool(name="test", maximum=2)
+    yield pool
+    pool.stop()
+
+
+@pytest_twisted.inlineCallbacks
+def test_worker_pool_runs_in_thread(worker_pool, assert_no_unhandled_errbacks):
+    def work(cancelled, a, b):
+        return threading.current_thread(), a + b
+
+    thread, result = yield worker_pool.run(work, 1, b=2)
+
+    assert result == 3
+    assert thread is not threading.main_thread()
+
+
+@pytest_twisted.inlineCallbacks
+def test_worker_pool_failure(worker_pool, assert_no_unhandled_errbacks):
+    def work(cancelled):
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        yield worker_pool.run(work)
+
+
+@pytest_twisted.inlineCallbacks
+def test_worker_pool_cancel(worker_pool, assert_no_unhandled_errbacks):
+    started = threading.Event()
+    finished = threading.Event()
+    steps = []
+
+    def work(cancelled):
+        started.set()
+        try:
+            while True:
+                epyqlib.utils.twisted.raise_if_cancelled(cancelled)
+                steps.append(None)
+                time.sleep(0.01)
+        finally:
+            time.sleep(0.05)
+            finished.set()
+
+    deferred = worker_pool.run(work)
+    started.wait()
+    deferred.cancel()
+
+    with pytest.raises(twisted.internet.defer.CancelledError):
+        yield deferred
+
+    # the cancellation is only reported once the worker is done
+    assert finished.is_set()
+
+    # the worker notices and stops
+    count = yield worker_pool.run(lambda cancelled: len(steps))
+    yield epyqlib.utils.twisted.sleep(0.05)
+    assert len(steps) == count
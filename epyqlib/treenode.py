@@ -22,6 +22,12 @@ class Signals(PyQt5.QtCore.QObject):
         int,
     )
     child_removed_complete = PyQt5.QtCore.pyqtSignal("PyQt_PyObject")
+    children_added = PyQt5.QtCore.pyqtSignal("PyQt_PyObject", int, int)
+    children_removed = PyQt5.QtCore.pyqtSignal(
+        "PyQt_PyObject",
+        "PyQt_PyObject",
+        int,
+    )
 
 
 class TreeNode:
@@ -30,6 +36,10 @@ class TreeNode:
 
         self.tx = tx
 
+        # id(child) -> row, validated by identity on lookup so direct
+        # manipulation of self.children (sorting etc) only costs a rebuild
+        self._child_rows = {}
+
         self.tree_parent = None
         self.set_parent(parent)
 
@@ -54,47 +64,113 @@ class TreeNode:
         if self.tree_parent is not None:
             self.tree_parent.append_child(self)
 
+    def _index_children(self, start=0):
+        rows = self._child_rows
+        if start == 0:
+            rows.clear()
+
+        for row in range(start, len(self.children)):
+            rows[id(self.children[row])] = row
+
     def insert_child(self, i, child):
         self.children.insert(i, child)
         child.tree_parent = self
+        row = self.row_of_child(child, hint=i)
+        self._index_children(start=row)
         self.pyqt_signals.child_added.emit(child, i)
         self.pyqt_signals.child_added_complete.emit(child)
 
     def append_child(self, child):
         self.children.append(child)
         child.tree_parent = self
-        self.pyqt_signals.child_added.emit(child, len(self.children) - 1)
+        row = len(self.children) - 1
+        self._child_rows[id(child)] = row
+        self.pyqt_signals.child_added.emit(child, row)
         self.pyqt_signals.child_added_complete.emit(child)
 
+    def insert_children(self, i, children):
+        """Insert several children starting at row ``i``.  A single
+        ``children_added`` range signal is emitted rather than one
+        ``child_added`` per child.  ``child_added_complete`` is still
+        emitted for each child."""
+
+        children = list(children)
+        if len(children) == 0:
+            return
+
+        i = min(max(i, 0), len(self.children))
+        self.children[i:i] = children
+        for child in children:
+            child.tree_parent = self
+        self._index_children(start=i)
+
+        self.pyqt_signals.children_added.emit(self, i, i + len(children) - 1)
+        for child in children:
+            self.pyqt_signals.child_added_complete.emit(child)
+
+    def append_children(self, children):
+        self.insert_children(len(self.children), children)
+
     def child_at_row(self, row):
         if row < len(self.children):
             return self.children[row]
         else:
             return None
 
-    def row_of_child(self, child):
-        for i, item in enumerate(self.children):
-            if item is child:
-                return i
-        return -1
+    def row_of_child(self, child, hint=None):
+        children = self.children
+        row = self._child_rows.get(id(child), hint)
+
+        if row is None or row >= len(children) or children[row] is not child:
+            self._index_children()
+            row = self._child_rows.get(id(child), -1)
+
+        return row
 
     def remove_child(self, row=None, child=None):
         if child is None:
             child = self.children[row]
         elif row is None:
-            row = self.children.index(child)
+            row = self.row_of_child(child)
+            if row == -1:
+                raise ValueError("{!r} is not a child".format(child))
 
         tree_parent = child.tree_parent
 
         child.parent = None
         child.tree_parent = None
-        self.children.remove(child)
+        del self.children[row]
+        self._child_rows.pop(id(child), None)
+        self._index_children(start=row)
 
         self.pyqt_signals.child_removed.emit(tree_parent, child, row)
         self.pyqt_signals.child_removed_complete.emit(child)
 
         return True
 
+    def remove_children(self, row, count):
+        """Remove ``count`` children starting at ``row`` emitting a single
+        ``children_removed`` range signal.  ``child_removed_complete`` is
+        still emitted for each child."""
+
+        children = self.children[row : row + count]
+        if len(children) == 0:
+            return []
+
+        for child in children:
+            child.parent = None
+            child.tree_parent = None
+            self._child_rows.pop(id(child), None)
+
+        del self.children[row : row + len(children)]
+        self._index_children(start=row)
+
+        self.pyqt_signals.children_removed.emit(self, children, row)
+        for child in children:
+            self.pyqt_signals.child_removed_complete.emit(child)
+
+        return children
+
     def traverse(self, call_this, payload=None, internal_nodes=False):
         if internal_nodes or len(self.children) == 0:
             call_this(self, payload)
@@ -31,6 +31,13 @@ class BusProxy(epyqlib.canneo.QtCanListener):
 
         self._bus = bus
 
+    def can_filter_ids(self):
+        can_filter_ids = getattr(self._protocol, "can_filter_ids", None)
+        if can_filter_ids is None:
+            return None
+
+        return can_filter_ids()
+
     def write(self, message):
         return self._bus.send(msg=message)
 
@@ -1,7 +1,9 @@
 import logging
+import time
 import can
 import collections
 import enum
+import epyqlib.metrics
 import epyqlib.utils.twisted
 import functools
 import itertools
@@ -13,6 +15,11 @@ from PyQt5.QtCore import QObject, pyqtSignal
 
 logger = logging.getLogger(__name__)
 
+commands = epyqlib.metrics.registry.counter("ccp.commands")
+command_seconds = epyqlib.metrics.registry.histogram("ccp.command_seconds")
+timeouts = epyqlib.metrics.registry.counter("ccp.timeouts")
+errors = epyqlib.metrics.registry.counter("ccp.errors")
+
 
 def endianness_swap_2byte(b):
     # TODO: figure out the correct way to handle endianness, especially
@@ -113,6 +120,7 @@ class Handler(QObject, twisted.protocols.policies.TimeoutMixin):
         self._download_block_counter = 0
 
         self._messages_sent = 0
+        self._send_time = None
 
         self.request_memory = None
 
@@ -135,6 +143,9 @@ class Handler(QObject, twisted.protocols.policies.TimeoutMixin):
         self._transport = transport
         logger.debug("Handler.makeConnection(): {}".format(transport))
 
+    def can_filter_ids(self):
+        return {(self._rx_id, self._extended)}
+
     def connect(self, station_address=1, timeout=None):
         logger.debug("Entering connect()")
         if self._active:
@@ -536,6 +547,11 @@ class Handler(QObject, twisted.protocols.policies.TimeoutMixin):
         self.state = state
 
         logger.debug("Message to be sent: {}".format(packet))
+
+        if epyqlib.metrics.enabled:
+            commands.increment()
+            self._send_time = time.perf_counter()
+
         self._transport.write(packet.message)
 
         if count_towards_total:
@@ -557,6 +573,12 @@ class Handler(QObject, twisted.protocols.policies.TimeoutMixin):
 
         self.setTimeout(None)
 
+        if self._send_time is not None:
+            # multi-reply commands such as uploads report the first reply
+            if epyqlib.metrics.enabled:
+                command_seconds.record(time.perf_counter() - self._send_time)
+            self._send_time = None
+
         packet = Packet.from_message(message=msg)
 
         if not isinstance(packet, BootloaderReply):
@@ -737,6 +759,10 @@ class Handler(QObject, twisted.protocols.policies.TimeoutMixin):
     def timeoutConnection(self):
         message = "Handler timed out while in state: {}".format(self.state)
         logger.debug(message)
+
+        self._send_time = None
+        if epyqlib.metrics.enabled:
+            timeouts.increment()
         self._active = False
         if self._previous_state in [HandlerState.idle]:
             self.state = self._previous_state
@@ -748,6 +774,9 @@ class Handler(QObject, twisted.protocols.policies.TimeoutMixin):
         self._deferred.callback(payload)
 
     def errback(self, payload):
+        if epyqlib.metrics.enabled:
+            errors.increment()
+
         self._active = False
         logger.debug("erring back for {}".format(self._deferred))
         logger.debug("with payload {}".format(payload))
@@ -0,0 +1,576 @@
+"""J1939-21 transport protocol for messages of 9 to 1785 bytes.
+
+:class:`Protocol` splits a message into TP.DT packets of seven bytes
+and sends them with TP.CM connection management messages.  It also
+reassembles messages that other nodes send.  Messages to the global
+address are broadcast with BAM.  Messages to a single node use RTS/CTS,
+where the receiver paces the packets and acknowledges the whole message
+at the end.
+
+Sessions are kept per source and destination pair, so transfers between
+different pairs run concurrently.  Sends to one destination are queued
+behind each other because J1939 allows only one connection per pair at a
+time.  The J1939-21 timeouts are in :class:`Timeouts`.  If a peer misses
+one, the session is aborted, and the receiver drops broadcasts it cannot
+complete.
+"""
+
+import collections
+import enum
+import logging
+
+import attr
+import can
+import twisted.internet.defer
+
+import epyqlib.metrics
+import epyqlib.utils.j1939
+
+
+logger = logging.getLogger(__name__)
+
+aborts = epyqlib.metrics.registry.counter("j1939_transport.aborts")
+timeouts = epyqlib.metrics.registry.counter("j1939_transport.timeouts")
+
+connection_management_pdu_format = 0xEC
+data_transfer_pdu_format = 0xEB
+
+global_address = 0xFF
+default_priority = 7
+
+packet_size = 7
+maximum_packets = 255
+maximum_size = packet_size * maximum_packets
+no_limit = 0xFF
+
+
+class ControlByte(enum.IntEnum):
+    request_to_send = 16
+    clear_to_send = 17
+    end_of_message_acknowledge = 19
+    broadcast_announce = 32
+    abort = 255
+
+
+class AbortReason(enum.IntEnum):
+    already_in_session = 1
+    resources_needed = 2
+    timeout = 3
+    clear_to_send_during_transfer = 4
+    retransmit_limit = 5
+    unexpected_data_transfer = 6
+    bad_sequence_number = 7
+    duplicate_sequence_number = 8
+    message_too_large = 9
+
+
+class TransportError(Exception):
+    pass
+
+
+class MessageTooLongError(TransportError):
+    pass
+
+
+class TransportTimeoutError(TransportError):
+    pass
+
+
+class AbortedError(TransportError):
+    def __init__(self, reason):
+        super().__init__("Aborted by the receiver with reason {}".format(reason))
+        self.reason = reason
+
+
+@attr.s(frozen=True)
+class Timeouts:
+    """Seconds, named as in J1939-21."""
+
+    # receiver, between packets
+    t1 = attr.ib(default=0.75)
+    # receiver, from sending a CTS to the first packet
+    t2 = attr.ib(default=1.25)
+    # originator, from the last packet to a CTS or the acknowledgement
+    t3 = attr.ib(default=1.25)
+    # originator, from a CTS holding the connection open to the next CTS
+    t4 = attr.ib(default=1.05)
+    # originator, between broadcast packets which must be 50 to 200 ms apart
+    broadcast_interval = attr.ib(default=0.05)
+
+
+@attr.s(frozen=True)
+class ReceivedMessage:
+    pgn = attr.ib()
+    source = attr.ib()
+    destination = attr.ib()
+    data = attr.ib()
+
+
+@attr.s(eq=False)
+class _Session:
+    pgn = attr.ib()
+    source = attr.ib()
+    destination = attr.ib()
+    size = attr.ib()
+    packets = attr.ib()
+    data = attr.ib()
+    deferred = attr.ib(default=None)
+    next_packet = attr.ib(default=1)
+    window_end = attr.ib(default=0)
+    packets_per_clear_to_send = attr.ib(default=no_limit)
+    call = attr.ib(default=None)
+
+    @property
+    def broadcast(self):
+        return self.destination == global_address
+
+
+def packet_count(size):
+    return -(-size // packet_size)
+
+
+def identifier(pgn, source, destination=global_address, priority=default_priority):
+    pdu_format = (pgn >> 8) & 0xFF
+
+    if pdu_format < 240:
+        pdu_specific = destination
+    else:
+        pdu_specific = pgn & 0xFF
+
+    return epyqlib.utils.j1939.Id.pack(
+        epyqlib.utils.j1939.Id(
+            priority=priority,
+            extended_data_page=(pgn >> 17) & 1,
+            data_page=(pgn >> 16) & 1,
+            pdu_format=pdu_format,
+            pdu_specific=pdu_specific,
+            source_address=source,
+        )
+    )
+
+
+def _pgn_bytes(pgn):
+    return pgn.to_bytes(3, "little")
+
+
+class Protocol:
+    """Send and receive transported messages as the node at ``address``.
+
+    Reassembled messages are passed to the listeners added with
+    :meth:`add_listener`.  Messages of eight bytes or less are not
+    transported and are neither reported nor handled here beyond
+    :meth:`send` writing them directly.
+    """
+
+    def __init__(
+        self,
+        address,
+        timeouts=Timeouts(),
+        packets_per_clear_to_send=16,
+        reactor=None,
+    ):
+        if reactor is None:
+            from twisted.internet import reactor
+
+        self.address = address
+        self.timeouts = timeouts
+        self.packets_per_clear_to_send = packets_per_clear_to_send
+        self.reactor = reactor
+
+        self._transport = None
+        self._listeners = []
+
+        # (source, destination) -> _Session
+        self._receiving = {}
+        # destination -> _Session
+        self._sending = {}
+        self._send_locks = collections.defaultdict(twisted.internet.defer.DeferredLock)
+
+    def makeConnection(self, transport):
+        self._transport = transport
+
+    def can_filter_ids(self):
+        # transport messages can come from any source
+        return None
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def send(self, pgn, data, destination=global_address, priority=default_priority):
+        data = bytes(data)
+
+        if len(data) > maximum_size:
+            raise MessageTooLongError(
+                "{} bytes is more than the {} that can be transported".format(
+                    len(data), maximum_size
+                )
+            )
+
+        if len(data) <= 8:
+            self._write(
+                identifier(
+                    pgn=pgn,
+                    source=self.address,
+                    destination=destination,
+                    priority=priority,
+                ),
+                data,
+            )
+
+            return twisted.internet.defer.succeed(None)
+
+        return self._send_locks[destination].run(
+            self._start_send,
+            pgn=pgn,
+            data=data,
+            destination=destination,
+        )
+
+    def _start_send(self, pgn, data, destination):
+        session = _Session(
+            pgn=pgn,
+            source=self.address,
+            destination=destination,
+            size=len(data),
+            packets=packet_count(len(data)),
+            data=data,
+        )
+        session.deferred = twisted.internet.defer.Deferred(
+            canceller=lambda _: self._cancel_send(session),
+        )
+        self._sending[destination] = session
+
+        if session.broadcast:
+            self._send_management(
+                session,
+                ControlByte.broadcast_announce,
+                *session.size.to_bytes(2, "little"),
+                session.packets,
+                no_limit,
+            )
+            self._schedule(
+                session,
+                self.timeouts.broadcast_interval,
+                self._send_broadcast_packet,
+            )
+        else:
+            self._send_management(
+                session,
+                ControlByte.request_to_send,
+                *session.size.to_bytes(2, "little"),
+                session.packets,
+                self.packets_per_clear_to_send,
+            )
+            self._schedule(session, self.timeouts.t3, self._send_timed_out)
+
+        return session.deferred
+
+    def dataReceived(self, msg):
+        if not msg.is_extended_id or msg.is_error_frame or msg.is_remote_frame:
+            return
+
+        id = epyqlib.utils.j1939.Id.unpack(msg.arbitration_id)
+        if id.extended_data_page != 0 or id.data_page != 0:
+            return
+
+        destination = id.pdu_specific
+        if destination not in (self.address, global_address):
+            return
+
+        data = bytes(msg.data)
+        if len(data) < 8:
+            return
+
+        if id.pdu_format == connection_management_pdu_format:
+            self._management_received(
+                source=id.source_address,
+                destination=destination,
+                data=data,
+            )
+        elif id.pdu_format == data_transfer_pdu_format:
+            self._packet_received(
+                source=id.source_address,
+                destination=destination,
+                data=data,
+            )
+
+    def _management_received(self, source, destination, data):
+        control = data[0]
+        pgn = int.from_bytes(data[5:8], "little")
+
+        if control == ControlByte.broadcast_announce:
+            if destination == global_address:
+                self._receive(source, destination, pgn, data)
+        elif destination == global_address:
+            # only announcements are broadcast
+            return
+        elif control == ControlByte.request_to_send:
+            self._receive(source, destination, pgn, data)
+        elif control == ControlByte.clear_to_send:
+            session = self._sending.get(source)
+            if session is not None and session.pgn == pgn:
+                self._clear_to_send_received(
+                    session, count=data[1], next_packet=data[2]
+                )
+        elif control == ControlByte.end_of_message_acknowledge:
+            session = self._sending.get(source)
+            if session is not None and session.pgn == pgn:
+                self._end_send(session)
+                session.deferred.callback(None)
+        elif control == ControlByte.abort:
+            self._abort_received(source, pgn, reason=data[1])
+
+    def _abort_received(self, source, pgn, reason):
+        session = self._sending.get(source)
+        if session is not None and session.pgn == pgn:
+            logger.debug("Send to {} aborted with reason {}".format(source, reason))
+            self._end_send(session)
+            session.deferred.errback(AbortedError(reason=reason))
+            return
+
+        session = self._receiving.get((source, self.address))
+        if session is not None and session.pgn == pgn:
+            logger.debug("Receive from {} aborted".format(source))
+            self._end_receive(session)
+
+    def _receive(self, source, destination, pgn, data):
+        key = (source, destination)
+        size = int.from_bytes(data[1:3], "little")
+        packets = data[3]
+
+        existing = self._receiving.get(key)
+        if existing is not None:
+            if existing.broadcast or existing.pgn == pgn:
+                # the originator has started over
+                self._end_receive(existing)
+            else:
+                self._abort(source, pgn, AbortReason.already_in_session)
+                return
+
+        if size > maximum_size or packets != packet_count(size):
+            if destination != global_address:
+                self._abort(source, pgn, AbortReason.message_too_large)
+            return
+
+        session = _Session(
+            pgn=pgn,
+            source=source,
+            destination=destination,
+            size=size,
+            packets=packets,
+            data=bytearray(packets * packet_size),
+            packets_per_clear_to_send=min(self.packets_per_clear_to_send, data[4]),
+        )
+        self._receiving[key] = session
+
+        if session.broadcast:
+            self._schedule(session, self.timeouts.t1, self._receive_timed_out)
+        else:
+            self._request_packets(session)
+
+    def _request_packets(self, session):
+        count = min(
+            session.packets_per_clear_to_send,
+            session.packets - session.next_packet + 1,
+        )
+        session.window_end = session.next_packet + count - 1
+
+        self._send_management(
+            session,
+            ControlByte.clear_to_send,
+            count,
+            session.next_packet,
+            0xFF,
+            0xFF,
+            destination=session.source,
+        )
+        self._schedule(session, self.timeouts.t2, self._receive_timed_out)
+
+    def _packet_received(self, source, destination, data):
+        session = self._receiving.get((source, destination))
+        if session is None:
+            return
+
+        sequence = data[0]
+        if sequence != session.next_packet:
+            self._end_receive(session)
+
+            if not session.broadcast:
+                if sequence < session.next_packet:
+                    reason = AbortReason.duplicate_sequence_number
+                else:
+                    reason = AbortReason.bad_sequence_number
+                self._abort(source, session.pgn, reason)
+
+            return
+
+        start = (sequence - 1) * packet_size
+        session.data[start : start + packet_size] = data[1:8]
+        session.next_packet += 1
+
+        if session.next_packet > session.packets:
+            self._end_receive(session)
+
+            if not session.broadcast:
+                self._send_management(
+                    session,
+                    ControlByte.end_of_message_acknowledge,
+                    *session.size.to_bytes(2, "little"),
+                    session.packets,
+                    0xFF,
+                    destination=session.source,
+                )
+
+            message = ReceivedMessage(
+                pgn=session.pgn,
+                source=session.source,
+                destination=session.destination,
+                data=bytes(session.data[: session.size]),
+            )
+            for listener in list(self._listeners):
+                listener(message)
+        elif not session.broadcast and sequence == session.window_end:
+            self._request_packets(session)
+        else:
+            self._schedule(session, self.timeouts.t1, self._receive_timed_out)
+
+    def _clear_to_send_received(self, session, count, next_packet):
+        if count == 0:
+            # the receiver is holding the connection open
+            self._schedule(session, self.timeouts.t4, self._send_timed_out)
+            return
+
+        if not 1 <= next_packet <= session.packets:
+            self._end_send(session)
+            self._abort(session.destination, session.pgn, AbortReason.resources_needed)
+            session.deferred.errback(
+                TransportError("Clear to send for packet {}".format(next_packet))
+            )
+            return
+
+        last = min(session.packets, next_packet + count - 1)
+        for number in range(next_packet, last + 1):
+            self._send_packet(session, number)
+
+        self._schedule(session, self.timeouts.t3, self._send_timed_out)
+
+    def _send_broadcast_packet(self, session):
+        self._send_packet(session, session.next_packet)
+        session.next_packet += 1
+
+        if session.next_packet > session.packets:
+            self._end_send(session)
+            session.deferred.callback(None)
+        else:
+            self._schedule(
+                session,
+                self.timeouts.broadcast_interval,
+                self._send_broadcast_packet,
+            )
+
+    def _send_packet(self, session, number):
+        start = (number - 1) * packet_size
+        chunk = session.data[start : start + packet_size]
+        padding = b"\xff" * (packet_size - len(chunk))
+
+        self._write(
+            identifier(
+                pgn=data_transfer_pdu_format << 8,
+                source=self.address,
+                destination=session.destination,
+            ),
+            bytes((number,)) + chunk + padding,
+        )
+
+    def _send_timed_out(self, session):
+        session.call = None
+        if epyqlib.metrics.enabled:
+            timeouts.increment()
+
+        logger.debug("Send to {} timed out".format(session.destination))
+
+        self._end_send(session)
+        self._abort(session.destination, session.pgn, AbortReason.timeout)
+        session.deferred.errback(
+            TransportTimeoutError(
+                "No response from {} to the transfer of PGN {}".format(
+                    session.destination, session.pgn
+                )
+            )
+        )
+
+    def _receive_timed_out(self, session):
+        session.call = None
+        if epyqlib.metrics.enabled:
+            timeouts.increment()
+
+        logger.debug("Receive from {} timed out".format(session.source))
+
+        self._end_receive(session)
+        if not session.broadcast:
+            self._abort(session.source, session.pgn, AbortReason.timeout)
+
+    def _cancel_send(self, session):
+        if self._sending.get(session.destination) is not session:
+            return
+
+        self._end_send(session)
+        if not session.broadcast:
+            self._abort(session.destination, session.pgn, AbortReason.resources_needed)
+
+    def _end_send(self, session):
+        self._cancel_call(session)
+        del self._sending[session.destination]
+
+    def _end_receive(self, session):
+        self._cancel_call(session)
+        del self._receiving[(session.source, session.destination)]
+
+    def _schedule(self, session, seconds, f):
+        self._cancel_call(session)
+        session.call = self.reactor.callLater(seconds, f, session)
+
+    def _cancel_call(self, session):
+        if session.call is not None and session.call.active():
+            session.call.cancel()
+
+        session.call = None
+
+    def _abort(self, destination, pgn, reason):
+        if epyqlib.metrics.enabled:
+            aborts.increment()
+
+        self._write(
+            identifier(
+                pgn=connection_management_pdu_format << 8,
+                source=self.address,
+                destination=destination,
+            ),
+            bytes((ControlByte.abort, reason, 0xFF, 0xFF, 0xFF)) + _pgn_bytes(pgn),
+        )
+
+    def _send_management(self, session, *payload, destination=None):
+        if destination is None:
+            destination = session.destination
+
+        self._write(
+            identifier(
+                pgn=connection_management_pdu_format << 8,
+                source=self.address,
+                destination=destination,
+            ),
+            bytes(payload) + _pgn_bytes(session.pgn),
+        )
+
+    def _write(self, arbitration_id, data):
+        self._transport.write(
+            can.Message(
+                arbitration_id=arbitration_id,
+                is_extended_id=True,
+                dlc=len(data),
+                data=data,
+            )
+        )
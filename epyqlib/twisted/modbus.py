@@ -0,0 +1,622 @@
+"""Non-blocking Modbus TCP and RTU clients for SunSpec devices.
+
+:class:`TcpProtocol` and :class:`RtuProtocol` read and write holding
+registers without blocking the reactor.  Modbus TCP tags each request with
+a transaction ID so :class:`TcpProtocol` keeps several requests in flight
+and matches the responses as they arrive.  Modbus RTU has no such ID and
+:class:`RtuProtocol` sends one request at a time.
+
+:class:`PointClient` reads pysunspec points.  It merges the registers of
+the requested points, and of their scale factors, into the fewest reads of
+at most 125 registers and skips points read within their time to live.
+The decoded values are stored on the pysunspec points just as
+``model.read_points()`` would store them.
+"""
+
+import abc
+import collections
+import logging
+import struct
+import time
+
+import attr
+import sunspec.core.modbus.client
+import twisted.internet.defer
+import twisted.internet.endpoints
+import twisted.internet.protocol
+import twisted.python.failure
+
+import epyqlib.metrics
+
+
+logger = logging.getLogger(__name__)
+
+transaction_seconds = epyqlib.metrics.registry.histogram("modbus.transaction_seconds")
+registers_read = epyqlib.metrics.registry.counter("modbus.registers_read")
+timeouts = epyqlib.metrics.registry.counter("modbus.timeouts")
+
+read_holding_registers = 3
+write_multiple_registers = 16
+
+maximum_read_count = 125
+maximum_write_count = 123
+
+
+class ModbusError(Exception):
+    pass
+
+
+class ExceptionResponseError(ModbusError):
+    def __init__(self, function, code):
+        super().__init__(
+            "Function {} failed with exception code {}".format(function, code)
+        )
+        self.function = function
+        self.code = code
+
+
+class RequestTimeoutError(ModbusError):
+    pass
+
+
+class NotConnectedError(ModbusError):
+    pass
+
+
+@attr.s(eq=False)
+class Request:
+    pdu = attr.ib()
+    deferred = attr.ib()
+    send_time = attr.ib(default=None)
+    timeout_call = attr.ib(default=None)
+
+
+def read_pdu(address, count):
+    return struct.pack(">BHH", read_holding_registers, address, count)
+
+
+def write_pdu(address, data):
+    count = len(data) // 2
+
+    return (
+        struct.pack(">BHHB", write_multiple_registers, address, count, len(data)) + data
+    )
+
+
+def parse_response(request_pdu, response_pdu):
+    """Return the register data of a read or ``None`` for a write, raising
+    :class:`ExceptionResponseError` for an exception response."""
+
+    function = request_pdu[0]
+
+    if response_pdu[0] == function | 0x80:
+        raise ExceptionResponseError(function=function, code=response_pdu[1])
+
+    if response_pdu[0] != function:
+        raise ModbusError(
+            "Response function {} does not match request function {}".format(
+                response_pdu[0], function
+            )
+        )
+
+    if function == read_holding_registers:
+        return bytes(response_pdu[2 : 2 + response_pdu[1]])
+
+    return None
+
+
+class _Protocol(twisted.internet.protocol.Protocol, metaclass=abc.ABCMeta):
+    """Common request handling.  Subclasses frame the PDUs and decide how
+    many requests may be outstanding."""
+
+    def __init__(self, slave_id=1, timeout=1, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+
+        self.slave_id = slave_id
+        self.timeout = timeout
+        self.reactor = reactor
+
+        self._queue = collections.deque()
+        self._buffer = b""
+        self.connected = False
+
+    def connectionMade(self):
+        self.connected = True
+
+    def connectionLost(self, reason):
+        self.connected = False
+
+        for request in self._abandon():
+            request.deferred.errback(NotConnectedError(str(reason.value)))
+
+    def read(self, address, count):
+        if not 0 < count <= maximum_read_count:
+            raise ModbusError(
+                "Read count must be from 1 to {}, got {}".format(
+                    maximum_read_count, count
+                )
+            )
+
+        return self.request(read_pdu(address=address, count=count))
+
+    def write(self, address, data):
+        if len(data) % 2 != 0 or not 0 < len(data) // 2 <= maximum_write_count:
+            raise ModbusError(
+                "Write must be from 1 to {} whole registers, got {} bytes".format(
+                    maximum_write_count, len(data)
+                )
+            )
+
+        return self.request(write_pdu(address=address, data=data))
+
+    def request(self, pdu):
+        request = Request(pdu=pdu, deferred=twisted.internet.defer.Deferred())
+
+        if not self.connected:
+            request.deferred.errback(NotConnectedError())
+            return request.deferred
+
+        self._queue.append(request)
+        self._send_queued()
+
+        return request.deferred
+
+    def _start(self, request, frame):
+        request.send_time = time.monotonic()
+        request.timeout_call = self.reactor.callLater(
+            self.timeout,
+            self._timed_out,
+            request,
+        )
+        self.transport.write(frame)
+
+    def _finish(self, request, response_pdu):
+        if request.timeout_call.active():
+            request.timeout_call.cancel()
+
+        if epyqlib.metrics.enabled:
+            transaction_seconds.record(time.monotonic() - request.send_time)
+
+        try:
+            result = parse_response(
+                request_pdu=request.pdu,
+                response_pdu=response_pdu,
+            )
+        except ModbusError as e:
+            request.deferred.errback(e)
+        else:
+            request.deferred.callback(result)
+
+        self._send_queued()
+
+    def _timed_out(self, request):
+        if epyqlib.metrics.enabled:
+            timeouts.increment()
+
+        self._forget(request)
+        request.deferred.errback(
+            RequestTimeoutError(
+                "No response within {:.1f} seconds".format(self.timeout),
+            )
+        )
+
+        self._send_queued()
+
+    def _abandon(self):
+        requests = list(self._queue)
+        self._queue.clear()
+
+        for request in requests:
+            if request.timeout_call is not None and request.timeout_call.active():
+                request.timeout_call.cancel()
+
+        return requests
+
+    @abc.abstractmethod
+    def _send_queued(self):
+        pass
+
+    @abc.abstractmethod
+    def _forget(self, request):
+        pass
+
+
+class TcpProtocol(_Protocol):
+    """Modbus TCP with up to ``maximum_in_flight`` requests outstanding."""
+
+    def __init__(self, slave_id=1, timeout=1, maximum_in_flight=8, reactor=None):
+        super().__init__(slave_id=slave_id, timeout=timeout, reactor=reactor)
+
+        self.maximum_in_flight = maximum_in_flight
+        self._in_flight = {}
+        self._transaction_id = 0
+
+    def _send_queued(self):
+        while len(self._queue) > 0 and len(self._in_flight) < self.maximum_in_flight:
+            request = self._queue.popleft()
+
+            self._transaction_id = (self._transaction_id + 1) % 0x10000
+            self._in_flight[self._transaction_id] = request
+
+            header = struct.pack(
+                ">HHHB",
+                self._transaction_id,
+                0,
+                len(request.pdu) + 1,
+                self.slave_id,
+            )
+            self._start(request=request, frame=header + request.pdu)
+
+    def dataReceived(self, data):
+        self._buffer += data
+
+        while len(self._buffer) >= 7:
+            transaction_id, _protocol_id, length, _unit = struct.unpack(
+                ">HHHB",
+                self._buffer[:7],
+            )
+            end = 6 + length
+            if len(self._buffer) < end:
+                break
+
+            pdu = self._buffer[7:end]
+            self._buffer = self._buffer[end:]
+
+            request = self._in_flight.pop(transaction_id, None)
+            if request is None:
+                # a late response to a request that has timed out
+                continue
+
+            self._finish(request=request, response_pdu=pdu)
+
+    def _forget(self, request):
+        for transaction_id, in_flight in tuple(self._in_flight.items()):
+            if in_flight is request:
+                del self._in_flight[transaction_id]
+
+    def _abandon(self):
+        requests = list(self._in_flight.values())
+        self._in_flight.clear()
+
+        for request in requests:
+            if request.timeout_call.active():
+                request.timeout_call.cancel()
+
+        return requests + super()._abandon()
+
+
+class RtuProtocol(_Protocol):
+    """Modbus RTU, one request at a time as the frames carry no ID."""
+
+    def __init__(self, slave_id=1, timeout=1, reactor=None):
+        super().__init__(slave_id=slave_id, timeout=timeout, reactor=reactor)
+
+        self._active = None
+
+    def _send_queued(self):
+        if self._active is not None or len(self._queue) == 0:
+            return
+
+        self._active = self._queue.popleft()
+        self._buffer = b""
+
+        frame = bytes([self.slave_id]) + self._active.pdu
+        crc = sunspec.core.modbus.client.computeCRC(frame)
+        self._start(request=self._active, frame=frame + struct.pack(">H", crc))
+
+    def _expected_length(self):
+        if len(self._buffer) < 3:
+            return None
+
+        function = self._buffer[1]
+        if function & 0x80:
+            return 5
+
+        if function == read_holding_registers:
+            return 5 + self._buffer[2]
+
+        return 8
+
+    def dataReceived(self, data):
+        if self._active is None:
+            return
+
+        self._buffer += data
+
+        length = self._expected_length()
+        if length is None or len(self._buffer) < length:
+            return
+
+        frame = self._buffer[:length]
+        self._buffer = b""
+
+        if frame[0] != self.slave_id or not sunspec.core.modbus.client.checkCRC(
+            frame[:-2], struct.unpack(">H", frame[-2:])[0]
+        ):
+            # leave the request to time out
+            logger.debug("Discarding Modbus RTU frame %r", frame)
+            return
+
+        request = self._active
+        self._active = None
+        self._finish(request=request, response_pdu=frame[1:-2])
+
+    def _forget(self, request):
+        if self._active is request:
+            self._active = None
+
+    def _abandon(self):
+        requests = [] if self._active is None else [self._active]
+        self._active = None
+
+        for request in requests:
+            if request.timeout_call.active():
+                request.timeout_call.cancel()
+
+        return requests + super()._abandon()
+
+
+@attr.s(frozen=True)
+class Block:
+    address = attr.ib()
+    count = attr.ib()
+    points = attr.ib()
+
+
+def point_span(point):
+    address = int(point.addr)
+
+    return address, address + int(point.point_type.len)
+
+
+def coalesce(points, maximum_count=maximum_read_count, gap=0):
+    """Group points into blocks of at most ``maximum_count`` registers.
+    Points separated by up to ``gap`` unrequested registers share a
+    block."""
+
+    blocks = []
+    start = end = None
+    members = []
+
+    for point in sorted(points, key=point_span):
+        point_start, point_end = point_span(point)
+
+        if (
+            start is not None
+            and point_start <= end + gap
+            and (max(end, point_end) - start <= maximum_count)
+        ):
+            end = max(end, point_end)
+            members.append(point)
+            continue
+
+        if start is not None:
+            blocks.append(Block(address=start, count=end - start, points=members))
+
+        start, end = point_start, point_end
+        members = [point]
+
+    if start is not None:
+        blocks.append(Block(address=start, count=end - start, points=members))
+
+    return blocks
+
+
+def decode(point, data):
+    """Set ``point.value_base`` from its registers like pysunspec's
+    ``ClientModel.read_points()``.  Scale factors must be decoded before
+    the points that use them."""
+
+    value = point.point_type.data_to(data)
+    if isinstance(value, bytes):
+        value = str(value, "latin-1")
+
+    if not point.point_type.is_impl(value):
+        point.value_base = None
+        point.value_sf = None
+        return
+
+    point.value_base = value
+    if point.sf_point is not None:
+        point.value_sf = point.sf_point.value_base
+
+
+@attr.s(eq=False)
+class PointClient:
+    """Read and write pysunspec points through a :class:`TcpProtocol` or
+    :class:`RtuProtocol`.  ``connect`` is called with no arguments to
+    (re)connect and returns a deferred firing with the protocol.
+
+    Points read within ``ttl`` seconds, or the per point override in
+    ``ttls``, are not read again.  Up to ``gap`` registers between
+    requested points are read along with them since another request costs
+    far more than a few more registers."""
+
+    connect = attr.ib()
+    ttl = attr.ib(default=0)
+    ttls = attr.ib(factory=dict)
+    gap = attr.ib(default=maximum_read_count)
+    clock = attr.ib(default=time.monotonic, repr=False)
+    protocol = attr.ib(default=None)
+    _read_times = attr.ib(factory=dict, repr=False)
+    _connecting = attr.ib(default=None, repr=False)
+    _waiters = attr.ib(factory=list, repr=False)
+
+    @classmethod
+    def tcp(cls, host, port=502, slave_id=1, timeout=1, reactor=None, **kwargs):
+        if reactor is None:
+            from twisted.internet import reactor
+
+        endpoint = twisted.internet.endpoints.TCP4ClientEndpoint(
+            reactor=reactor,
+            host=host,
+            port=port,
+            timeout=timeout,
+        )
+
+        def connect():
+            return twisted.internet.endpoints.connectProtocol(
+                endpoint,
+                TcpProtocol(slave_id=slave_id, timeout=timeout, reactor=reactor),
+            )
+
+        return cls(connect=connect, **kwargs)
+
+    @classmethod
+    def rtu(
+        cls,
+        port,
+        baudrate=115200,
+        parity="N",
+        slave_id=1,
+        timeout=1,
+        reactor=None,
+        **kwargs,
+    ):
+        if reactor is None:
+            from twisted.internet import reactor
+
+        import twisted.internet.serialport
+
+        def connect():
+            protocol = RtuProtocol(slave_id=slave_id, timeout=timeout, reactor=reactor)
+            twisted.internet.serialport.SerialPort(
+                protocol,
+                port,
+                reactor,
+                baudrate=baudrate,
+                parity=parity,
+            )
+
+            return twisted.internet.defer.succeed(protocol)
+
+        return cls(connect=connect, **kwargs)
+
+    async def _protocol(self):
+        if self.protocol is not None and self.protocol.connected:
+            return self.protocol
+
+        # each caller gets its own deferred since a deferred only hands its
+        # result to the first one awaiting it
+        waiter = twisted.internet.defer.Deferred()
+        self._waiters.append(waiter)
+
+        if self._connecting is None:
+            self._connecting = self.connect()
+            self._connecting.addBoth(self._connected)
+
+        return await waiter
+
+    def _connected(self, result):
+        self._connecting = None
+        waiters = self._waiters
+        self._waiters = []
+
+        if isinstance(result, twisted.python.failure.Failure):
+            for waiter in waiters:
+                waiter.errback(result)
+        else:
+            self.protocol = result
+            for waiter in waiters:
+                waiter.callback(result)
+
+    def disconnect(self):
+        if self.protocol is not None and self.protocol.transport is not None:
+            self.protocol.transport.loseConnection()
+
+        self.protocol = None
+
+    def set_ttl(self, points, ttl):
+        for point in points:
+            self.ttls[point] = ttl
+
+    def invalidate(self, points=None):
+        if points is None:
+            self._read_times.clear()
+            return
+
+        for point in points:
+            self._read_times.pop(point, None)
+
+    def _stale(self, point, now, max_age):
+        read_time = self._read_times.get(point)
+        if read_time is None:
+            return True
+
+        if max_age is None:
+            max_age = self.ttls.get(point, self.ttl)
+
+        return now - read_time > max_age
+
+    async def read_points(self, points, max_age=None):
+        """Read the passed points, and the scale factors they use, with as
+        few requests as possible.  All requests are issued together."""
+
+        points = set(points)
+        points.update(
+            point.sf_point for point in tuple(points) if point.sf_point is not None
+        )
+
+        now = self.clock()
+        stale = [point for point in points if self._stale(point, now, max_age)]
+
+        if len(stale) == 0:
+            return
+
+        blocks = coalesce(stale, gap=self.gap)
+        protocol = await self._protocol()
+
+        try:
+            results = await twisted.internet.defer.gatherResults(
+                [
+                    protocol.read(address=block.address, count=block.count)
+                    for block in blocks
+                ],
+                consumeErrors=True,
+            )
+        except twisted.internet.defer.FirstError as e:
+            e.subFailure.raiseException()
+
+        if epyqlib.metrics.enabled:
+            registers_read.increment(sum(block.count for block in blocks))
+
+        now = self.clock()
+        decoded = []
+        for block, data in zip(blocks, results):
+            for point in block.points:
+                start, end = point_span(point)
+                offset = 2 * (start - block.address)
+                decoded.append((point, data[offset : offset + 2 * (end - start)]))
+
+        # scale factors first so the points pick up the new values
+        decoded.sort(key=lambda pair: pair[0].sf_point is not None)
+
+        for point, data in decoded:
+            decode(point=point, data=data)
+            self._read_times[point] = now
+
+    async def read_models(self, models, max_age=None):
+        await self.read_points(
+            points=[
+                point
+                for model in models
+                for block in model.blocks
+                for point in [*block.points_list, *block.points_sf.values()]
+            ],
+            max_age=max_age,
+        )
+
+    async def write_point(self, point):
+        """Write ``point.value_base`` like pysunspec's ``point.write()``."""
+
+        length = int(point.point_type.len)
+        data = point.point_type.to_data(point.value_base, length * 2)
+
+        protocol = await self._protocol()
+        try:
+            await protocol.write(address=int(point.addr), data=data)
+        finally:
+            self.invalidate(points=[point])
+
+        point.dirty = False
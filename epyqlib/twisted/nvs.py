@@ -9,6 +9,7 @@ import attr
 import twisted.internet.defer
 import twisted.protocols.policies
 
+import epyqlib.metrics
 import epyqlib.nv
 import epyqlib.utils.general
 
@@ -18,6 +19,11 @@ __license__ = "GPLv2+"
 
 logger = logging.getLogger(__name__)
 
+transaction_seconds = epyqlib.metrics.registry.histogram("nvs.transaction_seconds")
+timeouts = epyqlib.metrics.registry.counter("nvs.timeouts")
+send_failures = epyqlib.metrics.registry.counter("nvs.send_failures")
+queue_depth = epyqlib.metrics.registry.gauge("nvs.queue_depth")
+
 
 class RequestTimeoutError(epyqlib.utils.general.ExpectedException):
     def __init__(self, state, item):
@@ -99,6 +105,13 @@ class Protocol(twisted.protocols.policies.TimeoutMixin):
 
         self.cancel_queued = False
 
+        # (arbitration_id, extended) pairs of the status frames, set by the
+        # owner once the frames are known
+        self.status_frame_ids = None
+
+    def can_filter_ids(self):
+        return self.status_frame_ids
+
     @property
     def state(self):
         return self._state
@@ -262,6 +275,10 @@ class Protocol(twisted.protocols.policies.TimeoutMixin):
 
     def _put(self, request):
         self.requests.put(request)
+
+        if epyqlib.metrics.enabled:
+            queue_depth.set(self.requests.qsize())
+
         self._get()
 
     def _get(self):
@@ -448,6 +465,10 @@ class Protocol(twisted.protocols.policies.TimeoutMixin):
 
         self.setTimeout(None)
 
+        if epyqlib.metrics.enabled:
+            transaction_seconds.record(time.time() - request.send_time)
+            queue_depth.set(self.requests.qsize())
+
         if request.all_values:
             status_signals = {s.status_signal for s in request.signals}
             value = {
@@ -462,11 +483,17 @@ class Protocol(twisted.protocols.policies.TimeoutMixin):
         self.callback(value, request.meta)
 
     def send_failed(self):
+        if epyqlib.metrics.enabled:
+            send_failures.increment()
+
         self.cancel_queued = True
         deferred = self._transaction_over()
         deferred.errback(SendFailedError())
 
     def timeoutConnection(self):
+        if epyqlib.metrics.enabled:
+            timeouts.increment()
+
         request = self._request_memory
         # TODO: report all requested signals
         signal = tuple(request.signals)[0]
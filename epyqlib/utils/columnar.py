@@ -0,0 +1,474 @@
+"""Column oriented numeric series for plotting long logs.
+
+Columns are stored as contiguous native arrays, doubles unless another
+:mod:`array` typecode is given, along with a JSON metadata dict.  Parsed CSV
+files are cached in this binary format in the user cache directory and
+:func:`epyqlib.datalogger.parse_log` can write it directly.  Files are memory
+mapped on load so only the pages that are actually plotted get read.
+:class:`Envelope` keeps a min/max pyramid per column so extents of any range
+are cheap and :func:`downsample` can reduce a visible range to a handful of
+points per pixel column.
+"""
+
+import array
+import bisect
+import csv
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import pathlib
+import struct
+import sys
+
+import appdirs
+import attr
+
+
+logger = logging.getLogger(__name__)
+
+magic = b"EPYQCOL1"
+suffix = ".columns"
+cache_suffix = suffix
+_header_length = struct.Struct("<Q")
+_alignment = 8
+
+# typecodes with the same item size on all supported platforms
+item_sizes = {
+    "b": 1,
+    "B": 1,
+    "h": 2,
+    "H": 2,
+    "i": 4,
+    "I": 4,
+    "q": 8,
+    "Q": 8,
+    "f": 4,
+    "d": 8,
+}
+
+
+class FormatError(Exception):
+    pass
+
+
+@attr.s
+class Columns:
+    """Ordered mapping from column name to a sequence of numbers supporting
+    slicing and the buffer protocol (:class:`array.array` or a cast
+    :class:`memoryview`)."""
+
+    names = attr.ib(converter=list)
+    _data = attr.ib(converter=dict)
+    metadata = attr.ib(factory=dict)
+    _mmap = attr.ib(default=None, repr=False)
+
+    @property
+    def rows(self):
+        if len(self.names) == 0:
+            return 0
+
+        return len(self._data[self.names[0]])
+
+    def __getitem__(self, name):
+        return self._data[name]
+
+    def __contains__(self, name):
+        return name in self._data
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def typecode(self, name):
+        column = self._data[name]
+
+        if isinstance(column, memoryview):
+            return column.format
+
+        return getattr(column, "typecode", "d")
+
+    def keys(self):
+        return list(self.names)
+
+    def values(self):
+        return [self._data[name] for name in self.names]
+
+    def items(self):
+        return [(name, self._data[name]) for name in self.names]
+
+    def close(self):
+        if self._mmap is not None:
+            for name in self.names:
+                self._data[name].release()
+
+            self._data = {}
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        names = next(reader)
+        columns = [array.array("d") for _ in names]
+
+        appends = [column.append for column in columns]
+        for row in reader:
+            for append, value in zip(appends, row):
+                append(float(value))
+
+    return Columns(names=names, data=zip(names, columns))
+
+
+def _padding(offset):
+    return -offset % _alignment
+
+
+def write(path, columns, source=None):
+    """Write ``columns`` in the columns format.  The file is written under a
+    temporary name and renamed so readers never see a partial file.
+    ``source`` is recorded in the header, see :func:`source_stamp`."""
+
+    data = []
+    for name in columns.names:
+        column = columns[name]
+        if not isinstance(column, (array.array, memoryview)):
+            column = array.array("d", column)
+
+        if isinstance(column, memoryview):
+            typecode = column.format
+        else:
+            typecode = column.typecode
+
+        if item_sizes.get(typecode) != column.itemsize:
+            raise FormatError(
+                "Unsupported type {!r} for {!r}".format(typecode, name),
+            )
+
+        data.append((typecode, column))
+
+    header = json.dumps(
+        {
+            "names": list(columns.names),
+            "types": [typecode for typecode, _ in data],
+            "rows": columns.rows,
+            "byteorder": sys.byteorder,
+            "metadata": columns.metadata,
+            "source": source,
+        }
+    ).encode("utf-8")
+
+    path = pathlib.Path(path)
+    temporary = path.with_name(path.name + ".tmp")
+
+    with open(temporary, "wb") as f:
+        f.write(magic)
+        f.write(_header_length.pack(len(header)))
+        f.write(header)
+        f.write(bytes(_padding(f.tell())))
+
+        for _, column in data:
+            f.write(column)
+            f.write(bytes(_padding(f.tell())))
+
+    os.replace(temporary, path)
+
+
+def _read_header(f, path):
+    if f.read(len(magic)) != magic:
+        raise FormatError("{} is not a columns file".format(path))
+
+    (length,) = _header_length.unpack(f.read(_header_length.size))
+    header = json.loads(f.read(length).decode("utf-8"))
+
+    if header["byteorder"] != sys.byteorder:
+        raise FormatError("{} has the wrong byte order".format(path))
+
+    return header
+
+
+def read_header(path):
+    """Read just the header dict of a file written by :func:`write`."""
+
+    with open(path, "rb") as f:
+        return _read_header(f, path)
+
+
+def load(path):
+    """Memory map a file written by :func:`write`."""
+
+    with open(path, "rb") as f:
+        header = _read_header(f, path)
+
+        offset = f.tell()
+        offset += _padding(offset)
+
+        names = header["names"]
+        types = header.get("types", ["d"] * len(names))
+        rows = header["rows"]
+        metadata = header.get("metadata", {})
+
+        if rows * len(names) == 0:
+            return Columns(
+                names=names,
+                data=(
+                    (name, array.array(typecode))
+                    for name, typecode in zip(names, types)
+                ),
+                metadata=metadata,
+            )
+
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    data = {}
+    for name, typecode in zip(names, types):
+        size = rows * item_sizes[typecode]
+        data[name] = view[offset : offset + size].cast(typecode)
+        offset += size
+        offset += _padding(offset)
+    view.release()
+
+    return Columns(names=names, data=data, metadata=metadata, mmap=mapped)
+
+
+def default_cache_directory():
+    return pathlib.Path(appdirs.user_cache_dir("Epyq", "EPC Power")) / "columns"
+
+
+def cache_path(path, directory=None):
+    """Cached columns for the CSV at ``path`` in ``directory``, the user
+    cache directory by default, named for the resolved source path."""
+
+    if directory is None:
+        directory = default_cache_directory()
+
+    path = pathlib.Path(path).resolve()
+    name = hashlib.sha256(os.fspath(path).encode("utf-8")).hexdigest()
+
+    return pathlib.Path(directory) / (path.stem + "-" + name[:16] + cache_suffix)
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_csv(path, cache=True, cache_directory=None):
+    """Load a CSV file, using and refreshing the binary cache in
+    ``cache_directory`` when ``cache`` is true.  The cache is only used if
+    the source size and modification time match those it was built from."""
+
+    if not cache:
+        return read_csv(path)
+
+    cached = cache_path(path, directory=cache_directory)
+    stamp = source_stamp(path)
+
+    try:
+        if read_header(cached).get("source") == stamp:
+            return load(cached)
+    except (OSError, FormatError, ValueError, KeyError):
+        pass
+
+    columns = read_csv(path)
+
+    try:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        write(cached, columns, source=stamp)
+    except OSError:
+        logger.debug("Unable to write column cache %s", cached, exc_info=True)
+
+    return columns
+
+
+def _reduce(values, indexes, block_size, function):
+    """Reduce each block of ``values`` with ``function``, also returning the
+    index of the chosen value.  ``indexes`` maps positions in ``values`` to
+    indexes of the original column, ``None`` when ``values`` is the
+    column."""
+
+    reduced = array.array("d")
+    reduced_indexes = array.array("q")
+
+    for start in range(0, len(values), block_size):
+        block = values[start : start + block_size]
+        if isinstance(block, memoryview):
+            block = block.tolist()
+
+        value = function(block)
+        try:
+            offset = block.index(value)
+        except ValueError:
+            # nan is not equal to itself
+            offset = next(i for i, v in enumerate(block) if v != v)
+
+        index = start + offset
+        if indexes is not None:
+            index = indexes[index]
+
+        reduced.append(value)
+        reduced_indexes.append(index)
+
+    return reduced, reduced_indexes
+
+
+@attr.s
+class Envelope:
+    """Min/max pyramid over a column.  Level ``n`` holds the extent of each
+    block of ``block_size * fan_out ** n`` values along with the indexes of
+    the extremes in the column."""
+
+    values = attr.ib()
+    block_size = attr.ib(default=64)
+    fan_out = attr.ib(default=8)
+    levels = attr.ib(factory=list)
+
+    def __attrs_post_init__(self):
+        if len(self.levels) > 0:
+            return
+
+        size = self.block_size
+        minimums = _reduce(self.values, None, size, min)
+        maximums = _reduce(self.values, None, size, max)
+
+        while True:
+            self.levels.append((size, minimums, maximums))
+
+            if len(minimums[0]) <= 1:
+                break
+
+            size *= self.fan_out
+            minimums = _reduce(*minimums, self.fan_out, min)
+            maximums = _reduce(*maximums, self.fan_out, max)
+
+    def extent(self, start=0, stop=None):
+        """Return ``(minimum, maximum)`` of ``values[start:stop]`` or
+        ``None`` for an empty range."""
+
+        indexes = self.extent_indexes(start, stop)
+        if indexes is None:
+            return None
+
+        minimum_index, maximum_index = indexes
+
+        return self.values[minimum_index], self.values[maximum_index]
+
+    def extent_indexes(self, start=0, stop=None):
+        """Return the indexes of the minimum and maximum of
+        ``values[start:stop]`` or ``None`` for an empty range."""
+
+        if stop is None:
+            stop = len(self.values)
+
+        start = max(start, 0)
+        stop = min(stop, len(self.values))
+
+        if stop <= start:
+            return None
+
+        return self._extent_indexes(start, stop, len(self.levels) - 1)
+
+    def _extent_indexes(self, start, stop, level):
+        values = self.values
+
+        while level >= 0:
+            size, minimums, maximums = self.levels[level]
+            first = -(-start // size)
+            last = stop // size
+
+            if first < last:
+                break
+
+            level -= 1
+        else:
+            window = values[start:stop]
+            if isinstance(window, memoryview):
+                window = window.tolist()
+
+            return (
+                start + min(range(len(window)), key=window.__getitem__),
+                start + max(range(len(window)), key=window.__getitem__),
+            )
+
+        minimum_values, minimum_indexes = minimums
+        maximum_values, maximum_indexes = maximums
+
+        offset = min(range(first, last), key=minimum_values.__getitem__)
+        minimum_index = minimum_indexes[offset]
+        offset = max(range(first, last), key=maximum_values.__getitem__)
+        maximum_index = maximum_indexes[offset]
+
+        for edge in ((start, first * size), (last * size, stop)):
+            if edge[0] < edge[1]:
+                edge_minimum, edge_maximum = self._extent_indexes(*edge, level - 1)
+                if values[edge_minimum] < values[minimum_index]:
+                    minimum_index = edge_minimum
+                if values[edge_maximum] > values[maximum_index]:
+                    maximum_index = edge_maximum
+
+        return minimum_index, maximum_index
+
+
+def visible_slice(x, minimum, maximum):
+    """Index range of the monotonic ``x`` covering ``[minimum, maximum]``
+    including one point beyond each side so lines reach the plot edges."""
+
+    start = max(bisect.bisect_left(x, minimum) - 1, 0)
+    stop = min(bisect.bisect_right(x, maximum) + 1, len(x))
+
+    return start, stop
+
+
+def downsample(x, y, envelope, start, stop, buckets):
+    """Reduce ``y[start:stop]`` to at most four points per bucket, M4
+    style: the first, minimum, maximum and last points of each bucket, in
+    ``x`` order and at their own ``x``.  At pixel resolution this draws the
+    same lines as the full data.  ``x`` must be monotonic.  Returns a list
+    of ``(x, y)`` tuples."""
+
+    count = stop - start
+    if count <= 4 * buckets:
+        return list(zip(x[start:stop], y[start:stop]))
+
+    x_minimum = x[start]
+    width = (x[stop - 1] - x_minimum) / buckets
+
+    if width <= 0 or not math.isfinite(width):
+        bounds = [start + (count * i) // buckets for i in range(buckets + 1)]
+    else:
+        bounds = [start]
+        for i in range(1, buckets):
+            bound = bisect.bisect_left(x, x_minimum + i * width, bounds[-1], stop)
+            bounds.append(bound)
+        bounds.append(stop)
+
+    points = []
+    append = points.append
+
+    for first, last in zip(bounds, bounds[1:]):
+        if first >= last:
+            continue
+
+        append((x[first], y[first]))
+
+        if last - first > 2:
+            for index in sorted(set(envelope.extent_indexes(first + 1, last - 1))):
+                append((x[index], y[index]))
+
+        if last - first > 1:
+            append((x[last - 1], y[last - 1]))
+
+    return points
@@ -1,33 +1,42 @@
 import collections
+import operator
 
 import attr
 
 
 def create_helpers(cls):
+    """Build ``unpack``, ``pgn`` and ``pack`` for the bitfield class.  The
+    shifts and masks are worked out once here so each call is just integer
+    operations.
+    """
     lengths = cls.lengths()
-    offsets = (sum(lengths[:i]) for i in range(len(lengths)))
-    cls_offsets = cls(*offsets)
-    cls_slices = cls(
-        *(slice(o, o + l) for l, o in zip(lengths, attr.astuple(cls_offsets)))
+    total = sum(lengths)
+    shifts = tuple(total - sum(lengths[: i + 1]) for i in range(len(lengths)))
+    masks = tuple((1 << length) - 1 for length in lengths)
+
+    names = tuple(f.name for f in attr.fields(cls))
+    values = operator.attrgetter(*names)
+    fields = tuple(zip(shifts, masks))
+
+    pgn_shifts = []
+    shift = 0
+    for length, is_pgn in reversed(tuple(zip(lengths, cls.pgns()))):
+        pgn_shifts.insert(0, shift if is_pgn else None)
+        if is_pgn:
+            shift += length
+    pgn_fields = tuple(
+        (index, shift) for index, shift in enumerate(pgn_shifts) if shift is not None
     )
 
-    sf = "{{:0{}b}}".format(sum(lengths))
-
     def unpack(n):
-        sn = sf.format(n)
-        return cls(*(int(sn[s], 2) for s in attr.astuple(cls_slices)))
+        return cls(*((n >> shift) & mask for shift, mask in fields))
 
     def pgn(id):
-        strings = (
-            "{:0{}b}".format(n, l)
-            for n, l, b in zip(attr.astuple(id), lengths, cls.pgns())
-            if b
-        )
-        return int("".join(strings), 2)
+        id_values = values(id)
+        return sum(id_values[index] << shift for index, shift in pgn_fields)
 
     def pack(id):
-        strings = ("{:0{}b}".format(n, l) for n, l in zip(attr.astuple(id), lengths))
-        return int("".join(strings), 2)
+        return sum(value << shift for value, shift in zip(values(id), shifts))
 
     return unpack, pgn, pack
 
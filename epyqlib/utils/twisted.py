@@ -1,10 +1,14 @@
 import functools
 import decimal
 import logging
+import threading
 import time
 
 import attr
 import twisted.internet.defer
+import twisted.internet.threads
+import twisted.python.failure
+import twisted.python.threadpool
 
 import epyqlib.utils.general
 import epyqlib.utils.qt
@@ -253,6 +257,97 @@ class DeferredRepeater:
         return self.private_deferred.unpause()
 
 
+def raise_if_cancelled(cancelled: threading.Event):
+    if cancelled.is_set():
+        raise twisted.internet.defer.CancelledError()
+
+
+@attr.s
+class WorkerPool:
+    """Threads dedicated to blocking work, kept apart from the reactor's
+    default pool.  :meth:`run` calls ``f(cancelled, *args, **kwargs)`` in a
+    worker and returns a Deferred for the result.  Cancelling the Deferred
+    sets the ``cancelled`` event, which ``f`` should check between steps, for
+    example with :func:`raise_if_cancelled`.  The Deferred fails with
+    :class:`CancelledError` only once ``f`` has returned so a retry never
+    overlaps the cancelled work, such as writing the same file.
+    """
+
+    name = attr.ib(default="worker")
+    minimum = attr.ib(default=0)
+    maximum = attr.ib(default=4)
+    _pool = attr.ib(default=None, init=False)
+    _shutdown_trigger = attr.ib(default=None, init=False)
+
+    def start(self):
+        if self._pool is not None:
+            return
+
+        self._pool = twisted.python.threadpool.ThreadPool(
+            minthreads=self.minimum,
+            maxthreads=self.maximum,
+            name=self.name,
+        )
+        self._pool.start()
+        self._shutdown_trigger = twisted.internet.reactor.addSystemEventTrigger(
+            "during",
+            "shutdown",
+            self.stop,
+        )
+
+    def stop(self):
+        if self._pool is None:
+            return
+
+        pool = self._pool
+        self._pool = None
+
+        try:
+            twisted.internet.reactor.removeSystemEventTrigger(self._shutdown_trigger)
+        except ValueError:
+            # already fired as part of the shutdown
+            pass
+        self._shutdown_trigger = None
+
+        pool.stop()
+
+    def run(self, f, *args, **kwargs):
+        self.start()
+
+        cancelled = threading.Event()
+
+        def cancel(deferred):
+            cancelled.set()
+            # the CancelledError is set right after this but is held back
+            # from the callbacks until the worker is done
+            deferred.pause()
+            worker.addBoth(lambda _: deferred.unpause())
+
+        deferred = twisted.internet.defer.Deferred(canceller=cancel)
+
+        def forward(result):
+            if deferred.called:
+                # cancelled already so the worker's outcome is of no interest
+                return
+
+            if isinstance(result, twisted.python.failure.Failure):
+                deferred.errback(result)
+            else:
+                deferred.callback(result)
+
+        worker = twisted.internet.threads.deferToThreadPool(
+            twisted.internet.reactor,
+            self._pool,
+            f,
+            cancelled,
+            *args,
+            **kwargs,
+        )
+        worker.addBoth(forward)
+
+        return deferred
+
+
 @attr.s
 class Mobius:
     f = attr.ib()
@@ -6,6 +6,7 @@ import twisted.internet.threads
 
 import epyqlib.cmemoryparser
 import epyqlib.datalogger
+import epyqlib.utils.columnar
 import epyqlib.utils.qt
 import epyqlib.utils.twisted
 import epyqlib.variableselection_ui
@@ -121,7 +122,11 @@ class VariableSelection(QtWidgets.QWidget):
         raw_filename = epyqlib.utils.qt.file_dialog(filters, parent=self)
 
         if raw_filename is not None:
-            filters = [("CSV", ["csv"]), ("All Files", ["*"])]
+            filters = [
+                ("CSV", ["csv"]),
+                ("Columns", [epyqlib.utils.columnar.suffix.lstrip(".")]),
+                ("All Files", ["*"]),
+            ]
             csv_guess = str(
                 pathlib.Path(raw_filename).with_suffix("." + filters[0][1][0])
             )
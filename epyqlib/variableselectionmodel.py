@@ -378,6 +378,19 @@ class CacheAndRawChunks:
     raw_chunks = attr.ib()
 
 
+def block_header_metadata(block_header_node):
+    metadata = {}
+
+    for node in block_header_node.leaves():
+        value = node.fields.value
+        if not isinstance(value, (bool, int, float, str, type(None))):
+            value = str(value)
+
+        metadata[".".join(node.path())] = value
+
+    return metadata
+
+
 class VariableModel(epyqlib.pyqabstractitemmodel.PyQAbstractItemModel):
     binary_loaded = pyqtSignal()
 
@@ -836,6 +849,7 @@ class VariableModel(epyqlib.pyqabstractitemmodel.PyQAbstractItemModel):
             variables_and_chunks=variables_and_chunks,
             sample_period_us=sample_period_us,
             raw_chunks=raw_chunks,
+            metadata={"block_header": block_header_metadata(block_header_node)},
         )
 
         return d